@@ -0,0 +1,138 @@
+"""
+Holds the runner of calculators for asyncio services, constructing and calculating
+them in a thread or process pool so heavy all-stock statistics do not block the
+event loop, and sharing one computation between concurrent identical requests.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+import pickle
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple, Type
+
+from calculators.base import BaseCalculator
+
+
+class _Flight:
+    """
+    A computation in flight and the number of requests awaiting it.
+    """
+
+    def __init__(self, task: "asyncio.Task") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncCalculatorRunner:
+    """
+    Runs calculators off the event loop, returning their results as awaitables.
+
+    A calculator is constructed - filtering the trades - and calculated in the executor.
+    With a process pool, it is constructed in a thread of the loop, which reads the
+    Market of this process, and pickled there, then calculated in a worker process.
+
+    Requests for the same calculator class and arguments arriving while one is in
+    flight share its computation. A request timing out or cancelled stops waiting;
+    the computation is cancelled once no request awaits it, though a calculation
+    already running in the executor completes and its result is discarded.
+
+    Parameters:
+    executor: The thread or process pool to calculate in. Defaults to the loop's default executor.
+    lock: A lock held while constructing and calculating in threads, e.g. the one the
+    service holds while writing trades, as calculators read views of the Market only
+    valid until the next write (optional).
+
+    Example:
+        runner = AsyncCalculatorRunner(ProcessPoolExecutor(max_workers=4))
+        vwsp = await runner.calculate(VolumeWeightedStockPriceCalculator, timeout=0.5)
+        ale_vwsp = await runner.calculate(VolumeWeightedStockPriceCalculator, stock_symbol="ALE")
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, lock: Optional[threading.Lock] = None) -> None:
+        self.executor = executor
+        self.lock = lock
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.computations = 0
+        self.requests = 0
+
+    async def calculate(
+        self, calculator_class: Type[BaseCalculator], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Any:
+        """
+        Construct a calculator with the given arguments and calculate it, sharing the
+        computation of an identical request in flight.
+
+        Parameters:
+        calculator_class (type): The calculator to run, e.g. VolumeWeightedStockPriceCalculator.
+        args, kwargs: The arguments of the calculator.
+        timeout (float): The seconds to wait for the result (optional).
+
+        Returns:
+        Any: Result of the calculation.
+
+        Raises:
+        TimeoutError: If the result is not available within the timeout.
+        """
+        self.requests += 1
+        key = _request_key(calculator_class, args, kwargs)
+        flight = self._flights.get(key) if key is not None else None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._compute(calculator_class, args, kwargs)))
+            self.computations += 1
+            if key is not None:
+                self._flights[key] = flight
+                flight.task.add_done_callback(lambda _: self._land(key, flight))
+
+        flight.waiters += 1
+        try:
+            # Shielded, a request giving up does not cancel the computation of the others
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+                self._land(key, flight)
+
+    def _land(self, key: Optional[Hashable], flight: _Flight) -> None:
+        """
+        Stop sharing a computation, once done or abandoned by all its requests.
+        """
+        if key is not None and self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _compute(self, calculator_class: Type[BaseCalculator], args: Tuple, kwargs: Dict) -> Any:
+        loop = asyncio.get_running_loop()
+        if not isinstance(self.executor, ProcessPoolExecutor):
+            return await loop.run_in_executor(self.executor, self._construct_and_calculate, calculator_class, args, kwargs)
+        # Pickled under the lock, the trades are copied out of the Market's buffers before the next write
+        calculator = await loop.run_in_executor(None, self._construct_pickled, calculator_class, args, kwargs)
+        return await loop.run_in_executor(self.executor, _calculate_pickled, calculator)
+
+    def _construct_and_calculate(self, calculator_class: Type[BaseCalculator], args: Tuple, kwargs: Dict) -> Any:
+        with self.lock or nullcontext():
+            return calculator_class(*args, **kwargs).calculate()
+
+    def _construct_pickled(self, calculator_class: Type[BaseCalculator], args: Tuple, kwargs: Dict) -> bytes:
+        with self.lock or nullcontext():
+            return pickle.dumps(calculator_class(*args, **kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _calculate_pickled(calculator: bytes) -> Any:
+    """
+    Calculate a pickled calculator, in a worker process.
+    """
+    return pickle.loads(calculator).calculate()
+
+
+def _request_key(calculator_class: Type[BaseCalculator], args: Tuple, kwargs: Dict) -> Optional[Hashable]:
+    """
+    Get the key identifying identical requests, None if the arguments are not hashable,
+    e.g. a frame of stock prices, and the request is then not shared.
+    """
+    key = (calculator_class, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
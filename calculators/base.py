@@ -3,12 +3,18 @@ Holds all the abstract base clasees for different types of stat calculators
 """
 
 from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import cached_property
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Any, Optional
 
-from exchange.market import Market
+from common.constants import DEFAULT_VENUE
 from exchange.stock import StockInfo
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    import pandas as pd
+
 
 class BaseCalculator(ABC):
     """
@@ -27,7 +33,8 @@ class BaseCalculator(ABC):
         input_data (Any): The data required for calculation.
         """
         self.input_data = input_data
-        logging.info(f"Initialized {self.__class__.__name__} with input data:\n {input_data}")
+        # Lazy formatting, rendering large trade frames is only worth it when the message is emitted
+        logging.info("Initialized %s with input data:\n %s", self.__class__.__name__, input_data)
 
     @abstractmethod
     def calculate(self, *args: Any, **kwargs: Any) -> Any:
@@ -40,6 +47,31 @@ class BaseCalculator(ABC):
         """
         pass
 
+    async def calculate_async(self, executor: Optional["Executor"] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Awaitable counterpart of calculate, running it in an executor so the event loop
+        is not blocked while the trades are aggregated.
+
+        To also construct calculators off the loop, and share identical concurrent
+        calculations, use calculators.async_runner.AsyncCalculatorRunner.
+
+        Parameters:
+        executor (Executor): The thread or process pool to calculate in. Defaults to the loop's
+        default executor. A process pool is sent a copy of the calculator.
+        timeout (float): The seconds to wait for the result (optional).
+
+        Returns:
+        Any: Result of the calculation.
+
+        Raises:
+        TimeoutError: If the calculation does not complete within the timeout. A calculation
+        already running in the executor completes and its result is discarded.
+        """
+        import asyncio  # Imported lazily, only event-loop services need it
+
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(executor, self.calculate), timeout)
+
 
 class StockStatisticCalculator(BaseCalculator):
     """
@@ -48,6 +80,7 @@ class StockStatisticCalculator(BaseCalculator):
     Parameters:
     stock_symbol: The symbol of the stock.
     price: The price of the stock.
+    venue: The venue whose StockInfo holds the stock (optional).
 
     Example:
         class ConcreteStockAttributeCalculator(StockStatisticCalculator):
@@ -59,18 +92,22 @@ class StockStatisticCalculator(BaseCalculator):
             stock_attr_calc.calculate()
     """
 
-    def __init__(self, stock_symbol: str, price: float) -> None:
+    def __init__(self, stock_symbol: str, price: float, venue: str = DEFAULT_VENUE) -> None:
         """
         Initialize the StockStatisticCalculator with stock symbol and price.
 
         Parameters:
         stock_symbol (str): The symbol of the stock.
         price (float): The price of the stock.
+        venue (str): The venue whose StockInfo holds the stock.
         """
+        self.stock_symbol = stock_symbol
+        self.venue = venue
         self.custom_price = price
         if not self.custom_price or self.custom_price <= 0:
             raise ValueError(f"Given price {self.custom_price} is invalid, provide a positive number")
-        stock_info = StockInfo().get_stock_info(stock_symbol)
+        # An immutable record, unaffected by concurrent stock updates, read without a snapshot
+        stock_info = StockInfo(venue).get_record(stock_symbol)
         super().__init__(input_data=stock_info)
 
 
@@ -80,6 +117,22 @@ class TradeStatisticCalculator(BaseCalculator):
 
     Parameters:
     trade_filter: The filter to apply to trades.
+    start_time: Only trades timestamped at or after this time are considered (optional).
+    venue: The venue whose Market holds the trades (optional).
+    stock_symbol: Only the trades of this stock are considered (optional).
+
+    The trades are a read-only view over the Market's column buffers (see
+    Market.get_trades_view), so calculators must not modify input_data; they
+    compute new arrays or frames from it instead of copying it first.
+
+    The per-stock aggregates of the filtered trades (see calculators.kernels) are
+    available through the `summary` property, computed once per calculator - from exact
+    integer sums when the Market stores prices in ticks.
+
+    Calculators only needing the traded value and volume of each stock pass sums_only.
+    When the Market's storage backend aggregates trades where they are stored, like the
+    SQLite backend, the summary then only holds those columns and is computed by the
+    backend, and input_data is the summary instead of the trades.
 
     Example:
         class ConcreteTradeStatCalculator(TradeStatisticCalculator):
@@ -90,13 +143,45 @@ class TradeStatisticCalculator(BaseCalculator):
         stat_calc = ConcreteTradeStatCalculator(trade_filter="stock_symbol=='XYZ' and trade_type='buy'")
     """
 
-    def __init__(self, trade_filter: str):
+    def __init__(
+        self,
+        trade_filter: str = "",
+        start_time: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+        stock_symbol: Optional[str] = None,
+        sums_only: bool = False,
+    ):
         """
         Initialize the TradeStatisticCalculator with a trade filter.
 
         Parameters:
         trade_filter (str): The filter to apply to trades.
+        start_time (datetime): The start of the time window of trades to consider (optional).
+        venue (str): The venue whose Market holds the trades.
+        stock_symbol (str): The stock whose trades to consider (optional).
+        sums_only (bool): Whether the calculator only needs the traded value and volume of each stock.
+        """
+        from exchange.market import Market  # Imported lazily, stock statistics do not need the trade store
+
+        self.venue = venue
+        market = Market(venue)
+        self.tick_size = market.tick_size
+        sums = market.get_trade_sums(start_time, stock_symbol=stock_symbol) if sums_only and not trade_filter else None
+        if sums is not None:
+            from calculators.kernels import summarize_sums
+
+            self.summary = summarize_sums(sums, tick_size=self.tick_size)
+            super().__init__(input_data=self.summary)
+            return
+        filtered_trades = market.get_trades_view(trade_filter, start_time=start_time, stock_symbol=stock_symbol)
+        super().__init__(input_data=filtered_trades)
+
+    @cached_property
+    def summary(self) -> "pd.DataFrame":
         """
-        market = Market()
-        filtered_trades = market.get_trades(trade_filter)
-        super().__init__(input_data=filtered_trades)
\ No newline at end of file
+        Per-stock aggregates of the filtered trades - volume weighted stock price,
+        traded value and volume, trade count, buy/sell volume, min/max/last price.
+        """
+        from calculators.kernels import summarize_trades
+
+        return summarize_trades(self.input_data, tick_size=self.tick_size)
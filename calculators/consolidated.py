@@ -0,0 +1,77 @@
+"""
+Holds calculators consolidating trade statistics across venues (or shards). Each
+venue computes small partial sums next to its own Market, e.g. in its own process,
+and only those partial sums are brought together - never the trades.
+"""
+
+import logging
+from typing import Any, Iterable
+import pandas as pd
+from calculators.base import BaseCalculator
+from calculators.kernels import TOTAL_VOLUME, TRADE_VALUE, VWSP
+from calculators.trade_stats import TradeSummaryCalculator
+from common.constants import DEFAULT_VENUE, STOCK_SYMBOL
+
+
+def venue_partial_sums(venue: str = DEFAULT_VENUE, stock_symbol: str = None) -> pd.DataFrame:
+    """
+    Compute the partial volume weighted stock price sums of a venue over the trade window.
+
+    Parameters:
+    venue (str): The venue whose Market holds the trades.
+    stock_symbol (str): The symbol of the stock (optional).
+
+    Returns:
+    pd.DataFrame: The traded value and volume per stock symbol (the index). The frame is
+    small and picklable, so it can be sent back from the venue's process.
+    """
+    calculator = TradeSummaryCalculator(stock_symbol=stock_symbol, venue=venue)
+    if calculator.input_data.empty:
+        return pd.DataFrame(
+            {TRADE_VALUE: [], TOTAL_VOLUME: []}, index=pd.Index([], name=STOCK_SYMBOL)
+        )
+    return calculator.summary[[TRADE_VALUE, TOTAL_VOLUME]]
+
+
+class ConsolidatedVolumeWeightedStockPriceCalculator(BaseCalculator):
+    """
+    Calculator for determining the volume weighted stock price across venues, from
+    the partial sums of each venue (see venue_partial_sums). The result of all stocks
+    can be passed on to the AllShareIndexCalculator for the consolidated index.
+
+    Parameters:
+    partial_sums: The partial sums of each venue.
+    stock_symbol: The symbol of the stock (optional).
+
+    Example:
+        partial_sums = [venue_partial_sums("XLON"), venue_partial_sums("XPAR")]
+        all_vwsp = ConsolidatedVolumeWeightedStockPriceCalculator(partial_sums).calculate()
+        all_share_index = AllShareIndexCalculator(all_vwsp).calculate()
+    """
+
+    def __init__(self, partial_sums: Iterable[pd.DataFrame], stock_symbol: str = None) -> None:
+        self.stock_symbol = stock_symbol
+        partial_sums = list(partial_sums)
+        super().__init__(input_data=pd.concat(partial_sums) if partial_sums else pd.DataFrame())
+
+    def calculate(self) -> Any:
+        """
+        Calculate the consolidated volume weighted stock price.
+
+        Returns:
+        float or pd.DataFrame: The volume weighted stock price for the specified stock, or a
+        DataFrame of volume weighted stock prices for all stocks if no stock symbol is specified.
+        None if no venue has trades.
+        """
+        if self.input_data.empty:
+            return None
+        sums = self.input_data.groupby(level=STOCK_SYMBOL).sum()
+        vwsp = (sums[TRADE_VALUE] / sums[TOTAL_VOLUME]).round(2).rename(VWSP)
+
+        if self.stock_symbol:
+            vwsp = vwsp.get(self.stock_symbol)
+            logging.info(f"Calculated consolidated VWSP for {self.stock_symbol}: {vwsp}")
+            return vwsp
+        else:
+            logging.info(f"Calculated consolidated VWSP for all stocks across {len(sums)} symbols")
+            return vwsp.reset_index()
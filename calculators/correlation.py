@@ -0,0 +1,483 @@
+"""
+Holds the calculators of the correlation and covariance matrices of the returns of
+all the stocks listed in a venue's StockInfo, from their prices in fixed time buckets
+- the volume weighted price of the trades of a bucket, or the price of its last trade.
+
+Buckets are aligned on multiples of the bucket length since the epoch, and a stock's
+price is carried forward over the buckets it does not trade in, so the return series
+of all stocks are aligned. Returns are the log returns between consecutive buckets,
+from the first bucket a stock trades in. Each pair of stocks is computed over the
+buckets both stocks have a return in (pairwise complete, like pandas DataFrame.cov
+and DataFrame.corr), as sample statistics (ddof=1). Pairs with fewer than two returns
+in common, and the correlations of a constant series, are NaN.
+
+The matrices are derived from the pairwise count and sums of the returns, computed
+for all pairs at once with a few matrix products rather than pair by pair. Only the
+buckets holding trades are laid out: over the buckets without trades in between, the
+prices carried forward give zero returns, which only add to the counts, so long idle
+spans cost nothing.
+"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from calculators.base import TradeStatisticCalculator
+from calculators.kernels import factorize_symbols
+from common.constants import DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP
+from exchange.market import Market, TradeListener
+from exchange.stock import StockInfo
+from exchange.trade_store import to_datetime64
+
+
+CORRELATION = "correlation"
+COVARIANCE = "covariance"
+MATRICES = (CORRELATION, COVARIANCE)
+
+# Bucket prices: the volume weighted price of the bucket's trades, or the price of its last trade
+VWSP_PRICES = "vwsp"
+CLOSE_PRICES = "close"
+PRICE_METHODS = (VWSP_PRICES, CLOSE_PRICES)
+
+DEFAULT_BUCKET = timedelta(minutes=1)
+
+
+def _check_matrix(matrix: str) -> None:
+    if matrix not in MATRICES:
+        raise ValueError(f"Matrix {matrix} should be one of {', '.join(MATRICES)}")
+
+
+def _bucket_ns(bucket: timedelta, price: str) -> int:
+    """
+    Check the bucket length and price method.
+
+    Returns:
+    int: The bucket length in nanoseconds.
+
+    Raises:
+    ValueError: If the price method is unknown, or the bucket is not positive.
+    """
+    if price not in PRICE_METHODS:
+        raise ValueError(f"Price {price} should be one of {', '.join(PRICE_METHODS)}")
+    bucket_ns = bucket // timedelta(microseconds=1) * 1000
+    if bucket_ns <= 0:
+        raise ValueError(f"Bucket {bucket} should be at least 1 microsecond")
+    return bucket_ns
+
+
+def _bucket_of(timestamp: datetime, bucket_ns: int) -> int:
+    return int(to_datetime64(timestamp).astype(np.int64)) // bucket_ns
+
+
+def _universe(venue: str) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    The symbols of the stocks listed in a venue's StockInfo, sorted, and their positions.
+    """
+    symbols = np.array(sorted(StockInfo(venue).snapshot()), dtype=object)
+    return symbols, {symbol: position for position, symbol in enumerate(symbols)}
+
+
+def _positions(symbols, universe: Dict[str, int]) -> np.ndarray:
+    """
+    The position in the universe of the stock of each trade, -1 if it is not listed.
+    """
+    codes, unique_symbols = factorize_symbols(symbols, sort=False)
+    unique_positions = np.array([universe.get(symbol, -1) for symbol in unique_symbols], dtype=np.int64)
+    return unique_positions[codes]
+
+
+def bucket_sums(
+    buckets: np.ndarray,
+    positions: np.ndarray,
+    prices: np.ndarray,
+    quantities: np.ndarray,
+    symbol_count: int,
+    bucket_count: int,
+    price: str = VWSP_PRICES,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate time-sorted trades into a bucket_count x symbol_count grid, whose prices are
+    the ratio of the two sums returned - the traded value and volume of each stock in
+    each bucket, or the last price of each stock in each bucket and 1.
+
+    Parameters:
+    buckets (np.ndarray): The row of the bucket of each trade, from 0.
+    positions (np.ndarray): The position of the stock of each trade in the universe.
+    prices (np.ndarray): The price of each trade.
+    quantities (np.ndarray): The quantity of each trade.
+    symbol_count (int): The number of stocks of the universe.
+    bucket_count (int): The number of bucket rows.
+    price (str): VWSP_PRICES or CLOSE_PRICES.
+
+    Returns:
+    tuple: The numerator and denominator grids, the denominator 0 where a stock did not trade.
+    """
+    size = bucket_count * symbol_count
+    cells = buckets * symbol_count + positions
+    if price == VWSP_PRICES:
+        quantities = quantities.astype(np.float64)
+        values = np.bincount(cells, weights=prices * quantities, minlength=size)
+        volumes = np.bincount(cells, weights=quantities, minlength=size)
+    else:
+        values, volumes = np.zeros(size), np.zeros(size)
+        # The first of the reversed trades of a cell is its last trade
+        traded, last = np.unique(cells[::-1], return_index=True)
+        values[traded] = prices[len(cells) - 1 - last]
+        volumes[traded] = 1.0
+    return values.reshape(bucket_count, symbol_count), volumes.reshape(bucket_count, symbol_count)
+
+
+def add_bucket_returns(
+    moments: "ReturnMoments",
+    buckets: np.ndarray,
+    values: np.ndarray,
+    volumes: np.ndarray,
+    previous: np.ndarray,
+    end: int,
+) -> np.ndarray:
+    """
+    Add the returns of the buckets from buckets[0] up to `end`, excluded, to the pairwise
+    sums, from the bucket sums (see bucket_sums) of the buckets holding trades only. The
+    buckets without trades after each of them carry its prices forward: their returns are
+    zero for the stocks with a price, which only adds to the counts.
+
+    Parameters:
+    moments (ReturnMoments): The pairwise sums to add to.
+    buckets (np.ndarray): The increasing buckets of the rows of the sums, before `end`.
+    values (np.ndarray): The numerator grid of the buckets.
+    volumes (np.ndarray): The denominator grid of the buckets.
+    previous (np.ndarray): The price of each stock as of the bucket before, NaN if it has none.
+    end (int): The bucket the returns stop at.
+
+    Returns:
+    np.ndarray: The price of each stock as of the bucket before `end`.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prices = np.vstack([previous, np.where(volumes > 0, values / volumes, np.nan)])
+    # Carry the prices forward over the buckets a stock does not trade in
+    latest = np.where(np.isnan(prices), 0, np.arange(len(prices))[:, None])
+    np.maximum.accumulate(latest, axis=0, out=latest)
+    prices = prices[latest, np.arange(prices.shape[1])]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        moments.add(np.log(prices[1:] / prices[:-1]))
+    moments.add_unchanged(~np.isnan(prices[1:]), np.diff(np.append(buckets, end)) - 1)
+    return prices[-1]
+
+
+class ReturnMoments:
+    """
+    The pairwise sums of aligned return series, which the covariance and correlation
+    matrices are derived from: for each pair of stocks (i, j), the number of buckets
+    both have a return in, and the sums of the returns of i, of their squares and of
+    the products of the returns of i and j over those buckets.
+
+    Adding a block of buckets costs four matrix products over the block, so the sums
+    are kept up to date as buckets close without revisiting the earlier ones.
+
+    Parameters:
+    symbol_count: The number of stocks.
+    """
+
+    def __init__(self, symbol_count: int) -> None:
+        shape = (symbol_count, symbol_count)
+        self.counts = np.zeros(shape)
+        self.sums = np.zeros(shape)
+        self.squares = np.zeros(shape)
+        self.products = np.zeros(shape)
+
+    def add(self, returns: np.ndarray) -> None:
+        """
+        Add a bucket x stock block of returns, NaN where a stock has no return.
+        """
+        if not len(returns):
+            return
+        valid = ~np.isnan(returns)
+        present = valid.astype(np.float64)
+        values = np.where(valid, returns, 0.0)
+        self.counts += present.T @ present
+        self.sums += values.T @ present
+        self.squares += (values * values).T @ present
+        self.products += values.T @ values
+
+    def add_unchanged(self, present: np.ndarray, repeats: np.ndarray) -> None:
+        """
+        Add runs of buckets in which no price changed: the stocks with a price (a row of
+        present per run) have a zero return in each of the `repeats` buckets of the run.
+        """
+        present = present.astype(np.float64)
+        self.counts += present.T @ (present * np.asarray(repeats, dtype=np.float64)[:, None])
+
+    def _centered(self) -> Tuple[np.ndarray, np.ndarray]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = self.sums / self.counts
+            return self.products - self.sums * means.T, np.maximum(self.squares - self.sums * means, 0.0)
+
+    def covariance(self) -> np.ndarray:
+        products, _ = self._centered()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = products / (self.counts - 1)
+        return np.where(self.counts > 1, covariance, np.nan)
+
+    def correlation(self) -> np.ndarray:
+        products, squares = self._centered()
+        # squares[i, j] is the sum of squared deviations of i over the returns in common with j
+        scale = squares * squares.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.clip(products / np.sqrt(scale), -1.0, 1.0)
+        return np.where((self.counts > 1) & (scale > 0), correlation, np.nan)
+
+    def frame(self, matrix: str, symbols: np.ndarray) -> pd.DataFrame:
+        """
+        Get the covariance or correlation matrix, indexed by stock symbol on both axes.
+        """
+        values = self.correlation() if matrix == CORRELATION else self.covariance()
+        index = pd.Index(symbols, name=STOCK_SYMBOL)
+        return pd.DataFrame(values, index=index, columns=index.copy())
+
+
+class ReturnCorrelationCalculator(TradeStatisticCalculator):
+    """
+    Calculator for the correlation, or covariance, matrix of the bucket returns of all
+    the stocks listed in the venue's StockInfo, from the trades of the buckets closed
+    by `now` - the buckets from the first one holding a trade up to the one `now` falls
+    in, excluded.
+
+    Parameters:
+    matrix: CORRELATION or COVARIANCE.
+    bucket: The length of the buckets. Defaults to 1 minute.
+    price: The price of a stock in a bucket, VWSP_PRICES or CLOSE_PRICES.
+    start_time: Only trades timestamped at or after this time are considered (optional).
+    now: The end of the closed buckets. Defaults to the current time.
+    venue: The venue whose trades are considered (optional).
+
+    Raises:
+    ValueError: If the matrix or the price method is unknown, or the bucket is not positive.
+    """
+
+    def __init__(
+        self,
+        matrix: str = CORRELATION,
+        bucket: timedelta = DEFAULT_BUCKET,
+        price: str = VWSP_PRICES,
+        start_time: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ):
+        _check_matrix(matrix)
+        self.bucket_ns = _bucket_ns(bucket, price)
+        self.matrix = matrix
+        self.price = price
+        self.now = now or datetime.now()
+        super().__init__(start_time=start_time, venue=venue)
+
+    def calculate(self) -> Optional[pd.DataFrame]:
+        """
+        Calculate the matrix.
+
+        Returns:
+        pd.DataFrame: The matrix, indexed by stock symbol on both axes. None if no
+        listed stock traded in the closed buckets.
+        """
+        if self.input_data.empty:
+            return None
+        symbols, universe = _universe(self.venue)
+        trades = self.input_data
+        timestamps = trades[TIMESTAMP].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        closed = np.searchsorted(timestamps, _bucket_of(self.now, self.bucket_ns) * self.bucket_ns, side="left")
+        positions = _positions(trades[STOCK_SYMBOL].iloc[:closed], universe)
+        listed = positions >= 0
+        if not listed.any():
+            return None
+        traded, rows = np.unique(timestamps[:closed][listed] // self.bucket_ns, return_inverse=True)
+        values, volumes = bucket_sums(
+            rows,
+            positions[listed],
+            trades[PRICE].to_numpy(dtype=np.float64)[:closed][listed],
+            trades[QUANTITY].to_numpy()[:closed][listed],
+            len(symbols),
+            len(traded),
+            self.price,
+        )
+        moments = ReturnMoments(len(symbols))
+        add_bucket_returns(
+            moments, traded, values, volumes, np.full(len(symbols), np.nan), _bucket_of(self.now, self.bucket_ns)
+        )
+        logging.info(f"Calculated return {self.matrix} of {len(symbols)} stocks")
+        return moments.frame(self.matrix, symbols)
+
+
+class RollingReturnCorrelation(TradeListener):
+    """
+    Maintains the correlation and covariance matrices of the bucket returns of all the
+    stocks listed in the venue's StockInfo as trades are recorded in the Market, with
+    the same results as ReturnCorrelationCalculator.
+
+    The sums of the open bucket are updated as its trades arrive. When a bucket closes,
+    because a later trade arrived or the calculation moved past it, its returns are
+    added to the pairwise sums (see ReturnMoments), so a calculation does not revisit
+    the earlier buckets. Trades arriving late into a closed bucket (or late into the
+    open bucket, with CLOSE_PRICES), cancelled trades, and stocks listed or removed
+    since, rebuild the sums from the trades of the Market.
+
+    Parameters:
+    bucket: The length of the buckets. Defaults to 1 minute.
+    price: The price of a stock in a bucket, VWSP_PRICES or CLOSE_PRICES.
+    start_time: Only trades timestamped at or after this time are considered (optional).
+    now: The end of the closed buckets initially. Defaults to the current time.
+    venue: The venue whose Market is followed (optional).
+
+    Example:
+        rolling_correlation = RollingReturnCorrelation(bucket=timedelta(minutes=5))
+        ...
+        rolling_correlation.calculate(COVARIANCE)
+
+    Raises:
+    ValueError: If the price method is unknown, or the bucket is not positive.
+    """
+
+    def __init__(
+        self,
+        bucket: timedelta = DEFAULT_BUCKET,
+        price: str = VWSP_PRICES,
+        start_time: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ) -> None:
+        self.bucket_ns = _bucket_ns(bucket, price)
+        self.price = price
+        self.venue = venue
+        self._start = None if start_time is None else to_datetime64(start_time)
+        self._market = Market(venue)
+        self._closed_until: Optional[int] = None
+        self._rebuild()
+        self._market.subscribe(self)
+        self.advance(now)
+
+    def _reset(self) -> None:
+        snapshot = StockInfo(self.venue).snapshot()
+        self._version = snapshot.version
+        self._symbols, self._universe = _universe(self.venue)
+        count = len(self._symbols)
+        self._moments = ReturnMoments(count)
+        # The bucket trades are added to, None before the first trade, and its sums
+        self._open_bucket: Optional[int] = None
+        self._open_sums = (np.zeros(count), np.zeros(count))
+        # The price of each stock as of the last closed bucket
+        self._closing_prices = np.full(count, np.nan)
+        self._latest: Optional[int] = None
+
+    def _rebuild(self) -> None:
+        self._reset()
+        self._add(self._market.get_trade_columns(start_time=self._start))
+        if self._closed_until is not None:
+            self._close(self._closed_until)
+
+    def close(self) -> None:
+        """
+        Stop following the trades recorded in the Market.
+        """
+        self._market.unsubscribe(self)
+
+    def _close(self, until: int) -> None:
+        """
+        Close the buckets before `until`, adding their returns to the pairwise sums.
+        """
+        if self._open_bucket is None or until <= self._open_bucket:
+            return
+        count = len(self._symbols)
+        # The open bucket, and the buckets after it without trades
+        open_values, open_volumes = self._open_sums
+        self._close_buckets(np.array([self._open_bucket]), open_values[None], open_volumes[None], until)
+        self._open_bucket = until
+        self._open_sums = (np.zeros(count), np.zeros(count))
+
+    def _close_buckets(self, buckets: np.ndarray, values: np.ndarray, volumes: np.ndarray, end: int) -> None:
+        self._closing_prices = add_bucket_returns(self._moments, buckets, values, volumes, self._closing_prices, end)
+
+    def _add(self, batch: Dict[str, np.ndarray]) -> bool:
+        """
+        Add time-sorted trades to the buckets.
+
+        Returns:
+        bool: False if the trades are late, and the sums need rebuilding.
+        """
+        timestamps = batch[TIMESTAMP].astype("datetime64[ns]").astype(np.int64)
+        positions = _positions(batch[STOCK_SYMBOL], self._universe)
+        selected = positions >= 0
+        if self._start is not None:
+            selected &= timestamps >= self._start.astype(np.int64)
+        if not selected.any():
+            return True
+        timestamps, positions = timestamps[selected], positions[selected]
+        buckets = timestamps // self.bucket_ns
+        if self._open_bucket is not None:
+            late = buckets.min() < self._open_bucket or (self.price == CLOSE_PRICES and timestamps.min() < self._latest)
+            if late:
+                return False
+            # The open bucket is the first row, traded in or not
+            buckets = np.append(self._open_bucket, buckets)
+        traded, rows = np.unique(buckets, return_inverse=True)
+        if self._open_bucket is not None:
+            rows = rows[1:]
+        values, volumes = bucket_sums(
+            rows, positions, batch[PRICE][selected].astype(np.float64), batch[QUANTITY][selected],
+            len(self._symbols), len(traded), self.price,
+        )
+        if self._open_bucket is not None:
+            open_values, open_volumes = self._open_sums
+            if self.price == VWSP_PRICES:
+                values[0] += open_values
+                volumes[0] += open_volumes
+            else:
+                values[0] = np.where(volumes[0] > 0, values[0], open_values)
+                volumes[0] = np.maximum(volumes[0], open_volumes)
+        if len(traded) > 1:
+            self._close_buckets(traded[:-1], values[:-1], volumes[:-1], int(traded[-1]))
+        self._open_bucket = int(traded[-1])
+        self._open_sums = (values[-1], volumes[-1])
+        self._latest = timestamps.max() if self._latest is None else max(self._latest, timestamps.max())
+        return True
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        if not self._add(batch):
+            self._rebuild()
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        if self._start is None or (batch[TIMESTAMP] >= self._start).any():
+            self._rebuild()
+
+    def on_flush(self) -> None:
+        self._reset()
+
+    def advance(self, now: Optional[datetime] = None) -> None:
+        """
+        Close the buckets ending at or before `now`.
+        """
+        until = _bucket_of(now or datetime.now(), self.bucket_ns)
+        if self._closed_until is None or until > self._closed_until:
+            self._closed_until = until
+            self._close(until)
+
+    def calculate(self, matrix: str = CORRELATION, now: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """
+        Calculate the correlation or covariance matrix of the buckets closed by `now`.
+
+        Returns:
+        pd.DataFrame: The matrix, indexed by stock symbol on both axes. None if no
+        listed stock traded in the closed buckets.
+
+        Raises:
+        ValueError: If the matrix is unknown.
+        """
+        _check_matrix(matrix)
+        snapshot = StockInfo(self.venue).snapshot()
+        if snapshot.version != self._version:
+            if list(self._symbols) != sorted(snapshot):
+                self._rebuild()
+            self._version = snapshot.version
+        self.advance(now)
+        if np.isnan(self._closing_prices).all():
+            return None
+        logging.info(f"Calculated rolling return {matrix} of {len(self._symbols)} stocks")
+        return self._moments.frame(matrix, self._symbols)
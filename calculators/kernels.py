@@ -0,0 +1,235 @@
+"""
+Holds the vectorized aggregation kernels shared by the trade statistic calculators.
+The core loops are JIT compiled with Numba when it is installed (see utils.jit).
+"""
+
+from fractions import Fraction
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TRADE_TYPE, TradeType
+from exchange.storage import TRADED_VALUE, VOLUME
+from utils.fixed_point import from_ticks, price_ratio, to_ticks
+from utils.jit import kernel
+
+
+VWSP = "volume_weighted_stock_price"
+TRADE_VALUE = "total_trade_value"
+TOTAL_VOLUME = "total_volume"
+TRADE_COUNT = "trade_count"
+BUY_VOLUME = "buy_volume"
+SELL_VOLUME = "sell_volume"
+MIN_PRICE = "min_price"
+MAX_PRICE = "max_price"
+LAST_PRICE = "last_price"
+
+TRADE_SUMMARY_FIELDS = (
+    VWSP, TRADE_VALUE, TOTAL_VOLUME, TRADE_COUNT, BUY_VOLUME,
+    SELL_VOLUME, MIN_PRICE, MAX_PRICE, LAST_PRICE,
+)
+
+# Rows factorized at once, which bounds the hash table of pd.factorize
+_FACTORIZE_CHUNK_SIZE = 65536
+
+
+def factorize_symbols(symbols, sort: bool = True):
+    """
+    Encode stock symbols as integer codes like pd.factorize, chunk by chunk, so the
+    temporary memory does not grow with the number of trades.
+
+    Symbols given as a categorical over the ids of a symbol registry, like the ones
+    of Market.get_trades_view, are encoded from their ids by array indexing instead,
+    without hashing any symbol.
+
+    Parameters:
+    symbols: The stock symbols, as an array, a Series or a categorical Series.
+    sort (bool): Number the distinct symbols in sorted order, else in order of appearance
+    (of registration for a categorical).
+
+    Returns:
+    tuple: The int64 code of each symbol, and the array of distinct symbols.
+    """
+    if isinstance(getattr(symbols, "dtype", None), pd.CategoricalDtype):
+        return _factorize_symbol_ids(pd.Series(symbols, copy=False), sort)
+    symbols = np.asarray(symbols)
+    codes = np.empty(len(symbols), dtype=np.int64)
+    distinct = {}
+    for lo in range(0, len(symbols), _FACTORIZE_CHUNK_SIZE):
+        chunk_codes, chunk_symbols = pd.factorize(symbols[lo:lo + _FACTORIZE_CHUNK_SIZE])
+        mapping = np.array([distinct.setdefault(symbol, len(distinct)) for symbol in chunk_symbols], dtype=np.int64)
+        codes[lo:lo + _FACTORIZE_CHUNK_SIZE] = mapping[chunk_codes]
+    unique_symbols = np.array(list(distinct), dtype=object)
+    if sort and len(unique_symbols):
+        order = np.argsort(unique_symbols, kind="stable")
+        ranks = np.empty_like(order)
+        ranks[order] = np.arange(len(order))
+        np.take(ranks, codes, out=codes)
+        unique_symbols = unique_symbols[order]
+    return codes, unique_symbols
+
+
+def _factorize_symbol_ids(symbols: pd.Series, sort: bool):
+    """
+    Encode a categorical of symbol ids as the codes of the symbols present, see factorize_symbols.
+    """
+    categories = symbols.cat.categories
+    ids = symbols.cat.codes.to_numpy()
+    present = np.flatnonzero(np.bincount(ids, minlength=len(categories)))
+    unique_symbols = categories[present].to_numpy(dtype=object)
+    if sort:
+        order = np.argsort(unique_symbols, kind="stable")
+        present, unique_symbols = present[order], unique_symbols[order]
+    ranks = np.empty(len(categories), dtype=np.int64)
+    ranks[present] = np.arange(len(present))
+    return ranks[ids], unique_symbols
+
+
+def _per_symbol_sums_numpy(codes, prices, quantities, is_buy, symbol_count):
+    sums = np.empty((symbol_count, 3))
+    sums[:, 0] = np.bincount(codes, weights=prices * quantities, minlength=symbol_count)
+    sums[:, 1] = np.bincount(codes, weights=quantities, minlength=symbol_count)
+    sums[:, 2] = np.bincount(codes, weights=quantities * is_buy, minlength=symbol_count)
+    return sums
+
+
+@kernel(numpy_impl=_per_symbol_sums_numpy)
+def per_symbol_sums(codes, prices, quantities, is_buy, symbol_count):
+    """
+    Sum the traded value, volume and buy volume of each symbol code.
+
+    Returns:
+    np.ndarray: A (symbol_count, 3) array of traded value, volume and buy volume.
+    """
+    sums = np.zeros((symbol_count, 3))
+    for i in range(len(codes)):
+        code = codes[i]
+        sums[code, 0] += prices[i] * quantities[i]
+        sums[code, 1] += quantities[i]
+        sums[code, 2] += quantities[i] * is_buy[i]
+    return sums
+
+
+def _per_symbol_tick_sums_numpy(codes, ticks, quantities, is_buy, symbol_count):
+    sums = np.zeros((symbol_count, 3), dtype=np.int64)
+    np.add.at(sums[:, 0], codes, ticks * quantities)
+    np.add.at(sums[:, 1], codes, quantities)
+    np.add.at(sums[:, 2], codes, quantities * is_buy)
+    return sums
+
+
+@kernel(numpy_impl=_per_symbol_tick_sums_numpy)
+def per_symbol_tick_sums(codes, ticks, quantities, is_buy, symbol_count):
+    """
+    Sum the traded value (in ticks), volume and buy volume of each symbol code, as
+    exact int64 sums of the int64 tick prices and quantities.
+
+    Returns:
+    np.ndarray: A (symbol_count, 3) int64 array of traded value, volume and buy volume.
+    """
+    sums = np.zeros((symbol_count, 3), dtype=np.int64)
+    for i in range(len(codes)):
+        code = codes[i]
+        sums[code, 0] += ticks[i] * quantities[i]
+        sums[code, 1] += quantities[i]
+        sums[code, 2] += quantities[i] * is_buy[i]
+    return sums
+
+
+def _log_mean_numpy(values):
+    return np.log(values).mean()
+
+
+@kernel(numpy_impl=_log_mean_numpy)
+def log_mean(values):
+    """
+    Mean of the natural logarithms of positive values, the geometric mean being its exponential.
+    """
+    total = 0.0
+    for i in range(len(values)):
+        total += np.log(values[i])
+    return total / len(values)
+
+
+def summarize_trades(trades: pd.DataFrame, tick_size: Optional[Fraction] = None) -> pd.DataFrame:
+    """
+    Aggregate trades per stock in a single pass over their columns, without copying
+    the trades or adding temporary columns to them.
+
+    Parameters:
+    trades (pd.DataFrame): Trades as returned by Market.get_trades, sorted by timestamp.
+    tick_size (Fraction): The tick size of a Market in tick mode (optional). The sums
+    are then accumulated as exact integers in ticks.
+
+    Returns:
+    pd.DataFrame: One row per stock symbol (sorted), with the columns in TRADE_SUMMARY_FIELDS.
+    The volume weighted stock price is not rounded, except in tick mode where it is
+    rounded half to even to cents from the exact sums.
+    """
+    codes, symbols = factorize_symbols(trades[STOCK_SYMBOL])
+    symbol_count = len(symbols)
+    prices = trades[PRICE].to_numpy(dtype=np.float64)
+    is_buy = trades[TRADE_TYPE].to_numpy() == TradeType.BUY.value
+
+    if tick_size is None:
+        quantities = trades[QUANTITY].to_numpy(dtype=np.float64)
+        sums = per_symbol_sums(codes, prices, quantities, is_buy, symbol_count)
+        trade_value, total_volume, buy_volume = sums[:, 0], sums[:, 1], sums[:, 2]
+        vwsp = trade_value / total_volume
+    else:
+        quantities = trades[QUANTITY].to_numpy(dtype=np.int64)
+        ticks = to_ticks(prices, tick_size)
+        sums = per_symbol_tick_sums(codes, ticks, quantities, is_buy.astype(np.int64), symbol_count)
+        vwsp = price_ratio(sums[:, 0], sums[:, 1], tick_size)
+        trade_value = from_ticks(sums[:, 0], tick_size)
+        total_volume, buy_volume = sums[:, 1].astype(np.float64), sums[:, 2].astype(np.float64)
+    trade_count = np.bincount(codes, minlength=symbol_count)
+
+    min_price = np.full(symbol_count, np.inf)
+    np.minimum.at(min_price, codes, prices)
+    max_price = np.full(symbol_count, -np.inf)
+    np.maximum.at(max_price, codes, prices)
+    # Trades are time-sorted, so the last price is at the highest row position of each stock
+    last_position = np.zeros(symbol_count, dtype=np.int64)
+    np.maximum.at(last_position, codes, np.arange(len(codes)))
+
+    return pd.DataFrame(
+        {
+            VWSP: vwsp,
+            TRADE_VALUE: trade_value,
+            TOTAL_VOLUME: total_volume,
+            TRADE_COUNT: trade_count,
+            BUY_VOLUME: buy_volume,
+            SELL_VOLUME: total_volume - buy_volume,
+            MIN_PRICE: min_price,
+            MAX_PRICE: max_price,
+            LAST_PRICE: prices[last_position],
+        },
+        index=pd.Index(symbols, name=STOCK_SYMBOL),
+    )
+
+
+def summarize_sums(sums: Dict[str, np.ndarray], tick_size: Optional[Fraction] = None) -> pd.DataFrame:
+    """
+    Build the volume weighted stock price, traded value and volume columns of the trade
+    summary from the per-stock sums aggregated by a storage backend (see Market.get_trade_sums).
+
+    Parameters:
+    sums (dict): The stock symbols (sorted) and their TRADED_VALUE and VOLUME sums.
+    tick_size (Fraction): The tick size of a Market in tick mode (optional), the traded
+    value then being the exact sum in ticks.
+
+    Returns:
+    pd.DataFrame: One row per stock symbol, with the VWSP, TRADE_VALUE and TOTAL_VOLUME
+    columns computed like in summarize_trades.
+    """
+    volume = sums[VOLUME]
+    if tick_size is None:
+        trade_value = sums[TRADED_VALUE].astype(np.float64)
+        vwsp = trade_value / volume
+    else:
+        vwsp = price_ratio(sums[TRADED_VALUE], volume, tick_size)
+        trade_value = from_ticks(sums[TRADED_VALUE], tick_size)
+    return pd.DataFrame(
+        {VWSP: vwsp, TRADE_VALUE: trade_value, TOTAL_VOLUME: volume.astype(np.float64)},
+        index=pd.Index(sums[STOCK_SYMBOL], name=STOCK_SYMBOL),
+    )
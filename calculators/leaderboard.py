@@ -0,0 +1,215 @@
+"""
+Holds the top-N leaderboard of stocks over the trade window - by traded volume,
+traded value, trade count or VWSP change - maintained incrementally as trades are
+recorded in the Market and leave the window.
+"""
+
+from datetime import datetime, timedelta
+import heapq
+import logging
+from typing import Dict, List, Optional, Set
+import numpy as np
+import pandas as pd
+from calculators.kernels import TOTAL_VOLUME, TRADE_COUNT, TRADE_VALUE
+from common.constants import DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_WINDOW
+from exchange.market import Market, TradeListener
+from exchange.trade_store import to_datetime64
+
+
+# Relative change of the volume weighted stock price from the previous window to
+# the current one. Stocks are ranked by its absolute value.
+VWSP_CHANGE = "vwsp_change"
+
+LEADERBOARD_METRICS = (TOTAL_VOLUME, TRADE_VALUE, TRADE_COUNT, VWSP_CHANGE)
+
+# Positions of the sums kept per stock and window
+_VOLUME, _TRADE_VALUE, _COUNT = 0, 1, 2
+
+
+class TopNLeaderboard(TradeListener):
+    """
+    Maintains the ranking of stocks over the trade window, so the top N stocks by a
+    metric can be read without regrouping and sorting all the trades.
+
+    The volume, traded value and trade count of each stock are kept for the current
+    window and the one before it (for the VWSP change), and updated as trades arrive
+    and are cancelled, and as the window moves forward. Every update of a stock pushes its new ranking
+    keys on one heap per metric; superseded entries are skipped, and dropped, when
+    the top of the heap is read. A query for the top N therefore costs O(N log S)
+    for S stocks, plus the entries it discards.
+
+    Parameters:
+    window: The time window of trades to consider. Defaults to 5 minutes.
+    now: The time the window initially ends at. Defaults to the current time.
+    venue: The venue whose Market is followed (optional).
+
+    Example:
+        leaderboard = TopNLeaderboard()
+        ...
+        leaderboard.top(VWSP_CHANGE, n=20)
+    """
+
+    def __init__(
+        self,
+        window: timedelta = TRADE_WINDOW,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ) -> None:
+        self.window = window
+        self._market = Market(venue)
+        self._window_start = (now or datetime.now()) - window
+        self._reset()
+        # Read before subscribing: the read merges the buffered late trades, notifying the listeners
+        trades = self._market.get_trade_columns(start_time=self._window_start - window)
+        self._market.subscribe(self)
+        self.on_trades(trades)
+
+    def _reset(self) -> None:
+        self._current: Dict[str, list] = {}
+        self._previous: Dict[str, list] = {}
+        self._versions: Dict[str, int] = {}
+        self._heaps: Dict[str, list] = {metric: [] for metric in LEADERBOARD_METRICS}
+
+    def close(self) -> None:
+        """
+        Stop following the trades recorded in the Market.
+        """
+        self._market.unsubscribe(self)
+
+    def _accumulate(self, sums: Dict[str, list], batch: Dict[str, np.ndarray], sign: int, touched: Set[str]) -> None:
+        symbols = batch[STOCK_SYMBOL]
+        if not len(symbols):
+            return
+        codes, unique_symbols = pd.factorize(symbols)
+        quantities = batch[QUANTITY].astype(np.float64)
+        volumes = np.bincount(codes, weights=quantities)
+        trade_values = np.bincount(codes, weights=batch[PRICE] * quantities)
+        counts = np.bincount(codes)
+        for symbol, volume, trade_value, count in zip(
+            unique_symbols, volumes.tolist(), trade_values.tolist(), counts.tolist()
+        ):
+            stock_sums = sums.setdefault(symbol, [0.0, 0.0, 0])
+            stock_sums[_VOLUME] += sign * volume
+            stock_sums[_TRADE_VALUE] += sign * trade_value
+            stock_sums[_COUNT] += sign * count
+            if stock_sums[_COUNT] <= 0:
+                del sums[symbol]
+            touched.add(symbol)
+
+    def _select(self, batch: Dict[str, np.ndarray], start: datetime, end: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        timestamps = batch[TIMESTAMP]
+        selected = timestamps >= to_datetime64(start)
+        if end is not None:
+            selected &= timestamps < to_datetime64(end)
+        if selected.all():
+            return batch
+        return {name: column[selected] for name, column in batch.items()}
+
+    def _vwsp_change(self, symbol: str) -> Optional[float]:
+        current, previous = self._current.get(symbol), self._previous.get(symbol)
+        if current is None or previous is None:
+            return None
+        previous_vwsp = previous[_TRADE_VALUE] / previous[_VOLUME]
+        return current[_TRADE_VALUE] / current[_VOLUME] / previous_vwsp - 1
+
+    def _refresh(self, touched: Set[str]) -> None:
+        """
+        Push the new ranking keys of the stocks whose sums changed.
+        """
+        for symbol in touched:
+            version = self._versions.get(symbol, 0) + 1
+            self._versions[symbol] = version
+            current = self._current.get(symbol)
+            if current is None:
+                continue
+            heapq.heappush(self._heaps[TOTAL_VOLUME], (-current[_VOLUME], symbol, version))
+            heapq.heappush(self._heaps[TRADE_VALUE], (-current[_TRADE_VALUE], symbol, version))
+            heapq.heappush(self._heaps[TRADE_COUNT], (-current[_COUNT], symbol, version))
+            change = self._vwsp_change(symbol)
+            if change is not None:
+                heapq.heappush(self._heaps[VWSP_CHANGE], (-abs(change), symbol, version))
+
+        # Rebuild the heaps once superseded entries dominate them
+        limit = 4 * len(self._current) + 64
+        for metric, heap in self._heaps.items():
+            if len(heap) > limit:
+                self._heaps[metric] = [entry for entry in heap if self._versions.get(entry[1]) == entry[2]]
+                heapq.heapify(self._heaps[metric])
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        touched = set()
+        self._accumulate(self._current, self._select(batch, self._window_start), 1, touched)
+        self._accumulate(
+            self._previous, self._select(batch, self._window_start - self.window, self._window_start), 1, touched
+        )
+        self._refresh(touched)
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        touched = set()
+        self._accumulate(self._current, self._select(batch, self._window_start), -1, touched)
+        self._accumulate(
+            self._previous, self._select(batch, self._window_start - self.window, self._window_start), -1, touched
+        )
+        self._refresh(touched)
+
+    def on_flush(self) -> None:
+        self._reset()
+
+    def advance(self, now: Optional[datetime] = None) -> None:
+        """
+        Move the end of the window to `now`, moving the trades leaving the current
+        window to the previous one, and dropping the ones leaving the previous window.
+        """
+        window_start = (now or datetime.now()) - self.window
+        if window_start <= self._window_start:
+            return
+        touched = set()
+        expired = self._market.get_trade_columns(self._window_start, window_start)
+        self._accumulate(self._current, expired, -1, touched)
+        self._accumulate(self._previous, expired, 1, touched)
+        # Includes the trades just moved, if the window moved by more than its length
+        previous_expired = self._market.get_trade_columns(self._window_start - self.window, window_start - self.window)
+        self._accumulate(self._previous, previous_expired, -1, touched)
+        self._window_start = window_start
+        self._refresh(touched)
+
+    def _metric_value(self, metric: str, symbol: str):
+        if metric == VWSP_CHANGE:
+            return self._vwsp_change(symbol)
+        position = {TOTAL_VOLUME: _VOLUME, TRADE_VALUE: _TRADE_VALUE, TRADE_COUNT: _COUNT}[metric]
+        return self._current[symbol][position]
+
+    def top(self, metric: str, n: int = 20, now: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Get the top N stocks by a metric over the window ending at `now`.
+
+        Parameters:
+        metric (str): One of LEADERBOARD_METRICS - total_volume, total_trade_value,
+        trade_count or vwsp_change (ranked by its absolute value).
+        n (int): The number of stocks to return.
+        now (datetime): The end of the window. Defaults to the current time.
+
+        Returns:
+        pd.DataFrame: The stock symbols and metric values, best first. Ties are ordered by symbol.
+
+        Raises:
+        ValueError: If the metric is unknown.
+        """
+        if metric not in self._heaps:
+            raise ValueError(f"Leaderboard metric '{metric}' is invalid, expected one of {LEADERBOARD_METRICS}")
+        self.advance(now)
+        heap = self._heaps[metric]
+        leaders: List[tuple] = []
+        while heap and len(leaders) < n:
+            entry = heapq.heappop(heap)
+            # Entries pushed before the last update of the stock are superseded
+            if self._versions.get(entry[1]) == entry[2]:
+                leaders.append(entry)
+        for entry in leaders:
+            heapq.heappush(heap, entry)
+
+        symbols = [entry[1] for entry in leaders]
+        logging.info("Calculated top %d stocks by %s", n, metric)
+        return pd.DataFrame(
+            {STOCK_SYMBOL: symbols, metric: [self._metric_value(metric, symbol) for symbol in symbols]}
+        )
@@ -0,0 +1,291 @@
+"""
+Holds the calculators of per-stock price and trade size quantiles over the trade
+window, and the time-bucketed quantile sketches they can be served from.
+"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from calculators.base import TradeStatisticCalculator
+from calculators.kernels import factorize_symbols
+from calculators.sketches import (
+    DEFAULT_RELATIVE_ACCURACY, QuantileSketch, merge_sketch_maps, sketch_by_symbol, sketch_groups,
+)
+from common.constants import DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_WINDOW
+from exchange.market import Market, TradeListener
+
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_BUCKET_WIDTH = timedelta(seconds=10)
+
+# Trade columns the sketches are kept for
+SKETCH_COLUMNS = (PRICE, QUANTITY)
+
+
+def quantile_label(quantile: float) -> str:
+    """
+    The column name of a quantile, e.g. p50 for 0.5 or p99.9 for 0.999.
+    """
+    return f"p{quantile * 100:g}"
+
+
+class WindowedQuantileSketches(TradeListener):
+    """
+    Maintains per-stock quantile sketches of the trade prices and sizes in time buckets,
+    so window quantiles merge the bucket sketches instead of rescanning the trades.
+
+    Trades are sketched into the bucket of their timestamp as they are recorded in the
+    Market, including late ones, and removed from it when cancelled. Buckets older than the window are dropped, bounding the
+    memory to the buckets of one window. The window is aligned to bucket boundaries, so it
+    may start up to one bucket width early.
+
+    Parameters:
+    window: The time window of trades to consider. Defaults to 5 minutes.
+    bucket_width: The width of the time buckets. Defaults to 10 seconds.
+    relative_accuracy: The relative error bound of the sketches.
+    now: The time the window initially ends at. Defaults to the current time.
+    venue: The venue whose Market is followed (optional).
+
+    Example:
+        sketches = WindowedQuantileSketches()
+        ...
+        PriceQuantileCalculator(sketches=sketches.merged(PRICE)).calculate()
+    """
+
+    def __init__(
+        self,
+        window: timedelta = TRADE_WINDOW,
+        bucket_width: timedelta = DEFAULT_BUCKET_WIDTH,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ) -> None:
+        if bucket_width <= timedelta(0):
+            raise ValueError(f"bucket_width {bucket_width} should be more than 0")
+        self.window = window
+        self.relative_accuracy = relative_accuracy
+        self._bucket_ns = bucket_width // timedelta(microseconds=1) * 1000
+        self._market = Market(venue)
+        self._buckets: Dict[int, Dict[str, Tuple[QuantileSketch, QuantileSketch]]] = {}
+        self._first_bucket = self._bucket_of((now or datetime.now()) - window)
+        # Read before subscribing: the read merges the buffered late trades, notifying the listeners
+        trades = self._market.get_trade_columns(start_time=self._bucket_start(self._first_bucket))
+        self._market.subscribe(self)
+        self.on_trades(trades)
+
+    def _bucket_of(self, timestamp: datetime) -> int:
+        return int(np.datetime64(timestamp, "ns").astype(np.int64)) // self._bucket_ns
+
+    def _bucket_start(self, bucket: int) -> datetime:
+        return np.datetime64(bucket * self._bucket_ns, "ns").astype("datetime64[us]").astype(datetime)
+
+    def close(self) -> None:
+        """
+        Stop following the trades recorded in the Market.
+        """
+        self._market.unsubscribe(self)
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        buckets = batch[TIMESTAMP].view(np.int64) // self._bucket_ns
+        kept = buckets >= self._first_bucket
+        if not kept.any():
+            return
+        if not kept.all():
+            batch = {name: column[kept] for name, column in batch.items()}
+            buckets = buckets[kept]
+        # Group the trades by bucket and stock, and add them to the sketches of the group in place
+        codes, unique_symbols = factorize_symbols(batch[STOCK_SYMBOL], sort=False)
+        first_bucket = int(buckets.min())
+        group_codes, groups = pd.factorize((buckets - first_bucket) * len(unique_symbols) + codes)
+        group_keys = list(zip((groups // len(unique_symbols) + first_bucket).tolist(), unique_symbols[groups % len(unique_symbols)]))
+        existing = [self._buckets.get(bucket, {}).get(symbol) for bucket, symbol in group_keys]
+        column_sketches = [
+            sketch_groups(
+                group_codes, batch[column], [None if entry is None else entry[position] for entry in existing],
+                self.relative_accuracy,
+            )
+            for position, column in enumerate(SKETCH_COLUMNS)
+        ]
+        for (bucket, symbol), price_sketch, size_sketch in zip(group_keys, *column_sketches):
+            self._buckets.setdefault(bucket, {})[symbol] = (price_sketch, size_sketch)
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        buckets = batch[TIMESTAMP].view(np.int64) // self._bucket_ns
+        for row in np.flatnonzero(buckets >= self._first_bucket).tolist():
+            sketches = self._buckets.get(int(buckets[row]), {}).get(batch[STOCK_SYMBOL][row])
+            if sketches is not None:
+                for sketch, column in zip(sketches, SKETCH_COLUMNS):
+                    sketch.remove(batch[column][row : row + 1])
+
+    def on_flush(self) -> None:
+        self._buckets = {}
+
+    def advance(self, now: Optional[datetime] = None) -> None:
+        """
+        Move the end of the window to `now`, dropping the buckets that left the window.
+        """
+        first_bucket = self._bucket_of((now or datetime.now()) - self.window)
+        if first_bucket <= self._first_bucket:
+            return
+        self._first_bucket = first_bucket
+        for bucket in [bucket for bucket in self._buckets if bucket < first_bucket]:
+            del self._buckets[bucket]
+
+    def merged(self, column: str = PRICE, now: Optional[datetime] = None) -> Dict[str, QuantileSketch]:
+        """
+        Get the per-stock sketches of a trade column over the window ending at `now`.
+
+        Parameters:
+        column (str): price or quantity.
+        now (datetime): The end of the window. Defaults to the current time.
+
+        Returns:
+        dict: A mapping of stock symbol to a new sketch merging the bucket sketches.
+        """
+        if column not in SKETCH_COLUMNS:
+            raise ValueError(f"Column '{column}' is not sketched, expected one of {SKETCH_COLUMNS}")
+        self.advance(now)
+        position = SKETCH_COLUMNS.index(column)
+        return merge_sketch_maps(
+            {symbol: sketches[position] for symbol, sketches in bucket_sketches.items()}
+            for bucket_sketches in self._buckets.values()
+        )
+
+    def merged_since(
+        self, start_time: datetime, column: str = PRICE, stock_symbol: Optional[str] = None
+    ) -> Optional[Dict[str, QuantileSketch]]:
+        """
+        Get the per-stock sketches of a trade column over the trades timestamped at or after
+        `start_time`, exactly: the buckets starting at or after it are merged, and the trades
+        of the bucket it falls in, from `start_time` on, are read back from the Market.
+
+        Parameters:
+        start_time (datetime): The start of the trades to consider.
+        column (str): price or quantity.
+        stock_symbol (str): Only the sketch of this stock is merged (optional).
+
+        Returns:
+        dict: A mapping of stock symbol to a new sketch. None if the buckets from start_time
+        on are not all kept, as the window moved past start_time.
+        """
+        if column not in SKETCH_COLUMNS:
+            raise ValueError(f"Column '{column}' is not sketched, expected one of {SKETCH_COLUMNS}")
+        start = int(np.datetime64(start_time, "ns").astype(np.int64))
+        first_bucket = start // self._bucket_ns
+        if first_bucket < self._first_bucket:
+            return None
+        sketch_maps = []
+        if start % self._bucket_ns:
+            edge = self._market.get_trade_columns(
+                start_time, self._bucket_start(first_bucket + 1), stock_symbols=None if stock_symbol is None else [stock_symbol]
+            )
+            sketch_maps.append(sketch_by_symbol(edge[STOCK_SYMBOL], edge[column], self.relative_accuracy))
+            first_bucket += 1
+        position = SKETCH_COLUMNS.index(column)
+        for bucket, bucket_sketches in list(self._buckets.items()):
+            if bucket < first_bucket:
+                continue
+            if stock_symbol is None:
+                sketch_maps.append({symbol: sketches[position] for symbol, sketches in bucket_sketches.items()})
+            elif stock_symbol in bucket_sketches:
+                sketch_maps.append({stock_symbol: bucket_sketches[stock_symbol][position]})
+        return merge_sketch_maps(sketch_maps)
+
+    def memory_usage(self) -> int:
+        """
+        The memory held by the bucket counts of all the sketches, in bytes.
+        """
+        return sum(
+            price_sketch.nbytes + size_sketch.nbytes
+            for bucket_sketches in self._buckets.values()
+            for price_sketch, size_sketch in bucket_sketches.values()
+        )
+
+
+class QuantileCalculator(TradeStatisticCalculator):
+    """
+    Abstract Base calculator for the quantiles of a trade column per stock over the trade window.
+
+    The quantiles are estimated from mergeable sketches (see calculators.sketches) within
+    their relative accuracy. The sketches are either given, e.g. merged from the buckets of
+    WindowedQuantileSketches or across venues with merge_sketch_maps, or merged from a
+    WindowedQuantileSketches of the venue given, reading back only the trades of the
+    bucket the window starts in, or built from the trades of the window. The calculator
+    does not advance the WindowedQuantileSketches, their owner does; windows starting
+    before the buckets they keep are sketched from the trades.
+
+    Parameters:
+    stock_symbol: The symbol of the stock (optional).
+    quantiles: The quantiles to estimate, each between 0 and 1. Defaults to the median, p95 and p99.
+    venue: The venue whose trades are considered (optional).
+    now: The end of the trade window. Defaults to the current time.
+    sketches: Per-stock sketches to estimate the quantiles from, or a WindowedQuantileSketches
+    of the venue to merge them from, instead of the trades (optional).
+    relative_accuracy: The relative accuracy of the sketches built from the trades.
+    """
+
+    column = None
+
+    def __init__(
+        self,
+        stock_symbol: str = None,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        venue: str = DEFAULT_VENUE,
+        now: Optional[datetime] = None,
+        sketches: Union[Dict[str, QuantileSketch], WindowedQuantileSketches, None] = None,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ):
+        self.stock_symbol = stock_symbol
+        self.quantiles = tuple(quantiles)
+        start_time = (now or datetime.now()) - TRADE_WINDOW
+        if isinstance(sketches, WindowedQuantileSketches):
+            sketches = sketches.merged_since(start_time, self.column, stock_symbol=stock_symbol)
+        super().__init__(start_time=start_time, venue=venue, stock_symbol=stock_symbol)
+        if sketches is None:
+            trades = self.input_data
+            sketches = (
+                {} if trades.empty
+                else sketch_by_symbol(trades[STOCK_SYMBOL].to_numpy(), trades[self.column].to_numpy(), relative_accuracy)
+            )
+        if stock_symbol:
+            sketches = {stock_symbol: sketches[stock_symbol]} if stock_symbol in sketches else {}
+        self.sketches = sketches
+
+    def calculate(self) -> Any:
+        """
+        Calculate the quantiles.
+
+        Returns:
+        pd.Series or pd.DataFrame: The quantiles of the specified stock, or a DataFrame
+        indexed by stock symbol if no stock symbol is specified, with the columns p50, p95, ...
+        None if there are no trades.
+        """
+        if not self.sketches:
+            return None
+        symbols = sorted(self.sketches)
+        labels = [quantile_label(quantile) for quantile in self.quantiles]
+        result = pd.DataFrame(
+            np.array([self.sketches[symbol].quantiles(self.quantiles) for symbol in symbols]),
+            index=pd.Index(symbols, name=STOCK_SYMBOL),
+            columns=labels,
+        )
+        logging.info(f"Calculated {self.column} quantiles for {self.stock_symbol or 'all stocks'}")
+        return result.iloc[0] if self.stock_symbol else result
+
+
+class PriceQuantileCalculator(QuantileCalculator):
+    """
+    Calculator for the per-stock trade price quantiles over the trade window.
+    """
+
+    column = PRICE
+
+
+class TradeSizeQuantileCalculator(QuantileCalculator):
+    """
+    Calculator for the per-stock trade size (quantity) quantiles over the trade window.
+    """
+
+    column = QUANTITY
@@ -0,0 +1,145 @@
+"""
+Holds incrementally maintained trade statistics, which are updated as trades
+are recorded in the Market instead of being recomputed from all trades.
+"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+from calculators.kernels import per_symbol_tick_sums
+from common.constants import DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_WINDOW
+from exchange.market import Market, TradeListener
+from exchange.trade_store import to_datetime64
+from utils.fixed_point import price_ratio, to_ticks
+
+
+class RollingVolumeWeightedStockPrice(TradeListener):
+    """
+    Maintains the per-stock traded value and quantity over the trade window, so
+    the volume weighted stock price can be read without rescanning the trades.
+
+    Trades merged late into the Market are added to the sums if they still fall
+    inside the window, and cancelled trades are subtracted from them. As the window
+    moves forward, the trades leaving it are read back from the time-sorted Market
+    and subtracted. When the Market stores prices in ticks, the sums are exact
+    integers, so adding and subtracting never drifts.
+
+    Parameters:
+    window: The time window of trades to consider. Defaults to 5 minutes.
+    now: The time the window initially ends at. Defaults to the current time.
+    venue: The venue whose Market is followed (optional).
+
+    Example:
+        rolling_vwsp = RollingVolumeWeightedStockPrice()
+        ...
+        rolling_vwsp.calculate(stock_symbol='XYZ')
+    """
+
+    def __init__(
+        self,
+        window: timedelta = TRADE_WINDOW,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ) -> None:
+        self.window = window
+        self._market = Market(venue)
+        self._tick_size = self._market.tick_size
+        self._sums: Dict[str, list] = {}
+        self._window_start = (now or datetime.now()) - window
+        # Read before subscribing: the read merges the buffered late trades, notifying the listeners
+        trades = self._market.get_trade_columns(start_time=self._window_start)
+        self._market.subscribe(self)
+        self.on_trades(trades)
+
+    def close(self) -> None:
+        """
+        Stop following the trades recorded in the Market.
+        """
+        self._market.unsubscribe(self)
+
+    def _accumulate(self, batch: Dict[str, np.ndarray], sign: int) -> None:
+        symbols = batch[STOCK_SYMBOL]
+        if not len(symbols):
+            return
+        codes, unique_symbols = pd.factorize(symbols)
+        if self._tick_size is None:
+            quantities = batch[QUANTITY].astype(np.float64)
+            trade_values = np.bincount(codes, weights=batch[PRICE] * quantities)
+            total_quantities = np.bincount(codes, weights=quantities)
+        else:
+            quantities = batch[QUANTITY].astype(np.int64)
+            tick_sums = per_symbol_tick_sums(
+                codes, to_ticks(batch[PRICE], self._tick_size), quantities,
+                np.zeros(len(codes), dtype=np.int64), len(unique_symbols),
+            )
+            # Python integers, so the running sums cannot overflow
+            trade_values, total_quantities = tick_sums[:, 0].tolist(), tick_sums[:, 1].tolist()
+        for symbol, trade_value, quantity in zip(unique_symbols, trade_values, total_quantities):
+            sums = self._sums.setdefault(symbol, [0, 0] if self._tick_size else [0.0, 0.0])
+            sums[0] += sign * trade_value
+            sums[1] += sign * quantity
+            if sums[1] <= 0:
+                del self._sums[symbol]
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        in_window = batch[TIMESTAMP] >= to_datetime64(self._window_start)
+        if in_window.all():
+            self._accumulate(batch, 1)
+        elif in_window.any():
+            self._accumulate({name: column[in_window] for name, column in batch.items()}, 1)
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        in_window = batch[TIMESTAMP] >= to_datetime64(self._window_start)
+        if in_window.any():
+            self._accumulate({name: column[in_window] for name, column in batch.items()}, -1)
+
+    def on_flush(self) -> None:
+        self._sums = {}
+
+    def advance(self, now: Optional[datetime] = None) -> None:
+        """
+        Move the end of the window to `now`, dropping the trades that left the window.
+        """
+        window_start = (now or datetime.now()) - self.window
+        if window_start <= self._window_start:
+            return
+        expired = self._market.get_trade_columns(self._window_start, window_start)
+        self._accumulate(expired, -1)
+        self._window_start = window_start
+
+    def calculate(self, stock_symbol: str = None, now: Optional[datetime] = None) -> Any:
+        """
+        Calculate the volume weighted stock price over the window ending at `now`.
+
+        Returns:
+        float or pd.DataFrame: The volume weighted stock price for the specified stock, or
+        a DataFrame of volume weighted stock prices for all stocks if no stock symbol is
+        specified. None if there are no trades in the window.
+        """
+        self.advance(now)
+        if stock_symbol:
+            if stock_symbol not in self._sums:
+                return None
+            trade_value, quantity = self._sums[stock_symbol]
+            if self._tick_size is None:
+                vwsp = round(trade_value / quantity, 2)
+            else:
+                vwsp = float(price_ratio([trade_value], [quantity], self._tick_size)[0])
+            logging.info(f"Calculated rolling VWSP for {stock_symbol}: {vwsp}")
+            return vwsp
+        if not self._sums:
+            return None
+        symbols = sorted(self._sums)
+        if self._tick_size is None:
+            sums = np.array([self._sums[symbol] for symbol in symbols])
+            vwsp = (sums[:, 0] / sums[:, 1]).round(2)
+        else:
+            vwsp = price_ratio(
+                [self._sums[symbol][0] for symbol in symbols],
+                [self._sums[symbol][1] for symbol in symbols],
+                self._tick_size,
+            )
+        logging.info("Calculated rolling VWSP for all stocks")
+        return pd.DataFrame({STOCK_SYMBOL: symbols, "volume_weighted_stock_price": vwsp})
@@ -0,0 +1,78 @@
+"""
+Holds calculators reading the trades of a shared-memory trade store (see
+exchange.shared_store), so analytics processes compute statistics on snapshots
+of the trades published by a single ingesting process, without copying them.
+"""
+
+from datetime import datetime
+import logging
+from typing import Any, Optional
+import numpy as np
+import pandas as pd
+from calculators.base import BaseCalculator
+from calculators.kernels import VWSP, per_symbol_sums
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TRADE_WINDOW
+from exchange.shared_store import IS_BUY, SharedTradeSnapshot
+
+
+class SharedVolumeWeightedStockPriceCalculator(BaseCalculator):
+    """
+    Calculator for determining the volume weighted stock price from a snapshot of a
+    shared-memory trade store, like VolumeWeightedStockPriceCalculator does from the
+    Market. The result of all stocks can be passed on to the AllShareIndexCalculator.
+
+    The trades are summed as floats, so the results match the ones of a Market
+    storing float prices.
+
+    Parameters:
+    snapshot: The snapshot of the store, e.g. SharedTradeReader(name).snapshot().
+    stock_symbol: The symbol of the stock (optional).
+    now: The end of the trade window. Defaults to the current time.
+
+    Example:
+        snapshot = SharedTradeReader("bsm-trades").snapshot()
+        all_vwsp = SharedVolumeWeightedStockPriceCalculator(snapshot).calculate()
+        all_share_index = AllShareIndexCalculator(all_vwsp).calculate()
+    """
+
+    def __init__(
+        self, snapshot: SharedTradeSnapshot, stock_symbol: str = None, now: Optional[datetime] = None
+    ) -> None:
+        self.stock_symbol = stock_symbol
+        self.symbols = snapshot.symbols
+        super().__init__(input_data=snapshot.window(start_time=(now or datetime.now()) - TRADE_WINDOW))
+
+    def calculate(self) -> Any:
+        """
+        Calculate the volume weighted stock price.
+
+        Returns:
+        float or pd.DataFrame: The volume weighted stock price for the specified stock,
+        or a DataFrame of volume weighted stock prices for all stocks if no stock symbol
+        is specified. None if there are no trades.
+        """
+        codes = self.input_data[STOCK_SYMBOL]
+        prices = self.input_data[PRICE]
+        quantities = self.input_data[QUANTITY]
+        is_buy = self.input_data[IS_BUY]
+        if self.stock_symbol:
+            matches = np.flatnonzero(self.symbols == self.stock_symbol)
+            if not len(matches):
+                return None
+            selected = codes == matches[0]
+            codes, prices, quantities, is_buy = codes[selected], prices[selected], quantities[selected], is_buy[selected]
+        if not len(codes):
+            return None
+
+        sums = per_symbol_sums(codes, prices, quantities.astype(np.float64), is_buy, len(self.symbols))
+        traded = np.flatnonzero(sums[:, 1] > 0)
+        vwsp = pd.Series(
+            sums[traded, 0] / sums[traded, 1], index=pd.Index(self.symbols[traded], name=STOCK_SYMBOL), name=VWSP
+        ).sort_index().round(2)
+
+        if self.stock_symbol:
+            vwsp = vwsp.iloc[0]
+            logging.info(f"Calculated shared VWSP for {self.stock_symbol}: {vwsp}")
+            return vwsp
+        logging.info("Calculated shared VWSP for all stocks")
+        return vwsp.reset_index()
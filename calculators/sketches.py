@@ -0,0 +1,243 @@
+"""
+Holds the mergeable quantile sketch used for the per-stock price and trade size
+distributions. Values are counted in logarithmic buckets, so any quantile is
+estimated within a fixed relative error, with memory bounded per sketch.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BUCKETS = 2048
+
+# Most (group, bucket key) cells counted at once with bincount, beyond the number of values
+_MAX_DENSE_CELLS = 1 << 20
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch of positive values with relative error guarantees.
+
+    A value x is counted in the bucket k = ceil(log(x) / log(gamma)), with
+    gamma = (1 + a) / (1 - a) for the relative accuracy a. Quantiles are estimated
+    from the bucket holding the requested rank, so an estimate q' of the exact
+    quantile q satisfies |q' - q| <= a * q. Sketches with the same relative
+    accuracy merge exactly, by adding their bucket counts.
+
+    Memory is bounded by max_buckets counts. A sketch spans a value range of
+    gamma ** max_buckets before the lowest buckets are collapsed together (about
+    1e35 for the defaults); only the quantiles falling in collapsed buckets then
+    lose the error guarantee.
+
+    Parameters:
+    relative_accuracy: The relative error bound of the quantile estimates, between 0 and 1.
+    max_buckets: The maximum number of buckets held.
+
+    Example:
+        sketch = QuantileSketch()
+        sketch.add(prices)
+        median, p99 = sketch.quantiles([0.5, 0.99])
+    """
+
+    def __init__(
+        self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_buckets: int = DEFAULT_MAX_BUCKETS
+    ) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Relative accuracy {relative_accuracy} should be between 0 and 1")
+        if max_buckets <= 0:
+            raise ValueError(f"max_buckets {max_buckets} should be more than 0")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = 0
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def keys(self, values: np.ndarray) -> np.ndarray:
+        """
+        Get the bucket keys of values.
+
+        Raises:
+        ValueError: If a value is not positive.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size and not (values > 0).all():
+            raise ValueError("Quantile sketches only hold positive values")
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def add(self, values: np.ndarray) -> None:
+        """
+        Add values to the sketch.
+        """
+        keys = self.keys(values)
+        if keys.size:
+            self.add_keys(keys)
+
+    def add_keys(self, keys: np.ndarray) -> None:
+        """
+        Add values already converted to bucket keys, see keys().
+        """
+        low = int(keys.min())
+        self._add_counts(np.bincount(keys - low), low)
+
+    def remove(self, values: np.ndarray) -> None:
+        """
+        Remove values previously added to the sketch, e.g. of cancelled trades. Values
+        counted in collapsed buckets are removed from the lowest bucket kept.
+        """
+        keys = self.keys(values)
+        if not keys.size or not self.count:
+            return
+        positions = np.clip(keys - self._offset, 0, len(self._counts) - 1)
+        np.subtract.at(self._counts, positions, 1)
+        np.maximum(self._counts, 0, out=self._counts)
+        self.count = int(self._counts.sum())
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Merge another sketch into this one.
+
+        Raises:
+        ValueError: If the sketches have different relative accuracies.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                f"Cannot merge sketches of relative accuracy {other.relative_accuracy} and {self.relative_accuracy}"
+            )
+        if other.count:
+            self._add_counts(other._counts, other._offset)
+
+    def _add_counts(self, counts: np.ndarray, offset: int) -> None:
+        if not self.count:
+            low, high = offset, offset + len(counts)
+        else:
+            low = min(self._offset, offset)
+            high = max(self._offset + len(self._counts), offset + len(counts))
+        if (low, high) != (self._offset, self._offset + len(self._counts)):
+            grown = np.zeros(high - low, dtype=np.int64)
+            if self.count:
+                grown[self._offset - low : self._offset - low + len(self._counts)] = self._counts
+            self._counts, self._offset = grown, low
+        self._counts[offset - low : offset - low + len(counts)] += counts
+        self.count += int(counts.sum())
+        if len(self._counts) > self.max_buckets:
+            # Collapse the lowest buckets into the lowest one kept
+            excess = len(self._counts) - self.max_buckets
+            self._counts[excess] += self._counts[:excess].sum()
+            self._counts = self._counts[excess:].copy()
+            self._offset += excess
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """
+        Estimate quantiles, each between 0 and 1. NaN for an empty sketch.
+        """
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if ((quantiles < 0) | (quantiles > 1)).any():
+            raise ValueError(f"Quantiles {quantiles.tolist()} should be between 0 and 1")
+        if not self.count:
+            return np.full(len(quantiles), np.nan)
+        ranks = np.floor(quantiles * (self.count - 1))
+        positions = np.searchsorted(np.cumsum(self._counts), ranks, side="right")
+        keys = positions + self._offset
+        # The estimate with the smallest relative error over the bucket (gamma ** (k-1), gamma ** k]
+        return 2 * np.power(self._gamma, keys.astype(np.float64)) / (self._gamma + 1)
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Estimate a single quantile, between 0 and 1.
+        """
+        return float(self.quantiles([quantile])[0])
+
+    def copy(self) -> "QuantileSketch":
+        """
+        Get an independent copy of the sketch.
+        """
+        sketch = QuantileSketch(self.relative_accuracy, self.max_buckets)
+        sketch._offset, sketch._counts, sketch.count = self._offset, self._counts.copy(), self.count
+        return sketch
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory held by the bucket counts, in bytes.
+        """
+        return self._counts.nbytes
+
+
+def sketch_groups(
+    codes: np.ndarray,
+    values: np.ndarray,
+    sketches: List[Optional[QuantileSketch]],
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+) -> List[QuantileSketch]:
+    """
+    Add values to the sketch of their group, in place, converting all the values to
+    bucket keys in one vectorized pass and counting them per group and key with a
+    bincount, without sorting the values.
+
+    Parameters:
+    codes (np.ndarray): The integer group of each value, from 0 to len(sketches) - 1.
+    values (np.ndarray): The values.
+    sketches (list): The sketch of each group, None for the groups to create one for.
+    relative_accuracy (float): The relative accuracy of the sketches.
+
+    Returns:
+    list: The sketch of each group.
+    """
+    sketches = [QuantileSketch(relative_accuracy) if sketch is None else sketch for sketch in sketches]
+    keys = sketches[0].keys(values) if sketches else np.zeros(0, dtype=np.int64)
+    if not len(keys):
+        return sketches
+    group_count = len(sketches)
+    low = int(keys.min())
+    span = int(keys.max()) - low + 1
+    if group_count * span <= max(4 * len(keys), _MAX_DENSE_CELLS):
+        counts = np.bincount(codes * span + (keys - low), minlength=group_count * span).reshape(group_count, span)
+        for sketch, row in zip(sketches, counts):
+            present = np.flatnonzero(row)
+            if len(present):
+                sketch._add_counts(row[present[0] : present[-1] + 1], low + int(present[0]))
+    else:
+        # Values spread over too many keys for dense counts, grouped by their integer codes instead
+        order = np.argsort(codes, kind="stable")
+        bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=group_count))]
+        for group, sketch in enumerate(sketches):
+            if bounds[group] < bounds[group + 1]:
+                sketch.add_keys(keys[order[bounds[group] : bounds[group + 1]]])
+    return sketches
+
+
+def sketch_by_symbol(
+    symbols: np.ndarray, values: np.ndarray, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY
+) -> Dict[str, QuantileSketch]:
+    """
+    Build one sketch per symbol from parallel arrays of symbols and values, grouping the
+    values by the integer codes of their symbols (see sketch_groups).
+    """
+    if not len(symbols):
+        return {}
+    from calculators.kernels import factorize_symbols  # Imported lazily, the sketches themselves do not need pandas
+
+    codes, unique_symbols = factorize_symbols(symbols, sort=False)
+    sketches = sketch_groups(codes, np.asarray(values), [None] * len(unique_symbols), relative_accuracy)
+    return dict(zip(unique_symbols.tolist(), sketches))
+
+
+def merge_sketch_maps(sketch_maps: Iterable[Dict[str, QuantileSketch]]) -> Dict[str, QuantileSketch]:
+    """
+    Merge per-symbol sketches, e.g. of several venues or time buckets, into new sketches.
+    """
+    merged = {}
+    for sketch_map in sketch_maps:
+        for symbol, sketch in sketch_map.items():
+            if symbol in merged:
+                merged[symbol].merge(sketch)
+            else:
+                merged[symbol] = sketch.copy()
+    return merged
@@ -49,7 +49,7 @@ class PERatioCalculator(StockStatisticCalculator):
         """
 
         dividend_calc = DividendYieldCalculator(
-            stock_symbol=self.input_data.name, price=self.custom_price
+            stock_symbol=self.stock_symbol, price=self.custom_price, venue=self.venue
         )
         dividend_yield = dividend_calc.calculate()
 
@@ -5,11 +5,11 @@ recorded trades of stocks, like Volume Weighted Stock Price, All Share Index, et
 
 from datetime import datetime
 import logging
-from typing import Any
+from typing import Any, Optional
 from calculators.base import BaseCalculator, TradeStatisticCalculator
-from scipy.stats import gmean
-from common.constants import STOCK_SYMBOL, TIMESTAMP
-from utils.common import get_timestamp_5_mins_before
+from calculators.kernels import VWSP, log_mean
+import numpy as np
+from common.constants import DEFAULT_VENUE, TRADE_WINDOW
 
 
 class VolumeWeightedStockPriceCalculator(TradeStatisticCalculator):
@@ -18,20 +18,18 @@ class VolumeWeightedStockPriceCalculator(TradeStatisticCalculator):
 
     Parameters:
     stock_symbol: The symbol of the stock (optional).
+    venue: The venue whose trades are considered (optional).
+    now: The end of the trade window, e.g. to replay historical trades. Defaults to the current time.
     """
 
-    def __init__(self, stock_symbol: str = None):
+    def __init__(
+        self, stock_symbol: str = None, venue: str = DEFAULT_VENUE, now: Optional[datetime] = None
+    ):
         self.stock_symbol = stock_symbol
-        filter_queries = []
-        timestamp_filter = (
-            f"{TIMESTAMP} >= '{get_timestamp_5_mins_before(datetime.now())}'"
+        # The time window is applied on the time-sorted trades, then the rows of the stock are selected
+        super().__init__(
+            start_time=(now or datetime.now()) - TRADE_WINDOW, venue=venue, stock_symbol=stock_symbol, sums_only=True
         )
-        filter_queries.append(timestamp_filter)
-        if stock_symbol:
-            stock_symbol_filter = f"{STOCK_SYMBOL} == '{stock_symbol}'"
-            filter_queries.append(stock_symbol_filter)
-        trade_filter = " & ".join(filter_queries)
-        super().__init__(trade_filter=trade_filter)
 
     def calculate(self) -> Any:
         """
@@ -43,28 +41,48 @@ class VolumeWeightedStockPriceCalculator(TradeStatisticCalculator):
         """
         if self.input_data.empty:
             return None
-        trades = self.input_data.copy()
-        # Calculate the weighted sums and total quantities using vectorized operations
-        trades["total_trade_value"] = trades["price"] * trades["quantity"]
-        result = trades.groupby("stock_symbol").agg(
-            {"total_trade_value": "sum", "quantity": "sum"}
-        )
-
-        # Calculate the Volume Weighted Stock Price
-        result["volume_weighted_stock_price"] = (
-            result["total_trade_value"] / result["quantity"]
-        ).round(2)
-
-        # Reset the index to turn the grouped DataFrame back to a regular DataFrame
-        result = result.drop(columns=["total_trade_value", "quantity"]).reset_index()
+        vwsp = self.summary[VWSP].round(2)
 
         if self.stock_symbol:
-            vwsp = result.squeeze().volume_weighted_stock_price
+            vwsp = vwsp.iloc[0]
             logging.info(f"Calculated VWSP for {self.stock_symbol}: {vwsp}")
             return vwsp
         else:
             logging.info(f"Calculated VWSP for all stocks")
-            return result
+            return vwsp.reset_index()
+
+
+class TradeSummaryCalculator(TradeStatisticCalculator):
+    """
+    Calculator for the per-stock trade summary over the trade window - volume weighted
+    stock price, traded value and volume, trade count, buy/sell volume and min/max/last price.
+
+    Parameters:
+    stock_symbol: The symbol of the stock (optional).
+    venue: The venue whose trades are considered (optional).
+    now: The end of the trade window. Defaults to the current time.
+    """
+
+    def __init__(
+        self, stock_symbol: str = None, venue: str = DEFAULT_VENUE, now: Optional[datetime] = None
+    ):
+        self.stock_symbol = stock_symbol
+        super().__init__(
+            start_time=(now or datetime.now()) - TRADE_WINDOW, venue=venue, stock_symbol=stock_symbol
+        )
+
+    def calculate(self) -> Any:
+        """
+        Calculate the trade summary.
+
+        Returns:
+        pd.Series or pd.DataFrame: The summary of the specified stock, or a DataFrame
+        indexed by stock symbol if no stock symbol is specified. None if there are no trades.
+        """
+        if self.input_data.empty:
+            return None
+        logging.info(f"Calculated trade summary for {self.stock_symbol or 'all stocks'}")
+        return self.summary.iloc[0] if self.stock_symbol else self.summary
 
 
 class AllShareIndexCalculator(BaseCalculator):
@@ -87,7 +105,8 @@ class AllShareIndexCalculator(BaseCalculator):
             logging.info("No positive prices available to calculate the all-share index.")
             return 0.0
 
-        geometric_mean = gmean(positive_prices)
+        # Geometric mean through the mean of logarithms, which avoids overflowing the product
+        geometric_mean = float(np.exp(log_mean(positive_prices.to_numpy(dtype=np.float64))))
         all_share_index = round(geometric_mean, 2)
         logging.info(f"Calculated All-Share Index: {all_share_index}")
-        return all_share_index
\ No newline at end of file
+        return all_share_index
@@ -0,0 +1,395 @@
+"""
+Holds the calculators of per-stock price dispersion over the trade window - price
+variance, standard deviation and log-return volatility - as window snapshots,
+historical series, and incrementally maintained rolling statistics.
+
+Variances are sample variances (ddof=1), NaN with fewer than two values. Log returns
+are taken between consecutive trades of a stock that are both inside the window, and
+the log-return volatility is their standard deviation, per trade (not annualized).
+"""
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from calculators.base import TradeStatisticCalculator
+from calculators.kernels import TRADE_COUNT, factorize_symbols
+from common.constants import DEFAULT_VENUE, PRICE, STOCK_SYMBOL, TIMESTAMP, TRADE_WINDOW
+from exchange.market import Market, TradeListener
+from exchange.trade_store import to_datetime64
+
+
+PRICE_VARIANCE = "price_variance"
+PRICE_STD = "price_std"
+LOG_RETURN_VOLATILITY = "log_return_volatility"
+
+VOLATILITY_FIELDS = (TRADE_COUNT, PRICE_VARIANCE, PRICE_STD, LOG_RETURN_VOLATILITY)
+
+
+def _moments(values: np.ndarray) -> tuple:
+    """
+    The count, mean and sum of squared deviations from the mean of values.
+    """
+    if not len(values):
+        return 0, 0.0, 0.0
+    mean = values.mean()
+    return len(values), float(mean), float(((values - mean) ** 2).sum())
+
+
+def _add_moments(state: list, count: int, mean: float, m2: float) -> None:
+    """
+    Add the moments of a group of values to a running [count, mean, m2] state
+    (Chan et al. parallel update).
+    """
+    if not count:
+        return
+    total = state[0] + count
+    delta = mean - state[1]
+    state[2] += m2 + delta * delta * state[0] * count / total
+    state[1] += delta * count / total
+    state[0] = total
+
+
+def _remove_moments(state: list, count: int, mean: float, m2: float) -> None:
+    """
+    Remove the moments of a group of values, previously added, from a running state.
+    """
+    if not count:
+        return
+    total = state[0] - count
+    if total <= 0:
+        state[:] = [0, 0.0, 0.0]
+        return
+    remaining_mean = (state[0] * state[1] - count * mean) / total
+    delta = mean - remaining_mean
+    state[2] = max(state[2] - m2 - delta * delta * total * count / state[0], 0.0)
+    state[1] = remaining_mean
+    state[0] = total
+
+
+def _variance(state: list) -> float:
+    return state[2] / (state[0] - 1) if state[0] > 1 else float("nan")
+
+
+def _window_stats(prices: np.ndarray) -> tuple:
+    """
+    The trade count, price variance and log-return variance of the time-sorted prices of a stock.
+    """
+    count = len(prices)
+    price_variance = prices.var(ddof=1) if count > 1 else np.nan
+    returns = np.log(prices[1:] / prices[:-1])
+    return_variance = returns.var(ddof=1) if len(returns) > 1 else np.nan
+    return count, price_variance, return_variance
+
+
+def _stats_frame(symbols: List[str], stats: List[tuple]) -> pd.DataFrame:
+    counts, price_variances, return_variances = (np.array(column, dtype=np.float64) for column in zip(*stats))
+    return pd.DataFrame(
+        {
+            TRADE_COUNT: counts.astype(np.int64),
+            PRICE_VARIANCE: price_variances,
+            PRICE_STD: np.sqrt(price_variances),
+            LOG_RETURN_VOLATILITY: np.sqrt(return_variances),
+        },
+        index=pd.Index(symbols, name=STOCK_SYMBOL),
+    )
+
+
+def _groups(symbols):
+    """
+    Yield each symbol with the positions of its rows, in time order.
+    """
+    codes, unique_symbols = factorize_symbols(symbols)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(unique_symbols)))]
+    for code, symbol in enumerate(unique_symbols):
+        yield symbol, order[bounds[code] : bounds[code + 1]]
+
+
+def _centered_window_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple:
+    """
+    Sums and sums of squares of values[starts:ends] for each window, from cumulative sums
+    of the values centered on their mean, which limits the cancellation error.
+    """
+    centered = values - values.mean() if len(values) else values
+    sums = np.r_[0.0, np.cumsum(centered)]
+    squares = np.r_[0.0, np.cumsum(centered * centered)]
+    return sums[ends] - sums[starts], squares[ends] - squares[starts]
+
+
+def _sample_variance(total: np.ndarray, squares: np.ndarray, count: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (squares - total * total / count) / (count - 1)
+    return np.where(count > 1, np.maximum(variance, 0.0), np.nan)
+
+
+def volatility_series(trades: pd.DataFrame, window: timedelta = TRADE_WINDOW) -> pd.DataFrame:
+    """
+    Compute, as of every trade, the statistics of its stock over the window ending at the
+    trade - the trades of the stock timestamped at or after the trade's timestamp minus the
+    window, up to and including the trade. Vectorized per stock with cumulative sums.
+
+    Parameters:
+    trades (pd.DataFrame): Trades as returned by Market.get_trades, sorted by timestamp.
+    window (timedelta): The time window.
+
+    Returns:
+    pd.DataFrame: The timestamp, stock symbol and price of every trade, in the order of
+    the trades, with the columns in VOLATILITY_FIELDS.
+    """
+    count = len(trades)
+    timestamps = trades[TIMESTAMP].to_numpy(dtype="datetime64[ns]")
+    prices = trades[PRICE].to_numpy(dtype=np.float64)
+    trade_counts = np.zeros(count, dtype=np.int64)
+    price_variances = np.full(count, np.nan)
+    return_variances = np.full(count, np.nan)
+    for _, rows in _groups(trades[STOCK_SYMBOL]):
+        times, group_prices = timestamps[rows], prices[rows]
+        positions = np.arange(len(rows))
+        starts = np.searchsorted(times, times - np.timedelta64(window), side="left")
+        trade_counts[rows] = positions + 1 - starts
+        total, squares = _centered_window_sums(group_prices, starts, positions + 1)
+        price_variances[rows] = _sample_variance(total, squares, trade_counts[rows])
+        # returns[j] is the log return from trade j - 1 to trade j of the stock, returns[0] a placeholder
+        returns = np.r_[0.0, np.log(group_prices[1:] / group_prices[:-1])]
+        total, squares = _centered_window_sums(returns[1:], starts, positions)
+        return_variances[rows] = _sample_variance(total, squares, positions - starts)
+
+    return pd.DataFrame(
+        {
+            TIMESTAMP: timestamps,
+            STOCK_SYMBOL: trades[STOCK_SYMBOL].to_numpy(),
+            PRICE: prices,
+            TRADE_COUNT: trade_counts,
+            PRICE_VARIANCE: price_variances,
+            PRICE_STD: np.sqrt(price_variances),
+            LOG_RETURN_VOLATILITY: np.sqrt(return_variances),
+        },
+        index=trades.index,
+    )
+
+
+class VolatilityCalculator(TradeStatisticCalculator):
+    """
+    Calculator for the per-stock price variance, standard deviation and log-return
+    volatility over the trade window.
+
+    Parameters:
+    stock_symbol: The symbol of the stock (optional).
+    venue: The venue whose trades are considered (optional).
+    now: The end of the trade window. Defaults to the current time.
+    """
+
+    def __init__(
+        self, stock_symbol: str = None, venue: str = DEFAULT_VENUE, now: Optional[datetime] = None
+    ):
+        self.stock_symbol = stock_symbol
+        super().__init__(
+            start_time=(now or datetime.now()) - TRADE_WINDOW, venue=venue, stock_symbol=stock_symbol
+        )
+
+    def calculate(self) -> Any:
+        """
+        Calculate the volatility statistics.
+
+        Returns:
+        pd.Series or pd.DataFrame: The statistics of the specified stock, or a DataFrame
+        indexed by stock symbol if no stock symbol is specified, with the columns in
+        VOLATILITY_FIELDS. None if there are no trades.
+        """
+        if self.input_data.empty:
+            return None
+        prices = self.input_data[PRICE].to_numpy(dtype=np.float64)
+        groups = list(_groups(self.input_data[STOCK_SYMBOL].to_numpy()))
+        stats = _stats_frame([symbol for symbol, _ in groups], [_window_stats(prices[rows]) for _, rows in groups])
+        logging.info(f"Calculated volatility for {self.stock_symbol or 'all stocks'}")
+        return stats.iloc[0] if self.stock_symbol else stats
+
+
+class VolatilitySeriesCalculator(TradeStatisticCalculator):
+    """
+    Calculator for the historical series of the volatility statistics, as of every
+    recorded trade, over the trade window ending at the trade (see volatility_series).
+
+    Parameters:
+    stock_symbol: The symbol of the stock (optional).
+    venue: The venue whose trades are considered (optional).
+    start_time: Only the series from this time on is returned (optional).
+    """
+
+    def __init__(
+        self, stock_symbol: str = None, venue: str = DEFAULT_VENUE, start_time: Optional[datetime] = None
+    ):
+        self.stock_symbol = stock_symbol
+        self.series_start_time = start_time
+        # The window of the first trades of the series starts before the series does
+        super().__init__(
+            start_time=None if start_time is None else start_time - TRADE_WINDOW,
+            venue=venue,
+            stock_symbol=stock_symbol,
+        )
+
+    def calculate(self) -> Optional[pd.DataFrame]:
+        """
+        Calculate the volatility series.
+
+        Returns:
+        pd.DataFrame: One row per trade, see volatility_series. None if there are no trades.
+        """
+        if self.input_data.empty:
+            return None
+        series = volatility_series(self.input_data)
+        if self.series_start_time is not None:
+            series = series[series[TIMESTAMP] >= to_datetime64(self.series_start_time)]
+        logging.info(f"Calculated volatility series for {self.stock_symbol or 'all stocks'}")
+        return series.reset_index(drop=True)
+
+
+class RollingVolatility(TradeListener):
+    """
+    Maintains the per-stock price variance and log-return volatility over the trade
+    window as trades are recorded in the Market, readable in O(1) per stock.
+
+    The count, mean and sum of squared deviations of the prices and of the log returns
+    are updated with numerically stable (Welford / Chan) add and remove operations, as
+    trades enter and leave the window. The prices in the window are kept per stock to
+    derive the returns leaving the window. A trade merged late into the middle of a
+    stock's trades, or cancelled, changes its neighbouring returns, so the stocks of
+    late and cancelled trades are rebuilt from the window.
+
+    Parameters:
+    window: The time window of trades to consider. Defaults to 5 minutes.
+    now: The time the window initially ends at. Defaults to the current time.
+    venue: The venue whose Market is followed (optional).
+    """
+
+    def __init__(
+        self,
+        window: timedelta = TRADE_WINDOW,
+        now: Optional[datetime] = None,
+        venue: str = DEFAULT_VENUE,
+    ) -> None:
+        self.window = window
+        self._market = Market(venue)
+        self._window_start = (now or datetime.now()) - window
+        self._reset()
+        # Read before subscribing: the read merges the buffered late trades, notifying the listeners
+        trades = self._market.get_trade_columns(start_time=self._window_start)
+        self._market.subscribe(self)
+        self.on_trades(trades)
+
+    def _reset(self) -> None:
+        # Per stock: prices in the window (from _heads), latest timestamp, price and return moments
+        self._prices: Dict[str, list] = {}
+        self._heads: Dict[str, int] = {}
+        self._latest: Dict[str, np.datetime64] = {}
+        self._price_moments: Dict[str, list] = {}
+        self._return_moments: Dict[str, list] = {}
+
+    def close(self) -> None:
+        """
+        Stop following the trades recorded in the Market.
+        """
+        self._market.unsubscribe(self)
+
+    def _append(self, symbol: str, timestamps: np.ndarray, prices: np.ndarray) -> None:
+        window_prices = self._prices.setdefault(symbol, [])
+        if len(window_prices) > self._heads.setdefault(symbol, 0):
+            returns = np.log(prices / np.r_[window_prices[-1], prices[:-1]])
+        else:
+            returns = np.log(prices[1:] / prices[:-1])
+        _add_moments(self._price_moments.setdefault(symbol, [0, 0.0, 0.0]), *_moments(prices))
+        _add_moments(self._return_moments.setdefault(symbol, [0, 0.0, 0.0]), *_moments(returns))
+        window_prices.extend(prices.tolist())
+        self._latest[symbol] = timestamps[-1]
+
+    def _expire(self, symbol: str, count: int) -> None:
+        window_prices, head = self._prices[symbol], self._heads[symbol]
+        # The trades leaving, and the first one staying, if any
+        leaving = np.array(window_prices[head : head + count + 1])
+        _remove_moments(self._price_moments[symbol], *_moments(leaving[:count]))
+        _remove_moments(self._return_moments[symbol], *_moments(np.log(leaving[1:] / leaving[:-1])))
+        head += count
+        if head == len(window_prices):
+            for state in (self._prices, self._heads, self._latest, self._price_moments, self._return_moments):
+                del state[symbol]
+            return
+        if head > len(window_prices) // 2:
+            del window_prices[:head]
+            head = 0
+        self._heads[symbol] = head
+
+    def _rebuild(self, symbols: set) -> None:
+        for symbol in symbols:
+            for state in (self._prices, self._heads, self._latest, self._price_moments, self._return_moments):
+                state.pop(symbol, None)
+        window = self._market.get_trade_columns(start_time=self._window_start, stock_symbols=sorted(symbols))
+        for symbol, rows in _groups(window[STOCK_SYMBOL]):
+            self._append(symbol, window[TIMESTAMP][rows], window[PRICE][rows])
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        in_window = batch[TIMESTAMP] >= to_datetime64(self._window_start)
+        if not in_window.any():
+            return
+        timestamps, prices = batch[TIMESTAMP][in_window], batch[PRICE][in_window]
+        late = set()
+        for symbol, rows in _groups(batch[STOCK_SYMBOL][in_window]):
+            latest = self._latest.get(symbol)
+            if latest is not None and timestamps[rows[0]] < latest:
+                late.add(symbol)
+            else:
+                self._append(symbol, timestamps[rows], prices[rows])
+        if late:
+            self._rebuild(late)
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        in_window = batch[TIMESTAMP] >= to_datetime64(self._window_start)
+        if in_window.any():
+            self._rebuild(set(batch[STOCK_SYMBOL][in_window]))
+
+    def on_flush(self) -> None:
+        self._reset()
+
+    def advance(self, now: Optional[datetime] = None) -> None:
+        """
+        Move the end of the window to `now`, removing the trades that left the window.
+        """
+        window_start = (now or datetime.now()) - self.window
+        if window_start <= self._window_start:
+            return
+        expired = self._market.get_trade_columns(self._window_start, window_start)
+        self._window_start = window_start
+        if len(expired[STOCK_SYMBOL]):
+            symbols, counts = np.unique(expired[STOCK_SYMBOL], return_counts=True)
+            for symbol, count in zip(symbols, counts.tolist()):
+                if symbol in self._prices:
+                    self._expire(symbol, count)
+
+    def calculate(self, stock_symbol: str = None, now: Optional[datetime] = None) -> Any:
+        """
+        Calculate the volatility statistics over the window ending at `now`.
+
+        Returns:
+        pd.Series or pd.DataFrame: The statistics of the specified stock, or a DataFrame
+        indexed by stock symbol if no stock symbol is specified, with the columns in
+        VOLATILITY_FIELDS. None if there are no trades in the window.
+        """
+        self.advance(now)
+        symbols = [stock_symbol] if stock_symbol else sorted(self._price_moments)
+        symbols = [symbol for symbol in symbols if symbol in self._price_moments]
+        if not symbols:
+            return None
+        stats = _stats_frame(
+            symbols,
+            [
+                (
+                    self._price_moments[symbol][0],
+                    _variance(self._price_moments[symbol]),
+                    _variance(self._return_moments[symbol]),
+                )
+                for symbol in symbols
+            ],
+        )
+        logging.info(f"Calculated rolling volatility for {stock_symbol or 'all stocks'}")
+        return stats.iloc[0] if stock_symbol else stats
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from enum import Enum
 
 
@@ -7,6 +8,19 @@ LAST_DIVIDEND = "last_dividend"
 PAR_VALUE = "par_value"
 FIXED_DIVIDEND_PCT = "fixed_dividend_pct"
 TIMESTAMP = "timestamp"
+QUANTITY = "quantity"
+TRADE_TYPE = "trade_type"
+PRICE = "price"
+TRADE_ID = "trade_id"
+
+# Column order of the trade records held by the Market
+TRADE_COLUMNS = (STOCK_SYMBOL, TIMESTAMP, QUANTITY, TRADE_TYPE, PRICE)
+
+# Name of the Market / StockInfo instance used when no venue is given
+DEFAULT_VENUE = "default"
+
+# Time window used by the trade statistics, like Volume Weighted Stock Price
+TRADE_WINDOW = timedelta(minutes=5)
 
 class StockType(Enum):
     COMMON = "Common"
@@ -14,4 +28,4 @@ class StockType(Enum):
 
 class TradeType(Enum):
     BUY = 'buy'
-    SELL = 'sell'
\ No newline at end of file
+    SELL = 'sell'
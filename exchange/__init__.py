@@ -1,5 +0,0 @@
-# Configure logging
-import logging
-
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d: %(message)s')
\ No newline at end of file
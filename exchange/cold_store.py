@@ -0,0 +1,224 @@
+"""
+Holds the compressed, immutable storage of the trades frozen out of the live
+TradeStore, which keeps a whole session's trades queryable in memory at a
+fraction of their live footprint
+"""
+
+from datetime import datetime
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE
+from exchange.trade_store import COLUMN_DTYPES, to_datetime64
+
+
+DEFAULT_COLD_BLOCK_SIZE = 65536
+
+# Decimal places tried to store prices as integers, e.g. 2 for cents
+_PRICE_DECIMALS = range(0, 7)
+
+
+def _smallest_uint(high: int) -> np.dtype:
+    """
+    The smallest unsigned integer dtype holding values from 0 to high.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class _PackedInts:
+    """
+    Integers stored as offsets from their minimum, in the smallest unsigned dtype
+    holding them, zlib compressed.
+    """
+
+    __slots__ = ("base", "dtype", "payload")
+
+    def __init__(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.int64)
+        self.base = int(values.min()) if len(values) else 0
+        offsets = values - self.base
+        self.dtype = _smallest_uint(int(offsets.max()) if len(values) else 0)
+        self.payload = zlib.compress(offsets.astype(self.dtype).tobytes())
+
+    def decode(self) -> np.ndarray:
+        offsets = np.frombuffer(zlib.decompress(self.payload), dtype=self.dtype)
+        return offsets.astype(np.int64) + self.base
+
+
+class ColdBlock:
+    """
+    An immutable, compressed block of trades sorted by timestamp.
+
+    - Timestamps are delta-encoded from the first one.
+    - Symbols and sides are dictionary-encoded, against the distinct values of the block.
+    - Prices are stored as integers when they have at most 6 decimals, e.g. cents,
+      as raw float64 otherwise. Quantities and trade ids are stored as offsets from
+      their minimum.
+
+    Every column is then packed in the smallest integer dtype holding it and zlib
+    compressed. The time range and symbols of the block are kept uncompressed, so
+    queries skip the blocks they do not need without decompressing them.
+
+    Parameters:
+    columns: The trades, as column arrays of COLUMN_DTYPES sorted by timestamp.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]) -> None:
+        timestamps = columns[TIMESTAMP].view(np.int64)
+        self.count = len(timestamps)
+        if not self.count:
+            raise ValueError("A cold block cannot be empty")
+        self.start_time = columns[TIMESTAMP][0]
+        self.end_time = columns[TIMESTAMP][-1]
+        self._first_timestamp = int(timestamps[0])
+        self._timestamps = _PackedInts(np.diff(timestamps, prepend=timestamps[0]))
+
+        self.symbols, symbol_codes = np.unique(columns[STOCK_SYMBOL], return_inverse=True)
+        self.symbol_set = frozenset(self.symbols.tolist())
+        self._symbol_codes = _PackedInts(symbol_codes.reshape(self.count))
+        self._trade_types, trade_type_codes = np.unique(columns[TRADE_TYPE], return_inverse=True)
+        self._trade_type_codes = _PackedInts(trade_type_codes.reshape(self.count))
+
+        self._quantities = _PackedInts(columns[QUANTITY])
+        self._trade_ids = _PackedInts(columns[TRADE_ID])
+        prices = columns[PRICE]
+        # Integers up to 2 ** 53 are exact in float64
+        self._price_decimals = next(
+            (decimals for decimals in _PRICE_DECIMALS
+             if np.abs(prices).max() * 10 ** decimals < 2 ** 53
+             and np.array_equal(np.rint(prices * 10 ** decimals) / 10 ** decimals, prices)),
+            None,
+        )
+        if self._price_decimals is None:
+            self._prices = zlib.compress(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+        else:
+            self._prices = _PackedInts(np.rint(prices * 10 ** self._price_decimals))
+
+    def overlaps(self, start: np.datetime64, end: np.datetime64, symbols: Optional[frozenset] = None) -> bool:
+        """
+        Whether the block may hold trades with start <= timestamp < end of the symbols.
+        """
+        if self.end_time < start or self.start_time >= end:
+            return False
+        return symbols is None or not self.symbol_set.isdisjoint(symbols)
+
+    def decode(self) -> Dict[str, np.ndarray]:
+        """
+        Decompress the trades of the block.
+
+        Returns:
+        dict: The trades, as column arrays of COLUMN_DTYPES sorted by timestamp.
+        """
+        if self._price_decimals is None:
+            prices = np.frombuffer(zlib.decompress(self._prices), dtype=np.float64).copy()
+        else:
+            prices = self._prices.decode() / 10 ** self._price_decimals
+        return {
+            STOCK_SYMBOL: self.symbols[self._symbol_codes.decode()],
+            TIMESTAMP: (np.cumsum(self._timestamps.decode()) + self._first_timestamp).view(COLUMN_DTYPES[TIMESTAMP]),
+            QUANTITY: self._quantities.decode(),
+            TRADE_TYPE: self._trade_types[self._trade_type_codes.decode()],
+            PRICE: prices,
+            TRADE_ID: self._trade_ids.decode(),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory held by the compressed columns and the dictionaries of the block, in bytes.
+        """
+        packed = (self._timestamps, self._symbol_codes, self._trade_type_codes, self._quantities, self._trade_ids)
+        prices = self._prices if isinstance(self._prices, bytes) else self._prices.payload
+        return (
+            sum(len(column.payload) for column in packed) + len(prices)
+            + self.symbols.nbytes + self._trade_types.nbytes
+        )
+
+
+class ColdStore:
+    """
+    The time-ordered sequence of cold blocks of a Market, holding trades older than
+    the ones of its live TradeStore.
+
+    Parameters:
+    block_size: The number of trades per block.
+    """
+
+    def __init__(self, block_size: int = DEFAULT_COLD_BLOCK_SIZE) -> None:
+        if block_size <= 0:
+            raise ValueError(f"block_size {block_size} should be more than 0")
+        self.block_size = block_size
+        self._blocks: List[ColdBlock] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def blocks(self) -> Tuple[ColdBlock, ...]:
+        return tuple(self._blocks)
+
+    @property
+    def end_time(self) -> Optional[np.datetime64]:
+        """
+        The timestamp of the latest frozen trade, None if no trade is frozen.
+        """
+        return self._blocks[-1].end_time if self._blocks else None
+
+    def freeze(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Freeze trades, not older than the ones already frozen, into blocks.
+
+        Parameters:
+        columns (dict): The trades, as column arrays of COLUMN_DTYPES sorted by timestamp.
+        """
+        count = len(columns[TIMESTAMP])
+        for lo in range(0, count, self.block_size):
+            hi = min(lo + self.block_size, count)
+            self._blocks.append(ColdBlock({name: column[lo:hi] for name, column in columns.items()}))
+        self._size += count
+
+    def read(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        symbols: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Read the trades with start_time <= timestamp < end_time, of the given symbols
+        if any, decompressing only the blocks that may hold them.
+
+        Returns:
+        list: The matching trades of each block read, as column arrays sorted by timestamp.
+        """
+        start = np.datetime64(np.iinfo(np.int64).min + 1, "ns") if start_time is None else to_datetime64(start_time)
+        end = np.datetime64(np.iinfo(np.int64).max, "ns") if end_time is None else to_datetime64(end_time)
+        symbols = None if symbols is None else frozenset(symbols)
+        parts = []
+        for block in self._blocks:
+            if not block.overlaps(start, end, symbols):
+                continue
+            columns = block.decode()
+            lo, hi = np.searchsorted(columns[TIMESTAMP], np.array([start, end], dtype=columns[TIMESTAMP].dtype))
+            selected = slice(lo, hi)
+            if symbols is not None and not block.symbol_set <= symbols:
+                selected = lo + np.flatnonzero(np.isin(columns[STOCK_SYMBOL][lo:hi], list(symbols)))
+            parts.append({name: column[selected] for name, column in columns.items()})
+        return parts
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory held by all the blocks, in bytes.
+        """
+        return sum(block.nbytes for block in self._blocks)
+
+    def clear(self) -> None:
+        """
+        Remove all the blocks.
+        """
+        self._blocks = []
+        self._size = 0
@@ -0,0 +1,197 @@
+"""
+Holds the streaming trade file loader - CSV or NDJSON trade files are parsed in
+fixed-size chunks, each chunk validated as a whole and added to the Market in bulk,
+so memory used for parsing stays bounded regardless of the file size.
+"""
+
+import logging
+import os
+from typing import Dict, Iterable, Iterator, Optional
+import numpy as np
+import pandas as pd
+from common.constants import (
+    DEFAULT_VENUE, FIXED_DIVIDEND_PCT, LAST_DIVIDEND, PAR_VALUE, PRICE, QUANTITY,
+    STOCK_SYMBOL, STOCK_TYPE, TIMESTAMP, TRADE_COLUMNS, TRADE_TYPE, StockType, TradeType,
+)
+from exchange.market import Market
+from exchange.stock import Stock, StockInfo
+
+
+CSV = "csv"
+NDJSON = "ndjson"
+FILE_FORMATS = (CSV, NDJSON)
+DEFAULT_CHUNK_SIZE = 100000
+
+_TRADE_TYPES = np.array([trade_type.value for trade_type in TradeType], dtype=object)
+
+
+def detect_format(path: str) -> str:
+    """
+    Detect the format of a trade file from its extension (.csv, .ndjson, .jsonl).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return CSV
+    if extension in (".ndjson", ".jsonl"):
+        return NDJSON
+    raise ValueError(f"Cannot detect the format of '{path}', expected one of {FILE_FORMATS}")
+
+
+def read_trade_chunks(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, file_format: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a trade file in chunks of at most `chunk_size` trades.
+
+    Parameters:
+    path (str): The trade file, with the columns stock_symbol, timestamp (ISO 8601),
+    quantity, trade_type (buy/sell) and price.
+    chunk_size (int): The number of trades parsed at a time.
+    file_format (str): csv or ndjson, detected from the extension if not given.
+
+    Yields:
+    pd.DataFrame: The chunks of trades.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format == CSV:
+        reader = pd.read_csv(
+            path, chunksize=chunk_size, usecols=list(TRADE_COLUMNS),
+            dtype={STOCK_SYMBOL: object, TRADE_TYPE: object},
+        )
+    elif file_format == NDJSON:
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, convert_dates=False)
+    else:
+        raise ValueError(f"File format '{file_format}' is invalid, expected one of {FILE_FORMATS}")
+    with reader:
+        yield from reader
+
+
+def validate_trades(chunk: pd.DataFrame, stock_info: StockInfo, first_row: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Validate a chunk of trades as a whole, with the same rules as Trade.
+
+    Parameters:
+    chunk (pd.DataFrame): The chunk of trades.
+    stock_info (StockInfo): The data store the stock symbols are validated against.
+    first_row (int): The row number of the first trade of the chunk in the file, for error messages.
+
+    Returns:
+    dict: The trades as column arrays, ready for Market.add_trades.
+
+    Raises:
+    ValueError: If any trade of the chunk is invalid.
+    """
+    missing = [column for column in TRADE_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Trade columns {missing} are missing")
+
+    symbols = chunk[STOCK_SYMBOL].to_numpy(dtype=object)
+    quantities = pd.to_numeric(chunk[QUANTITY], errors="coerce").to_numpy(dtype=np.float64)
+    prices = pd.to_numeric(chunk[PRICE], errors="coerce").to_numpy(dtype=np.float64)
+    trade_types = chunk[TRADE_TYPE].to_numpy(dtype=object)
+    timestamps = pd.to_datetime(chunk[TIMESTAMP], errors="coerce", format="ISO8601").to_numpy(dtype="datetime64[ns]")
+
+    valid_symbols = [symbol for symbol in pd.unique(symbols) if stock_info.is_valid_stock(symbol)]
+    checks = {
+        "invalid stock symbol": ~np.isin(symbols, np.array(valid_symbols, dtype=object)),
+        "quantity should be a whole number more than 0": ~(
+            (quantities > 0) & (np.mod(quantities, 1) == 0)
+        ),
+        "price should be more than 0": ~(prices > 0),
+        "invalid trade type": ~np.isin(trade_types, _TRADE_TYPES),
+        "invalid timestamp": np.isnat(timestamps),
+    }
+    for reason, invalid in checks.items():
+        if invalid.any():
+            rows = (np.flatnonzero(invalid)[:5] + first_row).tolist()
+            raise ValueError(f"Trade chunk rejected, {reason} in rows {rows}")
+
+    return {
+        STOCK_SYMBOL: symbols,
+        TIMESTAMP: timestamps,
+        QUANTITY: quantities.astype(np.int64),
+        TRADE_TYPE: trade_types,
+        PRICE: prices,
+    }
+
+
+def load_trades(
+    path: str,
+    venue: str = DEFAULT_VENUE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    file_format: Optional[str] = None,
+) -> int:
+    """
+    Stream a trade file into the Market of a venue, validating every chunk against its StockInfo.
+
+    Returns:
+    int: The number of trades added to the market.
+    """
+    market = Market(venue)
+    stock_info = StockInfo(venue)
+    added = 0
+    rows = 0
+    for chunk in read_trade_chunks(path, chunk_size=chunk_size, file_format=file_format):
+        added += market.add_trades(validate_trades(chunk, stock_info, first_row=rows))
+        rows += len(chunk)
+        logging.info(f"Loaded {rows} trades from {path}")
+    return added
+
+
+def write_trades(path: str, batches: Iterable[Dict[str, np.ndarray]], file_format: Optional[str] = None) -> int:
+    """
+    Write batches of trades, as column arrays, to a CSV or NDJSON trade file that
+    load_trades reads back, e.g. to replay a synthetic session.
+
+    Parameters:
+    path (str): The trade file, overwritten if it exists.
+    batches (Iterable[dict]): The trades, as column arrays like the ones taken by Market.add_trades.
+    file_format (str): csv or ndjson, detected from the extension if not given.
+
+    Returns:
+    int: The number of trades written.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"File format '{file_format}' is invalid, expected one of {FILE_FORMATS}")
+    written = 0
+    with open(path, "w", newline="") as f:
+        for batch in batches:
+            chunk = pd.DataFrame({name: batch[name] for name in TRADE_COLUMNS})
+            # ISO 8601 timestamps, to the nanosecond
+            chunk[TIMESTAMP] = np.datetime_as_string(np.asarray(batch[TIMESTAMP], dtype="datetime64[ns]"), unit="ns")
+            if file_format == CSV:
+                chunk.to_csv(f, header=not written, index=False)
+            elif len(chunk):
+                chunk.to_json(f, orient="records", lines=True)
+                f.write("\n")
+            written += len(chunk)
+    logging.info(f"Wrote {written} trades to {path}")
+    return written
+
+
+def load_stocks(path: str, venue: str = DEFAULT_VENUE, upsert: bool = False) -> int:
+    """
+    Load the stocks of a CSV file, with the columns stock_symbol, type (Common/Preferred),
+    last_dividend, fixed_dividend_pct and par_value, into the StockInfo of a venue.
+    With upsert, the stocks already in the StockInfo are updated, e.g. to reload dividends.
+
+    Returns:
+    int: The number of stocks added.
+    """
+    stocks_df = pd.read_csv(path, dtype={STOCK_SYMBOL: object, STOCK_TYPE: object})
+    stocks = [
+        Stock(
+            stock_symbol=row[STOCK_SYMBOL],
+            type=StockType(row[STOCK_TYPE]),
+            last_dividend=row[LAST_DIVIDEND],
+            fixed_dividend_pct=None if pd.isna(row[FIXED_DIVIDEND_PCT]) else row[FIXED_DIVIDEND_PCT],
+            par_value=row[PAR_VALUE],
+        )
+        for row in stocks_df.to_dict(orient="records")
+    ]
+    if upsert:
+        StockInfo(venue).upsert_stocks(stocks)
+    else:
+        StockInfo(venue).add_stocks(stocks)
+    return len(stocks)
@@ -3,32 +3,678 @@ Holds code related to the Beverage stock market - adding trades, filtering
 trades for different computations,  etc.
 """
 
+from datetime import datetime, timedelta
+from fractions import Fraction
 import logging
-import pandas as pd
+import sys
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+import numpy as np
+from common.constants import (
+    DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_COLUMNS, TRADE_ID, TRADE_TYPE, TradeType,
+)
+from exchange.cold_store import DEFAULT_COLD_BLOCK_SIZE, ColdStore
+from exchange.stock import StockInfo
+from exchange.storage import TradeStorage
+from exchange.symbols import SymbolRegistry
 from exchange.trade import Trade
-from utils.classutils import singleton
+from exchange.trade_store import COLUMN_DTYPES, TradeStore, object_bytes, to_datetime64
+from utils.fixed_point import TickSize, to_ticks
+from utils.classutils import named_singleton
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from exchange.sqlite_store import SQLiteTradeStore
 
-@singleton
+
+DEFAULT_MERGE_BATCH_SIZE = 4096
+
+# Timestamp recorded in the trade id index for the ids of trades not stored
+_NO_TRADE = np.iinfo(np.int64).min
+
+
+class TradeListener:
+    """
+    Base class for objects maintaining incremental state, like rolling statistics,
+    from the trades recorded in the Market.
+
+    Example:
+        class TradeCounter(TradeListener):
+            def on_trades(self, batch):
+                self.count += len(batch["timestamp"])
+
+        Market().subscribe(TradeCounter())
+    """
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        """
+        Called with the trades stored in the market, as column arrays sorted by timestamp.
+        Late trades are delivered when they are merged into the store, so the batch
+        may hold trades older than the ones previously delivered. Reads of the market
+        from a listener leave the late trades buffered, so they only see the trades
+        delivered to it.
+        """
+        pass
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        """
+        Called with the trades removed from the market by a cancel, or by an amend
+        before the amended trade is delivered to on_trades. The store no longer holds
+        them when this is called.
+        """
+        pass
+
+    def on_flush(self) -> None:
+        """
+        Called when all the trades are flushed from the market.
+        """
+        pass
+
+
+@named_singleton(DEFAULT_VENUE)
 class Market:
     """
-    A singleton class representing the market, storing trade entries.
+    A singleton class (per venue) representing the market, storing trade entries.
+    Market() is the default venue's market, Market("XLON") an independent market for
+    the venue (or shard) "XLON".
+
+    Trades are kept sorted by timestamp, so time window queries only touch the
+    matching trades. They are held in memory by default, or in a SQLite database
+    (see configure_storage). Trades arriving out of order are buffered and merged into
+    the store in batches. When a maximum lateness is configured, trades older than
+    the latest seen timestamp minus the lateness are rejected and reported through
+    get_rejected_trades().
+
+    Symbols are stored as the int32 ids of the venue's symbol registry (see
+    StockInfo.symbols) rather than strings, and decoded back when read.
+
+    Every trade recorded is assigned an increasing trade id, which cancel() and
+    amend() take to correct it. The id index holds the timestamp of every trade, so
+    a trade is found by a binary search instead of a scan of the store.
+
+    Trades older than a configurable hot window can be frozen into compressed cold
+    blocks (see exchange.cold_store), which reads decompress as needed. Frozen trades
+    cannot be corrected, and trades older than the frozen ones are rejected.
     """
 
-    def __init__(self):
+    def __init__(self, name: str = DEFAULT_VENUE):
+        """
+        Initialize the market with an empty store for trades.
+
+        Parameters:
+        name (str): The venue (or shard) of the market.
+        """
+        logging.info(f"Initializing the market '{name}' with an empty store for trades.")
+        self.name = name
+        self._trades: TradeStorage = TradeStore(symbols=StockInfo(name).symbols)
+        self._cold_trades = ColdStore()
+        self._hot_window = None
+        # Timestamp of the last trade of the oldest whole block in the live store, as of the
+        # last freeze check, which the hot window cutoff must pass to freeze a block
+        self._next_block_end = None
+        self._late_trades = []
+        self._rejected_trades = []
+        self._latest_timestamp = None
+        self._max_lateness = None
+        self._merge_batch_size = DEFAULT_MERGE_BATCH_SIZE
+        self._listeners = []
+        # Whether the listeners are being notified, their reads then leave the late trades buffered
+        self._notifying = False
+        # Timestamp, in ns, of the trade of each id
+        self._trade_timestamps = np.full(1024, _NO_TRADE, dtype=np.int64)
+        self._next_trade_id = 0
+
+
+    def configure_ingestion(
+        self,
+        max_lateness: Optional[timedelta] = None,
+        merge_batch_size: int = DEFAULT_MERGE_BATCH_SIZE,
+    ) -> None:
+        """
+        Configure how out-of-order trades are ingested.
+
+        Parameters:
+        max_lateness (timedelta): How far behind the latest seen trade a trade may be
+        timestamped and still be accepted. None accepts trades of any age.
+        merge_batch_size (int): The number of buffered late trades that triggers a merge
+        into the store. Buffered trades are also merged before any read.
+        """
+        if max_lateness is not None and max_lateness < timedelta(0):
+            raise ValueError(f"max_lateness {max_lateness} cannot be negative")
+        if merge_batch_size <= 0:
+            raise ValueError(f"merge_batch_size {merge_batch_size} should be more than 0")
+        self._max_lateness = max_lateness
+        self._merge_batch_size = merge_batch_size
+        logging.info(
+            f"Ingestion configured with max_lateness={max_lateness}, merge_batch_size={merge_batch_size}"
+        )
+
+
+    def configure_storage(
+        self, compact: bool = False, tick_size: Optional[TickSize] = None, database: Optional[str] = None
+    ) -> None:
+        """
+        Configure how and where the trades are stored. The trades already stored are
+        re-encoded, or moved to the database.
+
+        Parameters:
+        compact (bool): Store symbols as codes into a dictionary, the side as a buy flag
+        and quantities as int32 while they fit, instead of Python strings per trade.
+        tick_size: Store prices as int64 numbers of ticks of this size, e.g. "0.01".
+        Trade statistics are then computed from exact integer notional sums, and
+        trades priced off the tick grid are refused. None stores float prices.
+        Reads return the same columns either way.
+        database (str): Store the trades in this SQLite database file (see
+        exchange.sqlite_store) instead of memory, ":memory:" for a temporary one. A
+        database holding trades of an earlier session is opened with them, if the
+        market holds none. None stores the trades in memory.
+
+        Raises:
+        ValueError: If the tick size is invalid, or a stored price is not a multiple of it,
+        or the compact encoding is asked for a database, or both the database and the
+        market hold trades.
         """
-        Initialize the market with an empty dataframe for trades.
+        self._merge_late_trades()
+        if database is None:
+            trades = TradeStore(
+                capacity=max(len(self._trades), 1024), compact=compact, tick_size=tick_size, symbols=self.symbols
+            )
+        elif compact:
+            raise ValueError("The compact encoding only applies to the trades stored in memory")
+        else:
+            from exchange.sqlite_store import SQLiteTradeStore  # Imported lazily, like the other optional backends
+
+            trades = SQLiteTradeStore(database, tick_size=tick_size, symbols=self.symbols)
+            if len(trades) and (len(self._trades) or len(self._cold_trades)):
+                trades.close()
+                raise ValueError(f"Both the database {database} and the market '{self.name}' hold trades")
+            if len(trades):
+                self._index_stored_trades(trades)
+        trades.merge(self._trades.read())
+        self._trades.close()
+        self._trades = trades
+        self._next_block_end = None
+        logging.info(
+            f"Storage of the market '{self.name}' configured with compact={compact}, tick_size={tick_size}, "
+            f"database={database}"
+        )
+
+
+    def _index_stored_trades(self, trades: "SQLiteTradeStore") -> None:
         """
-        logging.info("Initializing the market with an empty dataframe for trades.")
-        self._trades = []
+        Index the trades of a database opened with trades, assigning the next trade ids after theirs.
+        """
+        trade_ids, timestamps = trades.trade_index()
+        self._next_trade_id = int(trade_ids.max()) + 1
+        self._trade_timestamps = np.full(max(self._next_trade_id, 1024), _NO_TRADE, dtype=np.int64)
+        self._trade_timestamps[trade_ids] = timestamps
+        self._latest_timestamp = timestamps.max().view("datetime64[ns]").astype("datetime64[us]").astype(datetime)
+
 
+    def configure_cold_storage(
+        self, hot_window: Optional[timedelta] = None, block_size: int = DEFAULT_COLD_BLOCK_SIZE
+    ) -> None:
+        """
+        Configure the freezing of older trades into compressed cold blocks.
+
+        Parameters:
+        hot_window (timedelta): How far behind the latest trade trades stay in the live
+        store. Older trades are frozen as they age, in whole blocks. None only freezes
+        trades on freeze() calls.
+        block_size (int): The number of trades per cold block.
+        """
+        if hot_window is not None and hot_window < timedelta(0):
+            raise ValueError(f"hot_window {hot_window} cannot be negative")
+        if block_size <= 0:
+            raise ValueError(f"block_size {block_size} should be more than 0")
+        self._hot_window = hot_window
+        self._cold_trades.block_size = block_size
+        self._next_block_end = None
+        logging.info(f"Cold storage configured with hot_window={hot_window}, block_size={block_size}")
+        self._freeze_aged_trades()
+
+
+    def freeze(self, before: datetime) -> int:
+        """
+        Freeze the trades timestamped before a time into compressed cold blocks.
 
-    def add_trade(self, trade_entry: Trade) -> None:
+        Returns:
+        int: The number of trades frozen.
+        """
+        self._merge_late_trades()
+        count = self._trades.count(None, before)
+        self._freeze_head(count)
+        return count
+
+
+    def _freeze_head(self, count: int) -> None:
+        """
+        Move the oldest trades of the live store into cold blocks.
+        """
+        if not count:
+            return
+        self._cold_trades.freeze(self._trades.head(count))
+        self._trades.drop_head(count)
+        logging.info(f"Froze {count} trades of the market '{self.name}' into cold storage.")
+
+
+    def _freeze_aged_trades(self) -> None:
+        """
+        Freeze the whole blocks of trades older than the hot window. The store is only
+        read once the cutoff passes the end of its oldest whole block, as of the last
+        check, not on every trade added. Late trades merged older than that block end
+        are frozen once the cutoff passes it.
+        """
+        block_size = self._cold_trades.block_size
+        if self._hot_window is None or len(self._trades) < block_size:
+            return
+        cutoff = to_datetime64(self._latest_timestamp - self._hot_window)
+        if self._next_block_end is not None and cutoff <= self._next_block_end:
+            return
+        self._merge_late_trades()
+        aged = self._trades.count(None, cutoff)
+        self._freeze_head(aged - aged % block_size)
+        self._next_block_end = (
+            self._trades.head(block_size)[TIMESTAMP][-1] if len(self._trades) >= block_size else None
+        )
+
+
+    def _is_frozen(self, timestamp: np.datetime64) -> bool:
+        """
+        Whether a timestamp is older than the trades frozen in cold storage.
+        """
+        return self._cold_trades.end_time is not None and timestamp < self._cold_trades.end_time
+
+
+    @property
+    def symbols(self) -> SymbolRegistry:
+        """
+        The registry of the symbol ids the trades are stored with, shared with the venue's StockInfo.
+        """
+        return self._trades.symbols
+
+
+    @property
+    def tick_size(self) -> Optional[Fraction]:
+        """
+        The tick size prices are stored as multiples of, None if prices are stored as floats.
+        """
+        return self._trades.tick_size
+
+
+    @property
+    def compact(self) -> bool:
+        """
+        Whether the trades are stored in the compact encoding (see configure_storage).
+        """
+        return self._trades.compact
+
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Get the memory held by the market, in bytes by component - the trade columns
+        (see TradeStore.memory_usage), the cold blocks, the trade id index, and the
+        buffered late and the rejected trades.
+
+        Example:
+            usage = Market().memory_usage()
+            total = sum(usage.values())
+        """
+        usage = self._trades.memory_usage()
+        usage["cold_blocks"] = self._cold_trades.nbytes
+        usage["trade_id_index"] = self._trade_timestamps.nbytes
+        usage["late_trades"] = sys.getsizeof(self._late_trades) + sum(
+            sys.getsizeof(record) + object_bytes(record.values()) for record in self._late_trades
+        )
+        usage["rejected_trades"] = sys.getsizeof(self._rejected_trades) + sum(
+            sys.getsizeof(trade) + sys.getsizeof(trade.__dict__) + object_bytes(trade.__dict__.values())
+            for trade in self._rejected_trades
+        )
+        return usage
+
+
+    @property
+    def trade_count(self) -> int:
+        """
+        The number of trades recorded, frozen and late ones included, without reading them.
+        """
+        return len(self._trades) + len(self._cold_trades) + len(self._late_trades)
+
+
+    @property
+    def next_trade_id(self) -> int:
+        """
+        The id the next trade recorded will be assigned. The trades of a batch given to
+        add_trades are assigned consecutive ids from it, in the order of the batch.
+        """
+        return self._next_trade_id
+
+
+    def _assign_trade_ids(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Assign the next trade ids to trades, indexing their timestamps.
+        """
+        count = len(timestamps)
+        first = self._next_trade_id
+        if first + count > len(self._trade_timestamps):
+            grown = np.full(max(first + count, 2 * len(self._trade_timestamps)), _NO_TRADE, dtype=np.int64)
+            grown[:first] = self._trade_timestamps[:first]
+            self._trade_timestamps = grown
+        self._trade_timestamps[first : first + count] = np.asarray(timestamps, dtype="datetime64[ns]").view(np.int64)
+        self._next_trade_id = first + count
+        return np.arange(first, first + count, dtype=np.int64)
+
+
+    def subscribe(self, listener: TradeListener) -> None:
+        """
+        Register a listener to be notified of the trades stored in the market.
+        """
+        self._listeners.append(listener)
+
+
+    def unsubscribe(self, listener: TradeListener) -> None:
+        """
+        Stop notifying a previously subscribed listener.
+        """
+        self._listeners.remove(listener)
+
+
+    def _notify(self, batch: Dict[str, np.ndarray], cancelled: bool = False) -> None:
+        """
+        Deliver trades stored, or removed if cancelled, to the listeners. Reads of the
+        market from the listeners meanwhile do not merge the buffered late trades, which
+        would notify them again in the middle of this notification.
+        """
+        notifying, self._notifying = self._notifying, True
+        try:
+            for listener in self._listeners:
+                if cancelled:
+                    listener.on_cancel(batch)
+                else:
+                    listener.on_trades(batch)
+        finally:
+            self._notifying = notifying
+
+
+    def add_trade(self, trade_entry: Trade) -> bool:
         """
         Add a trade entry to the market.
+
+        Returns:
+        bool: True if the trade was accepted, False if it was rejected for being
+        later than the configured maximum lateness, or older than the frozen trades.
+
+        Raises:
+        ValueError: In tick mode, if the price of the trade is not a multiple of the tick size.
+        """
+        record = trade_entry.__dict__
+        timestamp = record[TIMESTAMP]
+        if self._trades.tick_size is not None:
+            # Checked upfront, as late trades are only encoded when merged
+            to_ticks((record[PRICE],), self._trades.tick_size)
+        if self._latest_timestamp is None or timestamp >= self._latest_timestamp:
+            trade_entry.trade_id = int(self._assign_trade_ids([timestamp])[0])
+            self._trades.append(record)
+            self._latest_timestamp = timestamp
+            if self._listeners:
+                self._notify({name: np.array([record[name]], dtype=dtype) for name, dtype in COLUMN_DTYPES.items()})
+            self._freeze_aged_trades()
+        elif self._is_frozen(to_datetime64(timestamp)):
+            self._rejected_trades.append(trade_entry)
+            logging.warning(
+                f"Trade entry {trade_entry} rejected, it is older than the frozen trades, "
+                f"which end at {self._cold_trades.end_time}."
+            )
+            return False
+        elif self._max_lateness is not None and timestamp < self._latest_timestamp - self._max_lateness:
+            self._rejected_trades.append(trade_entry)
+            logging.warning(
+                f"Trade entry {trade_entry} rejected, it is more than {self._max_lateness} "
+                f"older than the latest trade at {self._latest_timestamp}."
+            )
+            return False
+        else:
+            trade_entry.trade_id = int(self._assign_trade_ids([timestamp])[0])
+            self._late_trades.append(record)
+            if len(self._late_trades) >= self._merge_batch_size:
+                self._merge_late_trades()
+        logging.info("Trade entry %s added successfully.", trade_entry)
+        return True
+
+
+    def add_trades(self, trade_columns: Dict[str, np.ndarray]) -> int:
+        """
+        Add a batch of trades, given as column arrays in any order, in one go. The trades
+        are expected to be validated already, e.g. by exchange.loader.validate_trades.
+
+        Returns:
+        int: The number of trades accepted. Like in add_trade, trades later than the
+        configured maximum lateness or older than the frozen trades are rejected and
+        reported. The trades are assigned
+        consecutive ids from next_trade_id, in the order of the batch, rejected ones
+        included.
+
+        Raises:
+        ValueError: In tick mode, if a price is not a multiple of the tick size. No
+        trade of the batch is added then.
+        """
+        timestamps = np.asarray(trade_columns[TIMESTAMP], dtype="datetime64[ns]")
+        if not len(timestamps):
+            return 0
+        batch = {name: np.asarray(trade_columns[name]) for name in TRADE_COLUMNS}
+        batch[TIMESTAMP] = timestamps
+        batch[TRADE_ID] = self._assign_trade_ids(timestamps)
+        latest = timestamps.max()
+        if self._latest_timestamp is not None:
+            latest = max(latest, to_datetime64(self._latest_timestamp))
+
+        rejected = np.zeros(len(timestamps), dtype=bool)
+        if self._cold_trades.end_time is not None:
+            frozen = timestamps < self._cold_trades.end_time
+            if frozen.any():
+                self._reject_trade_columns(
+                    {name: column[frozen] for name, column in batch.items()},
+                    f"they are older than the frozen trades, which end at {self._cold_trades.end_time}",
+                )
+                rejected |= frozen
+        if self._max_lateness is not None:
+            too_late = ~rejected & (timestamps < latest - np.timedelta64(self._max_lateness))
+            if too_late.any():
+                self._reject_trade_columns(
+                    {name: column[too_late] for name, column in batch.items()},
+                    f"they are more than {self._max_lateness} older than the latest trade at "
+                    f"{latest.astype('datetime64[us]').astype(datetime)}",
+                )
+                rejected |= too_late
+        if rejected.any():
+            self._trade_timestamps[batch[TRADE_ID][rejected]] = _NO_TRADE
+            batch = {name: column[~rejected] for name, column in batch.items()}
+
+        merged_batch = self._trades.merge(batch)
+        self._latest_timestamp = latest.astype("datetime64[us]").astype(datetime)
+        logging.info(f"Batch of {len(merged_batch[TIMESTAMP])} trades added to the market.")
+        self._notify(merged_batch)
+        self._freeze_aged_trades()
+        return len(merged_batch[TIMESTAMP])
+
+
+    def _reject_trade_columns(self, rejected: Dict[str, np.ndarray], reason: str) -> None:
+        """
+        Record the trades of a batch rejected for being later than the maximum lateness,
+        or older than the frozen trades, and log the reason.
+        """
+        for symbol, timestamp, quantity, trade_type, price in zip(
+            rejected[STOCK_SYMBOL], rejected[TIMESTAMP].astype("datetime64[us]").tolist(),
+            rejected[QUANTITY].tolist(), rejected[TRADE_TYPE], rejected[PRICE].tolist(),
+        ):
+            self._rejected_trades.append(
+                Trade(stock_symbol=symbol, timestamp=timestamp, quantity=quantity,
+                      trade_type=TradeType(trade_type), price=price, venue=self.name)
+            )
+        logging.warning(f"{len(rejected[TIMESTAMP])} trades rejected, {reason}.")
+
+
+    def _merge_late_trades(self) -> None:
+        """
+        Merge the buffered out-of-order trades into the sorted store. Left buffered while
+        the listeners are notified, until a later read.
+        """
+        if not self._late_trades or self._notifying:
+            return
+        batch = {
+            name: [record[name] for record in self._late_trades] for name in TRADE_COLUMNS + (TRADE_ID,)
+        }
+        self._late_trades = []
+        merged_batch = self._trades.merge(batch)
+        logging.info(f"Merged {len(merged_batch[TIMESTAMP])} late trades into the market.")
+        self._notify(merged_batch)
+
+
+    def _locate_trade(self, trade_id: int) -> Dict[str, np.ndarray]:
+        """
+        Find a trade in the store from its id.
+
+        Returns:
+        dict: The trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If no trade of the id is recorded in the market.
+        """
+        self._merge_late_trades()
+        trade = None
+        if 0 <= trade_id < self._next_trade_id and self._trade_timestamps[trade_id] != _NO_TRADE:
+            timestamp = self._trade_timestamps[trade_id].astype("datetime64[ns]")
+            trade = self._trades.find(trade_id, timestamp)
+            if trade is None and self._cold_trades.end_time is not None and timestamp <= self._cold_trades.end_time:
+                raise ValueError(f"Trade id {trade_id} is frozen in cold storage and cannot be corrected")
+        if trade is None:
+            raise ValueError(f"Trade id {trade_id} is not recorded in the market '{self.name}'")
+        return trade
+
+
+    def _remove_trade(self, trade_id: int) -> Dict[str, np.ndarray]:
+        """
+        Remove a trade from the store and the id index, and notify the listeners.
+        """
+        timestamp = self._locate_trade(trade_id)[TIMESTAMP][0]
+        removed = self._trades.remove_trade(trade_id, timestamp)
+        self._trade_timestamps[trade_id] = _NO_TRADE
+        self._notify(removed, cancelled=True)
+        return removed
+
+
+    def cancel(self, trade_id: int) -> Trade:
+        """
+        Cancel (bust) a recorded trade. The listeners adjust their incremental statistics
+        by removing the trade, through TradeListener.on_cancel.
+
+        Parameters:
+        trade_id (int): The id of the trade, as assigned when it was recorded.
+
+        Returns:
+        Trade: The cancelled trade.
+
+        Raises:
+        ValueError: If no trade of the id is recorded in the market.
+        """
+        removed = self._remove_trade(trade_id)
+        cancelled = self._to_trade(removed)
+        logging.info(f"Trade entry {cancelled} cancelled.")
+        return cancelled
+
+
+    def amend(
+        self,
+        trade_id: int,
+        quantity: Optional[int] = None,
+        price: Optional[float] = None,
+        trade_type: Optional[TradeType] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Trade:
+        """
+        Correct fields of a recorded trade, which keeps its trade id. The listeners see
+        the amend as the removal of the original trade (TradeListener.on_cancel) followed
+        by the amended trade (TradeListener.on_trades). The maximum lateness does not
+        apply to amended timestamps.
+
+        Parameters:
+        trade_id (int): The id of the trade, as assigned when it was recorded.
+        quantity, price, trade_type, timestamp: The corrected values, None to keep the recorded one.
+
+        Returns:
+        Trade: The amended trade.
+
+        Raises:
+        ValueError: If no trade of the id is recorded in the market, a corrected value
+        is invalid, or the corrected timestamp is older than the frozen trades. The trade
+        is left unchanged then.
+        """
+        located = self._locate_trade(trade_id)
+        original = self._to_trade(located)
+        amended = Trade(
+            stock_symbol=original.stock_symbol,
+            timestamp=original.timestamp if timestamp is None else timestamp,
+            quantity=original.quantity if quantity is None else quantity,
+            trade_type=TradeType(original.trade_type) if trade_type is None else trade_type,
+            price=original.price if price is None else price,
+            venue=self.name,
+        )
+        if self._trades.tick_size is not None:
+            to_ticks((amended.price,), self._trades.tick_size)
+        if self._is_frozen(to_datetime64(amended.timestamp)):
+            raise ValueError(
+                f"Trade {trade_id} cannot be amended to {amended.timestamp}, older than the frozen trades, "
+                f"which end at {self._cold_trades.end_time}"
+            )
+        amended.trade_id = trade_id
+
+        record = amended.__dict__
+        if not self._listeners and to_datetime64(amended.timestamp) == to_datetime64(original.timestamp):
+            # Corrected in place. Listeners must see the store without the original trade
+            # on on_cancel, e.g. to rebuild from it, so the trade is removed and merged back then
+            merged_batch = self._trades.replace_trade(trade_id, located[TIMESTAMP][0], record)
+        else:
+            self._remove_trade(trade_id)
+            merged_batch = self._trades.merge({name: [record[name]] for name in TRADE_COLUMNS + (TRADE_ID,)})
+            self._trade_timestamps[trade_id] = to_datetime64(amended.timestamp).astype(np.int64)
+        moved_forward = amended.timestamp > self._latest_timestamp
+        if moved_forward:
+            self._latest_timestamp = amended.timestamp
+        self._notify(merged_batch)
+        if moved_forward:
+            self._freeze_aged_trades()
+        logging.info(f"Trade entry {original} amended to {amended}.")
+        return amended
+
+
+    def _to_trade(self, columns: Dict[str, np.ndarray]) -> Trade:
         """
-        self._trades.append(trade_entry.__dict__)
-        logging.info(f"Trade entry {trade_entry} added successfully.")
+        Build the Trade of a single stored trade row.
+        """
+        trade = Trade(
+            stock_symbol=columns[STOCK_SYMBOL][0],
+            timestamp=columns[TIMESTAMP][0].astype("datetime64[us]").tolist(),
+            quantity=int(columns[QUANTITY][0]),
+            trade_type=TradeType(columns[TRADE_TYPE][0]),
+            price=float(columns[PRICE][0]),
+            venue=self.name,
+        )
+        trade.trade_id = int(columns[TRADE_ID][0])
+        return trade
+
+
+    @property
+    def latest_timestamp(self) -> Optional[datetime]:
+        """
+        The timestamp of the latest trade accepted, None if there are no trades.
+        """
+        return self._latest_timestamp
+
+
+    def get_rejected_trades(self) -> List[Trade]:
+        """
+        Get the trades rejected for arriving later than the configured maximum lateness.
+        """
+        return list(self._rejected_trades)
 
 
     def _flush_trades(self) -> None:
@@ -38,16 +684,89 @@ class Market:
         Returns:
         None
         """
-        self._trades = []
+        self._trades.clear()
+        self._cold_trades.clear()
+        self._late_trades = []
+        self._rejected_trades = []
+        self._latest_timestamp = None
+        self._next_block_end = None
+        self._trade_timestamps[: self._next_trade_id] = _NO_TRADE
+        self._next_trade_id = 0
+        for listener in self._listeners:
+            listener.on_flush()
         logging.info("All previous trades have been flushed.")
 
 
-    def get_trades(self, trade_filter: str = "") -> pd.DataFrame:
+    def get_trade_columns(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbols: Optional[Iterable[str]] = None,
+        symbol_ids: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get the trades with start_time <= timestamp < end_time, of the given stock symbols
+        if any, as column arrays sorted by timestamp, including their trade ids. The arrays
+        are only valid until the next trade is added. Frozen trades are decompressed from
+        the cold blocks overlapping the time range and symbols only.
+
+        With symbol_ids, the stock_symbol column holds the int32 ids of the symbols in
+        the venue's symbol registry (see symbols), e.g. to aggregate trades by indexing
+        arrays with them.
+        """
+        self._merge_late_trades()
+        if stock_symbols is not None:
+            stock_symbols = list(stock_symbols)
+        live = self._trades.read(start_time, end_time, stock_symbols, symbol_ids)
+        if self._cold_trades.end_time is None or (
+            start_time is not None and to_datetime64(start_time) > self._cold_trades.end_time
+        ):
+            return live
+        parts = self._cold_trades.read(start_time, end_time, stock_symbols)
+        if symbol_ids:
+            parts = [dict(part, **{STOCK_SYMBOL: self.symbols.register(part[STOCK_SYMBOL])}) for part in parts]
+        return {name: np.concatenate([part[name] for part in parts + [live]]) for name in live}
+
+
+    def get_trade_sums(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbol: Optional[str] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Sum the traded value and volume of each stock over the trades with
+        start_time <= timestamp < end_time, of the given stock if any, in the storage
+        backend when it aggregates trades (see TradeStorage.trade_sums).
+
+        Returns:
+        dict: The stock symbols (sorted) and their sums. None if the backend does not
+        aggregate trades, or the time range overlaps trades frozen in cold storage; the
+        trades are then aggregated from get_trade_columns.
+        """
+        self._merge_late_trades()
+        if self._cold_trades.end_time is not None and (
+            start_time is None or to_datetime64(start_time) <= self._cold_trades.end_time
+        ):
+            return None
+        return self._trades.trade_sums(start_time, end_time, stock_symbol)
+
+
+    def get_trades(
+        self,
+        trade_filter: str = "",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        with_trade_ids: bool = False,
+    ) -> "pd.DataFrame":
         """
         Get trades from the market, optionally filtered by the given filter.
 
         Parameters:
         trade_filter (str): A query string to filter trades. Defaults to an empty string.
+        start_time (datetime): Only return trades timestamped at or after this time (optional).
+        end_time (datetime): Only return trades timestamped before this time (optional).
+        with_trade_ids (bool): Include the trade_id column, e.g. to cancel or amend trades.
 
         Returns:
         pd.DataFrame: A dataframe containing the filtered trade entries, or all entries if no filter is provided.
@@ -56,8 +775,71 @@ class Market:
             trade_filter="stock_symbol=='XYZ' and trade_type='buy'"
             Market().get_trades(trade_filter)
         """
-        trades_df = pd.DataFrame(self._trades)
+        trade_columns = self.get_trade_columns(start_time, end_time)
+        names = TRADE_COLUMNS + (TRADE_ID,) if with_trade_ids else TRADE_COLUMNS
+        # Copied before, as pandas may wrap object columns without copying them
+        trades_df = self._trades_frame({name: trade_columns[name].copy() for name in names})
+        return self._filter_trades(trades_df, trade_filter)
+
+
+    def get_trades_view(
+        self,
+        trade_filter: str = "",
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbol: Optional[str] = None,
+    ) -> "pd.DataFrame":
+        """
+        Get trades like get_trades, as a read-only frame over the column buffers of the
+        store instead of a copy, for calculators. Writing to the frame raises an error.
+        The frame is only valid until the next write to the market, so it should be used
+        right away (or under the lock serializing writes and computations).
+
+        Selecting a stock_symbol copies the rows of the stock only, and a trade_filter the
+        rows it matches. Trades frozen in cold storage are decompressed copies.
+
+        Parameters:
+        trade_filter (str): A query string to filter trades (optional).
+        start_time (datetime): Only return trades timestamped at or after this time (optional).
+        end_time (datetime): Only return trades timestamped before this time (optional).
+        stock_symbol (str): Only return the trades of this stock (optional).
+        """
+        import pandas as pd  # Imported lazily, ingestion does not need pandas
+
+        stock_symbols = None if stock_symbol is None else [stock_symbol]
+        trade_columns = self.get_trade_columns(start_time, end_time, stock_symbols, symbol_ids=True)
+        # Symbols as a categorical over their ids, the other object columns as object
+        # Series, pandas would copy them into strings
+        trades_df = self._trades_frame({
+            name: pd.Series(self.symbols.categorical(trade_columns[name]), copy=False) if name == STOCK_SYMBOL
+            else pd.Series(trade_columns[name], dtype=object, copy=False) if trade_columns[name].dtype == object
+            else trade_columns[name]
+            for name in TRADE_COLUMNS
+        })
+        return self._filter_trades(trades_df, trade_filter)
+
+
+    def _trades_frame(self, trade_columns: Dict[str, np.ndarray]) -> "pd.DataFrame":
+        """
+        Wrap trade column arrays into a frame without copying them.
+        """
+        import pandas as pd  # Imported lazily, ingestion does not need pandas
+
+        if not len(self._trades) and not len(self._cold_trades):
+            return pd.DataFrame()
+        return pd.DataFrame(trade_columns, copy=False)
+
+
+    def _filter_trades(self, trades_df: "pd.DataFrame", trade_filter: str) -> "pd.DataFrame":
+        """
+        Apply a query string to trades.
+
+        Raises:
+        ValueError: If the filter is malformed.
+        """
         if trade_filter:
+            if trades_df.empty:
+                return trades_df
             logging.info(f"Filtering trades with filter: {trade_filter}")
             try:
                 filtered_trades = trades_df.query(trade_filter)
@@ -68,5 +850,5 @@ class Market:
                     f"Filtering Trades failed. Trade filter '{trade_filter}' maybe malformed"
                 )
         else:
-            logging.info(f"Returning all trades without filtering:\n{trades_df}")
-            return trades_df
\ No newline at end of file
+            logging.info("Returning all trades without filtering:\n%s", trades_df)
+            return trades_df
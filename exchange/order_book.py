@@ -0,0 +1,373 @@
+"""
+Holds the limit order books of a venue and the matching engine trading them. Orders
+are matched with price-time priority, and every match is recorded as a trade of the
+venue's Market, in batches, with the trade type of the aggressing order.
+"""
+
+from collections import deque
+import heapq
+from datetime import datetime
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from common.constants import (
+    DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType,
+)
+from exchange.market import Market
+from exchange.stock import StockInfo
+from exchange.trade_store import to_datetime64
+from utils.fixed_point import TickSize, from_ticks, parse_tick_size
+
+
+# Number of matched trades buffered before they are added to the Market
+DEFAULT_TRADE_BATCH_SIZE = 10000
+
+_BUY = TradeType.BUY.value
+_SELL = TradeType.SELL.value
+
+
+class Order:
+    """
+    An order resting in a book, for the quantity remaining. Cancelled orders are left
+    in their price level queue with no quantity, and skipped when matching.
+    """
+
+    __slots__ = ("order_id", "side", "price", "quantity")
+
+    def __init__(self, order_id: int, side: str, price: int, quantity: int) -> None:
+        self.order_id = order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+
+
+class PriceLevel:
+    """
+    The queue of the orders resting at a price, oldest first, and their total quantity.
+    """
+
+    __slots__ = ("orders", "volume")
+
+    def __init__(self) -> None:
+        self.orders: deque = deque()
+        self.volume = 0
+
+
+class OrderBook:
+    """
+    The limit order book of a stock - a price level per price, in ticks, on each side,
+    and a heap of the prices of each side to find the best one (bids negated).
+
+    Levels are removed when their volume drops to 0, leaving their price in the heap;
+    prices not found in the levels are dropped from the heaps as they come first. The
+    keys held by each heap are kept in a set, so a price is only pushed again once
+    dropped, and the heaps hold each price once however often levels come and go.
+    """
+
+    def __init__(self, stock_symbol: str) -> None:
+        self.stock_symbol = stock_symbol
+        self.bids: Dict[int, PriceLevel] = {}
+        self.asks: Dict[int, PriceLevel] = {}
+        self.bid_prices: List[int] = []
+        self.ask_prices: List[int] = []
+        self.bid_keys: set = set()
+        self.ask_keys: set = set()
+
+    def best_bid(self) -> Optional[int]:
+        """
+        Get the highest bid price, in ticks, None if there are no bids.
+        """
+        heap, levels = self.bid_prices, self.bids
+        while heap and -heap[0] not in levels:
+            self.bid_keys.discard(heapq.heappop(heap))
+        return -heap[0] if heap else None
+
+    def best_ask(self) -> Optional[int]:
+        """
+        Get the lowest ask price, in ticks, None if there are no asks.
+        """
+        heap, levels = self.ask_prices, self.asks
+        while heap and heap[0] not in levels:
+            self.ask_keys.discard(heapq.heappop(heap))
+        return heap[0] if heap else None
+
+    def depth(self, side: str, levels: int) -> List[Tuple[int, int]]:
+        """
+        Get the (price in ticks, volume) of the best price levels of a side, best first.
+        """
+        book = self.bids if side == _BUY else self.asks
+        prices = heapq.nlargest(levels, book) if side == _BUY else heapq.nsmallest(levels, book)
+        return [(price, book[price].volume) for price in prices]
+
+
+class MatchingEngine:
+    """
+    Matches the orders of a venue's stocks in an order book per stock, with price-time
+    priority: an order trades with the best priced resting orders first, and the
+    oldest of them at a price first, at their price. Each match is a trade of the
+    resting order's price, the smaller of the two quantities and the trade type of
+    the aggressing order's side.
+
+    Limit orders rest in the book for the quantity they do not fill. Market orders fill
+    what the opposite side of the book holds, and the rest is cancelled.
+
+    Trades are buffered as columns and added to the venue's Market with add_trades
+    every `batch_size` trades, and on flush(), so the Market is up to date once
+    flushed. They are timestamped with the aggressing order's timestamp.
+
+    Parameters:
+    venue: The venue whose stocks are traded and whose Market records the trades.
+    tick_size: The price increment of the books, e.g. "0.01". Order prices must be multiples of it.
+    batch_size: The number of trades buffered before they are added to the Market.
+
+    Example:
+        engine = MatchingEngine(tick_size="0.01")
+        resting = engine.submit_limit("TEA", TradeType.SELL, 100, 101.5)
+        engine.submit_limit("TEA", TradeType.BUY, 60, 102.0)   # Trades 60 at 101.5, a buy
+        engine.submit_market("TEA", TradeType.SELL, 10)          # No bids, cancelled
+        engine.cancel(resting)
+        engine.flush()
+    """
+
+    def __init__(
+        self, venue: str = DEFAULT_VENUE, tick_size: TickSize = "0.01", batch_size: int = DEFAULT_TRADE_BATCH_SIZE
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"batch_size {batch_size} should be at least 1")
+        self.venue = venue
+        self.market = Market(venue)
+        self.tick_size = parse_tick_size(tick_size)
+        self._ticks_per_price = self.tick_size.denominator / self.tick_size.numerator
+        self.batch_size = batch_size
+        self.books: Dict[str, OrderBook] = {}
+        # Resting orders, and the book they rest in, by order id
+        self._orders: Dict[int, Tuple[Order, OrderBook]] = {}
+        self._next_order_id = 0
+        self._symbols: List[str] = []
+        self._timestamps: List[int] = []
+        self._quantities: List[int] = []
+        self._trade_types: List[str] = []
+        self._prices: List[int] = []
+        self.events = 0
+        self.trades = 0
+
+    def book(self, stock_symbol: str) -> OrderBook:
+        """
+        Get the order book of a stock, created on first use.
+
+        Raises:
+        ValueError: If the stock is not listed in the venue's StockInfo.
+        """
+        book = self.books.get(stock_symbol)
+        if book is None:
+            if not StockInfo(self.venue).is_valid_stock(stock_symbol):
+                raise ValueError(f"Stock symbol {stock_symbol} is not valid")
+            book = self.books[stock_symbol] = OrderBook(stock_symbol)
+        return book
+
+    def to_ticks(self, price: float) -> int:
+        """
+        Convert a price to a number of ticks.
+
+        Raises:
+        ValueError: If the price is not a positive multiple of the tick size.
+        """
+        scaled = price * self._ticks_per_price
+        ticks = round(scaled)
+        if ticks <= 0 or abs(scaled - ticks) > 1e-6:
+            raise ValueError(f"Price {price} should be a positive multiple of the tick size {self.tick_size}")
+        return ticks
+
+    def submit_limit(
+        self, stock_symbol: str, side: TradeType, quantity: int, price: float, timestamp: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Submit a limit order, matching it against the opposite side of the book up to its price.
+
+        Parameters:
+        stock_symbol (str): The stock to trade.
+        side (TradeType): Whether the order buys or sells.
+        quantity (int): The quantity to trade.
+        price (float): The worst price to trade at.
+        timestamp (int): The time of the order, as the int64 nanoseconds of the Market's naive
+        local timestamps, e.g. to_datetime64(datetime.now()).view(np.int64). Defaults to now.
+
+        Returns:
+        int: The id of the order resting in the book, to cancel it. None if it was filled.
+
+        Raises:
+        ValueError: If the stock is not listed, the quantity is not positive or the price
+        is not a positive multiple of the tick size.
+        """
+        book = self.books.get(stock_symbol) or self.book(stock_symbol)
+        if quantity <= 0:
+            raise ValueError(f"Quantity {quantity} should be more than 0")
+        ticks = self.to_ticks(price)
+        self.events += 1
+        order_id = self._next_order_id
+        self._next_order_id = order_id + 1
+        if side is TradeType.BUY:
+            side, levels, heap, keys, key = _BUY, book.bids, book.bid_prices, book.bid_keys, -ticks
+            crossing = book.ask_prices
+        else:
+            side, levels, heap, keys, key = _SELL, book.asks, book.ask_prices, book.ask_keys, ticks
+            crossing = book.bid_prices
+        # Orders not reaching the best opposite price (or a stale one below it) skip matching
+        remaining = self._match(book, side, quantity, ticks, timestamp) if crossing and crossing[0] <= -key else quantity
+        if not remaining:
+            return None
+
+        level = levels.get(ticks)
+        if level is None:
+            level = levels[ticks] = PriceLevel()
+            if key not in keys:
+                keys.add(key)
+                heapq.heappush(heap, key)
+        order = Order(order_id, side, ticks, remaining)
+        level.orders.append(order)
+        level.volume += remaining
+        self._orders[order_id] = (order, book)
+        return order_id
+
+    def submit_market(
+        self, stock_symbol: str, side: TradeType, quantity: int, timestamp: Optional[int] = None
+    ) -> int:
+        """
+        Submit a market order, matching it against the opposite side of the book at any
+        price. The quantity not filled is cancelled.
+
+        Parameters:
+        stock_symbol (str): The stock to trade.
+        side (TradeType): Whether the order buys or sells.
+        quantity (int): The quantity to trade.
+        timestamp (int): The time of the order, as the int64 nanoseconds of the Market's naive
+        local timestamps, e.g. to_datetime64(datetime.now()).view(np.int64). Defaults to now.
+
+        Returns:
+        int: The quantity filled.
+
+        Raises:
+        ValueError: If the stock is not listed or the quantity is not positive.
+        """
+        book = self.books.get(stock_symbol) or self.book(stock_symbol)
+        if quantity <= 0:
+            raise ValueError(f"Quantity {quantity} should be more than 0")
+        self.events += 1
+        remaining = self._match(book, _BUY if side is TradeType.BUY else _SELL, quantity, None, timestamp)
+        return quantity - remaining
+
+    def cancel(self, order_id: int) -> bool:
+        """
+        Cancel the quantity remaining of a resting order.
+
+        Returns:
+        bool: True if the order was resting, False if it was filled or cancelled already.
+        """
+        self.events += 1
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return False
+        order, book = entry
+        levels = book.bids if order.side == _BUY else book.asks
+        level = levels[order.price]
+        level.volume -= order.quantity
+        order.quantity = 0
+        if not level.volume:
+            del levels[order.price]
+        else:
+            # Orders cancelled last in the queue are dropped, the others when matching reaches them
+            queue = level.orders
+            while not queue[-1].quantity:
+                queue.pop()
+        return True
+
+    def _match(
+        self, book: OrderBook, side: str, quantity: int, limit: Optional[int], timestamp: Optional[int]
+    ) -> int:
+        """
+        Match an aggressing order against the opposite side of a book, up to a limit
+        price in ticks (any price if None), buffering the trades.
+
+        Returns:
+        int: The quantity not filled.
+        """
+        if side == _BUY:
+            levels, heap, keys, sign = book.asks, book.ask_prices, book.ask_keys, 1
+        else:
+            levels, heap, keys, sign = book.bids, book.bid_prices, book.bid_keys, -1
+        # Heap keys are the prices times the sign, so both sides stop at keys past the bound
+        bound = None if limit is None else limit * sign
+        orders = self._orders
+        quantities, prices = self._quantities, self._prices
+        trades = 0
+        while quantity and heap:
+            key = heap[0]
+            if bound is not None and key > bound:
+                break
+            price = key * sign
+            level = levels.get(price)
+            if level is None:
+                keys.discard(heapq.heappop(heap))
+                continue
+            queue = level.orders
+            while quantity:
+                resting = queue[0]
+                fill = resting.quantity
+                if not fill:
+                    queue.popleft()
+                    continue
+                if fill > quantity:
+                    fill = quantity
+                resting.quantity -= fill
+                level.volume -= fill
+                quantity -= fill
+                if not resting.quantity:
+                    queue.popleft()
+                    del orders[resting.order_id]
+                quantities.append(fill)
+                prices.append(price)
+                trades += 1
+                if not level.volume:
+                    break
+            if not level.volume:
+                del levels[price]
+                keys.discard(heapq.heappop(heap))
+
+        if trades:
+            self._symbols.extend([book.stock_symbol] * trades)
+            if timestamp is None:
+                timestamp = int(to_datetime64(datetime.now()).view(np.int64))
+            self._timestamps.extend([timestamp] * trades)
+            self._trade_types.extend([side] * trades)
+            self.trades += trades
+            if len(self._prices) >= self.batch_size:
+                self.flush()
+        return quantity
+
+    def flush(self) -> int:
+        """
+        Add the buffered trades to the Market.
+
+        Returns:
+        int: The number of trades the Market accepted.
+        """
+        if not self._prices:
+            return 0
+        batch = {
+            STOCK_SYMBOL: np.array(self._symbols, dtype=object),
+            TIMESTAMP: np.array(self._timestamps, dtype=np.int64).view("datetime64[ns]"),
+            QUANTITY: np.array(self._quantities, dtype=np.int64),
+            TRADE_TYPE: np.array(self._trade_types, dtype=object),
+            PRICE: from_ticks(np.array(self._prices, dtype=np.int64), self.tick_size),
+        }
+        for column in (self._symbols, self._timestamps, self._quantities, self._trade_types, self._prices):
+            column.clear()
+        accepted = self.market.add_trades(batch)
+        logging.info("Matching engine added %d trades to the market of venue %s", accepted, self.venue)
+        return accepted
+
+    def resting_orders(self) -> int:
+        """
+        Get the number of orders resting in the books.
+        """
+        return len(self._orders)
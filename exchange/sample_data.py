@@ -0,0 +1,21 @@
+"""
+Holds the sample stocks of the Global Beverage Corporation Exchange used by the
+simulation and the command line tools
+"""
+
+from typing import List
+from common.constants import StockType
+from exchange.stock import Stock
+
+
+def sample_stocks() -> List[Stock]:
+    """
+    Returns the sample beverage stocks
+    """
+    return [
+        Stock(stock_symbol="TEA", type=StockType.COMMON, last_dividend=0, fixed_dividend_pct=None, par_value=100),
+        Stock(stock_symbol="POP", type=StockType.COMMON, last_dividend=8, fixed_dividend_pct=None, par_value=100),
+        Stock(stock_symbol="ALE", type=StockType.COMMON, last_dividend=23, fixed_dividend_pct=None, par_value=60),
+        Stock(stock_symbol="GIN", type=StockType.PREFERRED, last_dividend=8, fixed_dividend_pct=0.02, par_value=100),
+        Stock(stock_symbol="JOE", type=StockType.COMMON, last_dividend=13, fixed_dividend_pct=None, par_value=250)
+    ]
@@ -0,0 +1,429 @@
+"""
+Holds the shared-memory trade store - a single writer process publishes the trades
+of its Market into POSIX shared memory, and any number of reader processes attach
+to it and query consistent snapshots of the trades without copying them, so one
+ingest path feeds many CPU-bound analytics processes.
+
+Layout:
+- A small control segment, named after the store, holds a header of int64 fields
+  guarded by a sequence number (a seqlock). The writer makes it odd while updating
+  the header and even again once done, readers retry until they read the same even
+  number before and after the header.
+- The trades are held in data segments named "<name>-<generation>", as columns of
+  fixed capacity plus a dictionary of the stock symbols, each UTF-8 encoded after its
+  length. Within a generation, trades are only ever appended past the published count,
+  so the rows a reader has seen never change under it. Anything else (late trades
+  merged in the middle, cancels, amends, flushes or outgrowing the capacity) is
+  published as a new generation, and the previous one is unlinked - readers still
+  mapping it keep it until they drop it.
+"""
+
+from datetime import datetime
+import mmap
+import os
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+import numpy as np
+from common.constants import (
+    DEFAULT_VENUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE, TradeType,
+)
+from exchange.market import Market, TradeListener
+from exchange.trade_store import to_datetime64, window_bounds
+
+try:
+    import _posixshmem
+except ImportError:  # pragma: no cover - not a POSIX platform
+    _posixshmem = None
+
+
+DEFAULT_SHARED_CAPACITY = 1 << 20
+DEFAULT_SYMBOLS_CAPACITY = 1 << 16
+
+IS_BUY = "is_buy"
+
+# Header fields, int64 each
+_MAGIC_NUMBER = 0x5452414445535453
+(_MAGIC, _SEQUENCE, _GENERATION, _COUNT, _CAPACITY,
+ _SYMBOLS_CAPACITY, _SYMBOLS_SIZE, _SYMBOL_COUNT) = range(8)
+_HEADER_FIELDS = 8
+
+# The columns of a data segment, the 8-byte ones first so every column is aligned
+_COLUMN_DTYPES = {
+    TIMESTAMP: np.dtype(np.int64),
+    TRADE_ID: np.dtype(np.int64),
+    QUANTITY: np.dtype(np.int64),
+    PRICE: np.dtype(np.float64),
+    STOCK_SYMBOL: np.dtype(np.int32),
+    IS_BUY: np.dtype(np.uint8),
+}
+# Each symbol of the dictionary is preceded by its length in bytes, so symbols may hold any character
+_SYMBOL_LENGTH_BYTES = 4
+_BUY = TradeType.BUY.value
+
+_READ_RETRIES = 1000
+_INT64 = np.iinfo(np.int64)
+
+
+def _layout(capacity: int, symbols_capacity: int) -> tuple:
+    """
+    The offset of each column of a data segment, then of the symbol dictionary, and the segment size.
+    """
+    offsets = {}
+    offset = 0
+    for name, dtype in _COLUMN_DTYPES.items():
+        offsets[name] = offset
+        offset += capacity * dtype.itemsize
+    return offsets, offset, offset + symbols_capacity
+
+
+def _segment_name(name: str, generation: int) -> str:
+    return f"{name}-{generation}"
+
+
+def _encode_symbols(symbols) -> bytes:
+    """
+    Encode symbols as entries of the symbol dictionary.
+    """
+    entries = []
+    for symbol in symbols:
+        encoded = symbol.encode()
+        entries.append(len(encoded).to_bytes(_SYMBOL_LENGTH_BYTES, "little") + encoded)
+    return b"".join(entries)
+
+
+def _decode_symbols(raw: bytes, count: int) -> np.ndarray:
+    """
+    Decode the first `count` symbols of a symbol dictionary.
+    """
+    symbols = np.empty(count, dtype=object)
+    offset = 0
+    for index in range(count):
+        length = int.from_bytes(raw[offset : offset + _SYMBOL_LENGTH_BYTES], "little")
+        offset += _SYMBOL_LENGTH_BYTES
+        symbols[index] = raw[offset : offset + length].decode()
+        offset += length
+    return symbols
+
+
+def _map_read_only(name: str) -> mmap.mmap:
+    """
+    Map an existing shared memory segment read-only. Unlike SharedMemory, the mapping
+    is not tracked for removal when the reader process exits, and stays valid as long
+    as arrays reference it, even once the writer unlinked the segment.
+    """
+    if _posixshmem is None:
+        raise OSError("Shared trade stores need POSIX shared memory")
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+
+
+class SharedTradePublisher(TradeListener):
+    """
+    Publishes the trades of the Market of a venue into a shared-memory trade store,
+    kept up to date as trades are recorded. There is a single publisher per store.
+
+    Trades recorded in time order are appended in place. Late trades merged before
+    the last published one, cancels, amends and flushes publish a new generation: the
+    rows older than the correction are copied over from the current generation as they
+    are, already encoded, and only the trades from the correction on are read back
+    from the Market, so correcting a recent trade costs little more than a copy of the
+    columns. Growing the capacity copies the rows the same way.
+
+    Parameters:
+    name: The name of the store, e.g. "bsm-trades", which readers attach to.
+    venue: The venue whose Market is published (optional).
+    capacity: The initial number of trades a generation holds.
+    symbols_capacity: The initial size of the stock symbol dictionary, in bytes.
+
+    Raises:
+    FileExistsError: If a store of that name already exists.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        venue: str = DEFAULT_VENUE,
+        capacity: int = DEFAULT_SHARED_CAPACITY,
+        symbols_capacity: int = DEFAULT_SYMBOLS_CAPACITY,
+    ) -> None:
+        if capacity <= 0 or symbols_capacity <= 0:
+            raise ValueError(f"capacity {capacity} and symbols_capacity {symbols_capacity} should be more than 0")
+        self.name = name
+        self._market = Market(venue)
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_FIELDS * 8)
+        self._header = np.ndarray(_HEADER_FIELDS, dtype=np.int64, buffer=self._control.buf)
+        self._header[:] = 0
+        self._header[_MAGIC] = _MAGIC_NUMBER
+        self._segment: Optional[shared_memory.SharedMemory] = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self._symbols_area: Optional[np.ndarray] = None
+        self._symbol_codes: Dict[str, int] = {}
+        self._symbols_size = 0
+        self._count = 0
+        self._last_timestamp: Optional[int] = None
+        self._generation = 0
+        self._capacity = capacity
+        self._symbols_capacity = symbols_capacity
+        self._republish()
+        self._market.subscribe(self)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        """
+        Stop publishing and remove the store. Readers attached keep their mappings.
+        """
+        self._market.unsubscribe(self)
+        self._release_segment()
+        self._header = None
+        self._control.close()
+        self._control.unlink()
+
+    def __enter__(self) -> "SharedTradePublisher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _release_segment(self) -> None:
+        if self._segment is not None:
+            self._columns = {}
+            self._symbols_area = None
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+
+    def _publish_header(self, fields: Dict[int, int]) -> None:
+        """
+        Update header fields, the sequence number being odd in the meantime.
+        """
+        header = self._header
+        header[_SEQUENCE] += 1
+        for field, value in fields.items():
+            header[field] = value
+        header[_SEQUENCE] += 1
+
+    def _encode_symbols(self, symbols: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Encode symbols to their dictionary codes, adding the new ones to the dictionary.
+
+        Returns:
+        np.ndarray: The int32 codes, or None if the new symbols do not fit the dictionary.
+        """
+        import pandas as pd  # Imported lazily, like in the Market
+
+        inverse, unique_symbols = pd.factorize(symbols)
+        new_symbols = [symbol for symbol in unique_symbols.tolist() if symbol not in self._symbol_codes]
+        if new_symbols:
+            encoded = _encode_symbols(new_symbols)
+            if self._symbols_size + len(encoded) > self._symbols_capacity:
+                return None
+            self._symbols_area[self._symbols_size : self._symbols_size + len(encoded)] = np.frombuffer(encoded, np.uint8)
+            self._symbols_size += len(encoded)
+            for symbol in new_symbols:
+                self._symbol_codes[symbol] = len(self._symbol_codes)
+        codes = np.array([self._symbol_codes[symbol] for symbol in unique_symbols.tolist()], dtype=np.int32)
+        return codes[inverse]
+
+    def _write(self, batch: Dict[str, np.ndarray]) -> bool:
+        """
+        Write trades past the published count. Returns False if they do not fit the generation.
+        """
+        count = len(batch[TIMESTAMP])
+        if self._count + count > self._capacity:
+            return False
+        symbol_codes = self._encode_symbols(batch[STOCK_SYMBOL])
+        if symbol_codes is None:
+            return False
+        rows = slice(self._count, self._count + count)
+        self._columns[TIMESTAMP][rows] = batch[TIMESTAMP].view(np.int64)
+        self._columns[TRADE_ID][rows] = batch[TRADE_ID]
+        self._columns[QUANTITY][rows] = batch[QUANTITY]
+        self._columns[PRICE][rows] = batch[PRICE]
+        self._columns[STOCK_SYMBOL][rows] = symbol_codes
+        self._columns[IS_BUY][rows] = batch[TRADE_TYPE] == _BUY
+        self._count += count
+        return True
+
+    def _republish(self, since: Optional[int] = None) -> None:
+        """
+        Publish the trades of the Market into a new generation, growing it to hold them.
+        The rows published before `since` (a timestamp in ns) are copied over from the
+        current generation, the trades from then on are read back from the Market.
+        """
+        kept = 0
+        if since is not None and self._segment is not None:
+            kept = int(np.searchsorted(self._columns[TIMESTAMP][: self._count], since, side="left"))
+        trades = self._market.get_trade_columns(start_time=np.datetime64(since, "ns") if kept else None)
+        count = kept + len(trades[TIMESTAMP])
+        while self._capacity < count:
+            self._capacity *= 2
+        new_symbols = set(trades[STOCK_SYMBOL].tolist()).difference(self._symbol_codes)
+        while self._symbols_capacity < self._symbols_size + len(_encode_symbols(new_symbols)):
+            self._symbols_capacity *= 2
+
+        previous, previous_columns, previous_symbols = self._segment, self._columns, self._symbols_area
+        self._generation += 1
+        offsets, symbols_offset, size = _layout(self._capacity, self._symbols_capacity)
+        segment = shared_memory.SharedMemory(name=_segment_name(self.name, self._generation), create=True, size=size)
+        self._columns = {
+            name: np.ndarray(self._capacity, dtype=dtype, buffer=segment.buf, offset=offsets[name])
+            for name, dtype in _COLUMN_DTYPES.items()
+        }
+        if kept:
+            for name, column in self._columns.items():
+                column[:kept] = previous_columns[name][:kept]
+        self._symbols_area = np.ndarray(self._symbols_capacity, dtype=np.uint8, buffer=segment.buf, offset=symbols_offset)
+        # The symbol codes are kept across generations
+        if previous_symbols is not None:
+            self._symbols_area[: self._symbols_size] = previous_symbols[: self._symbols_size]
+        self._count = kept
+        self._write(trades)
+        self._last_timestamp = int(self._columns[TIMESTAMP][count - 1]) if count else None
+        self._publish_header({
+            _GENERATION: self._generation, _COUNT: self._count, _CAPACITY: self._capacity,
+            _SYMBOLS_CAPACITY: self._symbols_capacity, _SYMBOLS_SIZE: self._symbols_size,
+            _SYMBOL_COUNT: len(self._symbol_codes),
+        })
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+        self._segment = segment
+
+    def on_trades(self, batch: Dict[str, np.ndarray]) -> None:
+        count = len(batch[TIMESTAMP])
+        if not count:
+            return
+        timestamps = batch[TIMESTAMP].view(np.int64)
+        if self._last_timestamp is not None and timestamps[0] < self._last_timestamp:
+            self._republish(since=int(timestamps[0]))
+            return
+        if not self._write(batch):
+            self._republish(since=int(timestamps[0]))
+            return
+        self._last_timestamp = int(timestamps[-1])
+        self._publish_header({
+            _COUNT: self._count, _SYMBOLS_SIZE: self._symbols_size, _SYMBOL_COUNT: len(self._symbol_codes),
+        })
+
+    def on_cancel(self, batch: Dict[str, np.ndarray]) -> None:
+        self._republish(since=int(batch[TIMESTAMP].view(np.int64).min()))
+
+    def on_flush(self) -> None:
+        self._republish()
+
+
+class SharedTradeSnapshot:
+    """
+    A consistent, read-only snapshot of the trades of a shared-memory trade store.
+    The columns are views over the shared memory, never copied, and stay valid as
+    long as the snapshot (or any of its columns) is referenced.
+
+    Attributes:
+    sequence: The sequence number of the header the snapshot was taken at.
+    generation: The generation of the data segment.
+    symbols: The stock symbols, indexed by their code.
+    columns: The timestamp (datetime64[ns]), trade_id, quantity, price, stock_symbol
+    (int32 codes into symbols) and is_buy (bool) columns, sorted by timestamp.
+    """
+
+    def __init__(self, sequence: int, generation: int, symbols: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        self.sequence = sequence
+        self.generation = generation
+        self.symbols = symbols
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns[TIMESTAMP])
+
+    def window(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """
+        The columns of the trades with start_time <= timestamp < end_time, as views.
+        """
+        timestamps = self.columns[TIMESTAMP]
+        lo, hi = 0, len(timestamps)
+        if start_time is not None or end_time is not None:
+            lo, hi = window_bounds(
+                timestamps.view(np.int64),
+                _INT64.min if start_time is None else int(to_datetime64(start_time).astype(np.int64)),
+                _INT64.max if end_time is None else int(to_datetime64(end_time).astype(np.int64)),
+            )
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+
+class SharedTradeReader:
+    """
+    Attaches to a shared-memory trade store published by a SharedTradePublisher,
+    typically in another process.
+
+    Parameters:
+    name: The name of the store.
+
+    Raises:
+    FileNotFoundError: If no store of that name is published.
+    ValueError: If the shared memory of that name is not a trade store.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._control = _map_read_only(name)
+        self._header = np.ndarray(_HEADER_FIELDS, dtype=np.int64, buffer=self._control)
+        if self._header[_MAGIC] != _MAGIC_NUMBER:
+            raise ValueError(f"Shared memory '{name}' is not a trade store")
+        self._generation = None
+        self._segment: Optional[mmap.mmap] = None
+        self._symbols = np.empty(0, dtype=object)
+
+    def _read_header(self) -> np.ndarray:
+        """
+        Read a consistent copy of the header, retrying while the writer updates it.
+        """
+        for _ in range(_READ_RETRIES):
+            sequence = self._header[_SEQUENCE]
+            if sequence % 2 == 0:
+                header = self._header.copy()
+                if self._header[_SEQUENCE] == sequence and header[_SEQUENCE] == sequence:
+                    return header
+            os.sched_yield()
+        raise TimeoutError(f"Could not read a consistent header of the trade store '{self.name}'")
+
+    def snapshot(self) -> SharedTradeSnapshot:
+        """
+        Take a consistent snapshot of the published trades, without copying them.
+
+        Returns:
+        SharedTradeSnapshot: The trades published as of the snapshot.
+        """
+        for _ in range(_READ_RETRIES):
+            header = self._read_header()
+            generation = int(header[_GENERATION])
+            if generation != self._generation:
+                try:
+                    self._segment = _map_read_only(_segment_name(self.name, generation))
+                except FileNotFoundError:
+                    # Replaced by a newer generation since the header was read
+                    continue
+                self._generation = generation
+                self._symbols = np.empty(0, dtype=object)
+            capacity, count = int(header[_CAPACITY]), int(header[_COUNT])
+            offsets, symbols_offset, _ = _layout(capacity, int(header[_SYMBOLS_CAPACITY]))
+            symbol_count = int(header[_SYMBOL_COUNT])
+            if len(self._symbols) != symbol_count:
+                raw = bytes(self._segment[symbols_offset : symbols_offset + int(header[_SYMBOLS_SIZE])])
+                self._symbols = _decode_symbols(raw, symbol_count)
+            columns = {
+                name: np.ndarray(count, dtype=dtype, buffer=self._segment, offset=offsets[name])
+                for name, dtype in _COLUMN_DTYPES.items()
+            }
+            columns[TIMESTAMP] = columns[TIMESTAMP].view("datetime64[ns]")
+            columns[IS_BUY] = columns[IS_BUY].view(np.bool_)
+            return SharedTradeSnapshot(int(header[_SEQUENCE]), generation, self._symbols, columns)
+        raise TimeoutError(f"Could not attach to the trade store '{self.name}'")
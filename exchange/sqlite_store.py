@@ -0,0 +1,430 @@
+"""
+Holds the SQLite storage backend of the Market, keeping the trades in a database
+file on the local disk instead of memory, so trade sets larger than the memory
+stay queryable by time window and stock.
+
+Trades are inserted in batched transactions, the database is in WAL mode so
+readers of the file are not blocked by the ingestion, and the time and
+(stock symbol, timestamp) indexes serve the window and per-stock queries.
+Per-stock sums for the volume weighted stock price are aggregated in SQL, so
+they are computed without reading the trades out of the database.
+"""
+
+from datetime import datetime
+import logging
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE
+from exchange.storage import TRADED_VALUE, VOLUME, TradeStorage
+from exchange.symbols import SymbolRegistry
+from exchange.trade_store import COLUMN_DTYPES, to_datetime64
+from utils.fixed_point import TickSize, from_ticks, parse_tick_size, to_ticks
+
+
+DEFAULT_INSERT_BATCH_SIZE = 4096
+
+# Rows fetched at a time when reading trades out of the database
+_READ_CHUNK_SIZE = 65536
+
+# Stored columns, in the order of the rows inserted and selected after the seq column
+_COLUMNS = (TRADE_ID, STOCK_SYMBOL, TIMESTAMP, QUANTITY, TRADE_TYPE, PRICE)
+
+# The seq column records the arrival order, which orders the trades sharing a
+# timestamp. Prices are REAL, or INTEGER numbers of ticks in tick mode.
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS trades (
+        seq INTEGER PRIMARY KEY,
+        trade_id INTEGER NOT NULL,
+        stock_symbol TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        trade_type TEXT NOT NULL,
+        price NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS trades_by_time ON trades (timestamp)",
+    "CREATE INDEX IF NOT EXISTS trades_by_symbol_time ON trades (stock_symbol, timestamp)",
+    "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+_SELECT = f"SELECT seq, {', '.join(_COLUMNS)} FROM trades"
+_INSERT = f"INSERT INTO trades ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+
+def _to_ns(timestamp: datetime) -> int:
+    return int(to_datetime64(timestamp).astype(np.int64))
+
+
+def _window_clause(
+    start_time: Optional[datetime], end_time: Optional[datetime], stock_symbols: Optional[List[str]] = None
+) -> Tuple[str, list]:
+    """
+    Build the WHERE clause, and its parameters, of the trades with start_time <= timestamp < end_time
+    of the given stock symbols.
+    """
+    conditions, parameters = [], []
+    if stock_symbols is not None:
+        conditions.append(f"stock_symbol IN ({', '.join('?' * len(stock_symbols))})")
+        parameters.extend(stock_symbols)
+    if start_time is not None:
+        conditions.append("timestamp >= ?")
+        parameters.append(_to_ns(start_time))
+    if end_time is not None:
+        conditions.append("timestamp < ?")
+        parameters.append(_to_ns(end_time))
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+
+class SQLiteTradeStore(TradeStorage):
+    """
+    Store of trade records in a SQLite database, read back sorted by timestamp.
+
+    Appended trades are buffered and inserted in transactions of insert_batch_size
+    trades, or before the next read. Merged batches are inserted in one transaction.
+
+    A database already holding trades is opened with them, e.g. to query the trades
+    loaded by an earlier session. Its tick mode cannot be changed then.
+
+    Parameters:
+    database (str): The path of the database file, created if missing, or ":memory:".
+    tick_size: Store prices as int64 numbers of ticks of this size, e.g. "0.01" (optional).
+    insert_batch_size (int): The number of appended trades inserted per transaction.
+    symbols (SymbolRegistry): The registry of the symbol ids returned by reads, e.g.
+    the one of the venue's StockInfo. Defaults to a registry of the store's own.
+
+    Raises:
+    ValueError: If the database holds trades stored with another tick size.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        tick_size: Optional[TickSize] = None,
+        insert_batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        symbols: Optional[SymbolRegistry] = None,
+    ) -> None:
+        if insert_batch_size <= 0:
+            raise ValueError(f"insert_batch_size {insert_batch_size} should be more than 0")
+        self.database = database
+        self.symbols = SymbolRegistry() if symbols is None else symbols
+        self.tick_size = None if tick_size is None else parse_tick_size(tick_size)
+        self._insert_batch_size = insert_batch_size
+        self._pending: List[tuple] = []
+        # The Market serializes its calls, from whichever thread
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            stored = self._connection.execute("SELECT value FROM settings WHERE name = 'tick_size'").fetchone()
+            setting = "" if self.tick_size is None else str(self.tick_size)
+            if stored is None:
+                self._connection.execute("INSERT INTO settings VALUES ('tick_size', ?)", (setting,))
+        self._stored = self._connection.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+        if stored is not None and stored[0] != setting:
+            if self._stored:
+                self._connection.close()
+                raise ValueError(
+                    f"Database {database} holds trades stored with tick size {stored[0] or None}, "
+                    f"not {self.tick_size}"
+                )
+            with self._connection:
+                self._connection.execute("UPDATE settings SET value = ? WHERE name = 'tick_size'", (setting,))
+        logging.info(f"Opened the trade database {database} holding {self._stored} trades.")
+
+    def __len__(self) -> int:
+        return self._stored + len(self._pending)
+
+    @property
+    def first_timestamp(self) -> Optional[np.datetime64]:
+        """
+        The timestamp of the oldest trade stored, None if the store is empty.
+        """
+        self._flush_pending()
+        first = self._connection.execute("SELECT MIN(timestamp) FROM trades").fetchone()[0]
+        return None if first is None else np.datetime64(first, "ns")
+
+    def _encode_prices(self, prices: np.ndarray) -> list:
+        """
+        Convert prices to the stored values.
+
+        Raises:
+        ValueError: In tick mode, if a price is not a multiple of the tick size.
+        """
+        if self.tick_size is None:
+            return np.asarray(prices, dtype=np.float64).tolist()
+        return to_ticks(prices, self.tick_size).tolist()
+
+    def _insert(self, rows: Iterable[tuple]) -> None:
+        """
+        Insert rows, in the order of _COLUMNS, in one transaction.
+        """
+        with self._connection:
+            inserted = self._connection.executemany(_INSERT, rows).rowcount
+        self._stored += inserted
+
+    def _flush_pending(self) -> None:
+        """
+        Insert the buffered appended trades.
+        """
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._insert(pending)
+
+    def append(self, record: Dict) -> None:
+        """
+        Append a single trade record. Its timestamp must not precede the last stored one.
+
+        Parameters:
+        record (dict): A mapping of column name to value for the trade.
+        """
+        self._pending.append((
+            record[TRADE_ID], record[STOCK_SYMBOL], _to_ns(record[TIMESTAMP]), record[QUANTITY],
+            record[TRADE_TYPE], self._encode_prices((record[PRICE],))[0],
+        ))
+        if len(self._pending) >= self._insert_batch_size:
+            self._flush_pending()
+
+    def merge(self, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Merge a batch of trade records, in any order, into the store, in one transaction.
+
+        Returns:
+        dict: The merged batch, as column arrays sorted by timestamp.
+
+        Raises:
+        ValueError: In tick mode, if a price is not a multiple of the tick size. No
+        trade of the batch is stored then.
+        """
+        timestamps = np.asarray(batch[TIMESTAMP], dtype=COLUMN_DTYPES[TIMESTAMP])
+        order = np.argsort(timestamps, kind="stable")
+        sorted_batch = {
+            name: np.asarray(batch[name], dtype=dtype)[order]
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+        if not len(timestamps):
+            return sorted_batch
+        prices = self._encode_prices(sorted_batch[PRICE])
+        self._flush_pending()
+        self._insert(zip(
+            sorted_batch[TRADE_ID].tolist(), sorted_batch[STOCK_SYMBOL].tolist(),
+            sorted_batch[TIMESTAMP].view(np.int64).tolist(), sorted_batch[QUANTITY].tolist(),
+            sorted_batch[TRADE_TYPE].tolist(), prices,
+        ))
+        return sorted_batch
+
+    def _chunk_arrays(self, values: List[tuple]) -> List[np.ndarray]:
+        """
+        Convert the selected values of each column, seq first, to arrays with COLUMN_DTYPES.
+        """
+        seqs, trade_ids, symbols, timestamps, quantities, trade_types, prices = values
+        return [
+            np.array(seqs, dtype=np.int64),
+            np.array(trade_ids, dtype=np.int64),
+            np.array(symbols, dtype=object),
+            np.array(timestamps, dtype=np.int64).view(COLUMN_DTYPES[TIMESTAMP]),
+            np.array(quantities, dtype=np.int64),
+            np.array(trade_types, dtype=object),
+            (
+                np.array(prices, dtype=np.float64) if self.tick_size is None
+                else from_ticks(np.array(prices, dtype=np.int64), self.tick_size)
+            ),
+        ]
+
+    def _select(self, clause: str = "", parameters: Iterable = ()) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Select trades, in chunks, as read-only column arrays with COLUMN_DTYPES.
+
+        Returns:
+        Tuple[np.ndarray, dict]: The seq of the trades, and their columns.
+        """
+        self._flush_pending()
+        cursor = self._connection.execute(f"{_SELECT}{clause}", list(parameters))
+        parts = [self._chunk_arrays([()] * (len(_COLUMNS) + 1))]
+        while True:
+            rows = cursor.fetchmany(_READ_CHUNK_SIZE)
+            if not rows:
+                break
+            parts.append(self._chunk_arrays(list(zip(*rows))))
+        seqs, *arrays = [np.concatenate(values) for values in zip(*parts)]
+        columns = dict(zip(_COLUMNS, arrays))
+        columns = {name: columns[name] for name in COLUMN_DTYPES}
+        for column in columns.values():
+            column.flags.writeable = False
+        return seqs, columns
+
+    def read(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbols: Optional[Iterable[str]] = None,
+        symbol_ids: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get the trades with start_time <= timestamp < end_time, of the given stock symbols
+        if any, as read-only column arrays sorted by timestamp. With symbol_ids, the symbols
+        are encoded to their ids in `symbols`.
+        """
+        stock_symbols = None if stock_symbols is None else list(stock_symbols)
+        clause, parameters = _window_clause(start_time, end_time, stock_symbols)
+        columns = self._select(f"{clause} ORDER BY timestamp, seq", parameters)[1]
+        if symbol_ids:
+            columns[STOCK_SYMBOL] = self.symbols.register(columns[STOCK_SYMBOL])
+            columns[STOCK_SYMBOL].flags.writeable = False
+        return columns
+
+    def count(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> int:
+        """
+        Count the trades with start_time <= timestamp < end_time.
+        """
+        self._flush_pending()
+        clause, parameters = _window_clause(start_time, end_time)
+        return self._connection.execute(f"SELECT COUNT(*) FROM trades{clause}", parameters).fetchone()[0]
+
+    def head(self, count: int) -> Dict[str, np.ndarray]:
+        """
+        Get the `count` oldest trades.
+        """
+        return self._select(" ORDER BY timestamp, seq LIMIT ?", (count,))[1]
+
+    def drop_head(self, count: int) -> None:
+        """
+        Remove the `count` oldest trades, e.g. once frozen into cold storage.
+        """
+        self._flush_pending()
+        with self._connection:
+            removed = self._connection.execute(
+                "DELETE FROM trades WHERE seq IN (SELECT seq FROM trades ORDER BY timestamp, seq LIMIT ?)", (count,)
+            ).rowcount
+        self._stored -= removed
+
+    def _find(self, trade_id: int, timestamp: np.datetime64) -> Tuple[Optional[int], Dict[str, np.ndarray]]:
+        seqs, columns = self._select(
+            " WHERE timestamp = ? AND trade_id = ?", (int(timestamp.astype(np.int64)), int(trade_id))
+        )
+        return (int(seqs[0]) if len(seqs) else None), columns
+
+    def find(self, trade_id: int, timestamp: np.datetime64) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Find a trade from its id and timestamp, searching only the trades sharing its timestamp.
+
+        Returns:
+        dict: The trade, as column arrays of one row. None if it is not stored.
+        """
+        seq, columns = self._find(trade_id, timestamp)
+        return None if seq is None else columns
+
+    def _seq(self, trade_id: int, timestamp: np.datetime64) -> Tuple[int, Dict[str, np.ndarray]]:
+        seq, columns = self._find(trade_id, timestamp)
+        if seq is None:
+            raise ValueError(f"Trade id {trade_id} timestamped {timestamp} is not stored")
+        return seq, columns
+
+    def remove_trade(self, trade_id: int, timestamp: np.datetime64) -> Dict[str, np.ndarray]:
+        """
+        Remove a trade from its id and timestamp.
+
+        Returns:
+        dict: The removed trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+        seq, removed = self._seq(trade_id, timestamp)
+        with self._connection:
+            self._connection.execute("DELETE FROM trades WHERE seq = ?", (seq,))
+        self._stored -= 1
+        return removed
+
+    def replace_trade(self, trade_id: int, timestamp: np.datetime64, record: Dict) -> Dict[str, np.ndarray]:
+        """
+        Overwrite a trade, from its id and timestamp, with a record of the same timestamp.
+
+        Returns:
+        dict: The stored trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+        price = self._encode_prices((record[PRICE],))[0]
+        seq, _ = self._seq(trade_id, timestamp)
+        with self._connection:
+            self._connection.execute(
+                "UPDATE trades SET stock_symbol = ?, quantity = ?, trade_type = ?, price = ? WHERE seq = ?",
+                (record[STOCK_SYMBOL], record[QUANTITY], record[TRADE_TYPE], price, seq),
+            )
+        return self.find(trade_id, timestamp)
+
+    def trade_sums(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbol: Optional[str] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Sum the traded value and volume of each stock over the trades with
+        start_time <= timestamp < end_time, in SQL through the indexes.
+
+        Returns:
+        dict: The stock symbols (sorted) and their TRADED_VALUE and VOLUME sums. In tick
+        mode the traded value is the exact int64 sum in ticks.
+        """
+        self._flush_pending()
+        clause, parameters = _window_clause(start_time, end_time, None if stock_symbol is None else [stock_symbol])
+        rows = self._connection.execute(
+            "SELECT stock_symbol, SUM(price * quantity), SUM(quantity) FROM trades"
+            f"{clause} GROUP BY stock_symbol ORDER BY stock_symbol",
+            parameters,
+        ).fetchall()
+        symbols, values, volumes = zip(*rows) if rows else ((), (), ())
+        return {
+            STOCK_SYMBOL: np.array(symbols, dtype=object),
+            TRADED_VALUE: np.array(values, dtype=np.float64 if self.tick_size is None else np.int64),
+            VOLUME: np.array(volumes, dtype=np.int64),
+        }
+
+    def trade_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the trade id and timestamp of every trade stored, e.g. to index the trades
+        of a database opened by a Market.
+
+        Returns:
+        Tuple[np.ndarray, np.ndarray]: The int64 trade ids and their int64 timestamps in ns.
+        """
+        self._flush_pending()
+        index = np.array(self._connection.execute("SELECT trade_id, timestamp FROM trades").fetchall(), dtype=np.int64)
+        index = index.reshape(-1, 2)
+        return index[:, 0], index[:, 1]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Get the memory held by the store, in bytes by component - the buffered appended
+        trades and the page cache of the connection, bounded by the database size.
+        """
+        page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._connection.execute("PRAGMA page_count").fetchone()[0]
+        cache_size = self._connection.execute("PRAGMA cache_size").fetchone()[0]
+        # A negative cache size is a limit in KiB, a positive one in pages
+        cache_bytes = -1024 * cache_size if cache_size < 0 else cache_size * page_size
+        return {
+            "pending_inserts": sys.getsizeof(self._pending) + sum(sys.getsizeof(row) for row in self._pending),
+            "page_cache": min(cache_bytes, page_count * page_size),
+        }
+
+    def clear(self) -> None:
+        """
+        Remove all the trades from the store.
+        """
+        self._pending = []
+        with self._connection:
+            self._connection.execute("DELETE FROM trades")
+        self._stored = 0
+
+    def close(self) -> None:
+        """
+        Insert the buffered trades and close the database.
+        """
+        self._flush_pending()
+        self._connection.close()
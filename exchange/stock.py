@@ -2,11 +2,22 @@
 Holds infomation about all stocks
 """
 
+from collections.abc import Mapping
 import logging
-from common.constants import FIXED_DIVIDEND_PCT, LAST_DIVIDEND, PAR_VALUE, STOCK_SYMBOL, STOCK_TYPE, StockType, TradeType
-from utils.classutils import singleton
-import pandas as pd
-from typing import List
+import sys
+import threading
+from types import MappingProxyType
+from common.constants import DEFAULT_VENUE, FIXED_DIVIDEND_PCT, LAST_DIVIDEND, PAR_VALUE, STOCK_SYMBOL, STOCK_TYPE, StockType, TradeType
+from exchange.symbols import SymbolRegistry
+from utils.classutils import named_singleton
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Names of the information held for each stock
+STOCK_FIELDS = (STOCK_TYPE, LAST_DIVIDEND, FIXED_DIVIDEND_PCT, PAR_VALUE)
 
 
 class Stock:
@@ -43,32 +54,127 @@ class Stock:
 
 
 
-@singleton
+class StockSnapshot(Mapping):
+    """
+    An immutable, consistent view of the stocks of a StockInfo at one point in time,
+    as a read-only mapping of stock symbol to stock record. Updates made to the
+    StockInfo after the snapshot was taken are not visible through it.
+    """
+
+    def __init__(self, stocks: Dict[str, Mapping], version: int) -> None:
+        """
+        Parameters:
+        stocks (dict): The stock records, which must not be modified afterwards.
+        version (int): The number of updates made to the StockInfo before the snapshot.
+        """
+        self._stocks = stocks
+        self.version = version
+        self._stocks_df = None
+
+    def __getitem__(self, stock_symbol: str) -> Mapping:
+        return self._stocks[stock_symbol]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._stocks)
+
+    def __len__(self) -> int:
+        return len(self._stocks)
+
+    def get_record(self, stock_symbol: str) -> Mapping:
+        """
+        Retrieve the read-only record of a specific stock by its symbol.
+
+        Raises:
+        ValueError: If the stock symbol does not exist.
+        """
+        record = self._stocks.get(stock_symbol)
+        if record is None:
+            raise ValueError(f"Stock symbol '{stock_symbol}' not found")
+        return record
+
+    def to_frame(self) -> "pd.DataFrame":
+        """
+        Returns a DataFrame containing information about all stocks of the snapshot,
+        built once per snapshot.
+        """
+        import pandas as pd  # Imported lazily, the other StockInfo paths do not need pandas
+
+        if self._stocks_df is None:
+            if self._stocks:
+                self._stocks_df = pd.DataFrame.from_dict(
+                    {symbol: dict(record) for symbol, record in self._stocks.items()}, orient="index"
+                )
+                self._stocks_df.index.name = STOCK_SYMBOL
+            else:
+                self._stocks_df = pd.DataFrame()
+        return self._stocks_df
+
+
+@named_singleton(DEFAULT_VENUE)
 class StockInfo:
     """
     A class to store and manage stock information. It is designed as a Singleton
-    class to ensure we have only one data store for Stocks related information.
+    class per venue, to ensure we have only one data store for Stocks related
+    information of each venue. StockInfo() is the default venue's data store,
+    StockInfo("XLON") an independent one for the venue "XLON".
+
+    Stocks are held as immutable records keyed by symbol, so validating symbols and
+    reading a single stock does not need pandas. Readers of a single stock get its
+    current record (see get_record()) without a snapshot, so updates interleaved with
+    them take O(1) time each. Readers of all the stocks get consistent snapshots (see
+    snapshot()) while stocks are updated: the mapping of records is copied, in O(n),
+    on the first write after a snapshot was taken, and updated in place otherwise.
+
+    Every stock added is assigned a dense integer id in the venue's symbol registry
+    (see exchange.symbols), which the Market stores trades with and the calculators
+    aggregate by. Ids are kept when stocks are removed, so stored trades stay valid.
 
     Attributes:
-        _stocks (pd.DataFrame): A DataFrame to store stock information.
+        _stocks (dict): A mapping of stock symbol to stock information.
+        symbols (SymbolRegistry): The registry of the symbol ids of the venue.
 
     Methods:
         add_stocks(stocks_list):
-            Adds stock information to the DataFrame.
+            Adds stock information to the data store.
+
+        upsert_stocks(stocks_list):
+            Adds new stocks and replaces the information of existing ones.
+
+        update_stock(stock_symbol, **fields):
+            Updates some of the information of an existing stock, like its last dividend.
 
         get_all_stocks():
             Returns a DataFrame containing all stock information.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, name: str = DEFAULT_VENUE) -> None:
+        """
+        Initialize a StockInfo object with an empty data store.
+
+        Parameters:
+        name (str): The venue (or shard) the data store belongs to.
+        """
+        self.name = name
+        self.symbols = SymbolRegistry()
+        self._stocks: Dict[str, Mapping] = {}
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _writable_stocks(self) -> Dict[str, Mapping]:
         """
-        Initialize a StockInfo object with an empty DataFrame.
+        Get the mapping of records to update, copying it first if a snapshot shares it.
+        Must be called with the lock held.
         """
-        self._stocks = pd.DataFrame()
+        if self._snapshot is not None:
+            self._stocks = dict(self._stocks)
+            self._snapshot = None
+        self._version += 1
+        return self._stocks
 
     def add_stocks(self, stocks_list: List[Stock]) -> None:
         """
-        Add stock information to the DataFrame.
+        Add stock information to the data store.
 
         Parameters:
         stocks_list (list of Stock): List of Stock objects containing stock information.
@@ -76,37 +182,122 @@ class StockInfo:
         Raises:
         ValueError: If there are duplicate stock symbols in the new data.
         """
-        new_stocks = pd.DataFrame([stock.__dict__ for stock in stocks_list])
-        new_stocks = new_stocks.astype(
-            {
-                STOCK_TYPE: "str",
-                LAST_DIVIDEND: "float",
-                PAR_VALUE: "float",
-                FIXED_DIVIDEND_PCT: "float",
-            }
-        )
-        new_stocks = new_stocks.set_index(STOCK_SYMBOL)
-        merged_table = (
-            pd.concat([self._stocks, new_stocks])
-            if not self._stocks.empty
-            else new_stocks
-        )
+        new_stocks = {}
+        with self._lock:
+            for stock in stocks_list:
+                if stock.stock_symbol in self._stocks or stock.stock_symbol in new_stocks:
+                    raise ValueError("Duplicate stock symbols found")
+                new_stocks[stock.stock_symbol] = _to_record(stock)
 
-        # Check for duplicates in the new index
-        if merged_table.index.duplicated().any():
-            raise ValueError("Duplicate stock symbols found")
-        else:
             # No duplicates, proceed to save data
-            self._stocks = merged_table
-            logging.info(f"New stocks {stocks_list} successfully added to the data store")
+            self._writable_stocks().update(new_stocks)
+        for stock_symbol in new_stocks:
+            self.symbols.register_symbol(stock_symbol)
+        logging.info(f"New stocks {stocks_list} successfully added to the data store")
+
+    def upsert_stocks(self, stocks_list: List[Stock]) -> None:
+        """
+        Add new stocks to the data store, and replace the information of the stocks
+        already in it, e.g. to reload dividends intraday.
+
+        Parameters:
+        stocks_list (list of Stock): List of Stock objects containing stock information.
+        """
+        new_stocks = {stock.stock_symbol: _to_record(stock) for stock in stocks_list}
+        with self._lock:
+            self._writable_stocks().update(new_stocks)
+        for stock_symbol in new_stocks:
+            self.symbols.register_symbol(stock_symbol)
+        logging.info("%d stocks upserted in the data store", len(new_stocks))
+
+    def update_stock(self, stock_symbol: str, **fields: Any) -> None:
+        """
+        Update some of the information of a stock already in the data store.
+
+        Parameters:
+        stock_symbol (str): The symbol of the stock to update.
+        fields: The new values, by name - type, last_dividend, fixed_dividend_pct or par_value.
+
+        Raises:
+        ValueError: If the stock symbol does not exist, a field is unknown or a value is invalid.
+
+        Example:
+            StockInfo().update_stock('TEA', last_dividend=1.5)
+        """
+        unknown = set(fields) - set(STOCK_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown stock fields {sorted(unknown)}, expected some of {STOCK_FIELDS}")
+        with self._lock:
+            record = self._stocks.get(stock_symbol)
+            if record is None:
+                raise ValueError(f"Stock symbol '{stock_symbol}' not found")
+            values = {**record, **fields}
+            stock = Stock(
+                stock_symbol=stock_symbol,
+                type=StockType(values[STOCK_TYPE]),
+                last_dividend=values[LAST_DIVIDEND],
+                fixed_dividend_pct=values[FIXED_DIVIDEND_PCT],
+                par_value=values[PAR_VALUE],
+            )
+            self._writable_stocks()[stock_symbol] = _to_record(stock)
+        logging.info("Stock %s updated with %s", stock_symbol, fields)
+
+    def snapshot(self) -> StockSnapshot:
+        """
+        Get an immutable, consistent snapshot of all the stocks. Snapshots are shared
+        until the next update, so taking one without updates in between is free.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = StockSnapshot(self._stocks, self._version)
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """
+        The number of updates made to the data store, e.g. to tell whether stocks changed
+        since a snapshot without taking a new one.
+        """
+        return self._version
+
+    def get_record(self, stock_symbol: str) -> Mapping:
+        """
+        Retrieve the current read-only record of a specific stock by its symbol. Records
+        are immutable and replaced as a whole on updates, so this does not take a snapshot.
+
+        Raises:
+        ValueError: If the stock symbol does not exist.
+        """
+        record = self._stocks.get(stock_symbol)
+        if record is None:
+            raise ValueError(f"Stock symbol '{stock_symbol}' not found")
+        return record
 
     def is_valid_stock(self, stock_symbol: str) -> bool:
         """
         Check if a stock symbol is valid
         """
-        return stock_symbol in self._stocks.index
+        return stock_symbol in self._stocks
 
-    def get_stock_info(self, stock_symbol: str) -> pd.Series:
+    def symbol_id(self, stock_symbol: str) -> Optional[int]:
+        """
+        Get the id of a stock symbol in the venue's symbol registry, None if it was never listed.
+        """
+        return self.symbols.id_of(stock_symbol)
+
+    def get_stock_record(self, stock_symbol: str) -> Dict:
+        """
+        Retrieve the information of a specific stock by its symbol, as a dict.
+
+        Raises:
+        ValueError: If the stock symbol does not exist.
+        """
+        return dict(self.get_record(stock_symbol))
+
+    def get_stock_info(self, stock_symbol: str) -> "pd.Series":
         """
         Retrieve the information of a specific stock by its symbol.
 
@@ -119,19 +310,56 @@ class StockInfo:
         Raises:
         ValueError: If the stock symbol does not exist.
         """
-        if self.is_valid_stock(stock_symbol):
-            return self._stocks.loc[stock_symbol]
+        snapshot = self.snapshot()
+        if stock_symbol in snapshot:
+            return snapshot.to_frame().loc[stock_symbol]
         else:
             raise ValueError(f"Stock symbol '{stock_symbol}' not found")
 
-    def get_all_stocks(self) -> pd.DataFrame:
+    def get_all_stocks(self) -> "pd.DataFrame":
         """
         Returns a DataFrame containing information about all stocks
         """
-        return self._stocks
+        return self.snapshot().to_frame()
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Get the memory held by the data store, in bytes by component - the stock
+        records, the symbol registry, and the cached DataFrame of all stocks if built.
+        """
+        records = sys.getsizeof(self._stocks) + sum(
+            sys.getsizeof(symbol) + sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+            for symbol, record in self._stocks.items()
+        )
+        snapshot = self._snapshot
+        stocks_df = None if snapshot is None else snapshot._stocks_df
+        stocks_frame = 0 if stocks_df is None else int(stocks_df.memory_usage(deep=True).sum())
+        return {"stocks": records, "symbol_registry": self.symbols.memory_usage(), "stocks_frame": stocks_frame}
 
     def _remove_all_stocks(self) -> None:
         """
         Removes all stocks from the data store
         """
-        self._stocks = pd.DataFrame()
+        with self._lock:
+            self._stocks = {}
+            self._snapshot = None
+            self._version += 1
+
+
+def _to_record(stock: Stock) -> Mapping:
+    """
+    Build the immutable record of a stock
+    """
+    return MappingProxyType({
+        STOCK_TYPE: str(stock.type),
+        LAST_DIVIDEND: _to_float(stock.last_dividend),
+        FIXED_DIVIDEND_PCT: _to_float(stock.fixed_dividend_pct),
+        PAR_VALUE: _to_float(stock.par_value),
+    })
+
+
+def _to_float(value) -> float:
+    """
+    Convert an optional numeric stock attribute to float, with None as NaN
+    """
+    return float("nan") if value is None else float(value)
@@ -0,0 +1,160 @@
+"""
+Holds the interface of the storage backends holding the live trades of a Market -
+the in-memory TradeStore (see exchange.trade_store) and the SQLite store (see
+exchange.sqlite_store), for trade sets larger than the memory.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from fractions import Fraction
+from typing import Dict, Iterable, Optional
+import numpy as np
+from exchange.symbols import SymbolRegistry
+
+
+# Names of the per-stock sums returned by TradeStorage.trade_sums
+TRADED_VALUE = "traded_value"
+VOLUME = "volume"
+
+
+class TradeStorage(ABC):
+    """
+    Base class of the storage backends of the Market. A backend keeps the trades
+    sorted by timestamp, trades sharing a timestamp in arrival order, and returns
+    them as column arrays with the dtypes of trade_store.COLUMN_DTYPES.
+
+    Trades are identified by their trade id and timestamp, so a backend finds a
+    trade without scanning the trades of other timestamps. Reads may return the
+    stock symbols as the ids of the backend's symbol registry instead of strings.
+    """
+
+    tick_size: Optional[Fraction] = None
+    compact: bool = False
+    symbols: SymbolRegistry
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @property
+    @abstractmethod
+    def first_timestamp(self) -> Optional[np.datetime64]:
+        """
+        The timestamp of the oldest trade stored, None if the store is empty.
+        """
+
+    @abstractmethod
+    def append(self, record: Dict) -> None:
+        """
+        Append a single trade record. Its timestamp must not precede the last stored one.
+        """
+
+    @abstractmethod
+    def merge(self, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Merge a batch of trade records, in any order, into the sorted store.
+
+        Returns:
+        dict: The merged batch, as column arrays sorted by timestamp.
+        """
+
+    @abstractmethod
+    def read(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbols: Optional[Iterable[str]] = None,
+        symbol_ids: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get the trades with start_time <= timestamp < end_time, of the given stock
+        symbols if any, as read-only column arrays sorted by timestamp. With symbol_ids,
+        the stock_symbol column holds the int32 ids of the symbols in `symbols`.
+        """
+
+    @abstractmethod
+    def count(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> int:
+        """
+        Count the trades with start_time <= timestamp < end_time.
+        """
+
+    @abstractmethod
+    def head(self, count: int) -> Dict[str, np.ndarray]:
+        """
+        Get the `count` oldest trades, e.g. to freeze them into cold storage.
+        """
+
+    @abstractmethod
+    def drop_head(self, count: int) -> None:
+        """
+        Remove the `count` oldest trades, e.g. once frozen into cold storage.
+        """
+
+    @abstractmethod
+    def find(self, trade_id: int, timestamp: np.datetime64) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Find a trade from its id and timestamp.
+
+        Returns:
+        dict: The trade, as column arrays of one row. None if it is not stored.
+        """
+
+    @abstractmethod
+    def remove_trade(self, trade_id: int, timestamp: np.datetime64) -> Dict[str, np.ndarray]:
+        """
+        Remove a trade from its id and timestamp.
+
+        Returns:
+        dict: The removed trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+
+    @abstractmethod
+    def replace_trade(self, trade_id: int, timestamp: np.datetime64, record: Dict) -> Dict[str, np.ndarray]:
+        """
+        Overwrite a trade, from its id and timestamp, with a record of the same timestamp.
+
+        Returns:
+        dict: The stored trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+
+    def trade_sums(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbol: Optional[str] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Sum the traded value and volume of each stock over the trades with
+        start_time <= timestamp < end_time, for backends aggregating trades where
+        they are stored instead of returning them.
+
+        Returns:
+        dict: The stock symbols (sorted) and their TRADED_VALUE and VOLUME sums, the
+        traded value in ticks in tick mode. None if the backend does not aggregate,
+        the trades are then read and aggregated by the caller.
+        """
+        return None
+
+    @abstractmethod
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Get the memory held by the store, in bytes by component.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Remove all the trades from the store.
+        """
+
+    def close(self) -> None:
+        """
+        Release the resources held by the store, once the Market replaces it.
+        """
+        pass
@@ -0,0 +1,169 @@
+"""
+Holds the symbol registry of a venue - the dense integer ids assigned to stock
+symbols, shared by the StockInfo listing the stocks, the Market storing trades
+with symbol ids instead of strings, and the calculators aggregating trades by
+indexing arrays with the ids instead of hashing symbols.
+"""
+
+import sys
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+# Dtype of the symbol ids, enough for 2**31 - 1 symbols
+SYMBOL_ID_DTYPE = "int32"
+
+# Smallest integer dtype pandas holds the codes of categoricals in, by category count
+_CODE_DTYPES = ((2**7 - 1, "int8"), (2**15 - 1, "int16"), (2**31 - 1, "int32"))
+
+
+class SymbolRegistry:
+    """
+    Append-only registry assigning dense integer ids, from 0 in registration order,
+    to stock symbols. Ids are never reused or reassigned, so arrays of ids stay valid
+    as symbols are added, and readers decode them without locking.
+
+    Registering single symbols, as StockInfo does, does not need numpy; the arrays
+    of the registered symbols are built as they are first read.
+
+    Example:
+        registry = StockInfo().symbols
+        ids = registry.register(["TEA", "POP", "TEA"])  # array([0, 1, 0], dtype=int32)
+        registry.decode(ids)                            # array(['TEA', 'POP', 'TEA'], dtype=object)
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        # Object array of the symbols, filled from _symbols up to _filled as read
+        self._array: Optional["np.ndarray"] = None
+        self._filled = 0
+        self._lock = threading.Lock()
+        # Cached per registry size, as symbols are only appended
+        self._categories: Optional["pd.CategoricalDtype"] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    def _symbol_array(self) -> "np.ndarray":
+        """
+        Get the object array holding the registered symbols at their ids, growing and
+        filling it with the symbols registered since the last read. The array may be
+        longer than the registry.
+        """
+        import numpy as np  # Imported lazily, StockInfo registers symbols without numpy
+
+        array = self._array
+        if array is not None and self._filled == len(self._symbols):
+            return array
+        with self._lock:
+            array = self._array
+            count = len(self._symbols)
+            if array is None or len(array) < count:
+                # Readers holding the previous array still see the symbols registered so far
+                grown = np.empty(max(16, 2 * count), dtype=object)
+                if array is not None:
+                    grown[: self._filled] = array[: self._filled]
+                array = grown
+            array[self._filled : count] = self._symbols[self._filled : count]
+            self._array = array
+            self._filled = count
+        return array
+
+    @property
+    def symbols(self) -> "np.ndarray":
+        """
+        The registered symbols, indexed by id, as a read-only object array.
+        """
+        symbols = self._symbol_array()[: len(self._symbols)]
+        symbols.flags.writeable = False
+        return symbols
+
+    def id_of(self, symbol: str) -> Optional[int]:
+        """
+        Get the id of a symbol, None if it is not registered.
+        """
+        return self._ids.get(symbol)
+
+    def _add(self, symbol: str) -> int:
+        """
+        Assign the next id to a symbol. Must be called with the lock held.
+        """
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self._symbols)
+            self._symbols.append(symbol)
+            self._ids[symbol] = symbol_id
+        return symbol_id
+
+    def register_symbol(self, symbol: str) -> int:
+        """
+        Get the id of a symbol, registering it if new.
+        """
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is None:
+            with self._lock:
+                symbol_id = self._add(symbol)
+        return symbol_id
+
+    def register(self, symbols: Iterable[str]) -> "np.ndarray":
+        """
+        Get the ids of symbols, registering the new ones, e.g. to store a batch of trades.
+
+        Returns:
+        np.ndarray: The int32 id of each symbol.
+        """
+        import numpy as np
+        import pandas as pd  # Imported lazily, factorizing is much faster than sorting the symbols
+
+        codes, uniques = pd.factorize(np.asarray(symbols, dtype=object))
+        unique_ids = np.array([self._ids.get(symbol, -1) for symbol in uniques], dtype=SYMBOL_ID_DTYPE)
+        new = np.flatnonzero(unique_ids < 0)
+        if len(new):
+            with self._lock:
+                for position in new.tolist():
+                    unique_ids[position] = self._add(uniques[position])
+        return unique_ids[codes]
+
+    def decode(self, ids: "np.ndarray") -> "np.ndarray":
+        """
+        Get the symbols of ids, as an object array.
+        """
+        return self._symbol_array()[ids]
+
+    def categorical(self, ids: "np.ndarray") -> "pd.Categorical":
+        """
+        Wrap ids into a read-only pandas Categorical over the registered symbols, without
+        copying them unless pandas holds the codes in a narrower dtype.
+        """
+        import numpy as np
+        import pandas as pd  # Imported lazily, only the calculators need pandas
+
+        categories = self._categories
+        if categories is None or len(categories.categories) != len(self._symbols):
+            categories = self._categories = pd.CategoricalDtype(pd.Index(self.symbols.copy()))
+        count = len(categories.categories)
+        code_dtype = next((dtype for limit, dtype in _CODE_DTYPES if count < limit), "int64")
+        codes = np.asarray(ids).astype(code_dtype, copy=False)
+        codes.flags.writeable = False
+        return pd.Categorical.from_codes(codes, dtype=categories, validate=False)
+
+    def memory_usage(self) -> int:
+        """
+        Get the memory held by the registry, in bytes - the symbol array, the id mapping
+        and the symbols themselves.
+        """
+        array = self._array
+        return (
+            sys.getsizeof(self._symbols)
+            + sys.getsizeof(self._ids)
+            + sum(sys.getsizeof(symbol) for symbol in self._symbols)
+            + (0 if array is None else array.nbytes)
+        )
@@ -0,0 +1,228 @@
+"""
+Holds the synthetic market data generator - realistic trading sessions generated
+in vectorized form, as the columnar batches taken by Market.add_trades, so tests,
+benchmarks and replays get millions of trades without building Trade objects.
+"""
+
+from datetime import datetime, timedelta
+import math
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from common.constants import (
+    DEFAULT_VENUE, PAR_VALUE, PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType,
+)
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+from exchange.trade_store import to_datetime64
+
+
+DEFAULT_BATCH_SIZE = 100000
+
+# Start price of the stocks without a positive par value
+_DEFAULT_START_PRICE = 100.0
+
+_TRADE_TYPES = np.array([TradeType.BUY.value, TradeType.SELL.value], dtype=object)
+
+
+class SyntheticSession:
+    """
+    A seedable generator of a synthetic trading session over the stocks of a venue.
+
+    - Symbols are drawn with Zipf-like popularity, the most traded stock being drawn
+      about 2 ** symbol_skew times as often as the second most traded one.
+    - Prices follow a geometric random walk per stock from its par value, each trade
+      moving the log price by a normal step of standard deviation `volatility`, and are
+      rounded to `price_decimals`.
+    - Arrivals are bursty. Trades come as a Poisson process whose rate switches between
+      calm periods and bursts `burstiness` times faster, holding `burst_fraction` of the
+      trades in runs of `burst_length` trades on average, for an average rate of
+      `trades_per_second`.
+    - Quantities are log-normally distributed around `mean_quantity`, trade types are
+      buys with probability `buy_fraction`.
+    - A fraction `out_of_order_fraction` of the trades arrive late, timestamped up to
+      `max_delay` before the trades preceding them in the batch.
+
+    The same parameters and seed generate the same trades, however they are split
+    into batches, and consecutive batches continue the same session.
+
+    Parameters:
+    venue (str): The venue the stocks are drawn from.
+    stock_symbols (Sequence[str]): The stocks traded, all the stocks of the venue by default.
+    start_time (datetime): The start of the session. Defaults to midnight of today.
+    seed (int): The seed of the random generator.
+
+    Raises:
+    ValueError: If there is no stock to trade, a stock is not listed in the venue or a
+    parameter is out of its range.
+    """
+
+    def __init__(
+        self,
+        venue: str = DEFAULT_VENUE,
+        stock_symbols: Optional[Sequence[str]] = None,
+        start_time: Optional[datetime] = None,
+        seed: int = 0,
+        trades_per_second: float = 1000.0,
+        burstiness: float = 10.0,
+        burst_fraction: float = 0.3,
+        burst_length: float = 500.0,
+        volatility: float = 0.0005,
+        price_decimals: int = 2,
+        mean_quantity: float = 100.0,
+        buy_fraction: float = 0.5,
+        out_of_order_fraction: float = 0.0,
+        max_delay: timedelta = timedelta(seconds=1),
+        symbol_skew: float = 1.0,
+    ) -> None:
+        for name, value in (("trades_per_second", trades_per_second), ("burstiness", burstiness),
+                            ("burst_length", burst_length), ("mean_quantity", mean_quantity)):
+            if not value > 0:
+                raise ValueError(f"{name} {value} should be more than 0")
+        for name, value in (("burst_fraction", burst_fraction), ("buy_fraction", buy_fraction),
+                            ("out_of_order_fraction", out_of_order_fraction)):
+            if not 0 <= value <= 1:
+                raise ValueError(f"{name} {value} should be between 0 and 1")
+        if volatility < 0 or symbol_skew < 0 or price_decimals < 0 or max_delay < timedelta(0):
+            raise ValueError("volatility, symbol_skew, price_decimals and max_delay should not be negative")
+
+        stocks = StockInfo(venue).snapshot()
+        symbols = sorted(stocks) if stock_symbols is None else list(stock_symbols)
+        if not symbols:
+            raise ValueError(f"No stock to trade in venue '{venue}'")
+        unknown = [symbol for symbol in symbols if symbol not in stocks]
+        if unknown:
+            raise ValueError(f"Stocks {unknown} are not listed in venue '{venue}'")
+
+        self.venue = venue
+        self.symbols = np.array(symbols, dtype=object)
+        # One generator per drawn property, each consuming its stream in trade order, so
+        # the trades do not depend on the batch sizes
+        (self._symbol_rng, self._regime_rng, self._gap_rng, self._price_rng, self._quantity_rng,
+         self._side_rng, self._late_rng, self._delay_rng) = [
+            np.random.default_rng(seed_sequence) for seed_sequence in np.random.SeedSequence(seed).spawn(8)
+        ]
+        # The popularity ranks are shuffled, so the most traded stock is not the first one
+        ranks = self._symbol_rng.permutation(len(symbols)) + 1
+        weights = ranks ** -float(symbol_skew)
+        self._weights = weights / weights.sum()
+
+        start_prices = [stocks[symbol][PAR_VALUE] for symbol in symbols]
+        self._log_prices = np.log([price if price and price > 0 else _DEFAULT_START_PRICE for price in start_prices])
+        self._volatility = volatility
+        self._price_decimals = price_decimals
+        # Log-normal quantities with a unit log standard deviation
+        self._log_quantity = math.log(mean_quantity) - 0.5
+        self._buy_fraction = buy_fraction
+        self._out_of_order_fraction = out_of_order_fraction
+        self._max_delay = int(max_delay / timedelta(microseconds=1)) * 1000
+
+        # Mean gaps between trades in ns, calm and in bursts, averaging 1 / trades_per_second
+        calm_gap = 1e9 / (trades_per_second * ((1 - burst_fraction) + burst_fraction / burstiness))
+        self._mean_gaps = np.array([calm_gap, calm_gap / burstiness])
+        calm_length = burst_length * (1 - burst_fraction) / burst_fraction if burst_fraction else math.inf
+        self._mean_run_lengths = (calm_length, burst_length if burst_fraction else 0.0)
+        self._in_burst = False
+        self._run_left = self._run_length(False)
+
+        start = datetime.combine(datetime.today(), datetime.min.time()) if start_time is None else start_time
+        self._time = int(to_datetime64(start).astype(np.int64))
+        self.trade_count = 0
+
+    def _run_length(self, in_burst: bool) -> float:
+        mean = self._mean_run_lengths[in_burst]
+        if math.isinf(mean) or mean == 0:
+            return mean
+        return int(self._regime_rng.geometric(1 / mean)) if mean >= 1 else 1
+
+    def _regimes(self, count: int) -> np.ndarray:
+        """
+        Whether each of the next count trades arrives in a burst, continuing the current run.
+        """
+        in_burst = np.empty(count, dtype=bool)
+        filled = 0
+        while filled < count:
+            if self._run_left == 0:
+                self._in_burst = not self._in_burst
+                self._run_left = self._run_length(self._in_burst)
+            taken = int(min(self._run_left, count - filled))
+            in_burst[filled : filled + taken] = self._in_burst
+            self._run_left -= taken
+            filled += taken
+        return in_burst
+
+    def _walk(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Continue the log price random walk of each stock over its trades, in batch order.
+        """
+        steps = self._price_rng.normal(0.0, self._volatility, len(codes))
+        counts = np.bincount(codes, minlength=len(self.symbols))
+        order = np.argsort(codes, kind="stable")
+        walk = np.cumsum(steps[order])
+        # Restart the cumulative sum at each stock, from its current log price
+        before = np.r_[0.0, walk][np.r_[0, np.cumsum(counts)[:-1]]]
+        walk += np.repeat(self._log_prices - before, counts)
+        traded = counts > 0
+        self._log_prices[traded] = walk[np.cumsum(counts)[traded] - 1]
+        log_prices = np.empty_like(walk)
+        log_prices[order] = walk
+        return log_prices
+
+    def batch(self, count: int) -> Dict[str, np.ndarray]:
+        """
+        Generate the next count trades of the session.
+
+        Returns:
+        dict: The trades as column arrays in arrival order, ready for Market.add_trades.
+        """
+        if count < 0:
+            raise ValueError(f"count {count} should not be negative")
+        codes = self._symbol_rng.choice(len(self.symbols), size=count, p=self._weights)
+
+        gaps = self._gap_rng.exponential(1.0, count) * self._mean_gaps[self._regimes(count).astype(np.intp)]
+        timestamps = self._time + np.cumsum(np.rint(gaps).astype(np.int64))
+        if count:
+            self._time = int(timestamps[-1])
+        if self._out_of_order_fraction and self._max_delay:
+            late = self._late_rng.random(count) < self._out_of_order_fraction
+            timestamps[late] -= self._delay_rng.integers(0, self._max_delay, int(late.sum()), endpoint=True)
+
+        tick = 10.0 ** -self._price_decimals
+        prices = np.maximum(np.round(np.exp(self._walk(codes)), self._price_decimals), tick)
+        quantities = np.ceil(self._quantity_rng.lognormal(self._log_quantity, 1.0, count)).astype(np.int64)
+        is_sell = self._side_rng.random(count) >= self._buy_fraction
+        self.trade_count += count
+        return {
+            STOCK_SYMBOL: self.symbols[codes],
+            TIMESTAMP: timestamps.view("datetime64[ns]"),
+            QUANTITY: quantities,
+            TRADE_TYPE: _TRADE_TYPES[is_sell.astype(np.intp)],
+            PRICE: prices,
+        }
+
+    def batches(self, trade_count: int, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Generate the next trade_count trades of the session in batches of batch_size.
+
+        Yields:
+        dict: The trades of each batch as column arrays, ready for Market.add_trades.
+        """
+        if batch_size <= 0:
+            raise ValueError(f"batch_size {batch_size} should be more than 0")
+        for lo in range(0, trade_count, batch_size):
+            yield self.batch(min(batch_size, trade_count - lo))
+
+
+def to_trades(trade_columns: Dict[str, np.ndarray], venue: str = DEFAULT_VENUE) -> List[Trade]:
+    """
+    Build Trade objects from column arrays, e.g. to replay a batch through Market.add_trade
+    or send it to the stats server.
+    """
+    timestamps = trade_columns[TIMESTAMP].astype("datetime64[us]").tolist()
+    return [
+        Trade(stock_symbol=symbol, timestamp=timestamp, quantity=quantity,
+              trade_type=TradeType(trade_type), price=price, venue=venue)
+        for symbol, timestamp, quantity, trade_type, price in zip(
+            trade_columns[STOCK_SYMBOL].tolist(), timestamps, trade_columns[QUANTITY].tolist(),
+            trade_columns[TRADE_TYPE].tolist(), trade_columns[PRICE].tolist(),
+        )
+    ]
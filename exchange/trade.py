@@ -2,7 +2,7 @@
 Holds Trade related information
 """
 
-from common.constants import TradeType
+from common.constants import DEFAULT_VENUE, TradeType
 from datetime import datetime
 
 from exchange.stock import StockInfo
@@ -11,7 +11,8 @@ from exchange.stock import StockInfo
 
 class Trade:
     """
-    A class representing a trade entry in the market.
+    A class representing a trade entry in the market. The trade_id is assigned by
+    the Market when the trade is recorded, and identifies it for cancels and amends.
     """
 
     def __init__(
@@ -21,22 +22,25 @@ class Trade:
         quantity: int,
         trade_type: TradeType,
         price: float,
+        venue: str = DEFAULT_VENUE,
     ):
         """
-        Initialize a trade entry with the given parameters.
+        Initialize a trade entry with the given parameters. The stock symbol is
+        validated against the StockInfo of the given venue.
         """
         self.stock_symbol = stock_symbol
         self.timestamp = timestamp
         self.quantity = quantity
         self.trade_type = trade_type.value
         self.price = price
-        self._validate_inputs()
+        self.trade_id = None
+        self._validate_inputs(venue)
 
-    def _validate_inputs(self) -> None:
+    def _validate_inputs(self, venue: str = DEFAULT_VENUE) -> None:
         """
         Validate the input parameters of the trade entry.
         """
-        stock_info = StockInfo()
+        stock_info = StockInfo(venue)
         if not stock_info.is_valid_stock(self.stock_symbol):
             raise ValueError(f"Stock symbol {self.stock_symbol} is not valid")
         if self.quantity <= 0:
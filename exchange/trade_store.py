@@ -0,0 +1,429 @@
+"""
+Holds the columnar, time-sorted in-memory storage backing the Market
+"""
+
+from datetime import datetime
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE, TradeType
+from exchange.storage import TradeStorage
+from exchange.symbols import SYMBOL_ID_DTYPE, SymbolRegistry
+from utils.fixed_point import TickSize, from_ticks, parse_tick_size, to_ticks
+from utils.jit import kernel
+
+
+COLUMN_DTYPES = {
+    STOCK_SYMBOL: object,
+    TIMESTAMP: "datetime64[ns]",
+    QUANTITY: np.int64,
+    TRADE_TYPE: object,
+    PRICE: np.float64,
+    TRADE_ID: np.int64,
+}
+
+# Storage dtypes of the compact mode - the side as a buy flag and quantities as int32
+# while they fit. Symbols are stored as ids of the symbol registry in both modes.
+# Timestamps stay int64 nanoseconds since the epoch, prices stay float64 to keep
+# stats exact.
+COMPACT_COLUMN_DTYPES = {
+    STOCK_SYMBOL: SYMBOL_ID_DTYPE,
+    TIMESTAMP: "datetime64[ns]",
+    QUANTITY: np.int32,
+    TRADE_TYPE: np.int8,
+    PRICE: np.float64,
+    TRADE_ID: np.int64,
+}
+
+_INT32 = np.iinfo(np.int32)
+_BUY = TradeType.BUY.value
+# Trade type of each value of the compact buy flag
+_TRADE_TYPE_VALUES = np.array([TradeType.SELL.value, TradeType.BUY.value], dtype=object)
+
+
+def to_datetime64(timestamp: datetime) -> np.datetime64:
+    """
+    Convert a datetime (or pandas Timestamp) to the timestamp representation used by the store
+    """
+    return np.datetime64(timestamp, "ns")
+
+
+def _window_bounds_numpy(timestamps, start, end):
+    return np.searchsorted(timestamps, np.array([start, end], dtype=np.int64), side="left")
+
+
+@kernel(numpy_impl=_window_bounds_numpy)
+def window_bounds(timestamps, start, end):
+    """
+    Binary search the sorted int64 timestamps for the rows with start <= timestamp < end.
+
+    Returns:
+    np.ndarray: The [lo, hi) row positions.
+    """
+    bounds = np.empty(2, dtype=np.int64)
+    targets = (start, end)
+    for b in range(2):
+        lo = 0
+        hi = len(timestamps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamps[mid] < targets[b]:
+                lo = mid + 1
+            else:
+                hi = mid
+        bounds[b] = lo
+    return bounds
+
+
+def object_bytes(values: Iterable) -> int:
+    """
+    The size of the distinct Python objects referenced by `values`, in bytes.
+    """
+    distinct = {id(value): value for value in values}
+    return sum(sys.getsizeof(value) for value in distinct.values())
+
+
+class TradeStore(TradeStorage):
+    """
+    Columnar in-memory store of trade records, kept sorted by timestamp.
+
+    Trades arriving in timestamp order are appended in amortized O(1) time.
+    Out-of-order batches are merged into the sorted store, moving only the rows
+    at or after the earliest timestamp of the batch. Trades sharing a timestamp
+    keep their arrival order. Removing a trade moves only the rows after it, so
+    corrections of recent trades stay cheap.
+
+    Symbols are stored as int32 ids of a symbol registry (see exchange.symbols) instead
+    of Python strings per row. In compact mode the other columns are stored with
+    COMPACT_COLUMN_DTYPES too. In tick mode the prices are stored as int64 numbers of
+    ticks. All are decoded back when read, so readers see the same columns, or the
+    symbol ids when asked for.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        compact: bool = False,
+        tick_size: Optional[TickSize] = None,
+        symbols: Optional[SymbolRegistry] = None,
+    ) -> None:
+        """
+        Initialize an empty store.
+
+        Parameters:
+        capacity (int): The number of rows to pre-allocate.
+        compact (bool): Whether to store the trades in the compact encoding.
+        tick_size: The tick size to store prices as multiples of, e.g. "0.01" (optional).
+        symbols (SymbolRegistry): The registry of the symbol ids, e.g. the one of the
+        venue's StockInfo. Defaults to a registry of the store's own.
+        """
+        self.compact = compact
+        self.tick_size = None if tick_size is None else parse_tick_size(tick_size)
+        self.symbols = SymbolRegistry() if symbols is None else symbols
+        self._size = 0
+        dtypes = dict(COMPACT_COLUMN_DTYPES if compact else COLUMN_DTYPES)
+        dtypes[STOCK_SYMBOL] = SYMBOL_ID_DTYPE
+        if self.tick_size is not None:
+            dtypes[PRICE] = np.int64
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def first_timestamp(self) -> Optional[np.datetime64]:
+        """
+        The timestamp of the oldest trade stored, None if the store is empty.
+        """
+        return self._columns[TIMESTAMP][0] if self._size else None
+
+    def _reserve(self, extra: int) -> None:
+        """
+        Grow the column buffers, if required, to hold `extra` more rows.
+        """
+        required = self._size + extra
+        capacity = len(self._columns[TIMESTAMP])
+        if required <= capacity:
+            return
+        new_capacity = max(required, 2 * capacity)
+        for name, column in self._columns.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._columns[name] = grown
+
+    def _fit_quantities(self, low: int, high: int) -> None:
+        """
+        Widen the compact quantity column to int64 once a quantity does not fit int32.
+        """
+        column = self._columns[QUANTITY]
+        if column.dtype == np.int32 and (low < _INT32.min or high > _INT32.max):
+            self._columns[QUANTITY] = column.astype(np.int64)
+
+    def _encode(self, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Encode column arrays of COLUMN_DTYPES to the storage dtypes.
+
+        Raises:
+        ValueError: In tick mode, if a price is not a multiple of the tick size.
+        """
+        encoded = dict(batch)
+        if self.tick_size is not None:
+            encoded[PRICE] = to_ticks(batch[PRICE], self.tick_size)
+        encoded[STOCK_SYMBOL] = self.symbols.register(batch[STOCK_SYMBOL])
+        if self.compact:
+            if len(batch[TIMESTAMP]):
+                self._fit_quantities(batch[QUANTITY].min(), batch[QUANTITY].max())
+            encoded[QUANTITY] = batch[QUANTITY].astype(self._columns[QUANTITY].dtype)
+            encoded[TRADE_TYPE] = (batch[TRADE_TYPE] == _BUY).astype(np.int8)
+        return encoded
+
+    def _decode(self, columns: Dict[str, np.ndarray], symbol_ids: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Decode stored column arrays back to COLUMN_DTYPES, keeping the symbol ids if asked.
+        """
+        decoded = dict(columns)
+        if self.tick_size is not None:
+            decoded[PRICE] = from_ticks(columns[PRICE], self.tick_size)
+        if not symbol_ids:
+            decoded[STOCK_SYMBOL] = self.symbols.decode(columns[STOCK_SYMBOL])
+        if self.compact:
+            decoded[QUANTITY] = columns[QUANTITY].astype(np.int64)
+            decoded[TRADE_TYPE] = _TRADE_TYPE_VALUES[columns[TRADE_TYPE]]
+        return decoded
+
+    def append(self, record: Dict) -> None:
+        """
+        Append a single trade record. Its timestamp must not precede the last stored one.
+
+        Parameters:
+        record (dict): A mapping of column name to value for the trade.
+        """
+        record = self._encode_record(record)
+        self._reserve(1)
+        for name, column in self._columns.items():
+            column[self._size] = record[name]
+        self._size += 1
+
+    def _encode_record(self, record: Dict) -> Dict:
+        """
+        Encode a single trade record to the storage dtypes.
+        """
+        record = dict(record)
+        record[STOCK_SYMBOL] = self.symbols.register_symbol(record[STOCK_SYMBOL])
+        if self.tick_size is not None:
+            record[PRICE] = to_ticks((record[PRICE],), self.tick_size)[0]
+        if self.compact:
+            self._fit_quantities(record[QUANTITY], record[QUANTITY])
+            record[TRADE_TYPE] = record[TRADE_TYPE] == _BUY
+        return record
+
+    def replace(self, position: int, record: Dict) -> None:
+        """
+        Overwrite the trade at a row position with a record of the same timestamp.
+        """
+        record = self._encode_record(record)
+        for name, column in self._columns.items():
+            column[position] = record[name]
+
+    def merge(self, batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Merge a batch of trade records, in any order, into the sorted store.
+
+        Parameters:
+        batch (dict): A mapping of column name to equal length sequences of values.
+
+        Returns:
+        dict: The merged batch, as column arrays sorted by timestamp.
+        """
+        timestamps = np.asarray(batch[TIMESTAMP], dtype=COLUMN_DTYPES[TIMESTAMP])
+        count = len(timestamps)
+        order = np.argsort(timestamps, kind="stable")
+        sorted_batch = {
+            name: np.asarray(batch[name], dtype=dtype)[order]
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+        if not count:
+            return sorted_batch
+        stored_batch = self._encode(sorted_batch)
+
+        stored = self._columns[TIMESTAMP][: self._size]
+        start = int(np.searchsorted(stored, sorted_batch[TIMESTAMP][0], side="right"))
+        tail_size = self._size - start
+
+        # Destination of every batch row within the merged tail
+        positions = np.searchsorted(stored[start:], sorted_batch[TIMESTAMP], side="right")
+        batch_slots = positions + np.arange(count)
+        tail_slots = np.ones(tail_size + count, dtype=bool)
+        tail_slots[batch_slots] = False
+
+        self._reserve(count)
+        for name, column in self._columns.items():
+            merged = np.empty(tail_size + count, dtype=column.dtype)
+            merged[batch_slots] = stored_batch[name]
+            merged[tail_slots] = column[start : self._size]
+            column[start : self._size + count] = merged
+        self._size += count
+        return sorted_batch
+
+    def search(
+        self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None
+    ) -> Tuple[int, int]:
+        """
+        Find the positions of the trades with start_time <= timestamp < end_time.
+
+        Returns:
+        Tuple[int, int]: The [lo, hi) row positions of the matching trades.
+        """
+        if start_time is None and end_time is None:
+            return 0, self._size
+        int64 = np.iinfo(np.int64)
+        start = int64.min if start_time is None else to_datetime64(start_time).astype(np.int64)
+        end = int64.max if end_time is None else to_datetime64(end_time).astype(np.int64)
+        stored = self._columns[TIMESTAMP][: self._size].view(np.int64)
+        lo, hi = window_bounds(stored, np.int64(start), np.int64(end))
+        return int(lo), int(max(lo, hi))
+
+    def locate(self, trade_id: int, timestamp: np.datetime64) -> Optional[int]:
+        """
+        Find the position of a trade from its id and timestamp, searching only the
+        trades sharing its timestamp.
+
+        Returns:
+        int: The row position of the trade, None if it is not stored.
+        """
+        stored = self._columns[TIMESTAMP][: self._size]
+        lo = int(np.searchsorted(stored, timestamp, side="left"))
+        hi = int(np.searchsorted(stored, timestamp, side="right"))
+        matches = np.flatnonzero(self._columns[TRADE_ID][lo:hi] == trade_id)
+        return lo + int(matches[0]) if len(matches) else None
+
+    def remove(self, position: int) -> Dict[str, np.ndarray]:
+        """
+        Remove the trade at a row position, moving only the rows after it.
+
+        Returns:
+        dict: The removed trade, as column arrays of one row with COLUMN_DTYPES.
+        """
+        removed = {name: column.copy() for name, column in self.columns(position, position + 1).items()}
+        for column in self._columns.values():
+            column[position : self._size - 1] = column[position + 1 : self._size]
+        self._size -= 1
+        return removed
+
+    def columns(self, lo: int = 0, hi: Optional[int] = None, symbol_ids: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Get the rows [lo, hi) of every column, with COLUMN_DTYPES, or with the int32 ids
+        of the symbols if symbol_ids is set. The arrays returned are read-only views into
+        the store and are only valid until the next write. The symbols, and the columns
+        encoded in compact or tick mode, are decoded copies.
+        """
+        hi = self._size if hi is None else hi
+        columns = self._decode({name: column[lo:hi] for name, column in self._columns.items()}, symbol_ids)
+        for column in columns.values():
+            column.flags.writeable = False
+        return columns
+
+    def read(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        stock_symbols: Optional[Iterable[str]] = None,
+        symbol_ids: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get the trades with start_time <= timestamp < end_time, of the given stock symbols
+        if any, see columns. The stocks are selected by comparing symbol ids, before any
+        column is decoded.
+        """
+        lo, hi = self.search(start_time, end_time)
+        if stock_symbols is None:
+            return self.columns(lo, hi, symbol_ids)
+        wanted = [self.symbols.id_of(symbol) for symbol in stock_symbols]
+        wanted = [symbol_id for symbol_id in wanted if symbol_id is not None]
+        selected = np.isin(self._columns[STOCK_SYMBOL][lo:hi], wanted)
+        columns = self._decode({name: column[lo:hi][selected] for name, column in self._columns.items()}, symbol_ids)
+        for column in columns.values():
+            column.flags.writeable = False
+        return columns
+
+    def count(self, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> int:
+        """
+        Count the trades with start_time <= timestamp < end_time.
+        """
+        lo, hi = self.search(start_time, end_time)
+        return hi - lo
+
+    def head(self, count: int) -> Dict[str, np.ndarray]:
+        """
+        Get the `count` oldest trades, as read-only views into the store.
+        """
+        return self.columns(0, count)
+
+    def find(self, trade_id: int, timestamp: np.datetime64) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Find a trade from its id and timestamp.
+
+        Returns:
+        dict: A copy of the trade, as column arrays of one row. None if it is not stored.
+        """
+        position = self.locate(trade_id, timestamp)
+        if position is None:
+            return None
+        return {name: column.copy() for name, column in self.columns(position, position + 1).items()}
+
+    def _position(self, trade_id: int, timestamp: np.datetime64) -> int:
+        position = self.locate(trade_id, timestamp)
+        if position is None:
+            raise ValueError(f"Trade id {trade_id} timestamped {timestamp} is not stored")
+        return position
+
+    def remove_trade(self, trade_id: int, timestamp: np.datetime64) -> Dict[str, np.ndarray]:
+        """
+        Remove a trade from its id and timestamp, see remove.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+        return self.remove(self._position(trade_id, timestamp))
+
+    def replace_trade(self, trade_id: int, timestamp: np.datetime64, record: Dict) -> Dict[str, np.ndarray]:
+        """
+        Overwrite a trade, from its id and timestamp, with a record of the same timestamp.
+
+        Returns:
+        dict: A copy of the stored trade, as column arrays of one row.
+
+        Raises:
+        ValueError: If the trade is not stored.
+        """
+        position = self._position(trade_id, timestamp)
+        self.replace(position, record)
+        return {name: column.copy() for name, column in self.columns(position, position + 1).items()}
+
+    def drop_head(self, count: int) -> None:
+        """
+        Remove the `count` oldest trades, e.g. once frozen into cold storage.
+        """
+        for column in self._columns.values():
+            column[: self._size - count] = column[count : self._size]
+        self._size -= count
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Get the memory held by the store, in bytes by component - the allocated buffer
+        of each column, including the distinct Python objects referenced by object columns,
+        and the symbol registry, which the store may share with the venue's StockInfo.
+        """
+        usage = {}
+        for name, column in self._columns.items():
+            usage[name] = column.nbytes
+            if column.dtype == object:
+                usage[name] += object_bytes(column[: self._size])
+        usage["symbol_dictionary"] = self.symbols.memory_usage()
+        return usage
+
+    def clear(self) -> None:
+        """
+        Remove all the trades from the store.
+        """
+        self._size = 0
@@ -0,0 +1,175 @@
+"""
+Command line entry point of the Beverage Stock Market.
+
+    python market_cli.py load trades.csv [--stocks stocks.csv] [--chunk-size 100000]
+    python market_cli.py generate trades.csv --trades 1000000 [--seed 0]
+    python market_cli.py --profile profiles load trades.csv
+
+Streams a CSV or NDJSON trade file into the Market and prints the stats shown by
+the sample simulation - dividend yield, P/E ratio, Volume Weighted Stock Price and
+All Share Index - as of the latest trade of the file. Synthetic trade files are
+generated for replays and benchmarks. With --profile, each phase of the command is
+profiled and its reports are written to the given directory (see utils.profiling).
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import logging
+import sys
+
+from calculators.stock_stats import DividendYieldCalculator, PERatioCalculator
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import DEFAULT_VENUE, STOCK_SYMBOL
+from exchange.loader import DEFAULT_CHUNK_SIZE, FILE_FORMATS, load_stocks, load_trades, write_trades
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.synthetic import SyntheticSession
+from utils.profiling import DEFAULT_SAMPLE_INTERVAL, Profiler
+
+
+def print_stats(
+    venue: str, as_of: datetime, stock_symbol: str = None, price: float = None, profiler: Profiler = None
+) -> None:
+    """
+    Print the dividend yield, P/E ratio, VWSP and All Share Index of a venue.
+    Dividend yield and P/E ratio are given for the stock and price given, otherwise for
+    every traded stock at its volume weighted stock price. Each calculation is a phase
+    of the profiler, if given.
+    """
+    profiler = profiler or Profiler()
+    with profiler.phase("vwsp"):
+        all_vwsp = VolumeWeightedStockPriceCalculator(venue=venue, now=as_of).calculate()
+    print(f"Stats as of {as_of}")
+    if all_vwsp is None:
+        print("No trades in the 5 minutes before it")
+        return
+
+    stock_prices = (
+        [(stock_symbol, price)]
+        if stock_symbol
+        else list(zip(all_vwsp[STOCK_SYMBOL], all_vwsp["volume_weighted_stock_price"]))
+    )
+    with profiler.phase("stock_stats"):
+        stock_stats = [
+            (
+                symbol,
+                stock_price,
+                DividendYieldCalculator(stock_symbol=symbol, price=stock_price, venue=venue).calculate(),
+                PERatioCalculator(stock_symbol=symbol, price=stock_price, venue=venue).calculate(),
+            )
+            for symbol, stock_price in stock_prices
+        ]
+    for symbol, stock_price, dividend_yield, pe_ratio in stock_stats:
+        print(f"{symbol} at {stock_price}: dividend yield {dividend_yield}, P/E ratio {pe_ratio}")
+
+    print("Volume Weighted Stock Price:")
+    print(all_vwsp.to_string(index=False))
+    with profiler.phase("all_share_index"):
+        all_share_index = AllShareIndexCalculator(all_vwsp).calculate()
+    print(f"All Share Index: {all_share_index}")
+
+
+def run_load(args: argparse.Namespace) -> int:
+    venue = args.venue
+    profiler = args.profiler
+    with profiler.phase("stocks"):
+        if args.stocks:
+            load_stocks(args.stocks, venue=venue)
+        else:
+            StockInfo(venue).add_stocks(sample_stocks())
+        Market(venue).configure_storage(compact=args.compact, tick_size=args.tick_size, database=args.database)
+
+    with profiler.phase("ingest"):
+        trade_count = load_trades(args.trades, venue=venue, chunk_size=args.chunk_size, file_format=args.format)
+    print(f"Loaded {trade_count} trades from {args.trades}")
+    if args.memory:
+        for component, size in Market(venue).memory_usage().items():
+            print(f"Market memory, {component}: {size / 2**20:.2f} MiB")
+    as_of = args.as_of or Market(venue).latest_timestamp
+    if as_of is None:
+        return 0
+    print_stats(venue, as_of, stock_symbol=args.stock_symbol, price=args.price, profiler=profiler)
+    return 0
+
+
+def run_generate(args: argparse.Namespace) -> int:
+    venue = args.venue
+    if args.stocks:
+        load_stocks(args.stocks, venue=venue)
+    else:
+        StockInfo(venue).add_stocks(sample_stocks())
+    session = SyntheticSession(
+        venue=venue,
+        start_time=args.start,
+        seed=args.seed,
+        trades_per_second=args.rate,
+        out_of_order_fraction=args.out_of_order,
+        max_delay=timedelta(seconds=args.max_delay),
+    )
+    with args.profiler.phase("generate"):
+        written = write_trades(args.trades, session.batches(args.count, args.chunk_size), file_format=args.format)
+    print(f"Generated {written} trades into {args.trades}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Beverage Stock Market command line")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level")
+    parser.add_argument("--profile", metavar="DIR", help="Profile each phase and write the reports to this directory")
+    parser.add_argument(
+        "--profile-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL, help="Seconds between two stack samples"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load = subparsers.add_parser("load", help="Load a trade file and print its stats")
+    load.add_argument("trades", help="CSV or NDJSON trade file")
+    load.add_argument("--stocks", help="CSV file of stocks. Defaults to the sample beverage stocks")
+    load.add_argument("--format", choices=FILE_FORMATS, help="Format of the trade file, detected from its extension by default")
+    load.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Number of trades parsed at a time")
+    load.add_argument("--venue", default=DEFAULT_VENUE, help="Venue to load the trades into")
+    load.add_argument("--as-of", type=datetime.fromisoformat, help="End of the stats window. Defaults to the latest trade")
+    load.add_argument("--stock-symbol", help="Stock to calculate the dividend yield and P/E ratio of")
+    load.add_argument("--price", type=float, help="Price to calculate the dividend yield and P/E ratio at")
+    load.add_argument("--compact", action="store_true", help="Store the trades in the compact encoding")
+    load.add_argument("--tick-size", help="Store prices as integer ticks of this size, e.g. 0.01")
+    load.add_argument("--memory", action="store_true", help="Print the memory held by the market")
+    load.add_argument("--database", help="SQLite database file to store the trades in, instead of memory")
+    load.set_defaults(handler=run_load)
+
+    generate = subparsers.add_parser("generate", help="Generate a synthetic trade file")
+    generate.add_argument("trades", help="CSV or NDJSON trade file to write")
+    generate.add_argument("--trades", dest="count", type=int, default=1000000, help="Number of trades to generate")
+    generate.add_argument("--stocks", help="CSV file of the stocks traded. Defaults to the sample beverage stocks")
+    generate.add_argument("--format", choices=FILE_FORMATS, help="Format of the trade file, detected from its extension by default")
+    generate.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Number of trades generated at a time")
+    generate.add_argument("--venue", default=DEFAULT_VENUE, help="Venue the stocks are loaded into")
+    generate.add_argument("--seed", type=int, default=0, help="Seed of the generator")
+    generate.add_argument("--start", type=datetime.fromisoformat, help="Start of the session. Defaults to midnight of today")
+    generate.add_argument("--rate", type=float, default=1000.0, help="Average number of trades per second")
+    generate.add_argument("--out-of-order", type=float, default=0.0, help="Fraction of trades arriving late")
+    generate.add_argument("--max-delay", type=float, default=1.0, help="Maximum lateness of the late trades, in seconds")
+    generate.set_defaults(handler=run_generate)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "load" and bool(args.stock_symbol) != (args.price is not None):
+        parser.error("--stock-symbol and --price must be given together")
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d: %(message)s')
+    try:
+        args.profiler = Profiler(args.profile, sample_interval=args.profile_interval)
+        exit_code = args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.profiler.enabled:
+        print(args.profiler.summary(), file=sys.stderr)
+        print(f"Profile reports written to {args.profiler.write_summary()}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,30 @@
+import argparse
 from datetime import datetime, timedelta
+import logging
+import sys
 from calculators.stock_stats import DividendYieldCalculator, PERatioCalculator
 from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
-from common.constants import StockType, TradeType
+from common.constants import TradeType
 from exchange.market import Market
-from exchange.stock import Stock, StockInfo
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
 from exchange.trade import Trade
+from utils.profiling import Profiler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d: %(message)s')
+
+# Profiling mode, e.g. python sample_simulation.py --profile profiles
+parser = argparse.ArgumentParser(description="Sample simulation of the Beverage Stock Market")
+parser.add_argument("--profile", metavar="DIR", help="Profile each phase and write the reports to this directory")
+profiler = Profiler(parser.parse_args().profile)
 
 # Creating some stocks
 # OOPS - objct
-stocks_data = [
-    Stock(stock_symbol="TEA", type=StockType.COMMON, last_dividend=0, fixed_dividend_pct=None, par_value=100),
-    Stock(stock_symbol="POP", type=StockType.COMMON, last_dividend=8, fixed_dividend_pct=None, par_value=100),
-    Stock(stock_symbol="ALE", type=StockType.COMMON, last_dividend=23, fixed_dividend_pct=None, par_value=60),
-    Stock(stock_symbol="GIN", type=StockType.PREFERRED, last_dividend=8, fixed_dividend_pct=0.02, par_value=100),
-    Stock(stock_symbol="JOE", type=StockType.COMMON, last_dividend=13, fixed_dividend_pct=None, par_value=250)
-]
+stocks_data = sample_stocks()
 
 stock_info = StockInfo()
-stock_info.add_stocks(stocks_data)
+with profiler.phase("stocks"):
+    stock_info.add_stocks(stocks_data)
 
 res = stock_info.get_all_stocks()
 print(res.to_dict(), type(res))
@@ -53,32 +60,41 @@ trade_entries = [
 #create separate file
 market = Market()
 market._flush_trades()
-for trade in trade_entries:
-    market.add_trade(trade) #Add documentation for trades
+with profiler.phase("ingest"):
+    for trade in trade_entries:
+        market.add_trade(trade) #Add documentation for trades
 
 # print('\n\n 222222 \n\n')
 ###############################################################################
 
 # Calculating different stats
 
-dividend_calc = DividendYieldCalculator(stock_symbol='GIN', price=4)
-dividend_calc.calculate()
+with profiler.phase("dividend_yield"):
+    dividend_calc = DividendYieldCalculator(stock_symbol='GIN', price=4)
+    dividend_calc.calculate()
 
 # print('\n\n 333333 \n\n')
 
-pe_ratio_calc = PERatioCalculator(stock_symbol='GIN', price=4)
-pe_ratio_calc.calculate()
+with profiler.phase("pe_ratio"):
+    pe_ratio_calc = PERatioCalculator(stock_symbol='GIN', price=4)
+    pe_ratio_calc.calculate()
 
 # print('\n\n 444444 \n\n')
 
-vwsp_calc = VolumeWeightedStockPriceCalculator(stock_symbol='ALE')
-vwsp_calc.calculate()
+with profiler.phase("vwsp"):
+    vwsp_calc = VolumeWeightedStockPriceCalculator(stock_symbol='ALE')
+    vwsp_calc.calculate()
 
 # print('\n\n 555555 \n\n')
 
-all_share_vwsp_calc = VolumeWeightedStockPriceCalculator()
-all_share_vwsp = all_share_vwsp_calc.calculate()
-all_share_index_calc = AllShareIndexCalculator(all_share_vwsp)
-all_share_index_calc.calculate()
+with profiler.phase("all_share_index"):
+    all_share_vwsp_calc = VolumeWeightedStockPriceCalculator()
+    all_share_vwsp = all_share_vwsp_calc.calculate()
+    all_share_index_calc = AllShareIndexCalculator(all_share_vwsp)
+    all_share_index_calc.calculate()
+
+# print('\n\n 666666 \n\n')
 
-# print('\n\n 666666 \n\n')
\ No newline at end of file
+if profiler.enabled:
+    print(profiler.summary(), file=sys.stderr)
+    print(f"Profile reports written to {profiler.write_summary()}", file=sys.stderr)
@@ -0,0 +1,90 @@
+"""
+Holds the client library of the stats server (see service.server)
+"""
+
+import socket
+import threading
+from typing import Any, Dict, List
+
+from exchange.stock import Stock
+from exchange.trade import Trade
+from service import protocol
+from service.server import DEFAULT_SOCKET_PATH
+
+
+class StatsClient:
+    """
+    Client of the stats server. A client holds one connection and can be shared by
+    threads, requests are sent one at a time.
+
+    Example:
+        with StatsClient("/tmp/beverage-stock-market.sock") as client:
+            client.add_trades(trades)
+            vwsp = client.vwsp(stock_symbol="TEA")
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self) -> "StatsClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def request(self, operation: str, **fields: Any) -> Any:
+        """
+        Send a request and return its result.
+
+        Raises:
+        ValueError: If the server failed to handle the request.
+        ConnectionError: If the server closed the connection.
+        """
+        with self._lock:
+            protocol.send_message(self._socket, {"op": operation, **fields})
+            response = protocol.recv_message(self._socket)
+        if response is None:
+            raise ConnectionError("Connection closed by the stats server")
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def ping(self) -> str:
+        return self.request(protocol.PING)
+
+    def add_stocks(self, stocks: List[Stock]) -> int:
+        return self.request(protocol.ADD_STOCKS, stocks=[protocol.stock_to_dict(stock) for stock in stocks])
+
+    def add_trades(self, trades: List[Trade]) -> Dict[str, int]:
+        """
+        Send a batch of trades. Returns the number of accepted and rejected trades.
+        """
+        return self.request(protocol.ADD_TRADES, trades=[protocol.trade_to_dict(trade) for trade in trades])
+
+    def vwsp(self, stock_symbol: str = None) -> Any:
+        """
+        Get the volume weighted stock price of a stock, or a list of
+        {"stock_symbol", "volume_weighted_stock_price"} records of all stocks.
+        """
+        params = {"stock_symbol": stock_symbol} if stock_symbol else {}
+        return self.request(protocol.VWSP, params=params)
+
+    def all_share_index(self) -> float:
+        return self.request(protocol.ALL_SHARE_INDEX, params={})
+
+    def dividend_yield(self, stock_symbol: str, price: float) -> Any:
+        return self.request(protocol.DIVIDEND_YIELD, params={"stock_symbol": stock_symbol, "price": price})
+
+    def pe_ratio(self, stock_symbol: str, price: float) -> Any:
+        return self.request(protocol.PE_RATIO, params={"stock_symbol": stock_symbol, "price": price})
+
+    def server_stats(self) -> Dict[str, int]:
+        """
+        Get the number of query requests and actual computations served, and of trades held.
+        """
+        return self.request(protocol.SERVER_STATS)
@@ -0,0 +1,133 @@
+"""
+Load test of the stats server - concurrent client processes issue stats queries
+for a fixed duration, then the throughput, latency percentiles and the share of
+queries batched into a shared computation are reported.
+
+Run it against a running server, or let it start one:
+    python -m service.load_test --clients 16 --duration 10
+    python -m service.load_test --socket /tmp/beverage-stock-market.sock
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from common.constants import StockType
+from exchange.stock import Stock, StockInfo
+from exchange.synthetic import SyntheticSession, to_trades
+from service.client import StatsClient
+
+
+STOCK_SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+QUERY_MIX = ("vwsp_all", "vwsp_one", "all_share_index", "dividend_yield")
+
+
+def _seed(client: StatsClient, trade_count: int) -> None:
+    stocks = [
+        Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=8, fixed_dividend_pct=None, par_value=100)
+        for symbol in STOCK_SYMBOLS
+    ]
+    client.add_stocks(stocks)
+    # The trades are validated locally before being sent
+    StockInfo().add_stocks(stocks)
+    session = SyntheticSession(
+        stock_symbols=STOCK_SYMBOLS, start_time=datetime.now() - timedelta(seconds=240), seed=42,
+        trades_per_second=trade_count / 240,
+    )
+    trades = to_trades(session.batch(trade_count))
+    for start in range(0, len(trades), 10000):
+        client.add_trades(trades[start : start + 10000])
+
+
+def _run_client(socket_path: str, duration: float, seed: int) -> List[float]:
+    rng = random.Random(seed)
+    latencies = []
+    with StatsClient(socket_path) as client:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            query = rng.choice(QUERY_MIX)
+            start = time.perf_counter()
+            if query == "vwsp_all":
+                client.vwsp()
+            elif query == "vwsp_one":
+                client.vwsp(stock_symbol=rng.choice(STOCK_SYMBOLS))
+            elif query == "all_share_index":
+                client.all_share_index()
+            else:
+                client.dividend_yield(rng.choice(STOCK_SYMBOLS), price=100.0)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _wait_for_socket(socket_path: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(socket_path):
+            try:
+                with StatsClient(socket_path) as client:
+                    client.ping()
+                return
+            except OSError:
+                pass
+        time.sleep(0.05)
+    raise TimeoutError(f"Stats server did not start listening on {socket_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the Beverage Stock Market stats server")
+    parser.add_argument("--socket", help="Socket of a running server. A server is started when omitted")
+    parser.add_argument("--clients", type=int, default=8, help="Number of concurrent client processes")
+    parser.add_argument("--duration", type=float, default=5.0, help="Duration of the test, in seconds")
+    parser.add_argument("--trades", type=int, default=50000, help="Number of trades seeded before the test")
+    args = parser.parse_args()
+
+    server = None
+    socket_path = args.socket
+    if socket_path is None:
+        socket_path = os.path.join(tempfile.mkdtemp(), "stats.sock")
+        server = subprocess.Popen([sys.executable, "-m", "service.server", "--socket", socket_path])
+    try:
+        _wait_for_socket(socket_path)
+        with StatsClient(socket_path) as client:
+            if args.trades:
+                _seed(client, args.trades)
+            stats_before = client.server_stats()
+
+        with ProcessPoolExecutor(max_workers=args.clients) as executor:
+            futures = [
+                executor.submit(_run_client, socket_path, args.duration, seed)
+                for seed in range(args.clients)
+            ]
+            latencies = sorted(latency for future in futures for latency in future.result())
+
+        with StatsClient(socket_path) as client:
+            stats_after = client.server_stats()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    requests = stats_after["requests"] - stats_before["requests"]
+    computations = stats_after["computations"] - stats_before["computations"]
+    print(f"Clients: {args.clients}, duration: {args.duration}s, trades held: {stats_after['trades']}")
+    print(f"Queries: {len(latencies)}, throughput: {len(latencies) / args.duration:.1f} queries/s")
+    for percentile in (50, 90, 99, 99.9):
+        print(f"p{percentile}: {_percentile(latencies, percentile) * 1000:.2f} ms")
+    if requests:
+        print(f"Computations: {computations} for {requests} queries ({1 - computations / requests:.1%} batched)")
+
+
+if __name__ == "__main__":
+    main()
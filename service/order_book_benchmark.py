@@ -0,0 +1,128 @@
+"""
+Benchmark of the matching engine - a synthetic order flow of limit orders around a
+moving mid price, market orders and cancels of resting orders is replayed through
+the order books of a venue, and the order event and trade rates are reported.
+
+    python -m service.order_book_benchmark --events 1000000 --seed 7
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+from common.constants import PAR_VALUE, PRICE, TradeType
+from exchange.market import Market
+from exchange.order_book import MatchingEngine
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+
+
+LIMIT = 0
+MARKET = 1
+CANCEL = 2
+
+_SIDES = (TradeType.BUY, TradeType.SELL)
+
+
+def order_flow(
+    count: int,
+    stock_count: int,
+    seed: int = 0,
+    market_fraction: float = 0.05,
+    cancel_fraction: float = 0.3,
+    spread_ticks: int = 20,
+) -> Dict[str, np.ndarray]:
+    """
+    Generate a seeded synthetic order flow, as columns of order events.
+
+    Limit orders are priced up to `spread_ticks` ticks either side of a mid price
+    random walk per stock, so about half of them cross the book. Cancels pick a
+    resting order at random, through a uniform draw in [0, 1) of the "target" column.
+
+    Returns:
+    dict: The kind (LIMIT, MARKET or CANCEL), stock index, side index (0 buys), quantity,
+    price offset in ticks from the stock's mid price and cancel target of each event.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(
+        [LIMIT, MARKET, CANCEL], size=count, p=[1 - market_fraction - cancel_fraction, market_fraction, cancel_fraction]
+    ).astype(np.int8)
+    stocks = rng.integers(0, stock_count, size=count)
+    steps = rng.integers(-1, 2, size=count)
+    mid_offsets = np.zeros(count, dtype=np.int64)
+    for stock in range(stock_count):
+        rows = np.flatnonzero(stocks == stock)
+        mid_offsets[rows] = np.cumsum(steps[rows])
+    return {
+        "kind": kinds,
+        "stock": stocks,
+        "side": rng.integers(0, 2, size=count).astype(np.int8),
+        "quantity": np.maximum(1, rng.lognormal(np.log(100), 0.8, size=count)).astype(np.int64),
+        "offset": mid_offsets + rng.integers(-spread_ticks, spread_ticks + 1, size=count),
+        "target": rng.random(count),
+    }
+
+
+def replay(engine: MatchingEngine, flow: Dict[str, np.ndarray], mid_prices: Sequence[int]) -> None:
+    """
+    Submit an order flow to the engine, in its order, and flush the trades to the Market.
+
+    Parameters:
+    engine: The matching engine.
+    flow: The order events, see order_flow.
+    mid_prices: The start mid price of each stock, in ticks.
+    """
+    symbols = sorted(StockInfo(engine.venue).snapshot())
+    tick = float(engine.tick_size)
+    resting = []
+    submit_limit, submit_market, cancel = engine.submit_limit, engine.submit_market, engine.cancel
+    for kind, stock, side, quantity, offset, target in zip(
+        flow["kind"].tolist(), flow["stock"].tolist(), flow["side"].tolist(), flow["quantity"].tolist(),
+        flow["offset"].tolist(), flow["target"].tolist(),
+    ):
+        if kind == LIMIT:
+            ticks = max(1, mid_prices[stock] + offset)
+            order_id = submit_limit(symbols[stock], _SIDES[side], quantity, ticks * tick)
+            if order_id is not None:
+                resting.append(order_id)
+        elif kind == MARKET:
+            submit_market(symbols[stock], _SIDES[side], quantity)
+        elif resting:
+            # Swap-remove a random resting order, possibly filled since
+            position = int(target * len(resting))
+            resting[position], resting[-1] = resting[-1], resting[position]
+            cancel(resting.pop())
+    engine.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the matching engine of the order books")
+    parser.add_argument("--events", type=int, default=1000000, help="Number of order events")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the order flow")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Number of trades added to the Market at a time")
+    parser.add_argument("--venue", default="order-book-benchmark", help="Venue whose stocks are traded")
+    args = parser.parse_args(argv)
+
+    stock_info = StockInfo(args.venue)
+    if not len(stock_info.snapshot()):
+        stock_info.add_stocks(sample_stocks())
+    stocks = stock_info.snapshot()
+    engine = MatchingEngine(venue=args.venue, batch_size=args.batch_size)
+    mid_prices = [engine.to_ticks(stocks[symbol][PAR_VALUE] or 100.0) for symbol in sorted(stocks)]
+    flow = order_flow(args.events, len(stocks), seed=args.seed)
+
+    start = time.perf_counter()
+    replay(engine, flow, mid_prices)
+    elapsed = time.perf_counter() - start
+
+    trades = len(Market(args.venue).get_trade_columns()[PRICE])
+    print(f"Order events: {engine.events} in {elapsed:.2f}s, {engine.events / elapsed:,.0f} events/s")
+    print(f"Trades: {trades} recorded in the market, {trades / elapsed:,.0f} trades/s")
+    print(f"Resting orders: {engine.resting_orders()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Holds the wire protocol of the stats server - length prefixed JSON messages over
+a Unix domain socket, and the (de)serialization of stocks and trades.
+"""
+
+from datetime import datetime
+import json
+import socket
+import struct
+from typing import Any, Dict, Optional
+
+from common.constants import (
+    FIXED_DIVIDEND_PCT, LAST_DIVIDEND, PAR_VALUE, PRICE, QUANTITY, STOCK_SYMBOL,
+    STOCK_TYPE, TIMESTAMP, TRADE_TYPE, StockType, TradeType,
+)
+from exchange.stock import Stock
+from exchange.trade import Trade
+
+
+_HEADER = struct.Struct("!I")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+# Operations understood by the server
+PING = "ping"
+ADD_STOCKS = "add_stocks"
+ADD_TRADES = "add_trades"
+DIVIDEND_YIELD = "dividend_yield"
+PE_RATIO = "pe_ratio"
+VWSP = "vwsp"
+ALL_SHARE_INDEX = "all_share_index"
+SERVER_STATS = "server_stats"
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """
+    Send a JSON message, prefixed with its length.
+    """
+    payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """
+    Receive a JSON message sent with send_message.
+
+    Returns:
+    dict: The message, or None if the connection was closed.
+
+    Raises:
+    ValueError: If the message is larger than MAX_MESSAGE_SIZE.
+    """
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {size} bytes exceeds the limit of {MAX_MESSAGE_SIZE} bytes")
+    payload = _recv_exactly(sock, size)
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+def stock_to_dict(stock: Stock) -> Dict[str, Any]:
+    return dict(stock.__dict__)
+
+
+def stock_from_dict(data: Dict[str, Any]) -> Stock:
+    return Stock(
+        stock_symbol=data[STOCK_SYMBOL],
+        type=StockType(data[STOCK_TYPE]),
+        last_dividend=data[LAST_DIVIDEND],
+        fixed_dividend_pct=data[FIXED_DIVIDEND_PCT],
+        par_value=data[PAR_VALUE],
+    )
+
+
+def trade_to_dict(trade: Trade) -> Dict[str, Any]:
+    return {
+        STOCK_SYMBOL: trade.stock_symbol,
+        TIMESTAMP: trade.timestamp.isoformat(),
+        QUANTITY: trade.quantity,
+        TRADE_TYPE: trade.trade_type,
+        PRICE: trade.price,
+    }
+
+
+def trade_from_dict(data: Dict[str, Any], venue: str) -> Trade:
+    return Trade(
+        stock_symbol=data[STOCK_SYMBOL],
+        timestamp=datetime.fromisoformat(data[TIMESTAMP]),
+        quantity=data[QUANTITY],
+        trade_type=TradeType(data[TRADE_TYPE]),
+        price=data[PRICE],
+        venue=venue,
+    )
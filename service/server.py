@@ -0,0 +1,171 @@
+"""
+Holds a long-running stats server owning a venue's Market and StockInfo. Local
+processes send trade batches and stats queries over a Unix domain socket instead
+of each holding (and warming up) their own trade store.
+
+Run it with:
+    python -m service.server --socket /tmp/beverage-stock-market.sock
+"""
+
+import argparse
+import logging
+import os
+import socketserver
+import threading
+from typing import Any, Dict
+
+import pandas as pd
+from calculators.stock_stats import DividendYieldCalculator, PERatioCalculator
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import DEFAULT_VENUE
+from exchange.loader import validate_trades
+from exchange.market import Market
+from exchange.stock import StockInfo
+from service import protocol
+from utils.singleflight import SingleFlight
+
+
+DEFAULT_SOCKET_PATH = "/tmp/beverage-stock-market.sock"
+
+
+class StatsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Stats server over a Unix domain socket, one thread per connection.
+
+    Writes and computations on the Market are serialized. Concurrent identical
+    queries are batched into a single computation, all callers receiving its result.
+
+    Parameters:
+    socket_path: The path of the Unix domain socket to listen on.
+    venue: The venue whose Market and StockInfo the server owns (optional).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, venue: str = DEFAULT_VENUE) -> None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.venue = venue
+        self.market = Market(venue)
+        self.stock_info = StockInfo(venue)
+        self._lock = threading.Lock()
+        self._revision = 0
+        self._queries = SingleFlight()
+        super().__init__(socket_path, _StatsRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def handle_request_message(self, request: Dict[str, Any]) -> Any:
+        """
+        Handle a single request message and return its result.
+        """
+        operation = request.get("op")
+        if operation == protocol.PING:
+            return "pong"
+        if operation == protocol.ADD_STOCKS:
+            stocks = [protocol.stock_from_dict(stock) for stock in request["stocks"]]
+            with self._lock:
+                self.stock_info.add_stocks(stocks)
+                self._revision += 1
+            return len(stocks)
+        if operation == protocol.ADD_TRADES:
+            if not request["trades"]:
+                return {"accepted": 0, "rejected": 0}
+            # Validated and added as columns in one batch, instead of a Trade per row
+            trade_columns = validate_trades(pd.DataFrame(request["trades"]), self.stock_info)
+            with self._lock:
+                accepted = self.market.add_trades(trade_columns)
+                self._revision += 1
+            return {"accepted": accepted, "rejected": len(request["trades"]) - accepted}
+        if operation == protocol.SERVER_STATS:
+            with self._lock:
+                trade_count = self.market.trade_count
+            return {
+                "requests": self._queries.requests,
+                "computations": self._queries.computations,
+                "trades": trade_count,
+            }
+
+        query = _QUERIES.get(operation)
+        if query is None:
+            raise ValueError(f"Unknown operation '{operation}'")
+        params = request.get("params", {})
+        # Identical queries against the same state of the market share one computation
+        key = (operation, tuple(sorted(params.items())), self._revision)
+        return self._queries.do(key, lambda: self._run_query(query, params))
+
+    def _run_query(self, query, params: Dict[str, Any]) -> Any:
+        with self._lock:
+            return query(self.venue, **params)
+
+
+def _vwsp(venue: str, stock_symbol: str = None) -> Any:
+    result = VolumeWeightedStockPriceCalculator(stock_symbol=stock_symbol, venue=venue).calculate()
+    if result is None or stock_symbol:
+        return None if result is None else float(result)
+    return result.to_dict(orient="records")
+
+
+def _all_share_index(venue: str) -> float:
+    vwsp = VolumeWeightedStockPriceCalculator(venue=venue).calculate()
+    if vwsp is None:
+        return 0.0
+    return float(AllShareIndexCalculator(vwsp).calculate())
+
+
+def _dividend_yield(venue: str, stock_symbol: str, price: float) -> Any:
+    return DividendYieldCalculator(stock_symbol=stock_symbol, price=price, venue=venue).calculate()
+
+
+def _pe_ratio(venue: str, stock_symbol: str, price: float) -> Any:
+    return PERatioCalculator(stock_symbol=stock_symbol, price=price, venue=venue).calculate()
+
+
+_QUERIES = {
+    protocol.VWSP: _vwsp,
+    protocol.ALL_SHARE_INDEX: _all_share_index,
+    protocol.DIVIDEND_YIELD: _dividend_yield,
+    protocol.PE_RATIO: _pe_ratio,
+}
+
+
+class _StatsRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serves the requests of one client connection until it disconnects.
+    """
+
+    def handle(self) -> None:
+        while True:
+            request = protocol.recv_message(self.request)
+            if request is None:
+                return
+            try:
+                response = {"ok": True, "result": self.server.handle_request_message(request)}
+            except Exception as e:
+                logging.error(f"Request {request.get('op')} failed: {e}")
+                response = {"ok": False, "error": str(e)}
+            protocol.send_message(self.request, response)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve Beverage Stock Market stats over a Unix domain socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the Unix domain socket")
+    parser.add_argument("--venue", default=DEFAULT_VENUE, help="Venue of the Market served")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d: %(message)s')
+    with StatsServer(args.socket, venue=args.venue) as server:
+        print(f"Serving stats of venue '{args.venue}' on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Soak test of a Market under mixed load - a feed ingests synthetic trades at a target
+rate while concurrent workers issue VWSP, All Share Index and stock stat queries, for
+as long as a production session if need be. The latency distribution of the queries,
+the achieved ingest and query throughput, the memory growth and the dropped, out of
+order and behind-schedule trades are written to a JSON report, to compare versions.
+
+    python -m service.soak_test --rate 20000 --workers 8 --duration 300 --report soak.json
+    python -m service.soak_test --duration 60 --report new.json --baseline soak.json
+
+Writes and queries are serialized on one lock, like in the stats server, so query
+latencies include the time spent waiting for the feed.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from calculators.stock_stats import DividendYieldCalculator, PERatioCalculator
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import TIMESTAMP
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.synthetic import SyntheticSession
+from utils.jit import get_backend
+
+
+REPORT_VERSION = 1
+
+VWSP_ALL = "vwsp_all"
+VWSP_ONE = "vwsp_one"
+ALL_SHARE_INDEX = "all_share_index"
+DIVIDEND_YIELD = "dividend_yield"
+PE_RATIO = "pe_ratio"
+QUERY_MIX = (VWSP_ALL, VWSP_ONE, ALL_SHARE_INDEX, DIVIDEND_YIELD, PE_RATIO)
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Metrics compared against a baseline report, and whether higher values are better
+COMPARED_METRICS = {
+    ("ingest", "achieved_rate"): True,
+    ("queries", "throughput"): True,
+    ("queries", "latency_ms", "p50"): False,
+    ("queries", "latency_ms", "p99"): False,
+    ("queries", "latency_ms", "p99.9"): False,
+    ("memory", "rss_growth_bytes"): False,
+}
+# Relative change in the bad direction a metric may show before it counts as regressed, run-to-run noise
+DEFAULT_TOLERANCE = 0.1
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Get the resident memory of this process, None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def latency_stats(latencies: List[float], duration: float) -> Dict:
+    """
+    Summarize query latencies, in seconds, into their count, throughput and percentiles in ms.
+    """
+    if not latencies:
+        return {"count": 0, "throughput": 0.0, "latency_ms": {}}
+    milliseconds = np.asarray(latencies) * 1000
+    latency_ms = {f"p{percentile:g}": float(np.percentile(milliseconds, percentile)) for percentile in PERCENTILES}
+    latency_ms.update(mean=float(milliseconds.mean()), max=float(milliseconds.max()))
+    return {"count": len(latencies), "throughput": len(latencies) / duration, "latency_ms": latency_ms}
+
+
+class SoakTest:
+    """
+    Drives the ingestion and queries of a venue's Market for a fixed duration.
+
+    Parameters:
+    venue: The venue whose Market is loaded. Its StockInfo gets the sample stocks if empty.
+    rate: The target number of trades ingested per second.
+    workers: The number of concurrent query threads.
+    duration: The duration of the test, in seconds.
+    batch_interval: The seconds between two trade batches of the feed.
+    late_threshold: The seconds behind its schedule a trade counts as delivered behind schedule.
+    memory_interval: The seconds between two memory samples.
+    warmup_trades: The number of trades ingested, and queried once per query of the mix,
+    before the test starts, so imports and JIT compilation are not measured.
+    seed: The seed of the trades and of the query mix.
+    session_options: Extra options of the SyntheticSession, e.g. out_of_order_fraction.
+    """
+
+    def __init__(
+        self,
+        venue: str = "soak-test",
+        rate: float = 10000.0,
+        workers: int = 4,
+        duration: float = 60.0,
+        batch_interval: float = 0.01,
+        late_threshold: float = 0.1,
+        memory_interval: float = 1.0,
+        warmup_trades: int = 1000,
+        seed: int = 0,
+        **session_options,
+    ) -> None:
+        if not rate > 0 or not duration > 0 or not batch_interval > 0 or workers < 0:
+            raise ValueError("rate, duration and batch_interval should be more than 0, workers not negative")
+        self.venue = venue
+        self.rate = rate
+        self.workers = workers
+        self.duration = duration
+        self.batch_interval = batch_interval
+        self.late_threshold = late_threshold
+        self.memory_interval = memory_interval
+        self.warmup_trades = warmup_trades
+        self.seed = seed
+        self.market = Market(venue)
+        stock_info = StockInfo(venue)
+        if not len(stock_info.snapshot()):
+            stock_info.add_stocks(sample_stocks())
+        self.stock_symbols = sorted(stock_info.snapshot())
+        self.session = SyntheticSession(
+            venue=venue, start_time=datetime.now(), seed=seed, trades_per_second=rate, **session_options
+        )
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ingest: Dict = {}
+        self._latencies: Dict[str, List[float]] = {query: [] for query in QUERY_MIX}
+        self._errors: List[str] = []
+        self._memory_samples: List[Dict] = []
+
+    def _feed(self) -> None:
+        """
+        Ingest the trades due since the start at the target rate, in a batch per interval.
+        """
+        sent = accepted = out_of_order = behind_schedule = 0
+        max_lag = 0.0
+        latest = np.datetime64("NaT")
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            elapsed = time.perf_counter() - start
+            due = int(elapsed * self.rate)
+            if due > sent:
+                batch = self.session.batch(due - sent)
+                timestamps = batch[TIMESTAMP]
+                running_latest = np.maximum.accumulate(timestamps)
+                if not np.isnat(latest):
+                    running_latest = np.maximum(running_latest, latest)
+                out_of_order += int(np.count_nonzero(timestamps < running_latest))
+                latest = running_latest[-1]
+                with self.lock:
+                    accepted += self.market.add_trades(batch)
+                # Trade i is scheduled at i / rate seconds from the start
+                delivered = time.perf_counter() - start
+                lags = delivered - np.arange(sent, due) / self.rate
+                behind_schedule += int(np.count_nonzero(lags > self.late_threshold))
+                max_lag = max(max_lag, float(lags[0]))
+                sent = due
+            self._stop.wait(self.batch_interval)
+        self._ingest = {
+            "trades_sent": sent,
+            "trades_accepted": accepted,
+            "dropped": sent - accepted,
+            "out_of_order": out_of_order,
+            "behind_schedule": behind_schedule,
+            "max_lag_seconds": max_lag,
+        }
+
+    def _run_query(self, query: str, stock_symbol: str) -> None:
+        with self.lock:
+            if query == VWSP_ALL:
+                VolumeWeightedStockPriceCalculator(venue=self.venue).calculate()
+            elif query == VWSP_ONE:
+                VolumeWeightedStockPriceCalculator(stock_symbol, venue=self.venue).calculate()
+            elif query == ALL_SHARE_INDEX:
+                vwsp = VolumeWeightedStockPriceCalculator(venue=self.venue).calculate()
+                if vwsp is not None:
+                    AllShareIndexCalculator(vwsp).calculate()
+            elif query == DIVIDEND_YIELD:
+                DividendYieldCalculator(stock_symbol=stock_symbol, price=100.0, venue=self.venue).calculate()
+            else:
+                PERatioCalculator(stock_symbol=stock_symbol, price=100.0, venue=self.venue).calculate()
+
+    def _query(self, worker: int) -> None:
+        """
+        Issue queries drawn from the mix back to back, recording their latencies.
+        """
+        rng = random.Random(self.seed * 1000 + worker)
+        while not self._stop.is_set():
+            query = rng.choice(QUERY_MIX)
+            stock_symbol = rng.choice(self.stock_symbols)
+            start = time.perf_counter()
+            try:
+                self._run_query(query, stock_symbol)
+            except Exception as e:
+                self._errors.append(f"{query}: {e!r}")
+                continue
+            self._latencies[query].append(time.perf_counter() - start)
+
+    def _sample_memory(self, start: float) -> None:
+        with self.lock:
+            market_bytes = sum(self.market.memory_usage().values())
+            trades = self.market.trade_count
+        self._memory_samples.append(
+            {"elapsed": time.perf_counter() - start, "rss_bytes": rss_bytes(), "market_bytes": market_bytes, "trades": trades}
+        )
+
+    def run(self) -> Dict:
+        """
+        Run the test for its duration.
+
+        Returns:
+        dict: The report of the run - its config and environment, the ingest results, the
+        query latencies and throughput, overall and by query, and the memory samples.
+        """
+        if self.warmup_trades:
+            self.market.add_trades(self.session.batch(self.warmup_trades))
+            for query in QUERY_MIX:
+                self._run_query(query, self.stock_symbols[0])
+        started_at = datetime.now()
+        start = time.perf_counter()
+        self._sample_memory(start)
+        threads = [threading.Thread(target=self._feed, name="soak-feed")]
+        threads += [threading.Thread(target=self._query, args=(worker,), name=f"soak-query-{worker}") for worker in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        while not self._stop.wait(min(self.memory_interval, max(0.0, start + self.duration - time.perf_counter()))):
+            self._sample_memory(start)
+            if time.perf_counter() - start >= self.duration:
+                self._stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        self._sample_memory(start)
+        return self._report(started_at, elapsed)
+
+    def _report(self, started_at: datetime, elapsed: float) -> Dict:
+        first, last = self._memory_samples[0], self._memory_samples[-1]
+        all_latencies = [latency for latencies in self._latencies.values() for latency in latencies]
+        return {
+            "version": REPORT_VERSION,
+            "started_at": started_at.isoformat(),
+            "config": {
+                "venue": self.venue,
+                "rate": self.rate,
+                "workers": self.workers,
+                "duration": self.duration,
+                "batch_interval": self.batch_interval,
+                "late_threshold": self.late_threshold,
+                "warmup_trades": self.warmup_trades,
+                "seed": self.seed,
+                "tick_size": None if self.market.tick_size is None else str(self.market.tick_size),
+                "compact": self.market.compact,
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "kernel_backend": get_backend(),
+                "platform": platform.platform(),
+            },
+            "elapsed_seconds": elapsed,
+            "ingest": dict(self._ingest, target_rate=self.rate, achieved_rate=self._ingest.get("trades_sent", 0) / elapsed),
+            "queries": dict(
+                latency_stats(all_latencies, elapsed),
+                errors=len(self._errors),
+                error_samples=self._errors[:10],
+                by_query={query: latency_stats(latencies, elapsed) for query, latencies in self._latencies.items()},
+            ),
+            "memory": {
+                "rss_start_bytes": first["rss_bytes"],
+                "rss_end_bytes": last["rss_bytes"],
+                "rss_growth_bytes": None if first["rss_bytes"] is None else last["rss_bytes"] - first["rss_bytes"],
+                "market_start_bytes": first["market_bytes"],
+                "market_end_bytes": last["market_bytes"],
+                "samples": self._memory_samples,
+            },
+        }
+
+
+def compare_reports(baseline: Dict, report: Dict, tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Dict]:
+    """
+    Compare the main metrics of a report to the ones of a baseline report.
+
+    Parameters:
+    baseline (dict): The report of the earlier run.
+    report (dict): The report of the new run.
+    tolerance (float): The relative change in the bad direction a metric may show without
+    counting as regressed, e.g. 0.1 for 10%.
+
+    Returns:
+    dict: For each metric, e.g. "queries.latency_ms.p99", its baseline and new values,
+    the relative change and whether it regressed beyond the tolerance.
+    """
+    if tolerance < 0:
+        raise ValueError(f"tolerance {tolerance} cannot be negative")
+    comparison = {}
+    for path, higher_is_better in COMPARED_METRICS.items():
+        values = []
+        for source in (baseline, report):
+            for key in path:
+                source = source.get(key) if isinstance(source, dict) else None
+            values.append(source)
+        before, after = values
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else None
+        comparison[".".join(path)] = {
+            "baseline": before,
+            "value": after,
+            "change": change,
+            "regressed": change is not None and (change < -tolerance if higher_is_better else change > tolerance),
+        }
+    return comparison
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Soak test the Market under concurrent ingestion and queries")
+    parser.add_argument("--rate", type=float, default=10000.0, help="Target number of trades ingested per second")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent query threads")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duration of the test, in seconds")
+    parser.add_argument("--batch-interval", type=float, default=0.01, help="Seconds between two trade batches")
+    parser.add_argument("--late-threshold", type=float, default=0.1, help="Seconds behind schedule a trade counts as late")
+    parser.add_argument("--out-of-order", type=float, default=0.0, help="Fraction of trades arriving out of order")
+    parser.add_argument("--max-lateness", type=float, help="Seconds behind the latest trade beyond which trades are dropped")
+    parser.add_argument("--hot-window", type=float, help="Seconds of trades kept live, older ones are frozen to cold storage")
+    parser.add_argument("--tick-size", help="Store prices as integer ticks of this size, e.g. 0.01")
+    parser.add_argument("--compact", action="store_true", help="Store the trades in the compact encoding")
+    parser.add_argument("--warmup-trades", type=int, default=1000, help="Trades ingested and queried before the test")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the trades and of the query mix")
+    parser.add_argument("--log-level", default="ERROR", help="Logging level, rejected trades are logged as warnings")
+    parser.add_argument("--report", help="JSON file to write the report to. Printed when omitted")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare to")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="Relative change in the bad direction a metric may show before it counts as regressed",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d: %(message)s')
+
+    soak = SoakTest(
+        rate=args.rate,
+        workers=args.workers,
+        duration=args.duration,
+        batch_interval=args.batch_interval,
+        late_threshold=args.late_threshold,
+        warmup_trades=args.warmup_trades,
+        seed=args.seed,
+        out_of_order_fraction=args.out_of_order,
+    )
+    soak.market.configure_storage(compact=args.compact, tick_size=args.tick_size)
+    if args.max_lateness is not None:
+        soak.market.configure_ingestion(max_lateness=timedelta(seconds=args.max_lateness))
+    if args.hot_window is not None:
+        soak.market.configure_cold_storage(hot_window=timedelta(seconds=args.hot_window))
+    report = soak.run()
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["comparison"] = compare_reports(json.load(baseline_file), report, tolerance=args.tolerance)
+
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    ingest, queries = report["ingest"], report["queries"]
+    print(
+        f"Ingested {ingest['trades_sent']} trades at {ingest['achieved_rate']:.0f}/s (target {args.rate:.0f}/s), "
+        f"{ingest['dropped']} dropped, {ingest['behind_schedule']} behind schedule",
+        file=sys.stderr,
+    )
+    print(
+        f"Queries: {queries['count']} at {queries['throughput']:.1f}/s, "
+        + ", ".join(f"{name} {value:.2f} ms" for name, value in queries["latency_ms"].items()),
+        file=sys.stderr,
+    )
+    regressions = [metric for metric, result in report.get("comparison", {}).items() if result["regressed"]]
+    if regressions:
+        print(f"Worse than the baseline: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from calculators.async_runner import AsyncCalculatorRunner
+from calculators.base import BaseCalculator
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.synthetic import SyntheticSession
+
+
+VENUE = "async-test"
+
+
+class SlowCalculator(BaseCalculator):
+    """Sleeps before returning its input, counting its calculations."""
+
+    calculations = 0
+
+    def __init__(self, value, delay=0.2):
+        self.delay = delay
+        super().__init__(input_data=value)
+
+    def calculate(self):
+        type(self).calculations += 1
+        time.sleep(self.delay)
+        return self.input_data
+
+
+class TestAsyncCalculatorRunner(unittest.TestCase):
+    """Test cases for the awaitable calculator API."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.market.add_trades(SyntheticSession(venue=VENUE, start_time=datetime(2025, 3, 29, 9), seed=12).batch(20000))
+        self.now = self.market.latest_timestamp
+        SlowCalculator.calculations = 0
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_results_match_calculate(self):
+        expected = VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate()
+
+        async def run():
+            runner = AsyncCalculatorRunner(self.executor, lock=threading.Lock())
+            vwsp = await runner.calculate(VolumeWeightedStockPriceCalculator, venue=VENUE, now=self.now)
+            ale = await runner.calculate(VolumeWeightedStockPriceCalculator, "ALE", venue=VENUE, now=self.now)
+            index = await AllShareIndexCalculator(vwsp).calculate_async(self.executor, timeout=5)
+            return vwsp, ale, index
+
+        vwsp, ale, index = asyncio.run(run())
+        pd.testing.assert_frame_equal(vwsp, expected)
+        self.assertEqual(ale, VolumeWeightedStockPriceCalculator("ALE", venue=VENUE, now=self.now).calculate())
+        self.assertEqual(index, AllShareIndexCalculator(expected).calculate())
+
+    def test_identical_requests_share_a_computation(self):
+        runner = AsyncCalculatorRunner(self.executor)
+
+        async def run():
+            requests = [runner.calculate(SlowCalculator, 1) for _ in range(10)]
+            requests += [runner.calculate(SlowCalculator, 2) for _ in range(5)]
+            return await asyncio.gather(*requests)
+
+        self.assertEqual(asyncio.run(run()), [1] * 10 + [2] * 5)
+        self.assertEqual((runner.requests, runner.computations), (15, 2))
+        self.assertEqual(SlowCalculator.calculations, 2)
+        self.assertEqual(runner._flights, {})
+
+    def test_timeouts_and_cancellation(self):
+        runner = AsyncCalculatorRunner(self.executor)
+
+        async def run():
+            impatient = asyncio.ensure_future(runner.calculate(SlowCalculator, 1, timeout=0.05))
+            cancelled = asyncio.ensure_future(runner.calculate(SlowCalculator, 1))
+            patient = asyncio.ensure_future(runner.calculate(SlowCalculator, 1, timeout=5))
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            with self.assertRaises(TimeoutError):
+                await impatient
+            with self.assertRaises(asyncio.CancelledError):
+                await cancelled
+            self.assertEqual(await patient, 1)
+
+            # Abandoned by all its requests, the computation is not shared with later ones
+            with self.assertRaises(TimeoutError):
+                await runner.calculate(SlowCalculator, 3, timeout=0.05)
+            self.assertEqual(runner._flights, {})
+            self.assertEqual(await runner.calculate(SlowCalculator, 3, 0.01), 3)
+
+        asyncio.run(run())
+        self.assertEqual(runner.computations, 3)
+
+    def test_loop_is_not_blocked(self):
+        async def run():
+            runner = AsyncCalculatorRunner(self.executor)
+            calculation = asyncio.ensure_future(runner.calculate(SlowCalculator, 1, 0.5))
+            ticks = 0
+            while not calculation.done():
+                await asyncio.sleep(0.01)
+                ticks += 1
+            return ticks
+
+        self.assertGreater(asyncio.run(run()), 10)
+
+    def test_process_executor(self):
+        expected = VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate()
+
+        async def run():
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                runner = AsyncCalculatorRunner(executor)
+                return await asyncio.gather(
+                    *[runner.calculate(VolumeWeightedStockPriceCalculator, venue=VENUE, now=self.now) for _ in range(3)]
+                )
+
+        results = asyncio.run(run())
+        for vwsp in results:
+            pd.testing.assert_frame_equal(vwsp, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
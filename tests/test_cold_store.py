@@ -0,0 +1,180 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from calculators.trade_stats import VolumeWeightedStockPriceCalculator
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE, TradeType
+from exchange.cold_store import ColdBlock, ColdStore
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+from exchange.trade_store import COLUMN_DTYPES
+
+
+VENUE = "cold-store-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+
+
+def trade_columns(count, start, seed=3, symbols=SYMBOLS):
+    rng = np.random.default_rng(seed)
+    return {
+        STOCK_SYMBOL: np.array(symbols, dtype=object)[rng.integers(0, len(symbols), count)],
+        TIMESTAMP: np.datetime64(start, "ns") + np.sort(rng.integers(0, 3600 * 10**9, count)).astype("timedelta64[ns]"),
+        QUANTITY: rng.integers(1, 5000, count),
+        TRADE_TYPE: np.where(rng.random(count) < 0.5, TradeType.BUY.value, TradeType.SELL.value).astype(object),
+        PRICE: rng.uniform(10, 500, count).round(2),
+        TRADE_ID: np.arange(count, dtype=np.int64),
+    }
+
+
+def assert_columns_equal(test, actual, expected):
+    test.assertListEqual(sorted(actual), sorted(expected))
+    for name, column in expected.items():
+        test.assertEqual(actual[name].dtype, np.dtype(COLUMN_DTYPES[name]), name)
+        np.testing.assert_array_equal(actual[name], column, err_msg=name)
+
+
+class TestColdBlock(unittest.TestCase):
+    """Test cases for ColdBlock and ColdStore."""
+
+    def setUp(self):
+        self.start = datetime(2025, 3, 29, 9, 0)
+        self.columns = trade_columns(10000, self.start)
+
+    def test_round_trip(self):
+        block = ColdBlock(self.columns)
+        assert_columns_equal(self, block.decode(), self.columns)
+        # Prices off any decimal grid are stored as floats, still exactly
+        self.columns[PRICE] = np.random.default_rng(1).lognormal(4, 1, 10000)
+        assert_columns_equal(self, ColdBlock(self.columns).decode(), self.columns)
+
+    def test_compression(self):
+        block = ColdBlock(self.columns)
+        raw = sum(column.nbytes for column in self.columns.values())
+        self.assertLess(block.nbytes, raw / 3)
+        self.assertEqual(block.symbol_set, frozenset(SYMBOLS))
+        self.assertEqual(block.start_time, self.columns[TIMESTAMP][0])
+        self.assertEqual(block.end_time, self.columns[TIMESTAMP][-1])
+
+    def test_reads_skip_blocks(self):
+        store = ColdStore(block_size=1000)
+        store.freeze(self.columns)
+        store.freeze(trade_columns(1000, self.start + timedelta(hours=1), symbols=("FOO",)))
+        self.assertEqual((len(store), len(store.blocks)), (11000, 11))
+        start, end = self.start + timedelta(minutes=10), self.start + timedelta(minutes=20)
+        with mock.patch.object(ColdBlock, "decode", autospec=True, side_effect=ColdBlock.decode) as decode:
+            parts = store.read(start, end)
+        self.assertLessEqual(decode.call_count, 3)
+        timestamps = np.concatenate([part[TIMESTAMP] for part in parts])
+        in_range = (self.columns[TIMESTAMP] >= np.datetime64(start)) & (self.columns[TIMESTAMP] < np.datetime64(end))
+        np.testing.assert_array_equal(timestamps, self.columns[TIMESTAMP][in_range])
+
+        with mock.patch.object(ColdBlock, "decode", autospec=True, side_effect=ColdBlock.decode) as decode:
+            parts = store.read(symbols=["FOO"])
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(sum(len(part[TIMESTAMP]) for part in parts), 1000)
+        parts = store.read(symbols=["TEA"])
+        self.assertEqual(sum(len(part[TIMESTAMP]) for part in parts), (self.columns[STOCK_SYMBOL] == "TEA").sum())
+
+
+class TestMarketColdStorage(unittest.TestCase):
+    """Test cases for freezing the trades of a Market into cold storage."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.start = datetime(2025, 3, 29, 9, 0)
+        columns = trade_columns(20000, self.start)
+        del columns[TRADE_ID]
+        self.market.add_trades(columns)
+        self.now = self.start + timedelta(hours=1)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_reads_are_unchanged(self):
+        trades = self.market.get_trades(with_trade_ids=True)
+        window = self.market.get_trades(start_time=self.now - timedelta(minutes=30), end_time=self.now - timedelta(minutes=10))
+        vwsp = VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate()
+
+        frozen = self.market.freeze(self.now - timedelta(minutes=5))
+        self.assertGreater(frozen, 15000)
+        pd.testing.assert_frame_equal(self.market.get_trades(with_trade_ids=True), trades)
+        pd.testing.assert_frame_equal(
+            self.market.get_trades(start_time=self.now - timedelta(minutes=30), end_time=self.now - timedelta(minutes=10)),
+            window,
+        )
+        pd.testing.assert_frame_equal(VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate(), vwsp)
+        tea = self.market.get_trade_columns(stock_symbols=["TEA"])
+        np.testing.assert_array_equal(tea[TRADE_ID], trades.loc[trades[STOCK_SYMBOL] == "TEA", TRADE_ID])
+        # Live trades take 8 bytes per column
+        self.assertLess(self.market.memory_usage()["cold_blocks"], frozen * 8 * len(COLUMN_DTYPES) / 3)
+
+    def test_hot_window(self):
+        self.market.configure_cold_storage(hot_window=timedelta(minutes=10), block_size=1000)
+        usage = self.market.memory_usage()
+        self.assertGreater(usage["cold_blocks"], 0)
+        self.assertEqual(len(self.market._cold_trades) % 1000, 0)
+        self.assertGreater(len(self.market._cold_trades), 15000)
+        # Trades older than the frozen ones are rejected, frozen trades cannot be corrected
+        trade = Trade(stock_symbol="TEA", timestamp=self.start, quantity=1, trade_type=TradeType.BUY,
+                      price=1.0, venue=VENUE)
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertFalse(self.market.add_trade(trade))
+            self.assertEqual(self.market.add_trades({name: [value] for name, value in trade.__dict__.items()}), 0)
+        self.assertTrue(all("older than the frozen trades, which end at" in line for line in logs.output))
+        self.assertNotIn("None", " ".join(logs.output))
+        with self.assertRaises(ValueError):
+            self.market.cancel(0)
+        self.assertEqual(len(self.market.get_trades()), 20000)
+        self.market._flush_trades()
+        self.assertEqual(self.market.memory_usage()["cold_blocks"], 0)
+
+    def test_amends_around_frozen_trades(self):
+        self.market.freeze(self.now - timedelta(minutes=30))
+        trades = self.market.get_trades(with_trade_ids=True)
+        live_id = int(self.market.get_trade_columns(start_time=self.now - timedelta(minutes=1))[TRADE_ID][0])
+        # A trade cannot be amended to before the frozen trades, it is left unchanged
+        with self.assertRaises(ValueError):
+            self.market.amend(live_id, timestamp=self.start)
+        pd.testing.assert_frame_equal(self.market.get_trades(with_trade_ids=True), trades)
+
+        # Moving the latest trade forward freezes the trades aged out of the hot window
+        self.market.configure_cold_storage(hot_window=timedelta(minutes=10), block_size=1000)
+        frozen = len(self.market._cold_trades)
+        self.market.amend(live_id, timestamp=self.now + timedelta(minutes=30))
+        self.assertGreater(len(self.market._cold_trades), frozen)
+        # Only the amended trade and less than a block of the aged ones are left live
+        self.assertLessEqual(20000 - len(self.market._cold_trades), 1000)
+        timestamps = self.market.get_trade_columns()[TIMESTAMP]
+        self.assertTrue((np.diff(timestamps.view(np.int64)) >= 0).all())
+
+    def test_hot_window_checks_once_per_block(self):
+        self.market._flush_trades()
+        self.market.configure_storage(database=":memory:")
+        self.market.configure_cold_storage(hot_window=timedelta(minutes=10), block_size=500)
+        columns = trade_columns(5000, self.start)
+        trades = [
+            Trade(stock_symbol=symbol, timestamp=timestamp.astype("datetime64[us]").tolist(), quantity=int(quantity),
+                  trade_type=TradeType(trade_type), price=float(price), venue=VENUE)
+            for symbol, timestamp, quantity, trade_type, price in zip(
+                columns[STOCK_SYMBOL], columns[TIMESTAMP], columns[QUANTITY], columns[TRADE_TYPE], columns[PRICE]
+            )
+        ]
+        store = type(self.market._trades)
+        with mock.patch.object(store, "count", autospec=True, side_effect=store.count) as count:
+            for trade in trades:
+                self.market.add_trade(trade)
+        # Only the whole blocks older than the hot window are frozen, reading the store once per block
+        aged = (columns[TIMESTAMP] < columns[TIMESTAMP][-1] - np.timedelta64(10, "m")).sum()
+        self.assertEqual(len(self.market._cold_trades), aged - aged % 500)
+        self.assertLessEqual(count.call_count, len(self.market._cold_trades) // 500 + 1)
+        self.assertEqual(len(self.market.get_trades()), 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.rolling import RollingVolumeWeightedStockPrice
+from calculators.trade_stats import AllShareIndexCalculator, TradeSummaryCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+
+
+PLAIN_VENUE = "plain-storage-test"
+COMPACT_VENUE = "compact-storage-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+
+
+class TestCompactStorage(unittest.TestCase):
+    """Test cases checking the compact trade encoding gives the same results as the plain one."""
+
+    def setUp(self):
+        self.now = datetime(2025, 3, 29, 12, 0)
+        self.markets = {}
+        for venue, compact in ((PLAIN_VENUE, False), (COMPACT_VENUE, True)):
+            StockInfo(venue).add_stocks(sample_stocks())
+            self.markets[venue] = Market(venue)
+            self.markets[venue].configure_storage(compact=compact)
+
+        rng = np.random.default_rng(7)
+        count = 5000
+        self.batch = {
+            STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[rng.integers(0, len(SYMBOLS), count)],
+            TIMESTAMP: np.datetime64(self.now - timedelta(minutes=10), "ns")
+            + rng.integers(0, 10 * 60 * 10**9, count).astype("timedelta64[ns]"),
+            QUANTITY: rng.integers(1, 1000, count),
+            TRADE_TYPE: np.array([TradeType.BUY.value, TradeType.SELL.value], dtype=object)[rng.integers(0, 2, count)],
+            PRICE: rng.uniform(1, 500, count).round(2),
+        }
+
+    def tearDown(self):
+        for venue in (PLAIN_VENUE, COMPACT_VENUE):
+            Market.discard(venue)
+            StockInfo.discard(venue)
+
+    def add_trades(self):
+        for venue, market in self.markets.items():
+            market.add_trades(self.batch)
+            # Single trades, in order then late
+            for minutes, symbol in ((0.5, "GIN"), (-8, "TEA")):
+                market.add_trade(Trade(stock_symbol=symbol, timestamp=self.now - timedelta(minutes=minutes),
+                                       quantity=7, trade_type=TradeType.SELL, price=9.5, venue=venue))
+
+    def test_same_trades(self):
+        self.add_trades()
+        pd.testing.assert_frame_equal(
+            self.markets[COMPACT_VENUE].get_trades(), self.markets[PLAIN_VENUE].get_trades()
+        )
+        pd.testing.assert_frame_equal(
+            self.markets[COMPACT_VENUE].get_trades("trade_type == 'buy' and stock_symbol == 'ALE'"),
+            self.markets[PLAIN_VENUE].get_trades("trade_type == 'buy' and stock_symbol == 'ALE'"),
+        )
+
+    def test_same_stats(self):
+        rolling = {venue: RollingVolumeWeightedStockPrice(now=self.now, venue=venue) for venue in self.markets}
+        self.add_trades()
+        results = {}
+        for venue in self.markets:
+            vwsp = VolumeWeightedStockPriceCalculator(venue=venue, now=self.now).calculate()
+            results[venue] = (
+                vwsp,
+                VolumeWeightedStockPriceCalculator(stock_symbol="POP", venue=venue, now=self.now).calculate(),
+                TradeSummaryCalculator(venue=venue, now=self.now).calculate(),
+                AllShareIndexCalculator(vwsp).calculate(),
+                rolling[venue].calculate(now=self.now),
+            )
+            rolling[venue].close()
+        plain, compact = results[PLAIN_VENUE], results[COMPACT_VENUE]
+        pd.testing.assert_frame_equal(compact[0], plain[0])
+        self.assertEqual(compact[1], plain[1])
+        pd.testing.assert_frame_equal(compact[2], plain[2])
+        self.assertEqual(compact[3], plain[3])
+        pd.testing.assert_frame_equal(compact[4], plain[4])
+
+    def test_memory_usage(self):
+        self.add_trades()
+        plain = self.markets[PLAIN_VENUE].memory_usage()
+        compact = self.markets[COMPACT_VENUE].memory_usage()
+        self.assertIn("symbol_dictionary", compact)
+        # Symbols are stored as registry ids in both modes
+        self.assertEqual(compact[STOCK_SYMBOL], plain[STOCK_SYMBOL])
+        self.assertLess(compact[TRADE_TYPE], plain[TRADE_TYPE])
+        self.assertLess(compact[QUANTITY], plain[QUANTITY])
+        self.assertLess(sum(compact.values()), sum(plain.values()))
+
+    def test_large_quantities_widen(self):
+        market = self.markets[COMPACT_VENUE]
+        market.add_trade(Trade(stock_symbol="ALE", timestamp=self.now, quantity=3,
+                               trade_type=TradeType.BUY, price=1.0, venue=COMPACT_VENUE))
+        market.add_trade(Trade(stock_symbol="ALE", timestamp=self.now, quantity=2**40,
+                               trade_type=TradeType.BUY, price=1.0, venue=COMPACT_VENUE))
+        self.assertListEqual(market.get_trades()[QUANTITY].tolist(), [3, 2**40])
+
+    def test_reencode_existing_trades(self):
+        self.add_trades()
+        market = self.markets[PLAIN_VENUE]
+        expected = market.get_trades()
+        market.configure_storage(compact=True)
+        pd.testing.assert_frame_equal(market.get_trades(), expected)
+        market.configure_storage(compact=False)
+        pd.testing.assert_frame_equal(market.get_trades(), expected)
@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime, timedelta
+
+from calculators.consolidated import ConsolidatedVolumeWeightedStockPriceCalculator, venue_partial_sums
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import StockType, TradeType
+from exchange.market import Market
+from exchange.stock import Stock, StockInfo
+from exchange.trade import Trade
+
+
+VENUES = ("XLON", "XPAR")
+ALL_VENUES = "ALL"
+EMPTY_VENUE = "EMPTY"
+
+
+class TestConsolidatedVolumeWeightedStockPrice(unittest.TestCase):
+    """Test cases for consolidating VWSP and All Share Index across venues."""
+
+    @classmethod
+    def setUpClass(cls):
+        now = datetime.now()
+        for venue in VENUES + (ALL_VENUES,):
+            StockInfo(venue).add_stocks(
+                [
+                    Stock(stock_symbol='ABC', type=StockType.COMMON, last_dividend=5.0, fixed_dividend_pct=0.0, par_value=100.0),
+                    Stock(stock_symbol='XYZ', type=StockType.PREFERRED, last_dividend=8.0, fixed_dividend_pct=2.0, par_value=100.0),
+                    Stock(stock_symbol='DEF', type=StockType.COMMON, last_dividend=4.0, fixed_dividend_pct=0.0, par_value=100.0),
+                ]
+            )
+        for i in range(300):
+            venue = VENUES[i % 2]
+            # DEF only trades on XPAR
+            stock_symbol = ['ABC', 'XYZ', 'DEF'][i % 3] if venue == 'XPAR' else ['ABC', 'XYZ'][(i // 2) % 2]
+            minutes = (i * 7) % 8
+            for market_venue in (venue, ALL_VENUES):
+                Market(market_venue).add_trade(
+                    Trade(stock_symbol=stock_symbol, timestamp=now - timedelta(minutes=minutes),
+                          quantity=10 + i, trade_type=TradeType.BUY, price=100.0 + i % 17,
+                          venue=market_venue)
+                )
+
+    @classmethod
+    def tearDownClass(cls):
+        for venue in VENUES + (ALL_VENUES,):
+            Market.discard(venue)
+            StockInfo.discard(venue)
+
+    def tearDown(self):
+        Market.discard(EMPTY_VENUE)
+        StockInfo.discard(EMPTY_VENUE)
+
+    def test_venues_are_independent(self):
+        self.assertIsNot(Market('XLON'), Market('XPAR'))
+        self.assertIs(Market(), Market('default'))
+        self.assertNotIn('DEF', Market('XLON').get_trades()['stock_symbol'].tolist())
+        self.assertEqual(
+            len(Market('XLON').get_trades()) + len(Market('XPAR').get_trades()),
+            len(Market(ALL_VENUES).get_trades()),
+        )
+        with self.assertRaises(ValueError):
+            Trade(stock_symbol='ABC', timestamp=datetime.now(), quantity=1,
+                  trade_type=TradeType.BUY, price=1.0, venue='UNKNOWN')
+
+    def test_consolidated_vwsp_matches_single_venue(self):
+        partial_sums = [venue_partial_sums(venue) for venue in VENUES]
+        result = ConsolidatedVolumeWeightedStockPriceCalculator(partial_sums).calculate()
+        expected = VolumeWeightedStockPriceCalculator(venue=ALL_VENUES).calculate()
+        self.assertListEqual(result['stock_symbol'].tolist(), expected['stock_symbol'].tolist())
+        for actual_vwsp, expected_vwsp in zip(result['volume_weighted_stock_price'], expected['volume_weighted_stock_price']):
+            self.assertAlmostEqual(actual_vwsp, expected_vwsp, places=2)
+
+        self.assertAlmostEqual(
+            AllShareIndexCalculator(result).calculate(),
+            AllShareIndexCalculator(expected).calculate(),
+            places=2,
+        )
+
+    def test_consolidated_vwsp_single_stock(self):
+        partial_sums = [venue_partial_sums(venue, stock_symbol='DEF') for venue in VENUES]
+        result = ConsolidatedVolumeWeightedStockPriceCalculator(partial_sums, stock_symbol='DEF').calculate()
+        expected = VolumeWeightedStockPriceCalculator(stock_symbol='DEF', venue=ALL_VENUES).calculate()
+        self.assertAlmostEqual(result, expected, places=2)
+
+    def test_no_trades(self):
+        partial_sums = [venue_partial_sums(EMPTY_VENUE)]
+        self.assertIsNone(ConsolidatedVolumeWeightedStockPriceCalculator(partial_sums).calculate())
+
+
+if __name__ == '__main__':
+    unittest.main()
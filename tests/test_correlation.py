@@ -0,0 +1,170 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.correlation import (
+    CLOSE_PRICES,
+    CORRELATION,
+    COVARIANCE,
+    ReturnCorrelationCalculator,
+    RollingReturnCorrelation,
+    VWSP_PRICES,
+)
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import Stock, StockInfo, StockType
+
+
+VENUE = "correlation-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN")
+BUCKET = timedelta(minutes=1)
+
+
+def expected_matrix(trades, price, matrix, now):
+    """
+    The matrix computed pair by pair with pandas, from per-bucket prices pivoted by stock.
+    """
+    trades = trades[trades[TIMESTAMP] < pd.Timestamp(now).floor(BUCKET)].copy()
+    trades["bucket"] = trades[TIMESTAMP].dt.floor(BUCKET)
+    trades["value"] = trades[PRICE] * trades[QUANTITY]
+    grouped = trades.groupby(["bucket", trades[STOCK_SYMBOL].astype(object)])
+    if price == VWSP_PRICES:
+        prices = grouped["value"].sum() / grouped[QUANTITY].sum()
+    else:
+        prices = grouped[PRICE].last()
+    prices = prices.unstack()
+    buckets = pd.date_range(prices.index[0], pd.Timestamp(now).floor(BUCKET) - BUCKET, freq=BUCKET)
+    universe = sorted(StockInfo(VENUE).snapshot())
+    prices = prices.reindex(index=buckets, columns=universe).ffill()
+    returns = np.log(prices / prices.shift(1))
+    return returns.corr() if matrix == CORRELATION else returns.cov()
+
+
+class TestReturnCorrelation(unittest.TestCase):
+    """Test cases for the cross-stock return correlation and covariance calculators."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.start = datetime(2025, 3, 29, 9, 0)
+        self.rng = np.random.default_rng(11)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def batch(self, count, start, span, symbols=SYMBOLS):
+        timestamps = np.datetime64(start, "ns") + np.sort(self.rng.integers(0, span * 10**9, count)).astype(
+            "timedelta64[ns]"
+        )
+        # Correlated moves: a market factor and a stock-specific one
+        market_moves = self.rng.normal(0, 0.002, count).cumsum()
+        return {
+            STOCK_SYMBOL: np.array(symbols, dtype=object)[self.rng.integers(0, len(symbols), count)],
+            TIMESTAMP: timestamps,
+            QUANTITY: self.rng.integers(1, 1000, count),
+            TRADE_TYPE: np.full(count, TradeType.BUY.value, dtype=object),
+            PRICE: (100.0 * np.exp(market_moves + self.rng.normal(0, 0.001, count))).round(2),
+        }
+
+    def assert_matrix(self, result, price, matrix, now):
+        expected = expected_matrix(self.market.get_trades(), price, matrix, now)
+        self.assertListEqual(result.index.tolist(), sorted(StockInfo(VENUE).snapshot()))
+        self.assertListEqual(result.columns.tolist(), result.index.tolist())
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-7, atol=1e-12)
+
+    def test_calculator(self):
+        now = self.start + timedelta(minutes=30)
+        self.assertIsNone(ReturnCorrelationCalculator(venue=VENUE, now=now).calculate())
+        self.market.add_trades(self.batch(3000, self.start, 1800))
+        # JOE never trades, its row and column are NaN
+        for price in (VWSP_PRICES, CLOSE_PRICES):
+            for matrix in (CORRELATION, COVARIANCE):
+                result = ReturnCorrelationCalculator(matrix=matrix, price=price, venue=VENUE, now=now).calculate()
+                self.assert_matrix(result, price, matrix, now)
+        correlation = ReturnCorrelationCalculator(venue=VENUE, now=now).calculate()
+        self.assertTrue(correlation.loc["JOE"].isna().all())
+        np.testing.assert_allclose(np.diag(correlation.loc[list(SYMBOLS), list(SYMBOLS)]), 1.0)
+        self.assertGreater(correlation.loc["TEA", "POP"], 0.5)
+
+        # Only the buckets closed by now are considered
+        early = self.start + timedelta(minutes=10, seconds=30)
+        result = ReturnCorrelationCalculator(matrix=COVARIANCE, venue=VENUE, now=early).calculate()
+        self.assert_matrix(result, VWSP_PRICES, COVARIANCE, early)
+
+    def test_rolling_matches_calculator(self):
+        for price in (VWSP_PRICES, CLOSE_PRICES):
+            self.market._flush_trades()
+            self.market.add_trades(self.batch(500, self.start, 300))
+            rolling = RollingReturnCorrelation(price=price, venue=VENUE, now=self.start + timedelta(minutes=2))
+            # Trades in the open bucket, in later buckets, and after a gap without trades
+            for minute in (5, 6, 9, 10, 15):
+                self.market.add_trades(self.batch(200, self.start + timedelta(minutes=minute), 50))
+                now = self.start + timedelta(minutes=minute + 1)
+                for matrix in (CORRELATION, COVARIANCE):
+                    expected = ReturnCorrelationCalculator(matrix=matrix, price=price, venue=VENUE, now=now).calculate()
+                    pd.testing.assert_frame_equal(rolling.calculate(matrix, now=now), expected, rtol=1e-9, atol=1e-12)
+            rolling.close()
+
+    def test_long_idle_spans(self):
+        # A month without trades between two sessions, then idle until now
+        self.market.add_trades(self.batch(300, self.start, 600))
+        later = self.start + timedelta(days=30)
+        self.market.add_trades(self.batch(300, later, 600))
+        now = later + timedelta(hours=2)
+        rolling = RollingReturnCorrelation(venue=VENUE, now=self.start + timedelta(minutes=5))
+        for matrix in (CORRELATION, COVARIANCE):
+            result = ReturnCorrelationCalculator(matrix=matrix, venue=VENUE, now=now).calculate()
+            self.assert_matrix(result, VWSP_PRICES, matrix, now)
+            pd.testing.assert_frame_equal(rolling.calculate(matrix, now=now), result, rtol=1e-9, atol=1e-12)
+
+        # Centuries of empty buckets are accounted for without laying them out
+        now = self.start + timedelta(days=200 * 365)
+        expected = ReturnCorrelationCalculator(matrix=COVARIANCE, venue=VENUE, now=now).calculate()
+        self.assertLess(expected.loc["TEA", "TEA"], 1e-10)
+        pd.testing.assert_frame_equal(rolling.calculate(COVARIANCE, now=now), expected, rtol=1e-9, atol=1e-12)
+        rolling.close()
+
+    def test_late_trades_and_cancels(self):
+        self.market.add_trades(self.batch(600, self.start, 600))
+        rolling = RollingReturnCorrelation(price=CLOSE_PRICES, venue=VENUE, now=self.start + timedelta(minutes=5))
+        now = self.start + timedelta(minutes=12)
+
+        # A trade late into a closed bucket
+        self.market.add_trades(self.batch(1, self.start + timedelta(minutes=3), 1, symbols=("GIN",)))
+        expected = ReturnCorrelationCalculator(price=CLOSE_PRICES, venue=VENUE, now=now).calculate()
+        pd.testing.assert_frame_equal(rolling.calculate(now=now), expected, rtol=1e-9, atol=1e-12)
+
+        self.market.cancel(int(self.market.get_trade_columns()["trade_id"][10]))
+        expected = ReturnCorrelationCalculator(price=CLOSE_PRICES, venue=VENUE, now=now).calculate()
+        pd.testing.assert_frame_equal(rolling.calculate(now=now), expected, rtol=1e-9, atol=1e-12)
+
+        # A stock listed since is added to the matrices
+        StockInfo(VENUE).add_stocks([Stock(stock_symbol="RUM", type=StockType.COMMON, last_dividend=0.8, fixed_dividend_pct=0.0, par_value=100.0)])
+        self.market.add_trades(self.batch(100, self.start + timedelta(minutes=10), 60, symbols=("RUM", "TEA")))
+        now = self.start + timedelta(minutes=20)
+        expected = ReturnCorrelationCalculator(price=CLOSE_PRICES, venue=VENUE, now=now).calculate()
+        self.assertIn("RUM", expected.index)
+        pd.testing.assert_frame_equal(rolling.calculate(now=now), expected, rtol=1e-9, atol=1e-12)
+
+        self.market._flush_trades()
+        self.assertIsNone(rolling.calculate(now=now))
+        rolling.close()
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            ReturnCorrelationCalculator(matrix="beta", venue=VENUE)
+        with self.assertRaises(ValueError):
+            ReturnCorrelationCalculator(price="open", venue=VENUE)
+        with self.assertRaises(ValueError):
+            RollingReturnCorrelation(bucket=timedelta(0), venue=VENUE)
+        rolling = RollingReturnCorrelation(venue=VENUE, now=self.start)
+        with self.assertRaises(ValueError):
+            rolling.calculate("beta", now=self.start)
+        rolling.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
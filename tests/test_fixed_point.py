@@ -0,0 +1,157 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_EVEN, Decimal
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+from calculators.rolling import RollingVolumeWeightedStockPrice
+from calculators.trade_stats import AllShareIndexCalculator, TradeSummaryCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+from utils.fixed_point import from_ticks, parse_tick_size, round_ratio, to_ticks
+
+
+FLOAT_VENUE = "float-price-test"
+TICK_VENUE = "tick-price-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+
+
+class TestFixedPoint(unittest.TestCase):
+    """Test cases for the fixed-point arithmetic helpers."""
+
+    def test_parse_tick_size(self):
+        self.assertEqual(parse_tick_size("0.01"), Fraction(1, 100))
+        self.assertEqual(parse_tick_size(0.01), Fraction(1, 100))
+        self.assertEqual(parse_tick_size(Decimal("0.5")), Fraction(1, 2))
+        for invalid in ("0", -0.01, "cheap"):
+            with self.assertRaises(ValueError):
+                parse_tick_size(invalid)
+
+    def test_ticks_round_trip(self):
+        prices = np.array([0.01, 0.1, 0.3, 123.45, 99999.99, 2.68])
+        ticks = to_ticks(prices, Fraction(1, 100))
+        self.assertListEqual(ticks.tolist(), [1, 10, 30, 12345, 9999999, 268])
+        np.testing.assert_array_equal(from_ticks(ticks, Fraction(1, 100)), prices)
+        with self.assertRaises(ValueError):
+            to_ticks(np.array([1.005]), Fraction(1, 100))
+        self.assertListEqual(to_ticks(np.array([1.5, 3.0]), Fraction(1, 2)).tolist(), [3, 6])
+
+    def test_round_ratio_half_to_even(self):
+        self.assertEqual(round_ratio(1005, 1000), 1.0)
+        self.assertEqual(round_ratio(1015, 1000), 1.02)
+        self.assertEqual(round_ratio(10051, 10000), 1.01)
+        self.assertEqual(round_ratio(2, 3), 0.67)
+
+
+class TestTickPriceMode(unittest.TestCase):
+    """Test cases checking the tick price mode gives the same results as float prices."""
+
+    def setUp(self):
+        self.now = datetime(2025, 3, 29, 12, 0)
+        self.markets = {}
+        for venue, tick_size in ((FLOAT_VENUE, None), (TICK_VENUE, "0.01")):
+            StockInfo(venue).add_stocks(sample_stocks())
+            self.markets[venue] = Market(venue)
+            self.markets[venue].configure_storage(tick_size=tick_size)
+
+        rng = np.random.default_rng(3)
+        count = 20000
+        self.batch = {
+            STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[rng.integers(0, len(SYMBOLS), count)],
+            TIMESTAMP: np.datetime64(self.now - timedelta(minutes=10), "ns")
+            + rng.integers(0, 10 * 60 * 10**9, count).astype("timedelta64[ns]"),
+            QUANTITY: rng.integers(1, 5000, count),
+            TRADE_TYPE: np.array([TradeType.BUY.value, TradeType.SELL.value], dtype=object)[rng.integers(0, 2, count)],
+            PRICE: rng.integers(1, 10**6, count) / 100,
+        }
+
+    def tearDown(self):
+        for venue in (FLOAT_VENUE, TICK_VENUE):
+            Market.discard(venue)
+            StockInfo.discard(venue)
+
+    def add_trades(self):
+        for market in self.markets.values():
+            market.add_trades(self.batch)
+
+    def exact_vwsp(self, start_time):
+        """The VWSP of every symbol computed with decimals, rounded half to even."""
+        in_window = self.batch[TIMESTAMP] >= np.datetime64(start_time, "ns")
+        vwsp = {}
+        for symbol in SYMBOLS:
+            rows = in_window & (self.batch[STOCK_SYMBOL] == symbol)
+            notional = sum(
+                Decimal(repr(price)) * quantity
+                for price, quantity in zip(self.batch[PRICE][rows].tolist(), self.batch[QUANTITY][rows].tolist())
+            )
+            ratio = notional / Decimal(int(self.batch[QUANTITY][rows].sum()))
+            vwsp[symbol] = float(ratio.quantize(Decimal("0.01"), rounding=ROUND_HALF_EVEN))
+        return vwsp
+
+    def test_same_trades(self):
+        self.add_trades()
+        pd.testing.assert_frame_equal(self.markets[TICK_VENUE].get_trades(), self.markets[FLOAT_VENUE].get_trades())
+
+    def test_vwsp_matches_float_and_exact(self):
+        self.add_trades()
+        exact = self.exact_vwsp(self.now - timedelta(minutes=5))
+        tick_vwsp = VolumeWeightedStockPriceCalculator(venue=TICK_VENUE, now=self.now).calculate()
+        float_vwsp = VolumeWeightedStockPriceCalculator(venue=FLOAT_VENUE, now=self.now).calculate()
+        self.assertDictEqual(
+            dict(zip(tick_vwsp[STOCK_SYMBOL], tick_vwsp["volume_weighted_stock_price"])), exact
+        )
+        np.testing.assert_allclose(
+            tick_vwsp["volume_weighted_stock_price"], float_vwsp["volume_weighted_stock_price"], atol=0.0101
+        )
+        self.assertEqual(
+            VolumeWeightedStockPriceCalculator(stock_symbol="ALE", venue=TICK_VENUE, now=self.now).calculate(),
+            exact["ALE"],
+        )
+        self.assertAlmostEqual(
+            AllShareIndexCalculator(tick_vwsp).calculate(), AllShareIndexCalculator(float_vwsp).calculate(), delta=0.011
+        )
+
+    def test_trade_summary_matches_float(self):
+        self.add_trades()
+        tick_summary = TradeSummaryCalculator(venue=TICK_VENUE, now=self.now).calculate()
+        float_summary = TradeSummaryCalculator(venue=FLOAT_VENUE, now=self.now).calculate()
+        pd.testing.assert_frame_equal(
+            tick_summary.drop(columns=["volume_weighted_stock_price", "total_trade_value"]),
+            float_summary.drop(columns=["volume_weighted_stock_price", "total_trade_value"]),
+        )
+        np.testing.assert_allclose(tick_summary["total_trade_value"], float_summary["total_trade_value"], rtol=1e-12)
+
+    def test_rolling_vwsp_is_exact(self):
+        start = self.now - timedelta(minutes=10)
+        rolling = RollingVolumeWeightedStockPrice(now=start, venue=TICK_VENUE)
+        self.markets[TICK_VENUE].add_trades(self.batch)
+        # Slide the window over the trades one second at a time, then past all of them
+        for seconds in range(10 * 60 + 1):
+            rolling.advance(start + timedelta(seconds=seconds))
+        expected = self.exact_vwsp(self.now - timedelta(minutes=5))
+        result = rolling.calculate(now=self.now)
+        self.assertDictEqual(dict(zip(result[STOCK_SYMBOL], result["volume_weighted_stock_price"])), expected)
+        rolling.advance(self.now + timedelta(minutes=5, seconds=1))
+        self.assertIsNone(rolling.calculate(now=self.now + timedelta(minutes=5, seconds=1)))
+        rolling.close()
+
+    def test_off_grid_price_is_refused(self):
+        market = self.markets[TICK_VENUE]
+        with self.assertRaises(ValueError):
+            market.add_trade(Trade(stock_symbol="TEA", timestamp=self.now, quantity=1,
+                                   trade_type=TradeType.BUY, price=1.005, venue=TICK_VENUE))
+        with self.assertRaises(ValueError):
+            market.add_trades({**self.batch, PRICE: self.batch[PRICE] + 0.001})
+        self.assertEqual(len(market.get_trades()), 0)
+
+        float_market = self.markets[FLOAT_VENUE]
+        float_market.add_trade(Trade(stock_symbol="TEA", timestamp=self.now, quantity=1,
+                                     trade_type=TradeType.BUY, price=1.005, venue=FLOAT_VENUE))
+        with self.assertRaises(ValueError):
+            float_market.configure_storage(tick_size="0.01")
+        self.assertIsNone(float_market.tick_size)
+        self.assertEqual(float_market.get_trades()[PRICE].tolist(), [1.005])
@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("numpy", "pandas", "scipy")
+
+# Cold-start budget (seconds) of each public module, and the heavy dependencies it must not pull in.
+# The budgets are generous upper bounds to catch regressions, not precise targets.
+IMPORT_BUDGETS = {
+    "common.constants": (0.5, HEAVY_MODULES),
+    "utils.classutils": (0.5, HEAVY_MODULES),
+    "utils.jit": (0.5, HEAVY_MODULES),
+    "utils.profiling": (0.5, HEAVY_MODULES),
+    "utils.singleflight": (0.5, HEAVY_MODULES),
+    "exchange.symbols": (0.5, HEAVY_MODULES),
+    "exchange.stock": (0.5, HEAVY_MODULES),
+    "exchange.trade": (0.5, HEAVY_MODULES),
+    "exchange.sample_data": (0.5, HEAVY_MODULES),
+    "calculators.base": (0.5, HEAVY_MODULES),
+    "calculators.stock_stats": (0.5, HEAVY_MODULES),
+    "calculators.async_runner": (0.5, HEAVY_MODULES),
+    "service.protocol": (0.5, HEAVY_MODULES),
+    "utils.fixed_point": (2.0, ("pandas", "scipy")),
+    "exchange.storage": (2.0, ("pandas", "scipy")),
+    "exchange.trade_store": (2.0, ("pandas", "scipy")),
+    "exchange.cold_store": (2.0, ("pandas", "scipy")),
+    "exchange.sqlite_store": (2.0, ("pandas", "scipy")),
+    "exchange.market": (2.0, ("pandas", "scipy")),
+    "exchange.shared_store": (2.0, ("pandas", "scipy")),
+    "exchange.synthetic": (2.0, ("pandas", "scipy")),
+    "exchange.order_book": (2.0, ("pandas", "scipy")),
+    "calculators.sketches": (2.0, ("pandas", "scipy")),
+    "service.order_book_benchmark": (2.0, ("pandas", "scipy")),
+    "exchange.loader": (3.0, ("scipy",)),
+    "calculators.kernels": (3.0, ("scipy",)),
+    "calculators.trade_stats": (3.0, ("scipy",)),
+    "calculators.rolling": (3.0, ("scipy",)),
+    "calculators.consolidated": (3.0, ("scipy",)),
+    "calculators.shared": (3.0, ("scipy",)),
+    "calculators.leaderboard": (3.0, ("scipy",)),
+    "calculators.quantiles": (3.0, ("scipy",)),
+    "calculators.volatility": (3.0, ("scipy",)),
+    "calculators.correlation": (3.0, ("scipy",)),
+    "service.client": (3.0, ("scipy",)),
+    "service.server": (3.0, ("scipy",)),
+    "service.load_test": (3.0, ("scipy",)),
+    "service.soak_test": (3.0, ("scipy",)),
+}
+
+SIMULATION_BUDGET = 10.0
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+_STOCK_STATS_PROBE = """
+import json, sys
+from datetime import datetime
+from calculators.stock_stats import DividendYieldCalculator, PERatioCalculator
+from common.constants import StockType, TradeType
+from exchange.stock import Stock, StockInfo
+from exchange.trade import Trade
+
+StockInfo().add_stocks([Stock(stock_symbol="GIN", type=StockType.PREFERRED, last_dividend=8, fixed_dividend_pct=0.02, par_value=100)])
+Trade(stock_symbol="GIN", timestamp=datetime.now(), quantity=10, trade_type=TradeType.BUY, price=4.0)
+DividendYieldCalculator(stock_symbol="GIN", price=4).calculate()
+PERatioCalculator(stock_symbol="GIN", price=4).calculate()
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def run_probe(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return result.stdout
+
+
+class TestImportTime(unittest.TestCase):
+    """Cold-start import budgets, every measurement runs in a fresh interpreter."""
+
+    def test_module_import_budgets(self):
+        for module, (budget, forbidden) in IMPORT_BUDGETS.items():
+            with self.subTest(module=module):
+                probe = json.loads(run_probe(_IMPORT_PROBE.format(module=module)))
+                loaded = {name.split(".")[0] for name in probe["modules"]}
+                self.assertLess(probe["elapsed"], budget, f"Importing {module} is over budget")
+                self.assertFalse(
+                    loaded.intersection(forbidden),
+                    f"Importing {module} pulls in {loaded.intersection(forbidden)}",
+                )
+
+    def test_stock_stats_path_is_light(self):
+        loaded = {name.split(".")[0] for name in json.loads(run_probe(_STOCK_STATS_PROBE))}
+        self.assertFalse(loaded.intersection(HEAVY_MODULES))
+
+    def test_sample_simulation_budget(self):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "sample_simulation.py"], cwd=REPO_ROOT, capture_output=True, check=True
+        )
+        self.assertLess(time.perf_counter() - start, SIMULATION_BUDGET)
@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+from calculators.kernels import log_mean, per_symbol_sums, per_symbol_tick_sums
+from exchange.trade_store import window_bounds
+from utils import jit
+
+
+class TestKernels(unittest.TestCase):
+    """Test the loop (JIT) and NumPy implementations of the kernels give identical results."""
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        size = 2000
+        self.codes = rng.integers(0, 7, size=size)
+        self.prices = rng.uniform(1.0, 500.0, size=size).round(2)
+        self.quantities = rng.integers(1, 1000, size=size).astype(np.float64)
+        self.is_buy = rng.random(size) < 0.5
+        self.timestamps = np.sort(rng.integers(0, 10**12, size=size))
+
+    def implementations(self, kernel):
+        implementations = {"loop": kernel.loop_impl, "numpy": kernel.numpy_impl}
+        if jit.numba_available():
+            implementations["numba"] = kernel.compiled()
+        return implementations
+
+    def test_per_symbol_sums(self):
+        expected = per_symbol_sums.numpy_impl(self.codes, self.prices, self.quantities, self.is_buy, 7)
+        for name, implementation in self.implementations(per_symbol_sums).items():
+            with self.subTest(implementation=name):
+                result = implementation(self.codes, self.prices, self.quantities, self.is_buy, 7)
+                np.testing.assert_array_equal(result, expected)
+
+    def test_per_symbol_tick_sums(self):
+        ticks = np.rint(self.prices * 100).astype(np.int64)
+        quantities = self.quantities.astype(np.int64)
+        is_buy = self.is_buy.astype(np.int64)
+        expected = per_symbol_tick_sums.numpy_impl(self.codes, ticks, quantities, is_buy, 7)
+        for name, implementation in self.implementations(per_symbol_tick_sums).items():
+            with self.subTest(implementation=name):
+                result = implementation(self.codes, ticks, quantities, is_buy, 7)
+                np.testing.assert_array_equal(result, expected)
+
+    def test_log_mean(self):
+        expected = log_mean.numpy_impl(self.prices)
+        for name, implementation in self.implementations(log_mean).items():
+            with self.subTest(implementation=name):
+                result = implementation(self.prices)
+                # Summation order differs (pairwise vs sequential), the rounded index does not
+                self.assertAlmostEqual(result, expected, places=10)
+                self.assertEqual(round(np.exp(result), 2), round(np.exp(expected), 2))
+
+    def test_window_bounds(self):
+        int64 = np.iinfo(np.int64)
+        windows = [
+            (int64.min, int64.max),
+            (self.timestamps[100], self.timestamps[1500]),
+            (self.timestamps[100] + 1, self.timestamps[-1]),
+            (int64.min, self.timestamps[0]),
+            (self.timestamps[-1] + 1, int64.max),
+        ]
+        for start, end in windows:
+            expected = window_bounds.numpy_impl(self.timestamps, np.int64(start), np.int64(end))
+            for name, implementation in self.implementations(window_bounds).items():
+                with self.subTest(implementation=name, start=start, end=end):
+                    result = implementation(self.timestamps, np.int64(start), np.int64(end))
+                    np.testing.assert_array_equal(result, expected)
+
+
+class TestBackendSelection(unittest.TestCase):
+    """Test the kernel backend selection."""
+
+    def tearDown(self):
+        jit.set_backend(None)
+
+    def test_default_backend(self):
+        expected = jit.NUMBA if jit.numba_available() else jit.NUMPY
+        self.assertEqual(jit.get_backend(), expected)
+
+    def test_set_numpy_backend(self):
+        jit.set_backend(jit.NUMPY)
+        self.assertEqual(jit.get_backend(), jit.NUMPY)
+        self.assertEqual(log_mean(np.array([1.0, np.e ** 2])), 1.0)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            jit.set_backend("cuda")
+
+    @unittest.skipIf(jit.numba_available(), "Numba is installed")
+    def test_numba_backend_unavailable(self):
+        with self.assertRaises(ValueError):
+            jit.set_backend(jit.NUMBA)
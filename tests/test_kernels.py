@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.kernels import (
+    BUY_VOLUME, LAST_PRICE, MAX_PRICE, MIN_PRICE, SELL_VOLUME, TOTAL_VOLUME,
+    TRADE_COUNT, TRADE_SUMMARY_FIELDS, TRADE_VALUE, VWSP, factorize_symbols, summarize_trades,
+)
+
+
+class TestSummarizeTrades(unittest.TestCase):
+    """Test cases for the fused per-stock aggregation kernel."""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        size = 5000
+        start = datetime(2025, 3, 29, 9, 0)
+        self.trades = pd.DataFrame(
+            {
+                "stock_symbol": rng.choice(["TEA", "POP", "ALE", "GIN"], size=size),
+                "timestamp": [start + timedelta(milliseconds=i) for i in range(size)],
+                "quantity": rng.integers(1, 500, size=size),
+                "trade_type": rng.choice(["buy", "sell"], size=size),
+                "price": rng.uniform(50.0, 150.0, size=size).round(2),
+            }
+        )
+
+    def test_matches_groupby(self):
+        before = self.trades.copy()
+        summary = summarize_trades(self.trades)
+
+        trades = self.trades.assign(trade_value=self.trades["price"] * self.trades["quantity"])
+        grouped = trades.groupby("stock_symbol")
+        self.assertListEqual(summary.index.tolist(), sorted(trades["stock_symbol"].unique()))
+        np.testing.assert_allclose(summary[TRADE_VALUE], grouped["trade_value"].sum())
+        np.testing.assert_allclose(summary[TOTAL_VOLUME], grouped["quantity"].sum())
+        np.testing.assert_allclose(
+            summary[VWSP], grouped["trade_value"].sum() / grouped["quantity"].sum()
+        )
+        np.testing.assert_array_equal(summary[TRADE_COUNT], grouped.size())
+        np.testing.assert_array_equal(summary[MIN_PRICE], grouped["price"].min())
+        np.testing.assert_array_equal(summary[MAX_PRICE], grouped["price"].max())
+        np.testing.assert_array_equal(summary[LAST_PRICE], grouped["price"].last())
+        buys = trades[trades["trade_type"] == "buy"].groupby("stock_symbol")["quantity"].sum()
+        sells = trades[trades["trade_type"] == "sell"].groupby("stock_symbol")["quantity"].sum()
+        np.testing.assert_allclose(summary[BUY_VOLUME], buys)
+        np.testing.assert_allclose(summary[SELL_VOLUME], sells)
+
+        # The input trades are left untouched
+        pd.testing.assert_frame_equal(self.trades, before)
+
+    def test_summary_fields(self):
+        summary = summarize_trades(self.trades)
+        self.assertTupleEqual(tuple(summary.columns), TRADE_SUMMARY_FIELDS)
+
+    def test_factorize_symbols_matches_pandas(self):
+        symbols = np.random.default_rng(3).choice(["TEA", "POP", "ALE", "GIN"], size=200000).astype(object)
+        codes, unique_symbols = factorize_symbols(symbols)
+        expected_codes, expected_symbols = pd.factorize(symbols, sort=True)
+        np.testing.assert_array_equal(codes, expected_codes)
+        np.testing.assert_array_equal(unique_symbols, expected_symbols)
+        codes, unique_symbols = factorize_symbols(symbols, sort=False)
+        np.testing.assert_array_equal(unique_symbols[codes], symbols)
+        codes, unique_symbols = factorize_symbols(np.array([], dtype=object))
+        self.assertEqual((len(codes), len(unique_symbols)), (0, 0))
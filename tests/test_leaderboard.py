@@ -0,0 +1,104 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.kernels import TOTAL_VOLUME, TRADE_COUNT, TRADE_VALUE
+from calculators.leaderboard import LEADERBOARD_METRICS, VWSP_CHANGE, TopNLeaderboard
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, StockType, TradeType
+from exchange.market import Market
+from exchange.stock import Stock, StockInfo
+from exchange.trade import Trade
+
+
+VENUE = "leaderboard-test"
+SYMBOLS = [f"S{i:03d}" for i in range(200)]
+
+
+class TestTopNLeaderboard(unittest.TestCase):
+    """Test cases checking the incremental leaderboard against a full recompute."""
+
+    @classmethod
+    def setUpClass(cls):
+        StockInfo(VENUE).add_stocks(
+            [Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=1, fixed_dividend_pct=None, par_value=100)
+             for symbol in SYMBOLS]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def setUp(self):
+        self.market = Market(VENUE)
+        self.market._flush_trades()
+        self.start = datetime(2025, 3, 29, 9, 0)
+        self.leaderboard = TopNLeaderboard(now=self.start, venue=VENUE)
+        self.rng = np.random.default_rng(5)
+
+    def tearDown(self):
+        self.leaderboard.close()
+
+    def random_batch(self, count, end, span=timedelta(minutes=3)):
+        # Whole prices and quantities, so the sums are exact in any order
+        offsets = self.rng.integers(0, int(span.total_seconds() * 1000), count).astype("timedelta64[ms]")
+        return {
+            STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[self.rng.zipf(1.5, count) % len(SYMBOLS)],
+            TIMESTAMP: np.datetime64(end, "ns") - offsets.astype("timedelta64[ns]"),
+            QUANTITY: self.rng.integers(1, 1000, count),
+            TRADE_TYPE: np.full(count, TradeType.BUY.value, dtype=object),
+            PRICE: self.rng.integers(10, 200, count).astype(np.float64),
+        }
+
+    def expected_top(self, metric, n, now):
+        window = self.leaderboard.window
+        trades = self.market.get_trades(start_time=now - 2 * window)
+        trades = trades.assign(trade_value=trades[PRICE] * trades[QUANTITY])
+        current = trades[trades[TIMESTAMP] >= now - window].groupby(STOCK_SYMBOL)
+        values = pd.DataFrame({
+            TOTAL_VOLUME: current[QUANTITY].sum().astype(np.float64),
+            TRADE_VALUE: current["trade_value"].sum(),
+            TRADE_COUNT: current.size(),
+        })
+        if metric == VWSP_CHANGE:
+            previous = trades[trades[TIMESTAMP] < now - window].groupby(STOCK_SYMBOL)
+            previous_vwsp = previous["trade_value"].sum() / previous[QUANTITY].sum()
+            change = (values[TRADE_VALUE] / values[TOTAL_VOLUME] / previous_vwsp - 1).dropna()
+            ranked = pd.DataFrame({STOCK_SYMBOL: change.index, metric: change.to_numpy(), "key": -change.abs().to_numpy()})
+        else:
+            ranked = pd.DataFrame({STOCK_SYMBOL: values.index, metric: values[metric].to_numpy(), "key": -values[metric].to_numpy()})
+        ranked = ranked.sort_values(["key", STOCK_SYMBOL]).head(n).drop(columns="key")
+        return ranked.reset_index(drop=True)
+
+    def assert_top(self, now, n=20):
+        for metric in LEADERBOARD_METRICS:
+            with self.subTest(metric=metric, now=now):
+                result = self.leaderboard.top(metric, n=n, now=now)
+                expected = self.expected_top(metric, n, now)
+                self.assertListEqual(result[STOCK_SYMBOL].tolist(), expected[STOCK_SYMBOL].tolist())
+                np.testing.assert_allclose(result[metric].to_numpy(dtype=float), expected[metric].to_numpy(dtype=float))
+
+    def test_top_as_trades_arrive_and_expire(self):
+        now = self.start
+        for step in range(12):
+            now += timedelta(minutes=1)
+            # Batches straddle the window boundaries, and include late trades
+            self.market.add_trades(self.random_batch(2000, now))
+            self.assert_top(now)
+        # Jump past both windows
+        self.assertTrue(self.leaderboard.top(TOTAL_VOLUME, now=now + timedelta(minutes=11)).empty)
+
+    def test_single_trades(self):
+        for second in range(300):
+            self.market.add_trade(Trade(stock_symbol=SYMBOLS[second % 7], timestamp=self.start + timedelta(seconds=second),
+                                        quantity=second + 1, trade_type=TradeType.SELL, price=10.0 + second % 3, venue=VENUE))
+        self.assert_top(self.start + timedelta(minutes=5), n=5)
+        self.assert_top(self.start + timedelta(minutes=8), n=5)
+
+    def test_flush_and_invalid_metric(self):
+        self.market.add_trades(self.random_batch(100, self.start + timedelta(minutes=1)))
+        self.market._flush_trades()
+        self.assertTrue(self.leaderboard.top(TRADE_COUNT, now=self.start + timedelta(minutes=1)).empty)
+        with self.assertRaises(ValueError):
+            self.leaderboard.top("price")
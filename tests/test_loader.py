@@ -0,0 +1,120 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import market_cli
+from calculators.trade_stats import VolumeWeightedStockPriceCalculator
+from common.constants import TradeType
+from exchange.loader import load_trades, read_trade_chunks
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+
+
+VENUE = "loader-test"
+REFERENCE_VENUE = "loader-reference"
+
+
+class TestLoader(unittest.TestCase):
+    """Test cases for the streaming trade file loader."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.start = datetime(2025, 3, 29, 9, 0)
+        cls.records = [
+            {
+                "stock_symbol": ["TEA", "POP", "ALE", "GIN", "JOE"][i % 5],
+                "timestamp": (cls.start + timedelta(seconds=(i * 37) % 600)).isoformat(),
+                "quantity": 1 + i % 40,
+                "trade_type": ["buy", "sell"][i % 2],
+                "price": 100.0 + i % 23,
+            }
+            for i in range(1000)
+        ]
+        cls.csv_path = os.path.join(cls.directory, "trades.csv")
+        with open(cls.csv_path, "w") as f:
+            f.write("stock_symbol,timestamp,quantity,trade_type,price\n")
+            for record in cls.records:
+                f.write(",".join(str(value) for value in record.values()) + "\n")
+        cls.ndjson_path = os.path.join(cls.directory, "trades.ndjson")
+        with open(cls.ndjson_path, "w") as f:
+            for record in cls.records:
+                f.write(json.dumps(record) + "\n")
+
+        StockInfo(REFERENCE_VENUE).add_stocks(sample_stocks())
+        for record in cls.records:
+            Market(REFERENCE_VENUE).add_trade(
+                Trade(stock_symbol=record["stock_symbol"], timestamp=datetime.fromisoformat(record["timestamp"]),
+                      quantity=record["quantity"], trade_type=TradeType(record["trade_type"]),
+                      price=record["price"], venue=REFERENCE_VENUE)
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        for venue in (VENUE, REFERENCE_VENUE):
+            Market.discard(venue)
+            StockInfo.discard(venue)
+
+    def setUp(self):
+        StockInfo.discard(VENUE)
+        Market.discard(VENUE)
+        StockInfo(VENUE).add_stocks(sample_stocks())
+
+    def assert_matches_reference(self):
+        as_of = self.start + timedelta(minutes=10)
+        expected = VolumeWeightedStockPriceCalculator(venue=REFERENCE_VENUE, now=as_of).calculate()
+        result = VolumeWeightedStockPriceCalculator(venue=VENUE, now=as_of).calculate()
+        self.assertDictEqual(result.to_dict(), expected.to_dict())
+        self.assertListEqual(
+            Market(VENUE).get_trades()["quantity"].tolist(),
+            Market(REFERENCE_VENUE).get_trades()["quantity"].tolist(),
+        )
+
+    def test_chunks_are_bounded(self):
+        chunk_sizes = [len(chunk) for chunk in read_trade_chunks(self.csv_path, chunk_size=300)]
+        self.assertListEqual(chunk_sizes, [300, 300, 300, 100])
+
+    def test_load_csv(self):
+        self.assertEqual(load_trades(self.csv_path, venue=VENUE, chunk_size=128), 1000)
+        self.assert_matches_reference()
+
+    def test_load_ndjson(self):
+        self.assertEqual(load_trades(self.ndjson_path, venue=VENUE, chunk_size=128), 1000)
+        self.assert_matches_reference()
+
+    def test_invalid_chunk_is_rejected(self):
+        path = os.path.join(self.directory, "invalid.csv")
+        with open(path, "w") as f:
+            f.write("stock_symbol,timestamp,quantity,trade_type,price\n")
+            f.write("TEA,2025-03-29T09:00:00,10,buy,100.0\n")
+            f.write("BEER,2025-03-29T09:00:01,10,buy,100.0\n")
+        with self.assertRaises(ValueError):
+            load_trades(path, venue=VENUE)
+        self.assertEqual(len(Market(VENUE).get_trades()), 0)
+
+    def test_bulk_add_rejects_late_trades(self):
+        market = Market(VENUE)
+        market.configure_ingestion(max_lateness=timedelta(minutes=1))
+        load_trades(self.csv_path, venue=VENUE, chunk_size=1000)
+        # Trades span 10 minutes, the ones more than a minute before the latest are rejected
+        self.assertEqual(len(market.get_trades()) + len(market.get_rejected_trades()), 1000)
+        self.assertGreater(len(market.get_rejected_trades()), 0)
+        self.assertGreaterEqual(
+            market.get_trades()["timestamp"].min(), market.latest_timestamp - timedelta(minutes=1)
+        )
+
+    def test_cli(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exit_code = market_cli.main(["load", self.csv_path, "--venue", "loader-cli-test", "--chunk-size", "256"])
+        Market.discard("loader-cli-test")
+        StockInfo.discard("loader-cli-test")
+        self.assertEqual(exit_code, 0)
+        self.assertIn("Loaded 1000 trades", output.getvalue())
+        self.assertIn("All Share Index", output.getvalue())
@@ -1,11 +1,13 @@
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
+import numpy as np
 from pandas import Timestamp
 from common.constants import TradeType
 from exchange.stock import StockInfo, Stock, StockType
 from exchange.trade import Trade  # Adjust the import based on your module structure
 from exchange.market import Market  # Adjust based on your actual import paths
+from exchange.synthetic import SyntheticSession, to_trades
 
 
 class TestMarket(unittest.TestCase):
@@ -70,6 +72,9 @@ class TestMarket(unittest.TestCase):
             price=2500.0,
         )
 
+    def tearDown(self):
+        self.market.configure_ingestion(max_lateness=None)
+
     def test_add_trade(self):
         self.market.add_trade(self.trade_a)
         trades = self.market.get_trades()
@@ -129,42 +134,112 @@ class TestMarket(unittest.TestCase):
     def test_large_number_of_trades(self):
         # Adding a large number of trades for multiple stocks
         num_trades = 100000
-        for i in range(num_trades):
-            stock_symbol = ['JUICE', 'MILK', 'WATER', 'SODA'][i % 4]
-            trade = Trade(
-                stock_symbol = stock_symbol,
-                timestamp = datetime(2023, 10, 5, 14, 0),
-                quantity = i + 1,
-                trade_type = TradeType.BUY if i % 2 == 0 else TradeType.SELL,
-                price = 150.0 + i
-            )
-            self.market.add_trade(trade)
+        session = SyntheticSession(
+            stock_symbols=['JUICE', 'MILK', 'WATER', 'SODA'], start_time=datetime(2023, 10, 5, 14, 0),
+            seed=11, out_of_order_fraction=0.05,
+        )
+        batch = session.batch(num_trades)
+        self.assertEqual(self.market.add_trades(batch), num_trades)
 
         trades = self.market.get_trades()
-        # Ensure all trades are added
+        # Ensure all trades are added, time sorted
         self.assertEqual(len(trades), num_trades)
+        self.assertTrue(trades["timestamp"].is_monotonic_increasing)
 
-        # Filtering for specific stock
-        juice_trades = self.market.get_trades("stock_symbol == 'JUICE'")
-        juice_count = len(juice_trades)
-        self.assertEqual(juice_count, num_trades // 4)
-
-        milk_trades = self.market.get_trades("stock_symbol == 'MILK'")
-        milk_count = len(milk_trades)
-        self.assertEqual(milk_count, num_trades // 4)
-
-        water_trades = self.market.get_trades("stock_symbol == 'WATER'")
-        water_count = len(water_trades)
-        self.assertEqual(water_count, num_trades // 4)
-
-        soda_trades = self.market.get_trades("stock_symbol == 'SODA'")
-        soda_count = len(soda_trades)
-        self.assertEqual(soda_count, num_trades // 4)
+        # Filtering for each stock
+        for stock_symbol in ('JUICE', 'MILK', 'WATER', 'SODA'):
+            stock_trades = self.market.get_trades(f"stock_symbol == '{stock_symbol}'")
+            self.assertEqual(len(stock_trades), (batch["stock_symbol"] == stock_symbol).sum())
 
         # Filtering for buy trades
         buy_trades = self.market.get_trades("trade_type == 'buy'")
-        self.assertEqual(len(buy_trades), num_trades // 2)
+        self.assertEqual(len(buy_trades), (batch["trade_type"] == "buy").sum())
 
         # Filtering for sell trades
         sell_trades = self.market.get_trades("trade_type == 'sell'")
-        self.assertEqual(len(sell_trades), num_trades // 2)
\ No newline at end of file
+        self.assertEqual(len(sell_trades), num_trades - len(buy_trades))
+
+    def test_many_single_trades(self):
+        trades = to_trades(SyntheticSession(start_time=datetime(2023, 10, 5, 14, 0), seed=12).batch(5000))
+        for trade in trades:
+            self.assertTrue(self.market.add_trade(trade))
+        self.assertListEqual(self.market.get_trades()["quantity"].tolist(), [trade.quantity for trade in trades])
+
+    def test_out_of_order_trades_are_time_sorted(self):
+        self.market.add_trade(self.trade_b)
+        self.market.add_trade(self.trade_a)
+        trades = self.market.get_trades()
+        self.assertListEqual(trades["stock_symbol"].tolist(), ["JUICE", "MILK"])
+        self.assertTrue(trades["timestamp"].is_monotonic_increasing)
+
+    def test_get_trades_time_window(self):
+        self.market.add_trade(self.trade_a)
+        self.market.add_trade(self.trade_b)
+        trades = self.market.get_trades(start_time=datetime(2023, 10, 6))
+        self.assertListEqual(trades["stock_symbol"].tolist(), ["MILK"])
+        trades = self.market.get_trades(end_time=datetime(2023, 10, 6))
+        self.assertListEqual(trades["stock_symbol"].tolist(), ["JUICE"])
+
+    def test_late_trades_within_bound_are_merged(self):
+        self.market.configure_ingestion(max_lateness=timedelta(minutes=10), merge_batch_size=3)
+        start = datetime(2023, 10, 5, 14, 0)
+        offsets = [0, 5, 2, 9, 1, 7, 3, 8, 4, 6]
+        for offset in offsets:
+            accepted = self.market.add_trade(
+                Trade(
+                    stock_symbol="WATER",
+                    timestamp=start + timedelta(minutes=offset),
+                    quantity=offset + 1,
+                    trade_type=TradeType.BUY,
+                    price=10.0,
+                )
+            )
+            self.assertTrue(accepted)
+        trades = self.market.get_trades()
+        self.assertListEqual(trades["quantity"].tolist(), list(range(1, 11)))
+        self.assertListEqual(self.market.get_rejected_trades(), [])
+
+    def test_late_trades_beyond_bound_are_rejected(self):
+        self.market.configure_ingestion(max_lateness=timedelta(minutes=5))
+        self.market.add_trade(self.trade_b)
+        accepted = self.market.add_trade(self.trade_a)
+        self.assertFalse(accepted)
+        self.assertListEqual(self.market.get_rejected_trades(), [self.trade_a])
+        self.assertEqual(len(self.market.get_trades()), 1)
+
+    def test_equal_timestamps_keep_arrival_order(self):
+        self.market.add_trade(self.trade_b)
+        for quantity in (1, 2, 3):
+            self.market.add_trade(
+                Trade(
+                    stock_symbol="SODA",
+                    timestamp=datetime(2023, 10, 5, 14, 0),
+                    quantity=quantity,
+                    trade_type=TradeType.SELL,
+                    price=1.0,
+                )
+            )
+        trades = self.market.get_trades("stock_symbol == 'SODA'")
+        self.assertListEqual(trades["quantity"].tolist(), [1, 2, 3])
+
+    def test_trades_view_is_read_only_and_shares_the_store(self):
+        self.market.add_trade(self.trade_a)
+        self.market.add_trade(self.trade_b)
+        view = self.market.get_trades_view()
+        self.assertListEqual(view["stock_symbol"].tolist(), self.market.get_trades()["stock_symbol"].tolist())
+        for name, column in self.market._trades.columns().items():
+            # Symbols are a categorical over the stored symbol ids
+            if name in view and name != "stock_symbol":
+                self.assertTrue(np.shares_memory(view[name].to_numpy(), column), name)
+        for name, value in (("price", 1.0), ("stock_symbol", "SODA")):
+            with self.assertRaises(ValueError):
+                view.loc[0, name] = value
+        self.assertEqual(self.market.get_trades()["stock_symbol"].tolist(), ["JUICE", "MILK"])
+
+    def test_trades_view_of_one_stock(self):
+        self.market.add_trade(self.trade_a)
+        self.market.add_trade(self.trade_b)
+        view = self.market.get_trades_view(stock_symbol="MILK", start_time=datetime(2023, 10, 1))
+        self.assertListEqual(view["quantity"].tolist(), [200])
+        with self.assertRaises(ValueError):
+            view.loc[0, "quantity"] = 1
@@ -0,0 +1,167 @@
+import os
+import time
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+
+import numpy as np
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.order_book import MatchingEngine
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from service import order_book_benchmark
+from service.order_book_benchmark import order_flow, replay
+
+
+VENUE = "order-book-test"
+
+BUY, SELL = TradeType.BUY, TradeType.SELL
+
+
+class TestMatchingEngine(unittest.TestCase):
+    """Test cases for the order books and their matching engine."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.engine = MatchingEngine(venue=VENUE, tick_size="0.01")
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def trades(self):
+        self.engine.flush()
+        columns = self.market.get_trade_columns()
+        return list(zip(columns[QUANTITY].tolist(), columns[PRICE].tolist(), columns[TRADE_TYPE].tolist()))
+
+    def test_price_time_priority(self):
+        engine = self.engine
+        first = engine.submit_limit("TEA", SELL, 100, 101.0, timestamp=1)
+        second = engine.submit_limit("TEA", SELL, 50, 101.0, timestamp=2)
+        better = engine.submit_limit("TEA", SELL, 30, 100.5, timestamp=3)
+        engine.submit_limit("TEA", BUY, 40, 99.0, timestamp=4)
+        self.assertEqual(engine.book("TEA").depth(SELL.value, 5), [(10050, 30), (10100, 150)])
+        self.assertEqual(self.trades(), [])
+
+        # Fills the best price first, then the oldest order at the next price, at their prices
+        self.assertIsNone(engine.submit_limit("TEA", BUY, 120, 101.0, timestamp=5))
+        self.assertEqual(self.trades(), [(30, 100.5, "buy"), (90, 101.0, "buy")])
+        self.assertFalse(engine.cancel(better))
+        self.assertTrue(engine.cancel(first))
+        self.assertFalse(engine.cancel(first))
+        self.assertEqual(engine.book("TEA").depth(SELL.value, 5), [(10100, 50)])
+
+        # A sell crossing the bids trades as a sell, and rests the rest
+        resting = engine.submit_limit("TEA", SELL, 60, 99.0, timestamp=6)
+        self.assertIsNotNone(resting)
+        self.assertEqual(self.trades()[-1], (40, 99.0, "sell"))
+        self.assertEqual((engine.book("TEA").best_bid(), engine.book("TEA").best_ask()), (None, 9900))
+        self.assertEqual(engine.resting_orders(), 2)
+        self.assertEqual(self.market.get_trade_columns()[TIMESTAMP][-1], np.datetime64(6, "ns"))
+        self.assertEqual(engine.book("TEA").depth(SELL.value, 5), [(9900, 20), (10100, 50)])
+        self.assertTrue(engine.cancel(second))
+
+    def test_market_orders(self):
+        engine = self.engine
+        self.assertEqual(engine.submit_market("GIN", BUY, 10), 0)
+        engine.submit_limit("GIN", SELL, 20, 50.0)
+        engine.submit_limit("GIN", SELL, 20, 52.0)
+        engine.submit_limit("GIN", BUY, 5, 40.0)
+        self.assertEqual(engine.submit_market("GIN", BUY, 100), 40)
+        self.assertEqual(engine.submit_market("GIN", SELL, 3), 3)
+        self.assertEqual(self.trades(), [(20, 50.0, "buy"), (20, 52.0, "buy"), (3, 40.0, "sell")])
+        self.assertEqual(engine.book("GIN").depth(BUY.value, 5), [(4000, 2)])
+        self.assertIsNone(engine.book("GIN").best_ask())
+
+    def test_trades_are_added_in_batches(self):
+        engine = MatchingEngine(venue=VENUE, batch_size=3)
+        for _ in range(4):
+            engine.submit_limit("ALE", SELL, 1, 60.0)
+        engine.submit_limit("ALE", BUY, 2, 60.0)
+        self.assertEqual(len(self.market.get_trade_columns()[PRICE]), 0)
+        engine.submit_limit("ALE", BUY, 2, 60.0)
+        self.assertEqual(len(self.market.get_trade_columns()[PRICE]), 4)
+        self.assertEqual(engine.flush(), 0)
+        self.assertEqual(set(self.market.get_trade_columns()[STOCK_SYMBOL]), {"ALE"})
+
+    def test_default_timestamp_is_local_time(self):
+        # Trades are timestamped in naive local time, like the rest of the Market, not UTC
+        previous = os.environ.get("TZ")
+        os.environ["TZ"] = "America/New_York"
+        time.tzset()
+        try:
+            before = datetime.now()
+            self.engine.submit_limit("ALE", SELL, 1, 60.0)
+            self.engine.submit_limit("ALE", BUY, 1, 60.0)
+            after = datetime.now()
+        finally:
+            if previous is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = previous
+            time.tzset()
+        self.engine.flush()
+        timestamp = self.market.get_trade_columns()[TIMESTAMP][0].astype("datetime64[us]").tolist()
+        self.assertTrue(before <= timestamp <= after)
+
+    def test_cancel_churn_keeps_the_book_bounded(self):
+        book = self.engine.book("ALE")
+        self.engine.submit_limit("ALE", BUY, 5, 95.0)
+        self.engine.submit_limit("ALE", SELL, 5, 100.0)
+        for _ in range(10000):
+            # Away from the best price, and behind an order resting at it
+            self.engine.cancel(self.engine.submit_limit("ALE", BUY, 1, 90.0))
+            self.engine.cancel(self.engine.submit_limit("ALE", BUY, 1, 95.0))
+        self.assertEqual(len(book.bid_prices), 2)
+        self.assertEqual(len(book.bids[self.engine.to_ticks(95.0)].orders), 1)
+        self.assertEqual(book.best_bid(), self.engine.to_ticks(95.0))
+        self.assertEqual(self.engine.submit_market("ALE", SELL, 10), 5)
+        self.assertEqual((book.best_bid(), len(book.bid_prices)), (None, 0))
+        self.engine.submit_limit("ALE", BUY, 1, 90.0)
+        self.assertEqual(book.best_bid(), self.engine.to_ticks(90.0))
+
+    def test_invalid_orders(self):
+        with self.assertRaises(ValueError):
+            self.engine.submit_limit("XXX", BUY, 10, 100.0)
+        with self.assertRaises(ValueError):
+            self.engine.submit_limit("TEA", BUY, 10, 100.005)
+        with self.assertRaises(ValueError):
+            self.engine.submit_limit("TEA", BUY, 10, 0.0)
+        with self.assertRaises(ValueError):
+            self.engine.submit_market("TEA", SELL, 0)
+        with self.assertRaises(ValueError):
+            MatchingEngine(venue=VENUE, batch_size=0)
+        self.assertEqual(self.engine.events, 0)
+
+    def test_random_order_flow(self):
+        stocks = StockInfo(VENUE).snapshot()
+        mid_prices = [10000] * len(stocks)
+        flow = order_flow(50000, len(stocks), seed=3)
+        replay(self.engine, flow, mid_prices)
+        self.assertEqual(self.engine.events, 50000)
+        self.assertEqual(len(self.market.get_trade_columns()[PRICE]), self.engine.trades)
+        self.assertGreater(self.engine.trades, 10000)
+
+        resting = 0
+        for book in self.engine.books.values():
+            best_bid, best_ask = book.best_bid(), book.best_ask()
+            if best_bid is not None and best_ask is not None:
+                self.assertLess(best_bid, best_ask)
+            for levels in (book.bids, book.asks):
+                for level in levels.values():
+                    self.assertEqual(level.volume, sum(order.quantity for order in level.orders))
+                    resting += sum(1 for order in level.orders if order.quantity)
+        self.assertEqual(resting, self.engine.resting_orders())
+
+    def test_benchmark(self):
+        with redirect_stdout(StringIO()) as stdout:
+            exit_code = order_book_benchmark.main(["--events", "20000", "--venue", VENUE])
+        self.assertEqual(exit_code, 0)
+        self.assertIn("events/s", stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
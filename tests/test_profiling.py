@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+import market_cli
+from exchange.market import Market
+from exchange.stock import StockInfo
+from utils.profiling import Profiler
+
+
+def busy_loop(seconds):
+    """Burn CPU, allocating along the way."""
+    blocks = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        blocks.append(bytearray(1024))
+    return blocks
+
+
+class TestProfiler(unittest.TestCase):
+    """Test cases for the profiling mode of the entry points."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.directory, "profiles")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_phase_reports(self):
+        profiler = Profiler(self.output_dir, sample_interval=0.001)
+        with profiler.phase("busy"):
+            blocks = busy_loop(0.2)
+        with profiler.phase("idle"):
+            pass
+        self.assertFalse(tracemalloc.is_tracing())
+
+        busy = profiler.phases[0]
+        self.assertGreaterEqual(busy["wall_seconds"], 0.2)
+        self.assertGreater(busy["samples"], 10)
+        self.assertGreater(busy["allocated_bytes"], len(blocks) * 1024)
+        with open(busy["reports"]["collapsed"]) as collapsed_file:
+            stack, count = collapsed_file.readline().rsplit(" ", 1)
+        self.assertIn("test_phase_reports (test_profiling.py", stack)
+        self.assertIn(";busy_loop (test_profiling.py", stack)
+        self.assertGreater(int(count), 0)
+        with open(busy["reports"]["txt"]) as report_file:
+            report = report_file.read()
+        self.assertIn("busy_loop", report)
+        self.assertIn("Allocation sites by memory growth", report)
+
+        with open(profiler.write_summary()) as summary_file:
+            summary = json.load(summary_file)
+        self.assertEqual([phase["phase"] for phase in summary["phases"]], ["busy", "idle"])
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)),
+            sorted(f"{prefix}.{kind}" for prefix in ("00-busy", "01-idle") for kind in ("prof", "txt", "collapsed"))
+            + ["summary.json"],
+        )
+        self.assertIn("busy", profiler.summary())
+
+    def test_disabled_profiler_only_times_phases(self):
+        profiler = Profiler()
+        with profiler.phase("busy"):
+            busy_loop(0.01)
+        self.assertEqual(list(profiler.phases[0]), ["phase", "wall_seconds"])
+        self.assertIsNone(profiler.write_summary())
+        self.assertFalse(os.path.exists(self.output_dir))
+
+    def test_cli_profiling_mode(self):
+        trades_path = os.path.join(self.directory, "trades.csv")
+        venue = "profiling-cli-test"
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                market_cli.main(["generate", trades_path, "--trades", "2000", "--venue", venue, "--start", "2025-03-29T09:00"])
+                StockInfo.discard(venue)
+                exit_code = market_cli.main(["--profile", self.output_dir, "load", trades_path, "--venue", venue])
+        finally:
+            Market.discard(venue)
+            StockInfo.discard(venue)
+        self.assertEqual(exit_code, 0)
+        self.assertIn("All Share Index", stdout.getvalue())
+        self.assertIn("Profile reports written to", stderr.getvalue())
+        with open(os.path.join(self.output_dir, "summary.json")) as summary_file:
+            phases = [phase["phase"] for phase in json.load(summary_file)["phases"]]
+        self.assertEqual(phases, ["stocks", "ingest", "vwsp", "stock_stats", "all_share_index"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.quantiles import PriceQuantileCalculator, TradeSizeQuantileCalculator, WindowedQuantileSketches
+from calculators.sketches import QuantileSketch, merge_sketch_maps, sketch_by_symbol
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TRADE_WINDOW, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+
+
+VENUES = ("quantile-test-a", "quantile-test-b")
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+QUANTILES = (0.01, 0.25, 0.5, 0.95, 0.99, 1.0)
+
+
+def exact_quantiles(values, quantiles):
+    ordered = np.sort(values)
+    return ordered[np.floor(np.asarray(quantiles) * (len(ordered) - 1)).astype(int)]
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """Test cases for QuantileSketch."""
+
+    def setUp(self):
+        rng = np.random.default_rng(17)
+        self.values = rng.lognormal(mean=4, sigma=1.5, size=50000)
+
+    def test_relative_error_bound(self):
+        for accuracy, max_buckets in ((0.01, 2048), (0.001, 8192)):
+            sketch = QuantileSketch(relative_accuracy=accuracy, max_buckets=max_buckets)
+            sketch.add(self.values)
+            expected = exact_quantiles(self.values, QUANTILES)
+            np.testing.assert_array_less(np.abs(sketch.quantiles(QUANTILES) - expected), accuracy * expected + 1e-12)
+            self.assertEqual(sketch.count, len(self.values))
+
+    def test_merge_equals_sketch_of_union(self):
+        whole = QuantileSketch()
+        whole.add(self.values)
+        merged = QuantileSketch()
+        for part in np.array_split(self.values, 7):
+            sketch = QuantileSketch()
+            sketch.add(part)
+            merged.merge(sketch)
+        np.testing.assert_array_equal(merged.quantiles(QUANTILES), whole.quantiles(QUANTILES))
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(relative_accuracy=0.02))
+
+    def test_bounded_memory(self):
+        sketch = QuantileSketch(max_buckets=256)
+        sketch.add(self.values)
+        self.assertLessEqual(sketch.nbytes, 256 * 8)
+        self.assertEqual(sketch.count, len(self.values))
+        # High quantiles keep the error bound, only the collapsed low buckets lose it
+        expected = exact_quantiles(self.values, [0.99, 1.0])
+        np.testing.assert_array_less(np.abs(sketch.quantiles([0.99, 1.0]) - expected), 0.01 * expected)
+
+    def test_invalid_values(self):
+        sketch = QuantileSketch()
+        self.assertTrue(np.isnan(sketch.quantile(0.5)))
+        with self.assertRaises(ValueError):
+            sketch.add(np.array([1.0, 0.0]))
+        with self.assertRaises(ValueError):
+            sketch.quantiles([1.5])
+        with self.assertRaises(ValueError):
+            QuantileSketch(relative_accuracy=1.0)
+
+    def test_sketch_by_symbol(self):
+        symbols = np.array(SYMBOLS, dtype=object)[np.arange(len(self.values)) % len(SYMBOLS)]
+        sketches = sketch_by_symbol(symbols, self.values)
+        self.assertListEqual(sorted(sketches), sorted(SYMBOLS))
+        for symbol, sketch in sketches.items():
+            expected = QuantileSketch()
+            expected.add(self.values[symbols == symbol])
+            np.testing.assert_array_equal(sketch.quantiles(QUANTILES), expected.quantiles(QUANTILES))
+
+
+class TestQuantileCalculators(unittest.TestCase):
+    """Test cases for the price and trade size quantile calculators."""
+
+    def setUp(self):
+        # On a bucket boundary, so the bucketed window matches the exact one
+        self.now = datetime(2025, 3, 29, 12, 0)
+        rng = np.random.default_rng(23)
+        self.batches = {}
+        for venue in VENUES:
+            StockInfo(venue).add_stocks(sample_stocks())
+            count = 20000
+            self.batches[venue] = {
+                STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[rng.integers(0, len(SYMBOLS), count)],
+                TIMESTAMP: np.datetime64(self.now - timedelta(minutes=10), "ns")
+                + rng.integers(0, 10 * 60 * 10**9, count).astype("timedelta64[ns]"),
+                QUANTITY: rng.integers(1, 10000, count),
+                TRADE_TYPE: np.full(count, TradeType.BUY.value, dtype=object),
+                PRICE: rng.lognormal(mean=5, sigma=0.3, size=count).round(2),
+            }
+        self.sketches = WindowedQuantileSketches(now=self.now - timedelta(minutes=10), venue=VENUES[0])
+
+    def tearDown(self):
+        self.sketches.close()
+        for venue in VENUES:
+            Market.discard(venue)
+            StockInfo.discard(venue)
+
+    def expected(self, batches, column):
+        symbols = np.concatenate([batch[STOCK_SYMBOL] for batch in batches])
+        timestamps = np.concatenate([batch[TIMESTAMP] for batch in batches])
+        values = np.concatenate([batch[column] for batch in batches])
+        in_window = timestamps >= np.datetime64(self.now - timedelta(minutes=5), "ns")
+        return {
+            symbol: exact_quantiles(values[in_window & (symbols == symbol)], (0.5, 0.95, 0.99))
+            for symbol in SYMBOLS
+        }
+
+    def assert_within_bound(self, result, expected):
+        for symbol, exact in expected.items():
+            np.testing.assert_array_less(np.abs(result.loc[symbol].to_numpy() - exact), 0.01 * exact + 1e-12)
+
+    def test_quantiles_from_trades(self):
+        Market(VENUES[0]).add_trades(self.batches[VENUES[0]])
+        for calculator, column in ((PriceQuantileCalculator, PRICE), (TradeSizeQuantileCalculator, QUANTITY)):
+            result = calculator(venue=VENUES[0], now=self.now).calculate()
+            self.assertListEqual(result.columns.tolist(), ["p50", "p95", "p99"])
+            self.assert_within_bound(result, self.expected([self.batches[VENUES[0]]], column))
+        single = PriceQuantileCalculator(stock_symbol="GIN", venue=VENUES[0], now=self.now).calculate()
+        self.assertIsInstance(single, pd.Series)
+        self.assertIsNone(PriceQuantileCalculator(venue=VENUES[1], now=self.now).calculate())
+
+    def test_quantiles_from_windowed_sketches(self):
+        Market(VENUES[0]).add_trades(self.batches[VENUES[0]])
+        from_trades = PriceQuantileCalculator(venue=VENUES[0], now=self.now).calculate()
+        from_sketches = PriceQuantileCalculator(sketches=self.sketches.merged(PRICE, now=self.now)).calculate()
+        pd.testing.assert_frame_equal(from_sketches, from_trades)
+        sizes = TradeSizeQuantileCalculator(sketches=self.sketches.merged(QUANTITY, now=self.now)).calculate()
+        self.assert_within_bound(sizes, self.expected([self.batches[VENUES[0]]], QUANTITY))
+        # Only the buckets of one window are kept
+        self.assertLessEqual(len(self.sketches._buckets), 31)
+        self.assertGreater(self.sketches.memory_usage(), 0)
+
+    def test_quantiles_from_windowed_sketches_of_the_venue(self):
+        market = Market(VENUES[0])
+        batch = self.batches[VENUES[0]]
+        first = batch[TIMESTAMP] < np.datetime64(self.now - timedelta(minutes=2), "ns")
+        market.add_trades({name: column[first] for name, column in batch.items()})
+        listeners = len(market._listeners)
+
+        def from_trades(now, column=PRICE):
+            trades = market.get_trade_columns(start_time=now - TRADE_WINDOW)
+            return sketch_by_symbol(trades[STOCK_SYMBOL], trades[column])
+
+        # Off a bucket boundary, the trades of the bucket the window starts in are read back
+        now = self.now - timedelta(minutes=2, seconds=7)
+        self.sketches.advance(now)
+        calculator = PriceQuantileCalculator(sketches=self.sketches, venue=VENUES[0], now=now)
+        pd.testing.assert_frame_equal(calculator.calculate(), PriceQuantileCalculator(sketches=from_trades(now)).calculate())
+        self.assertIsNone(calculator.tick_size)
+        self.assertEqual(calculator.summary["trade_count"].sum(), len(market.get_trade_columns(start_time=now - TRADE_WINDOW)[PRICE]))
+
+        # Trades added since are added to the buckets, the calculators do not advance them
+        market.add_trades({name: column[~first] for name, column in batch.items()})
+        first_bucket = self.sketches._first_bucket
+        for calculator, column in ((PriceQuantileCalculator, PRICE), (TradeSizeQuantileCalculator, QUANTITY)):
+            result = calculator(sketches=self.sketches, venue=VENUES[0], now=self.now).calculate()
+            pd.testing.assert_frame_equal(result, calculator(sketches=from_trades(self.now, column)).calculate())
+        single = PriceQuantileCalculator(stock_symbol="GIN", sketches=self.sketches, venue=VENUES[0], now=self.now).calculate()
+        expected = PriceQuantileCalculator(stock_symbol="GIN", sketches=from_trades(self.now)).calculate()
+        pd.testing.assert_series_equal(single, expected)
+        self.assertEqual(self.sketches._first_bucket, first_bucket)
+
+        # A window starting before the buckets kept is sketched from the trades
+        self.sketches.advance(self.now)
+        now = self.now - timedelta(minutes=4)
+        result = PriceQuantileCalculator(sketches=self.sketches, venue=VENUES[0], now=now).calculate()
+        pd.testing.assert_frame_equal(result, PriceQuantileCalculator(sketches=from_trades(now)).calculate())
+        # Queries without sketches do not follow the Market
+        PriceQuantileCalculator(venue=VENUES[0], now=self.now).calculate()
+        self.assertEqual(len(market._listeners), listeners)
+
+    def test_quantiles_merged_across_venues(self):
+        for venue in VENUES:
+            Market(venue).add_trades(self.batches[venue])
+        other = WindowedQuantileSketches(now=self.now - timedelta(minutes=10), venue=VENUES[1])
+        sketches = merge_sketch_maps([self.sketches.merged(PRICE, now=self.now), other.merged(PRICE, now=self.now)])
+        other.close()
+        result = PriceQuantileCalculator(sketches=sketches).calculate()
+        self.assert_within_bound(result, self.expected(list(self.batches.values()), PRICE))
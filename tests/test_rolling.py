@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime, timedelta
+
+from calculators.rolling import RollingVolumeWeightedStockPrice
+from common.constants import StockType, TradeType
+from exchange.market import Market
+from exchange.stock import Stock, StockInfo
+from exchange.trade import Trade
+
+
+class TestRollingVolumeWeightedStockPrice(unittest.TestCase):
+    """Test cases for RollingVolumeWeightedStockPrice."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stock_info = StockInfo()
+        cls.stock_info._remove_all_stocks()
+        cls.stock_info.add_stocks(
+            [
+                Stock(stock_symbol='ABC', type=StockType.COMMON, last_dividend=5.0, fixed_dividend_pct=0.0, par_value=100.0),
+                Stock(stock_symbol='XYZ', type=StockType.PREFERRED, last_dividend=8.0, fixed_dividend_pct=2.0, par_value=100.0),
+            ]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stock_info._remove_all_stocks()
+
+    def setUp(self):
+        self.market = Market()
+        self.market._flush_trades()
+        self.now = datetime(2025, 3, 29, 9, 0)
+        self.rolling_vwsp = RollingVolumeWeightedStockPrice(now=self.now)
+
+    def tearDown(self):
+        self.rolling_vwsp.close()
+        self.market.configure_ingestion(max_lateness=None)
+        self.market._flush_trades()
+
+    def add_trade(self, stock_symbol, minutes, quantity, price):
+        return self.market.add_trade(
+            Trade(stock_symbol=stock_symbol, timestamp=self.now + timedelta(minutes=minutes),
+                  quantity=quantity, trade_type=TradeType.BUY, price=price)
+        )
+
+    def test_vwsp_follows_new_trades(self):
+        self.add_trade('ABC', 0, 100, 10.0)
+        self.add_trade('ABC', 1, 300, 20.0)
+        self.add_trade('XYZ', 1, 50, 5.0)
+        result = self.rolling_vwsp.calculate(stock_symbol='ABC', now=self.now + timedelta(minutes=1))
+        self.assertAlmostEqual(result, (10.0 * 100 + 20.0 * 300) / 400, places=2)
+
+    def test_vwsp_drops_expired_trades(self):
+        self.add_trade('ABC', 0, 100, 10.0)
+        self.add_trade('ABC', 3, 100, 20.0)
+        result = self.rolling_vwsp.calculate(stock_symbol='ABC', now=self.now + timedelta(minutes=6))
+        self.assertAlmostEqual(result, 20.0, places=2)
+        result = self.rolling_vwsp.calculate(stock_symbol='ABC', now=self.now + timedelta(minutes=9))
+        self.assertIsNone(result)
+
+    def test_vwsp_corrected_by_late_trades(self):
+        self.market.configure_ingestion(max_lateness=timedelta(minutes=2))
+        self.add_trade('ABC', 0, 100, 10.0)
+        self.add_trade('ABC', 4, 100, 20.0)
+        self.assertTrue(self.add_trade('ABC', 3, 200, 30.0))
+        self.assertFalse(self.add_trade('ABC', 1, 500, 40.0))
+        result = self.rolling_vwsp.calculate(stock_symbol='ABC', now=self.now + timedelta(minutes=4))
+        self.assertAlmostEqual(result, (10.0 * 100 + 20.0 * 100 + 30.0 * 200) / 400, places=2)
+
+    def test_matches_full_recomputation(self):
+        for i in range(200):
+            self.add_trade(['ABC', 'XYZ'][i % 2], (i * 7) % 10, i + 1, 10.0 + i % 13)
+        now = self.now + timedelta(minutes=8)
+        result = self.rolling_vwsp.calculate(now=now)
+        trades = self.market.get_trades(start_time=now - timedelta(minutes=5))
+        trades["trade_value"] = trades["price"] * trades["quantity"]
+        sums = trades.groupby("stock_symbol")[["trade_value", "quantity"]].sum()
+        expected = (sums["trade_value"] / sums["quantity"]).round(2)
+        self.assertListEqual(result["stock_symbol"].tolist(), expected.index.tolist())
+        self.assertListEqual(result["volume_weighted_stock_price"].tolist(), expected.tolist())
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from calculators.trade_stats import VolumeWeightedStockPriceCalculator
+from common.constants import StockType, TradeType
+from exchange.market import Market
+from exchange.stock import Stock, StockInfo
+from exchange.trade import Trade
+from service import protocol
+from service.client import StatsClient
+from service.server import StatsServer
+from utils.singleflight import SingleFlight
+
+
+VENUE = "stats-server-test"
+
+
+class TestStatsServer(unittest.TestCase):
+    """Test cases for the stats server and its client."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.socket_path = os.path.join(tempfile.mkdtemp(), "stats.sock")
+        cls.server = StatsServer(cls.socket_path, venue=VENUE)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+
+        cls.stocks = [
+            Stock(stock_symbol='ABC', type=StockType.COMMON, last_dividend=5.0, fixed_dividend_pct=None, par_value=100.0),
+            Stock(stock_symbol='XYZ', type=StockType.PREFERRED, last_dividend=8.0, fixed_dividend_pct=0.02, par_value=100.0),
+        ]
+        # The server runs in this process, so its StockInfo also validates the trades created here
+        cls.client = StatsClient(cls.socket_path)
+        cls.client.add_stocks(cls.stocks)
+        now = datetime.now()
+        cls.trades = [
+            Trade(stock_symbol=['ABC', 'XYZ'][i % 2], timestamp=now - timedelta(seconds=i),
+                  quantity=10 + i, trade_type=TradeType.BUY, price=100.0 + i % 7, venue=VENUE)
+            for i in range(100)
+        ]
+        cls.client.add_trades(cls.trades)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_ping(self):
+        self.assertEqual(self.client.ping(), "pong")
+
+    def test_vwsp(self):
+        expected = VolumeWeightedStockPriceCalculator(stock_symbol='ABC', venue=VENUE).calculate()
+        self.assertAlmostEqual(self.client.vwsp(stock_symbol='ABC'), expected, places=2)
+        records = self.client.vwsp()
+        self.assertListEqual([record['stock_symbol'] for record in records], ['ABC', 'XYZ'])
+
+    def test_all_share_index_and_stock_stats(self):
+        self.assertGreater(self.client.all_share_index(), 0)
+        self.assertAlmostEqual(self.client.dividend_yield('ABC', 50.0), 0.1)
+        self.assertAlmostEqual(self.client.pe_ratio('ABC', 50.0), 500.0)
+
+    def test_errors_are_reported(self):
+        with self.assertRaises(ValueError):
+            self.client.dividend_yield('INVALID', 50.0)
+        with self.assertRaises(ValueError):
+            self.client.request("unknown")
+        # The connection remains usable
+        self.assertEqual(self.client.ping(), "pong")
+
+    def test_trade_batches(self):
+        trade_count = self.client.server_stats()["trades"]
+        self.assertEqual(trade_count, Market(VENUE).trade_count)
+        trades = [protocol.trade_to_dict(trade) for trade in self.trades[:2]]
+        # A batch with an invalid trade is rejected as a whole
+        with self.assertRaises(ValueError):
+            self.client.request(protocol.ADD_TRADES, trades=trades + [dict(trades[0], stock_symbol="INVALID")])
+        self.assertEqual(self.client.server_stats()["trades"], trade_count)
+        self.assertEqual(self.client.request(protocol.ADD_TRADES, trades=[]), {"accepted": 0, "rejected": 0})
+
+    def test_concurrent_clients(self):
+        results = []
+
+        def query():
+            with StatsClient(self.socket_path) as client:
+                results.append(client.vwsp(stock_symbol='XYZ'))
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(results), 8)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for de-duplicating concurrent identical computations."""
+
+    def test_concurrent_calls_share_one_computation(self):
+        flights = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait()
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do("key", compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while flights.requests < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertListEqual(results, [42] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.computations, 1)
+
+    def test_errors_are_shared(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            flights.do("key", fail)
+        # A later call computes again
+        self.assertEqual(flights.do("key", lambda: 1), 1)
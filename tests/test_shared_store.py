@@ -0,0 +1,208 @@
+import multiprocessing
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from calculators.shared import SharedVolumeWeightedStockPriceCalculator
+from calculators.trade_stats import AllShareIndexCalculator, VolumeWeightedStockPriceCalculator
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.shared_store import SharedTradePublisher, SharedTradeReader
+from exchange.stock import Stock, StockInfo, StockType
+from exchange.synthetic import SyntheticSession
+from exchange.trade import Trade
+
+
+VENUE = "shared-store-test"
+
+
+def read_stats(name, now):
+    """
+    Attach to a store from another process and compute the VWSP of all stocks and the index.
+    """
+    snapshot = SharedTradeReader(name).snapshot()
+    vwsp = SharedVolumeWeightedStockPriceCalculator(snapshot, now=now).calculate()
+    return len(snapshot), vwsp.to_dict(orient="list"), AllShareIndexCalculator(vwsp).calculate()
+
+
+def read_while_written(name, snapshots):
+    """
+    Take snapshots of a store being written, checking that each one is consistent.
+    """
+    reader = SharedTradeReader(name)
+    counts = []
+    for _ in range(snapshots):
+        snapshot = reader.snapshot()
+        timestamps = snapshot.columns[TIMESTAMP]
+        if not (np.diff(timestamps.view(np.int64)) >= 0).all():
+            raise AssertionError("Snapshot timestamps are not sorted")
+        if len(np.unique(snapshot.columns[TRADE_ID])) != len(snapshot):
+            raise AssertionError("Snapshot trade ids are not unique")
+        counts.append(len(snapshot))
+    return counts
+
+
+class TestSharedTradeStore(unittest.TestCase):
+    """Test cases for the shared-memory trade store."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.start = datetime(2025, 3, 29, 9, 0)
+        self.session = SyntheticSession(venue=VENUE, start_time=self.start, seed=8, trades_per_second=200)
+        self.name = f"bsm-test-{os.getpid()}"
+        self.publisher = SharedTradePublisher(self.name, venue=VENUE, capacity=4096)
+
+    def tearDown(self):
+        self.publisher.close()
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_snapshot_matches_market(self):
+        for batch in self.session.batches(20000, batch_size=3000):
+            self.market.add_trades(batch)
+        now = self.market.latest_timestamp
+        snapshot = SharedTradeReader(self.name).snapshot()
+        self.assertEqual(len(snapshot), 20000)
+        trades = self.market.get_trade_columns()
+        np.testing.assert_array_equal(snapshot.columns[PRICE], trades[PRICE])
+        np.testing.assert_array_equal(snapshot.symbols[snapshot.columns["stock_symbol"]], trades["stock_symbol"])
+
+        vwsp = SharedVolumeWeightedStockPriceCalculator(snapshot, now=now).calculate()
+        expected = VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate()
+        pd.testing.assert_frame_equal(vwsp, expected)
+        self.assertEqual(AllShareIndexCalculator(vwsp).calculate(), AllShareIndexCalculator(expected).calculate())
+        self.assertEqual(
+            SharedVolumeWeightedStockPriceCalculator(snapshot, stock_symbol="GIN", now=now).calculate(),
+            VolumeWeightedStockPriceCalculator(stock_symbol="GIN", venue=VENUE, now=now).calculate(),
+        )
+        self.assertIsNone(SharedVolumeWeightedStockPriceCalculator(snapshot, now=now + timedelta(hours=1)).calculate())
+
+    def test_snapshots_are_consistent_and_not_copied(self):
+        reader = SharedTradeReader(self.name)
+        self.market.add_trades(self.session.batch(1000))
+        first = reader.snapshot()
+        self.market.add_trades(self.session.batch(1000))
+        second = reader.snapshot()
+        self.assertEqual((len(first), len(second)), (1000, 2000))
+        self.assertEqual(first.generation, second.generation)
+        self.assertTrue(np.shares_memory(first.columns[PRICE], second.columns[PRICE]))
+        with self.assertRaises(ValueError):
+            second.columns[PRICE][0] = 1.0
+
+        # Cancels and late trades are published as a new generation, earlier snapshots are unchanged
+        prices = second.columns[PRICE].copy()
+        self.market.cancel(10)
+        late = self.session.batch(10)
+        late[TIMESTAMP] = late[TIMESTAMP] - np.timedelta64(60, "s")
+        self.market.add_trades(late)
+        third = reader.snapshot()
+        self.assertGreater(third.generation, second.generation)
+        self.assertEqual(len(third), 2009)
+        np.testing.assert_array_equal(second.columns[PRICE], prices)
+        np.testing.assert_array_equal(third.columns[TRADE_ID], self.market.get_trade_columns()[TRADE_ID])
+
+        self.market._flush_trades()
+        self.assertEqual(len(reader.snapshot()), 0)
+
+    def test_corrections_copy_the_older_rows(self):
+        reader = SharedTradeReader(self.name)
+        self.market.add_trades(self.session.batch(3000))
+        trade_ids = self.market.get_trade_columns()[TRADE_ID]
+        read = []
+        get_trade_columns = self.market.get_trade_columns
+
+        def counted(*args, **kwargs):
+            columns = get_trade_columns(*args, **kwargs)
+            read.append(len(columns[TIMESTAMP]))
+            return columns
+
+        with mock.patch.object(self.market, "get_trade_columns", counted):
+            self.market.cancel(int(trade_ids[-5]))
+            self.market.amend(int(trade_ids[-10]), quantity=7)
+        # Only the trades from the corrected ones on are read back from the Market
+        self.assertTrue(read)
+        self.assertLessEqual(max(read), 10)
+        snapshot = reader.snapshot()
+        trades = self.market.get_trade_columns()
+        self.assertEqual(len(snapshot), 2999)
+        for name in (TIMESTAMP, TRADE_ID, QUANTITY, PRICE):
+            np.testing.assert_array_equal(snapshot.columns[name], trades[name], err_msg=name)
+        np.testing.assert_array_equal(snapshot.symbols[snapshot.columns[STOCK_SYMBOL]], trades[STOCK_SYMBOL])
+
+    def test_late_trade_buffered_before_a_batch(self):
+        self.market.add_trades(self.session.batch(10))
+        last = self.market.latest_timestamp
+        late = self.market.get_trade_columns()[TIMESTAMP][5].astype("datetime64[us]").tolist()
+        self.market.add_trade(Trade(stock_symbol="TEA", timestamp=late, quantity=1, trade_type=TradeType.BUY, price=15.0, venue=VENUE))
+        # The batch merges before the buffered late trade, which the publisher's read leaves buffered
+        batch = {
+            STOCK_SYMBOL: np.array(["POP"], dtype=object),
+            TIMESTAMP: np.array([np.datetime64(last, "ns") - np.timedelta64(1, "ms")]),
+            QUANTITY: np.array([2]),
+            TRADE_TYPE: np.array([TradeType.SELL.value], dtype=object),
+            PRICE: np.array([16.0]),
+        }
+        self.market.add_trades(batch)
+        trades = self.market.get_trade_columns()
+        snapshot = SharedTradeReader(self.name).snapshot()
+        self.assertEqual(len(snapshot), 12)
+        np.testing.assert_array_equal(snapshot.columns[TRADE_ID], trades[TRADE_ID])
+        np.testing.assert_array_equal(snapshot.columns[PRICE], trades[PRICE])
+
+    def test_symbols_with_any_character(self):
+        symbols = ("NEW\nLINE", "CAFÉ")
+        StockInfo(VENUE).add_stocks([
+            Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=1.0, fixed_dividend_pct=0.0, par_value=100.0)
+            for symbol in symbols
+        ])
+        self.market.add_trades({
+            STOCK_SYMBOL: np.array(symbols + ("TEA",), dtype=object),
+            TIMESTAMP: np.full(3, np.datetime64(self.start, "ns")),
+            QUANTITY: np.array([1, 2, 3]),
+            TRADE_TYPE: np.full(3, TradeType.BUY.value, dtype=object),
+            PRICE: np.array([1.0, 2.0, 3.0]),
+        })
+        snapshot = SharedTradeReader(self.name).snapshot()
+        self.assertListEqual(snapshot.symbols[snapshot.columns[STOCK_SYMBOL]].tolist(), list(symbols) + ["TEA"])
+
+    def test_growth_and_window(self):
+        self.market.add_trades(self.session.batch(10000))
+        self.assertGreaterEqual(self.publisher.generation, 2)
+        snapshot = SharedTradeReader(self.name).snapshot()
+        start, end = self.start + timedelta(seconds=10), self.start + timedelta(seconds=20)
+        window = snapshot.window(start, end)
+        expected = self.market.get_trade_columns(start, end)
+        np.testing.assert_array_equal(window[TRADE_ID], expected[TRADE_ID])
+
+    def test_readers_in_other_processes(self):
+        self.market.add_trades(self.session.batch(5000))
+        now = self.market.latest_timestamp
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+            count, vwsp, index = executor.submit(read_stats, self.name, now).result()
+            expected = VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate()
+            self.assertEqual(count, 5000)
+            self.assertDictEqual(vwsp, expected.to_dict(orient="list"))
+            self.assertEqual(index, AllShareIndexCalculator(expected).calculate())
+
+            reading = executor.submit(read_while_written, self.name, 100)
+            for batch in self.session.batches(50000, batch_size=500):
+                self.market.add_trades(batch)
+            counts = reading.result()
+        self.assertTrue(all(5000 <= count <= 55000 for count in counts))
+
+    def test_store_lifecycle(self):
+        with self.assertRaises(FileExistsError):
+            SharedTradePublisher(self.name, venue=VENUE)
+        with self.assertRaises(FileNotFoundError):
+            SharedTradeReader(f"{self.name}-missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
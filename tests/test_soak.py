@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from exchange.market import Market
+from exchange.stock import StockInfo
+from service import soak_test
+from service.soak_test import QUERY_MIX, SoakTest, compare_reports
+
+
+VENUE = "soak-test"
+
+
+class TestSoakTest(unittest.TestCase):
+    """Test cases for the mixed ingest and query soak test harness."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_report(self):
+        soak = SoakTest(venue=VENUE, rate=5000, workers=2, duration=1.5, memory_interval=0.5, out_of_order_fraction=0.1)
+        report = soak.run()
+        json.dumps(report)
+
+        ingest = report["ingest"]
+        self.assertGreater(ingest["trades_sent"], 5000)
+        self.assertEqual(ingest["dropped"], 0)
+        self.assertEqual(len(soak.market.get_trade_columns()["trade_id"]), ingest["trades_accepted"] + 1000)
+        self.assertGreater(ingest["out_of_order"], 0)
+        self.assertGreater(ingest["achieved_rate"], 2500)
+
+        queries = report["queries"]
+        self.assertEqual(queries["errors"], 0)
+        self.assertEqual(queries["count"], sum(stats["count"] for stats in queries["by_query"].values()))
+        self.assertEqual(set(queries["by_query"]), set(QUERY_MIX))
+        latency = queries["latency_ms"]
+        self.assertTrue(0 < latency["p50"] <= latency["p99"] <= latency["p99.9"] <= latency["max"])
+        self.assertGreaterEqual(len(report["memory"]["samples"]), 3)
+        self.assertGreater(report["memory"]["market_end_bytes"], report["memory"]["market_start_bytes"])
+
+    def test_compare_reports(self):
+        baseline = {"ingest": {"achieved_rate": 1000.0}, "queries": {"throughput": 100.0, "latency_ms": {"p50": 2.0, "p99": 10.0}}}
+        report = {"ingest": {"achieved_rate": 900.0}, "queries": {"throughput": 120.0, "latency_ms": {"p50": 2.0, "p99": 12.0}}}
+        comparison = compare_reports(baseline, report, tolerance=0.0)
+        self.assertEqual(set(comparison), {"ingest.achieved_rate", "queries.throughput", "queries.latency_ms.p50", "queries.latency_ms.p99"})
+        self.assertAlmostEqual(comparison["queries.latency_ms.p99"]["change"], 0.2)
+        self.assertEqual(
+            [metric for metric, result in comparison.items() if result["regressed"]],
+            ["ingest.achieved_rate", "queries.latency_ms.p99"],
+        )
+        # Within the tolerance, the 10% lower ingest rate is noise, the 20% higher p99 is not
+        comparison = compare_reports(baseline, report, tolerance=0.15)
+        self.assertEqual([metric for metric, result in comparison.items() if result["regressed"]], ["queries.latency_ms.p99"])
+        comparison = compare_reports(baseline, report, tolerance=0.25)
+        self.assertFalse(any(result["regressed"] for result in comparison.values()))
+        with self.assertRaises(ValueError):
+            compare_reports(baseline, report, tolerance=-0.1)
+
+    def test_command_line(self):
+        report_path = os.path.join(self.directory, "soak.json")
+        compared_path = os.path.join(self.directory, "compared.json")
+        arguments = ["--rate", "2000", "--workers", "1", "--duration", "0.5"]
+        with redirect_stderr(StringIO()) as stderr:
+            self.assertEqual(soak_test.main(arguments + ["--report", report_path]), 0)
+            status = soak_test.main(arguments + ["--report", compared_path, "--baseline", report_path, "--tolerance", "0.5"])
+        self.assertIn("Ingested", stderr.getvalue())
+        with open(compared_path) as report_file:
+            report = json.load(report_file)
+        # Non-zero when a metric is worse than the baseline
+        self.assertEqual(status, int(any(result["regressed"] for result in report["comparison"].values())))
+        self.assertEqual(report["version"], soak_test.REPORT_VERSION)
+        self.assertEqual(report["config"]["rate"], 2000)
+        self.assertIn("queries.latency_ms.p99", report["comparison"])
+
+        baseline_path = os.path.join(self.directory, "baseline.json")
+        with open(baseline_path, "w") as baseline_file:
+            json.dump({"ingest": {"achieved_rate": 1e12}, "queries": {"throughput": 1e12}}, baseline_file)
+        with redirect_stderr(StringIO()) as stderr:
+            self.assertEqual(soak_test.main(arguments + ["--report", compared_path, "--baseline", baseline_path]), 1)
+        self.assertIn("Worse than the baseline", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.trade_stats import (
+    AllShareIndexCalculator, TradeSummaryCalculator, VolumeWeightedStockPriceCalculator,
+)
+from common.constants import TRADE_ID, TradeType
+from exchange.market import Market, TradeListener
+from exchange.sample_data import sample_stocks
+from exchange.sqlite_store import SQLiteTradeStore
+from exchange.stock import StockInfo
+from exchange.synthetic import SyntheticSession, to_trades
+
+
+VENUE = "sqlite-test"
+MEMORY_VENUE = "sqlite-test-memory"
+
+
+class TradeRecorder(TradeListener):
+    def __init__(self):
+        self.trades = []
+        self.cancels = []
+        self.flushes = 0
+
+    def on_trades(self, batch):
+        self.trades.extend(batch[TRADE_ID].tolist())
+
+    def on_cancel(self, batch):
+        self.cancels.extend(batch[TRADE_ID].tolist())
+
+    def on_flush(self):
+        self.flushes += 1
+
+
+class TestSQLiteTradeStore(unittest.TestCase):
+    """Test cases for the SQLite storage backend of the Market."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, "trades.db")
+        for venue in (VENUE, MEMORY_VENUE):
+            StockInfo(venue).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.memory_market = Market(MEMORY_VENUE)
+        self.start = datetime(2025, 3, 29, 9, 0)
+
+    def tearDown(self):
+        for venue in (VENUE, MEMORY_VENUE):
+            Market(venue)._trades.close()
+            Market.discard(venue)
+            StockInfo.discard(venue)
+        shutil.rmtree(self.directory)
+
+    def add_to_both(self, batch):
+        self.assertEqual(self.market.add_trades(batch), self.memory_market.add_trades(batch))
+
+    def assert_same_trades(self, **window):
+        stored = self.market.get_trade_columns(**window)
+        expected = self.memory_market.get_trade_columns(**window)
+        for name, column in expected.items():
+            np.testing.assert_array_equal(stored[name], column, err_msg=name)
+
+    def test_same_trades_and_statistics_as_in_memory(self):
+        self.market.configure_storage(database=self.database, tick_size="0.01")
+        self.memory_market.configure_storage(tick_size="0.01")
+        session = SyntheticSession(venue=VENUE, start_time=self.start, seed=3, out_of_order_fraction=0.05)
+        for batch in session.batches(30000, batch_size=7000):
+            self.add_to_both(batch)
+        self.assert_same_trades()
+        middle = self.start + timedelta(seconds=10)
+        self.assert_same_trades(start_time=middle, end_time=middle + timedelta(seconds=5))
+        self.assert_same_trades(start_time=middle, stock_symbols=["TEA", "GIN"])
+        pd.testing.assert_frame_equal(
+            self.market.get_trades("stock_symbol == 'ALE'"), self.memory_market.get_trades("stock_symbol == 'ALE'")
+        )
+
+        now = self.market.latest_timestamp
+        self.assertIsNotNone(self.market.get_trade_sums(now - timedelta(minutes=5)))
+        self.assertIsNone(self.memory_market.get_trade_sums(now - timedelta(minutes=5)))
+        vwsp = VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate()
+        expected = VolumeWeightedStockPriceCalculator(venue=MEMORY_VENUE, now=now).calculate()
+        pd.testing.assert_frame_equal(vwsp, expected)
+        self.assertEqual(AllShareIndexCalculator(vwsp).calculate(), AllShareIndexCalculator(expected).calculate())
+        self.assertEqual(
+            VolumeWeightedStockPriceCalculator("GIN", venue=VENUE, now=now).calculate(),
+            VolumeWeightedStockPriceCalculator("GIN", venue=MEMORY_VENUE, now=now).calculate(),
+        )
+        self.assertIsNone(VolumeWeightedStockPriceCalculator(venue=VENUE, now=now + timedelta(hours=1)).calculate())
+        pd.testing.assert_frame_equal(
+            TradeSummaryCalculator(venue=VENUE, now=now).calculate(),
+            TradeSummaryCalculator(venue=MEMORY_VENUE, now=now).calculate(),
+        )
+
+    def test_float_prices(self):
+        self.market.configure_storage(database=self.database)
+        batch = SyntheticSession(venue=VENUE, start_time=self.start, seed=4).batch(5000)
+        self.add_to_both(batch)
+        now = self.market.latest_timestamp
+        pd.testing.assert_frame_equal(
+            VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate(),
+            VolumeWeightedStockPriceCalculator(venue=MEMORY_VENUE, now=now).calculate(),
+        )
+
+    def test_single_trades_corrections_and_flush(self):
+        self.market.configure_storage(database=self.database)
+        recorder = TradeRecorder()
+        self.market.subscribe(recorder)
+        trades = to_trades(SyntheticSession(venue=VENUE, start_time=self.start, seed=5).batch(10000), venue=VENUE)
+        for trade in trades:
+            self.market.add_trade(trade)
+            self.memory_market.add_trade(trade)
+        self.assertEqual(len(recorder.trades), 10000)
+        self.assert_same_trades()
+
+        for market in (self.market, self.memory_market):
+            market.cancel(17)
+            market.amend(20, quantity=5, trade_type=TradeType.SELL)
+            market.amend(30, timestamp=trades[30].timestamp + timedelta(seconds=1))
+        self.assert_same_trades()
+        self.assertEqual(recorder.cancels, [17, 20, 30])
+        self.assertEqual(recorder.trades[-2:], [20, 30])
+        with self.assertRaises(ValueError):
+            self.market.cancel(17)
+
+        self.market._flush_trades()
+        self.assertEqual(recorder.flushes, 1)
+        self.assertEqual(len(self.market.get_trades()), 0)
+        self.assertIsNone(VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.start).calculate())
+
+    def test_reopen_database(self):
+        session = SyntheticSession(venue=VENUE, start_time=self.start, seed=6)
+        self.market.add_trades(session.batch(2000))
+        self.market.configure_storage(database=self.database, tick_size="0.01")
+        self.assertEqual(len(self.market.get_trades()), 2000)
+        self.market.add_trades(session.batch(1000))
+        latest = self.market.latest_timestamp
+        Market(VENUE)._trades.close()
+        Market.discard(VENUE)
+
+        reopened = Market(VENUE)
+        with self.assertRaises(ValueError):
+            reopened.configure_storage(database=self.database)
+        reopened.configure_storage(database=self.database, tick_size="0.01")
+        self.assertEqual(len(reopened.get_trades()), 3000)
+        self.assertEqual(reopened.next_trade_id, 3000)
+        self.assertEqual(reopened.latest_timestamp, latest)
+        self.assertEqual(reopened.cancel(2999).trade_id, 2999)
+        reopened.add_trades(session.batch(10))
+        self.assertEqual(reopened.get_trade_columns()[TRADE_ID][-1], 3009)
+
+        other = Market(MEMORY_VENUE)
+        other.add_trades(session.batch(10))
+        with self.assertRaises(ValueError):
+            other.configure_storage(database=self.database, tick_size="0.01")
+        with self.assertRaises(ValueError):
+            other.configure_storage(compact=True, database=self.database)
+
+    def test_database_layout(self):
+        store = SQLiteTradeStore(self.database)
+        batch = SyntheticSession(venue=VENUE, start_time=self.start, seed=7).batch(100)
+        store.merge(dict(batch, trade_id=np.arange(100)))
+        store.close()
+        connection = sqlite3.connect(self.database)
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({"trades_by_time", "trades_by_symbol_time"} <= indexes)
+        plan = " ".join(str(row) for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT SUM(price * quantity) FROM trades WHERE stock_symbol = 'TEA' AND timestamp >= 0"
+        ))
+        self.assertIn("trades_by_symbol_time", plan)
+        self.assertEqual(connection.execute("SELECT COUNT(*) FROM trades").fetchone()[0], 100)
+        connection.close()
+
+    def test_batched_appends_and_cold_storage(self):
+        store = SQLiteTradeStore(":memory:", insert_batch_size=100)
+        trades = to_trades(SyntheticSession(venue=VENUE, start_time=self.start, seed=8).batch(250), venue=VENUE)
+        for trade_id, trade in enumerate(trades):
+            trade.trade_id = trade_id
+            store.append(trade.__dict__)
+        self.assertEqual(len(store._pending), 50)
+        self.assertEqual(len(store), 250)
+        self.assertEqual(store.count(), 250)
+        self.assertEqual(len(store._pending), 0)
+        store.close()
+
+        self.market.configure_storage(database=self.database)
+        self.market.add_trades(SyntheticSession(venue=VENUE, start_time=self.start, seed=9).batch(5000))
+        expected = self.market.get_trade_columns()
+        frozen = self.market.freeze(self.start + timedelta(seconds=2))
+        self.assertGreater(frozen, 0)
+        self.assertEqual(len(self.market._trades), 5000 - frozen)
+        for name, column in self.market.get_trade_columns().items():
+            np.testing.assert_array_equal(column, expected[name], err_msg=name)
+        now = self.market.latest_timestamp
+        self.assertIsNone(self.market.get_trade_sums(now - timedelta(minutes=5)))
+        self.assertIsNotNone(VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 
 from common.constants import FIXED_DIVIDEND_PCT, LAST_DIVIDEND, PAR_VALUE, STOCK_SYMBOL, STOCK_TYPE, StockType
+from calculators.stock_stats import DividendYieldCalculator
 from exchange.stock import Stock, StockInfo
+import threading
 import unittest
 
 
@@ -66,4 +68,99 @@ class TestStockInfo(unittest.TestCase):
         self.assertTrue(self.stock_info.is_valid_stock('RUM'))
         self.assertTrue(self.stock_info.is_valid_stock('BEER'))
         self.assertFalse(self.stock_info.is_valid_stock('WHISKEY'))
-        self.stock_info._remove_all_stocks()
\ No newline at end of file
+        self.stock_info._remove_all_stocks()
+
+    def test_memory_usage(self):
+        usage = self.stock_info.memory_usage()
+        self.assertGreater(usage["stocks"], 0)
+        self.assertEqual(usage["stocks_frame"], 0)
+        self.stock_info.get_all_stocks()
+        self.assertGreater(self.stock_info.memory_usage()["stocks_frame"], 0)
+        self.stock_info._remove_all_stocks()
+
+    def test_upsert_stocks(self):
+        self.stock_info.upsert_stocks([
+            Stock(stock_symbol='RUM', type=StockType.COMMON, last_dividend=1.6, fixed_dividend_pct=0.0, par_value=100.0),
+            Stock(stock_symbol='GIN', type=StockType.COMMON, last_dividend=2.0, fixed_dividend_pct=None, par_value=50.0),
+        ])
+        self.assertEqual(self.stock_info.get_stock_record('RUM')[LAST_DIVIDEND], 1.6)
+        self.assertTrue(self.stock_info.is_valid_stock('GIN'))
+        self.assertEqual(len(self.stock_info.get_all_stocks()), 3)
+        self.stock_info._remove_all_stocks()
+
+    def test_update_stock(self):
+        self.stock_info.update_stock('BEER', last_dividend=1.5)
+        self.assertDictEqual(
+            self.stock_info.get_stock_record('BEER'),
+            {STOCK_TYPE: 'Preferred', LAST_DIVIDEND: 1.5, FIXED_DIVIDEND_PCT: 0.02, PAR_VALUE: 200.0},
+        )
+        self.assertEqual(self.stock_info.get_all_stocks().loc['BEER', LAST_DIVIDEND], 1.5)
+        self.stock_info.update_stock('RUM', last_dividend=1.5)
+        self.assertEqual(DividendYieldCalculator(stock_symbol='RUM', price=100.0).calculate(), 0.015)
+        with self.assertRaises(ValueError):
+            self.stock_info.update_stock('WHISKEY', last_dividend=1.5)
+        with self.assertRaises(ValueError):
+            self.stock_info.update_stock('BEER', dividend=1.5)
+        with self.assertRaises(ValueError):
+            self.stock_info.update_stock('BEER', par_value=-1.0)
+        self.stock_info._remove_all_stocks()
+
+    def test_snapshot_is_immutable(self):
+        snapshot = self.stock_info.snapshot()
+        self.assertIs(self.stock_info.snapshot(), snapshot)
+        self.stock_info.update_stock('RUM', last_dividend=3.0)
+        self.stock_info.upsert_stocks([
+            Stock(stock_symbol='GIN', type=StockType.COMMON, last_dividend=2.0, fixed_dividend_pct=None, par_value=50.0),
+        ])
+        self.assertEqual(snapshot['RUM'][LAST_DIVIDEND], 0.8)
+        self.assertNotIn('GIN', snapshot)
+        self.assertEqual(self.stock_info.snapshot()['RUM'][LAST_DIVIDEND], 3.0)
+        self.assertGreater(self.stock_info.snapshot().version, snapshot.version)
+        with self.assertRaises(TypeError):
+            snapshot['RUM'][LAST_DIVIDEND] = 1.0
+        self.stock_info._remove_all_stocks()
+
+    def test_snapshots_are_consistent_during_updates(self):
+        symbols = [f"S{i}" for i in range(100)]
+        self.stock_info.upsert_stocks([
+            Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=0, fixed_dividend_pct=None, par_value=0)
+            for symbol in symbols
+        ])
+
+        def reload_dividends():
+            # Every reload gives all the stocks the same last dividend and par value
+            for value in range(1, 50):
+                self.stock_info.upsert_stocks([
+                    Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=value, fixed_dividend_pct=None, par_value=value)
+                    for symbol in symbols
+                ])
+
+        writer = threading.Thread(target=reload_dividends)
+        writer.start()
+        while writer.is_alive():
+            snapshot = self.stock_info.snapshot()
+            values = {snapshot[symbol][LAST_DIVIDEND] for symbol in symbols} | {snapshot[symbol][PAR_VALUE] for symbol in symbols}
+            self.assertEqual(len(values), 1)
+        writer.join()
+        self.stock_info._remove_all_stocks()
+
+    def test_interleaved_updates_and_reads_do_not_copy(self):
+        symbols = [f"S{i}" for i in range(1000)]
+        self.stock_info.upsert_stocks([
+            Stock(stock_symbol=symbol, type=StockType.COMMON, last_dividend=1, fixed_dividend_pct=None, par_value=10)
+            for symbol in symbols
+        ])
+        self.stock_info.snapshot()
+        self.stock_info.update_stock('S0', last_dividend=2)  # Copies once, the snapshot shares the records
+        stocks = self.stock_info._stocks
+        for value in range(3, 100):
+            self.stock_info.update_stock('S1', last_dividend=value)
+            self.assertAlmostEqual(DividendYieldCalculator(stock_symbol='S1', price=10).calculate(), value / 10)
+            self.assertEqual(self.stock_info.get_stock_record('S1')[LAST_DIVIDEND], value)
+            self.assertEqual(self.stock_info.get_record('S0')[LAST_DIVIDEND], 2)
+        # Single stock reads take no snapshot, so the updates did not copy the records again
+        self.assertIs(self.stock_info._stocks, stocks)
+        self.assertEqual(self.stock_info.version, self.stock_info.snapshot().version)
+        with self.assertRaises(ValueError):
+            self.stock_info.get_record('WHISKEY')
+        self.stock_info._remove_all_stocks()
@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from calculators.kernels import factorize_symbols
+from calculators.trade_stats import TradeSummaryCalculator, VolumeWeightedStockPriceCalculator
+from calculators.volatility import VolatilityCalculator
+from common.constants import StockType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import Stock, StockInfo
+from exchange.symbols import SymbolRegistry
+from exchange.synthetic import SyntheticSession
+
+
+VENUE = "symbols-test"
+
+
+class TestSymbolRegistry(unittest.TestCase):
+    """Test cases for the symbol registry and the trades stored with symbol ids."""
+
+    def setUp(self):
+        self.stock_info = StockInfo(VENUE)
+        self.stock_info.add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.start = datetime(2025, 3, 29, 9, 0)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def test_ids_are_dense_and_stable(self):
+        registry = self.stock_info.symbols
+        self.assertIs(self.market.symbols, registry)
+        self.assertEqual([self.stock_info.symbol_id(stock.stock_symbol) for stock in sample_stocks()], [0, 1, 2, 3, 4])
+        self.assertIsNone(self.stock_info.symbol_id("GIN2"))
+
+        ids = registry.register(["GIN", "NEW", "TEA", "NEW"])
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual(ids.tolist(), [3, 5, 0, 5])
+        self.assertEqual(registry.register_symbol("NEW"), 5)
+        self.stock_info.upsert_stocks([Stock("NEW", StockType.COMMON, 1, 0, 100)])
+        self.assertEqual(self.stock_info.symbol_id("NEW"), 5)
+        np.testing.assert_array_equal(registry.decode(ids), ["GIN", "NEW", "TEA", "NEW"])
+        with self.assertRaises(ValueError):
+            registry.symbols[0] = "ALE"
+
+        categorical = registry.categorical(ids)
+        self.assertEqual(list(categorical), ["GIN", "NEW", "TEA", "NEW"])
+        self.assertEqual(categorical.codes.dtype, np.int8)
+
+    def test_trades_stored_as_ids(self):
+        batch = SyntheticSession(venue=VENUE, start_time=self.start, seed=11).batch(20000)
+        self.market.add_trades(batch)
+        columns = self.market.get_trade_columns(symbol_ids=True)
+        self.assertEqual(columns["stock_symbol"].dtype, np.int32)
+        np.testing.assert_array_equal(
+            self.market.symbols.decode(columns["stock_symbol"]), self.market.get_trade_columns()["stock_symbol"]
+        )
+        view = self.market.get_trades_view()
+        self.assertIsInstance(view["stock_symbol"].dtype, pd.CategoricalDtype)
+        with self.assertRaises(ValueError):
+            view.loc[0, "stock_symbol"] = "TEA"
+
+        codes, symbols = factorize_symbols(view["stock_symbol"])
+        expected_codes, expected_symbols = factorize_symbols(view["stock_symbol"].to_numpy(dtype=object))
+        np.testing.assert_array_equal(codes, expected_codes)
+        np.testing.assert_array_equal(symbols, expected_symbols)
+        codes, symbols = factorize_symbols(view["stock_symbol"], sort=False)
+        self.assertEqual(symbols.tolist(), ["TEA", "POP", "ALE", "GIN", "JOE"])
+
+        now = self.market.latest_timestamp
+        summary = TradeSummaryCalculator(venue=VENUE, now=now).calculate()
+        self.assertEqual(summary.index.tolist(), sorted(symbols))
+        self.assertEqual(len(VolatilityCalculator(venue=VENUE, now=now).calculate()), 5)
+        self.assertEqual(len(VolumeWeightedStockPriceCalculator(venue=VENUE, now=now).calculate()), 5)
+
+    def test_scales_to_many_symbols(self):
+        symbols = np.array([f"S{number:06d}" for number in range(150000)], dtype=object)
+        registry = SymbolRegistry()
+        ids = registry.register(symbols[::-1])
+        self.assertEqual(len(registry), 150000)
+        np.testing.assert_array_equal(ids, np.arange(150000))
+        trade_ids = registry.register(symbols[np.arange(0, 150000, 7)])
+        categorical = registry.categorical(trade_ids)
+        self.assertEqual(categorical.codes.dtype, np.int32)
+        self.assertTrue(np.shares_memory(categorical.codes, trade_ids))
+        codes, unique_symbols = factorize_symbols(pd.Series(categorical))
+        np.testing.assert_array_equal(unique_symbols, np.sort(symbols[np.arange(0, 150000, 7)]))
+        np.testing.assert_array_equal(unique_symbols[codes], registry.decode(trade_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE
+from exchange.loader import load_trades, write_trades
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.synthetic import SyntheticSession, to_trades
+
+
+VENUE = "synthetic-test"
+
+
+class TestSyntheticSession(unittest.TestCase):
+    """Test cases for the synthetic market data generator."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.start = datetime(2025, 3, 29, 9, 0)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def session(self, **params):
+        return SyntheticSession(venue=VENUE, start_time=self.start, **params)
+
+    def test_deterministic_across_batch_sizes(self):
+        params = dict(seed=4, out_of_order_fraction=0.1)
+        whole = self.session(**params).batch(20000)
+        parts = list(self.session(**params).batches(20000, batch_size=3333))
+        self.assertEqual(len(parts), 7)
+        for name, column in whole.items():
+            np.testing.assert_array_equal(np.concatenate([part[name] for part in parts]), column, err_msg=name)
+        other_seed = self.session(seed=5).batch(20000)
+        self.assertFalse(np.array_equal(other_seed[PRICE], whole[PRICE]))
+
+    def test_trades_are_valid(self):
+        batch = self.session(seed=1).batch(50000)
+        self.assertEqual(batch[TIMESTAMP].dtype, np.dtype("datetime64[ns]"))
+        self.assertTrue(np.isin(batch[STOCK_SYMBOL], list(StockInfo(VENUE).snapshot())).all())
+        self.assertTrue((batch[QUANTITY] >= 1).all())
+        self.assertTrue((batch[PRICE] > 0).all())
+        np.testing.assert_array_equal(batch[PRICE], batch[PRICE].round(2))
+        self.assertAlmostEqual((batch[TRADE_TYPE] == "buy").mean(), 0.5, delta=0.02)
+        self.assertTrue((np.diff(batch[TIMESTAMP]) >= np.timedelta64(0)).all())
+        self.assertEqual(Market(VENUE).add_trades(batch), 50000)
+
+    def test_session_shape(self):
+        batch = self.session(seed=2, trades_per_second=500, buy_fraction=0.7, symbol_skew=2.0).batch(100000)
+        duration = (batch[TIMESTAMP][-1] - batch[TIMESTAMP][0]) / np.timedelta64(1, "s")
+        self.assertAlmostEqual(duration, 200, delta=20)
+        self.assertAlmostEqual((batch[TRADE_TYPE] == "buy").mean(), 0.7, delta=0.02)
+        _, counts = np.unique(batch[STOCK_SYMBOL], return_counts=True)
+        self.assertGreater(counts.max(), 3 * np.sort(counts)[-2])
+        # Bursty arrivals spread the gaps more than a Poisson process, of unit coefficient of variation
+        gaps = np.diff(batch[TIMESTAMP].astype(np.int64))
+        self.assertGreater(gaps.std() / gaps.mean(), 1.2)
+        # Prices start from the par values
+        first = {symbol: price for symbol, price in zip(batch[STOCK_SYMBOL][::-1], batch[PRICE][::-1])}
+        self.assertAlmostEqual(first["ALE"], 60, delta=3)
+
+    def test_out_of_order_trades(self):
+        batch = self.session(seed=3, out_of_order_fraction=0.2, max_delay=timedelta(milliseconds=50)).batch(10000)
+        timestamps = batch[TIMESTAMP]
+        late = timestamps < np.maximum.accumulate(timestamps)
+        self.assertAlmostEqual(late.mean(), 0.2, delta=0.05)
+        self.assertLessEqual((np.maximum.accumulate(timestamps) - timestamps).max(), np.timedelta64(50, "ms"))
+        market = Market(VENUE)
+        market.configure_ingestion(max_lateness=timedelta(milliseconds=50))
+        # Replayed in arrival order, every trade is within the lateness bound
+        self.assertTrue(all(market.add_trade(trade) for trade in to_trades(batch, venue=VENUE)))
+        self.assertTrue(market.get_trades()["timestamp"].is_monotonic_increasing)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            self.session(stock_symbols=["TEA", "FOO"])
+        with self.assertRaises(ValueError):
+            self.session(out_of_order_fraction=1.5)
+        with self.assertRaises(ValueError):
+            self.session(trades_per_second=0)
+        with self.assertRaises(ValueError):
+            SyntheticSession(venue="synthetic-empty")
+        StockInfo.discard("synthetic-empty")
+
+    def test_replay(self):
+        batch = self.session(seed=6).batch(3000)
+        trades = to_trades(batch, venue=VENUE)
+        self.assertListEqual([trade.price for trade in trades], batch[PRICE].tolist())
+        path = os.path.join(tempfile.mkdtemp(), "trades.csv")
+        self.assertEqual(write_trades(path, self.session(seed=6).batches(3000, batch_size=1000)), 3000)
+        self.assertEqual(load_trades(path, venue=VENUE, chunk_size=700), 3000)
+        stored = Market(VENUE).get_trade_columns()
+        for name, column in batch.items():
+            np.testing.assert_array_equal(stored[name], column, err_msg=name)
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
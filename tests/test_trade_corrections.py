@@ -0,0 +1,186 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.leaderboard import LEADERBOARD_METRICS, TopNLeaderboard
+from calculators.quantiles import PriceQuantileCalculator, WindowedQuantileSketches
+from calculators.rolling import RollingVolumeWeightedStockPrice
+from calculators.trade_stats import VolumeWeightedStockPriceCalculator
+from calculators.volatility import RollingVolatility, VolatilityCalculator
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_ID, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+
+
+VENUE = "corrections-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+
+
+class TestTradeCorrections(unittest.TestCase):
+    """Test cases for trade ids, cancels and amends."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.now = datetime(2025, 3, 29, 12, 0)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def trade(self, symbol="TEA", minutes=0, quantity=100, price=10.0):
+        return Trade(stock_symbol=symbol, timestamp=self.now + timedelta(minutes=minutes), quantity=quantity,
+                     trade_type=TradeType.BUY, price=price, venue=VENUE)
+
+    def batch(self, count, seed=5):
+        rng = np.random.default_rng(seed)
+        return {
+            STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[rng.integers(0, len(SYMBOLS), count)],
+            TIMESTAMP: np.datetime64(self.now - timedelta(minutes=8), "ns")
+            + rng.integers(0, 8 * 60 * 10**9, count).astype("timedelta64[ns]"),
+            QUANTITY: rng.integers(1, 1000, count),
+            TRADE_TYPE: np.where(rng.random(count) < 0.5, TradeType.BUY.value, TradeType.SELL.value).astype(object),
+            PRICE: rng.uniform(50, 150, count).round(2),
+        }
+
+    def test_trade_ids(self):
+        first = self.trade(minutes=1)
+        late = self.trade(minutes=0)
+        self.assertTrue(self.market.add_trade(first))
+        self.assertTrue(self.market.add_trade(late))
+        self.assertEqual((first.trade_id, late.trade_id), (0, 1))
+
+        self.market.configure_ingestion(max_lateness=timedelta(minutes=1))
+        batch = self.batch(3)
+        batch[TIMESTAMP] = np.array([self.now + timedelta(minutes=2), self.now - timedelta(hours=1),
+                                     self.now + timedelta(minutes=3)], dtype="datetime64[ns]")
+        self.assertEqual(self.market.next_trade_id, 2)
+        self.assertEqual(self.market.add_trades(batch), 2)
+        trades = self.market.get_trades(with_trade_ids=True)
+        self.assertListEqual(trades[TRADE_ID].tolist(), [1, 0, 2, 4])
+        self.assertNotIn(TRADE_ID, self.market.get_trades().columns)
+        # The id of the rejected trade is not recorded
+        with self.assertRaises(ValueError):
+            self.market.cancel(3)
+
+    def test_cancel(self):
+        trades = [self.trade(symbol, minutes) for minutes, symbol in enumerate(("TEA", "POP", "TEA"))]
+        for trade in trades:
+            self.market.add_trade(trade)
+        cancelled = self.market.cancel(trades[1].trade_id)
+        self.assertEqual((cancelled.stock_symbol, cancelled.trade_id), ("POP", 1))
+        self.assertListEqual(self.market.get_trades(with_trade_ids=True)[TRADE_ID].tolist(), [0, 2])
+        for trade_id in (1, 7, -1):
+            with self.assertRaises(ValueError):
+                self.market.cancel(trade_id)
+
+    def test_amend(self):
+        trades = [self.trade(minutes=minutes) for minutes in range(3)]
+        for trade in trades:
+            self.market.add_trade(trade)
+        amended = self.market.amend(0, price=12.5, timestamp=self.now + timedelta(minutes=5))
+        self.assertEqual((amended.trade_id, amended.price, amended.quantity), (0, 12.5, 100))
+        stored = self.market.get_trades(with_trade_ids=True)
+        self.assertListEqual(stored[TRADE_ID].tolist(), [1, 2, 0])
+        self.assertEqual(self.market.latest_timestamp, self.now + timedelta(minutes=5))
+        self.market.amend(0, quantity=7)
+        self.assertEqual(self.market.get_trades(with_trade_ids=True).iloc[-1][QUANTITY], 7)
+        # Invalid corrections leave the trade unchanged
+        with self.assertRaises(ValueError):
+            self.market.amend(0, price=-1.0)
+        pd.testing.assert_frame_equal(
+            self.market.get_trades(with_trade_ids=True).iloc[:2], stored.iloc[:2]
+        )
+
+    def test_amend_latest_trade_of_rolling_volatility(self):
+        volatility = RollingVolatility(now=self.now - timedelta(minutes=10), venue=VENUE)
+        for minutes, price in ((-4, 10.0), (-3, 10.1), (-2, 10.05), (-1, 10.2)):
+            self.market.add_trade(self.trade(minutes=minutes, price=price))
+        self.market.add_trade(self.trade("POP", minutes=-1, price=50.0))
+        # The latest TEA trade, amended in place: it is not counted twice
+        self.market.amend(3, price=10.12)
+        expected = VolatilityCalculator(venue=VENUE, now=self.now).calculate()
+        self.assertEqual(expected.loc["TEA", "trade_count"], 4)
+        pd.testing.assert_frame_equal(volatility.calculate(now=self.now), expected)
+        volatility.close()
+
+    def test_cancel_in_compact_tick_mode(self):
+        self.market.configure_storage(compact=True, tick_size="0.01")
+        self.market.add_trades(self.batch(100))
+        with self.assertRaises(ValueError):
+            self.market.amend(10, price=10.005)
+        self.market.amend(10, price=10.01)
+        self.market.cancel(20)
+        trades = self.market.get_trades(with_trade_ids=True)
+        self.assertEqual(len(trades), 99)
+        self.assertNotIn(20, trades[TRADE_ID].tolist())
+        self.assertEqual(trades.loc[trades[TRADE_ID] == 10, PRICE].item(), 10.01)
+
+    def test_flush_resets_ids(self):
+        self.market.add_trade(self.trade())
+        self.market._flush_trades()
+        with self.assertRaises(ValueError):
+            self.market.cancel(0)
+        trade = self.trade()
+        self.market.add_trade(trade)
+        self.assertEqual(trade.trade_id, 0)
+
+    def test_listeners_started_with_late_trades_buffered(self):
+        for minutes, quantity, price in ((-3, 5, 15.0), (-1, 4, 20.0), (-2, 3, 17.0)):
+            self.market.add_trade(self.trade(minutes=minutes, quantity=quantity, price=price))
+        # The late trade is merged by the initial read of each listener, and counted once
+        start = self.now - timedelta(minutes=10)
+        rolling_vwsp = RollingVolumeWeightedStockPrice(now=start, venue=VENUE)
+        leaderboard = TopNLeaderboard(now=start, venue=VENUE)
+        sketches = WindowedQuantileSketches(now=start, venue=VENUE)
+        pd.testing.assert_frame_equal(
+            rolling_vwsp.calculate(now=self.now), VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate()
+        )
+        fresh = TopNLeaderboard(now=self.now, venue=VENUE)
+        for metric in LEADERBOARD_METRICS:
+            pd.testing.assert_frame_equal(leaderboard.top(metric, 5, now=self.now), fresh.top(metric, 5, now=self.now))
+        self.assertEqual(sketches.merged(QUANTITY, now=self.now)["TEA"].count, 3)
+        for listener in (rolling_vwsp, leaderboard, sketches, fresh):
+            listener.close()
+
+    def test_listeners_reverse_corrections(self):
+        for tick_size in (None, "0.01"):
+            with self.subTest(tick_size=tick_size):
+                self.market._flush_trades()
+                self.market.configure_storage(tick_size=tick_size)
+                start = self.now - timedelta(minutes=10)
+                rolling_vwsp = RollingVolumeWeightedStockPrice(now=start, venue=VENUE)
+                leaderboard = TopNLeaderboard(now=start, venue=VENUE)
+                sketches = WindowedQuantileSketches(now=start, venue=VENUE)
+                volatility = RollingVolatility(now=start, venue=VENUE)
+                listeners = (rolling_vwsp, leaderboard, sketches, volatility)
+                self.market.add_trades(self.batch(2000))
+                rng = np.random.default_rng(9)
+                for trade_id in rng.choice(2000, 100, replace=False).tolist():
+                    if trade_id % 2:
+                        self.market.cancel(trade_id)
+                    else:
+                        self.market.amend(trade_id, price=round(float(rng.uniform(50, 150)), 2),
+                                          quantity=int(rng.integers(1, 1000)))
+
+                expected_vwsp = VolumeWeightedStockPriceCalculator(venue=VENUE, now=self.now).calculate()
+                pd.testing.assert_frame_equal(rolling_vwsp.calculate(now=self.now), expected_vwsp)
+                expected_volatility = VolatilityCalculator(venue=VENUE, now=self.now).calculate()
+                pd.testing.assert_frame_equal(volatility.calculate(now=self.now), expected_volatility)
+                fresh = TopNLeaderboard(now=self.now, venue=VENUE)
+                for metric in LEADERBOARD_METRICS:
+                    pd.testing.assert_frame_equal(leaderboard.top(metric, 5, now=self.now), fresh.top(metric, 5, now=self.now))
+                fresh.close()
+                pd.testing.assert_frame_equal(
+                    PriceQuantileCalculator(sketches=sketches.merged(PRICE, now=self.now)).calculate(),
+                    PriceQuantileCalculator(venue=VENUE, now=self.now).calculate(),
+                )
+                for listener in listeners:
+                    listener.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
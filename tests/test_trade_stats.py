@@ -2,10 +2,11 @@ import unittest
 from datetime import datetime, timedelta
 
 import pandas as pd
-from calculators.trade_stats import VolumeWeightedStockPriceCalculator, AllShareIndexCalculator
+from calculators.trade_stats import VolumeWeightedStockPriceCalculator, AllShareIndexCalculator, TradeSummaryCalculator
 from exchange.stock import Stock, StockInfo
 from exchange.trade import Trade
 from exchange.market import Market
+from exchange.synthetic import SyntheticSession
 from common.constants import StockType, TradeType
 from scipy.stats import gmean
 
@@ -118,6 +119,17 @@ class TestTradeStatsCalculators(unittest.TestCase):
 
         self.assertEqual(result, 0.0, "All Share Index should be 0 when no valid prices are available.")
 
+    def test_trade_summary(self):
+        """Test the trade summary of all stocks within the last 5 minutes."""
+
+        result = TradeSummaryCalculator().calculate()
+
+        self.assertListEqual(result.index.tolist(), ['ABC', 'XYZ'])
+        self.assertEqual(result.loc['ABC', 'trade_count'], 1)
+        self.assertEqual(result.loc['ABC', 'buy_volume'], 50)
+        self.assertEqual(result.loc['XYZ', 'sell_volume'], 100)
+        self.assertEqual(result.loc['XYZ', 'last_price'], 150.0)
+
 
 class TestTradeStatsCalculatorsLargeData(unittest.TestCase):
     """Test cases for VolumeWeightedStockPriceCalculator and AllShareIndexCalculator with large data."""
@@ -150,28 +162,19 @@ class TestTradeStatsCalculatorsLargeData(unittest.TestCase):
 
         # Create Market instance and add a large number of trade objects
         cls.market = Market()
+        cls.market._flush_trades()
 
         now = datetime.now()
-        trade_list = []
-
-        # Creating trades for stock 'ABC' within the last 5 minutes
-        for i in range(45000):
-            trade_list.append(Trade(stock_symbol='ABC', timestamp=now - timedelta(seconds=i//200), quantity=100, trade_type=TradeType.BUY, price=50.0 + (i % 100)))
-
-        # Creating trades for stock 'ABC' outside the last 5 minutes
-        for i in range(5000):
-            trade_list.append(Trade(stock_symbol='ABC', timestamp=now - timedelta(minutes=6) - timedelta(seconds=i//200), quantity=100, trade_type=TradeType.BUY, price=50.0 + (i % 100)))
-
-        # Creating trades for stock 'XYZ' within the last 5 minutes
-        for i in range(45000):
-            trade_list.append(Trade(stock_symbol='XYZ', timestamp=now - timedelta(seconds=i//200), quantity=200, trade_type=TradeType.SELL, price=100.0 + (i % 50)))
-
-        # Creating trades for stock 'XYZ' outside the last 5 minutes
-        for i in range(5000):
-            trade_list.append(Trade(stock_symbol='XYZ', timestamp=now - timedelta(minutes=6) - timedelta(seconds=i//200), quantity=200, trade_type=TradeType.SELL, price=100.0 + (i % 50)))
-
-        for trade in trade_list:
-            cls.market.add_trade(trade)
+        # Trades of 'ABC' and 'XYZ' within the last 5 minutes, about 4 minutes long
+        cls.recent_trades = SyntheticSession(
+            stock_symbols=['ABC', 'XYZ'], start_time=now - timedelta(minutes=4), seed=1, trades_per_second=375
+        ).batch(90000)
+        # Trades of 'ABC' and 'XYZ' outside the last 5 minutes, about 1 minute long
+        old_trades = SyntheticSession(
+            stock_symbols=['ABC', 'XYZ'], start_time=now - timedelta(minutes=7), seed=2, trades_per_second=10000 / 60
+        ).batch(10000)
+        cls.market.add_trades(old_trades)
+        cls.market.add_trades(cls.recent_trades)
 
     @classmethod
     def tearDownClass(cls):
@@ -184,10 +187,9 @@ class TestTradeStatsCalculatorsLargeData(unittest.TestCase):
         result = calculator.calculate()
 
         # Compute the expected VWSP considering only the trades within the last 5 minutes
-        valid_trades = [Trade(stock_symbol='ABC', timestamp=datetime.now() - timedelta(seconds=i//200), quantity=100, trade_type=TradeType.BUY, price=50.0 + (i % 100)) for i in range(45000)]
-        total_trade_value = sum(trade.price * trade.quantity for trade in valid_trades)
-        total_quantity = sum(trade.quantity for trade in valid_trades)
-        expected_vwsp = total_trade_value / total_quantity
+        abc = self.recent_trades['stock_symbol'] == 'ABC'
+        quantities = self.recent_trades['quantity'][abc]
+        expected_vwsp = (self.recent_trades['price'][abc] * quantities).sum() / quantities.sum()
 
         self.assertAlmostEqual(result, expected_vwsp, places=2)
 
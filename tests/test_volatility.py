@@ -0,0 +1,164 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from calculators.kernels import TRADE_COUNT
+from calculators.volatility import (
+    LOG_RETURN_VOLATILITY,
+    PRICE_STD,
+    PRICE_VARIANCE,
+    RollingVolatility,
+    VolatilityCalculator,
+    VolatilitySeriesCalculator,
+    volatility_series,
+)
+from common.constants import PRICE, QUANTITY, STOCK_SYMBOL, TIMESTAMP, TRADE_TYPE, TradeType
+from exchange.market import Market
+from exchange.sample_data import sample_stocks
+from exchange.stock import StockInfo
+from exchange.trade import Trade
+
+
+VENUE = "volatility-test"
+SYMBOLS = ("TEA", "POP", "ALE", "GIN", "JOE")
+
+
+def expected_stats(prices):
+    returns = np.diff(np.log(prices))
+    return (
+        len(prices),
+        np.var(prices, ddof=1) if len(prices) > 1 else np.nan,
+        np.std(returns, ddof=1) if len(returns) > 1 else np.nan,
+    )
+
+
+class TestVolatility(unittest.TestCase):
+    """Test cases for the volatility calculators."""
+
+    def setUp(self):
+        StockInfo(VENUE).add_stocks(sample_stocks())
+        self.market = Market(VENUE)
+        self.now = datetime(2025, 3, 29, 12, 0)
+        self.rng = np.random.default_rng(31)
+
+    def tearDown(self):
+        Market.discard(VENUE)
+        StockInfo.discard(VENUE)
+
+    def batch(self, count, start, span, base_price=100.0):
+        timestamps = np.datetime64(start, "ns") + np.sort(self.rng.integers(0, span * 10**9, count)).astype(
+            "timedelta64[ns]"
+        )
+        return {
+            STOCK_SYMBOL: np.array(SYMBOLS, dtype=object)[self.rng.integers(0, len(SYMBOLS), count)],
+            TIMESTAMP: timestamps,
+            QUANTITY: self.rng.integers(1, 1000, count),
+            TRADE_TYPE: np.full(count, TradeType.SELL.value, dtype=object),
+            PRICE: (base_price * np.exp(self.rng.normal(0, 0.01, count).cumsum())).round(2),
+        }
+
+    def assert_matches_window(self, result, now):
+        trades = self.market.get_trades(start_time=now - timedelta(minutes=5))
+        for symbol in SYMBOLS:
+            prices = trades.loc[trades[STOCK_SYMBOL] == symbol, PRICE].to_numpy()
+            if not len(prices):
+                self.assertNotIn(symbol, result.index)
+                continue
+            count, variance, volatility = expected_stats(prices)
+            row = result.loc[symbol]
+            self.assertEqual(row[TRADE_COUNT], count)
+            np.testing.assert_allclose(row[PRICE_VARIANCE], variance, rtol=1e-7, atol=1e-9)
+            np.testing.assert_allclose(row[PRICE_STD], np.sqrt(variance), rtol=1e-7, atol=1e-9)
+            np.testing.assert_allclose(row[LOG_RETURN_VOLATILITY], volatility, rtol=1e-7, atol=1e-12)
+
+    def test_window_calculator(self):
+        self.assertIsNone(VolatilityCalculator(venue=VENUE, now=self.now).calculate())
+        self.market.add_trades(self.batch(5000, self.now - timedelta(minutes=10), 600))
+        result = VolatilityCalculator(venue=VENUE, now=self.now).calculate()
+        self.assertListEqual(
+            result.columns.tolist(), [TRADE_COUNT, PRICE_VARIANCE, PRICE_STD, LOG_RETURN_VOLATILITY]
+        )
+        self.assert_matches_window(result, self.now)
+        single = VolatilityCalculator(stock_symbol="GIN", venue=VENUE, now=self.now).calculate()
+        self.assertIsInstance(single, pd.Series)
+        pd.testing.assert_series_equal(single, result.loc["GIN"])
+
+    def test_rolling_follows_trades_and_window(self):
+        rolling = RollingVolatility(now=self.now - timedelta(minutes=10), venue=VENUE)
+        self.addCleanup(rolling.close)
+        self.market.configure_ingestion(max_lateness=timedelta(minutes=2))
+        start = self.now - timedelta(minutes=10)
+        for step in range(10):
+            self.market.add_trades(self.batch(500, start + timedelta(minutes=step), 60))
+            if step % 3 == 2:
+                # Late trades, merged into the middle of the stocks' trades
+                self.market.add_trades(self.batch(50, start + timedelta(minutes=step - 1), 60))
+            now = start + timedelta(minutes=step + 1)
+            self.assert_matches_window(rolling.calculate(now=now), now)
+
+        single = rolling.calculate(stock_symbol="TEA", now=self.now)
+        pd.testing.assert_series_equal(single, VolatilityCalculator(stock_symbol="TEA", venue=VENUE, now=self.now).calculate())
+        self.assertIsNone(rolling.calculate(now=self.now + timedelta(minutes=6)))
+        self.assertIsNone(rolling.calculate(stock_symbol="TEA", now=self.now + timedelta(minutes=6)))
+
+    def test_rolling_with_late_trades_buffered(self):
+        def add_trade(minutes, price):
+            self.market.add_trade(Trade(stock_symbol="TEA", timestamp=self.now + timedelta(minutes=minutes), quantity=1,
+                                        trade_type=TradeType.BUY, price=price, venue=VENUE))
+
+        for minutes, price in ((-5, 10.0), (-3, 11.0), (-1, 12.0)):
+            add_trade(minutes, price)
+        # Buffered late trades, merged by the initial read, then by the rebuild of a late batch
+        add_trade(-4, 13.0)
+        rolling = RollingVolatility(now=self.now - timedelta(minutes=1), venue=VENUE)
+        self.addCleanup(rolling.close)
+        add_trade(-4.5, 13.0)
+        self.market.add_trades({
+            STOCK_SYMBOL: np.array(["TEA"], dtype=object),
+            TIMESTAMP: np.array([np.datetime64(self.now - timedelta(minutes=2), "ns")]),
+            QUANTITY: np.array([1]),
+            TRADE_TYPE: np.array([TradeType.BUY.value], dtype=object),
+            PRICE: np.array([14.0]),
+        })
+        expected = VolatilityCalculator(venue=VENUE, now=self.now).calculate()
+        self.assertEqual(expected.loc["TEA", TRADE_COUNT], 6)
+        pd.testing.assert_frame_equal(rolling.calculate(now=self.now), expected)
+
+    def test_rolling_is_numerically_stable(self):
+        # Tiny moves on a large price, where the naive sum of squares loses all precision
+        batch = self.batch(20000, self.now - timedelta(minutes=20), 1200)
+        batch[PRICE] = 1e6 + self.rng.normal(0, 1e-3, len(batch[PRICE]))
+        rolling = RollingVolatility(now=self.now - timedelta(minutes=20), venue=VENUE)
+        self.addCleanup(rolling.close)
+        self.market.add_trades(batch)
+        for minutes in range(0, 21, 4):
+            now = self.now - timedelta(minutes=20 - minutes)
+            result = rolling.calculate(now=now)
+            expected = VolatilityCalculator(venue=VENUE, now=now).calculate()
+            np.testing.assert_allclose(result[PRICE_VARIANCE], expected[PRICE_VARIANCE], rtol=1e-6)
+
+    def test_series_matches_trailing_windows(self):
+        self.market.add_trades(self.batch(2000, self.now - timedelta(minutes=30), 1800))
+        trades = self.market.get_trades()
+        series = volatility_series(trades)
+        self.assertEqual(len(series), len(trades))
+        for row in self.rng.choice(len(trades), 50, replace=False):
+            timestamp, symbol = trades[TIMESTAMP].iloc[row], trades[STOCK_SYMBOL].iloc[row]
+            history = trades.iloc[: row + 1]
+            prices = history.loc[
+                (history[STOCK_SYMBOL] == symbol) & (history[TIMESTAMP] >= timestamp - timedelta(minutes=5)), PRICE
+            ].to_numpy()
+            count, variance, volatility = expected_stats(prices)
+            self.assertEqual(series[TRADE_COUNT].iloc[row], count)
+            np.testing.assert_allclose(series[PRICE_VARIANCE].iloc[row], variance, rtol=1e-7, atol=1e-9)
+            np.testing.assert_allclose(series[LOG_RETURN_VOLATILITY].iloc[row], volatility, rtol=1e-7, atol=1e-12)
+
+        since = self.now - timedelta(minutes=10)
+        tail = VolatilitySeriesCalculator(stock_symbol="ALE", venue=VENUE, start_time=since).calculate()
+        expected = series[(series[STOCK_SYMBOL] == "ALE") & (series[TIMESTAMP] >= since)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(tail, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,3 +10,46 @@ def singleton(cls):
         return instances[cls]
 
     return get_instance
+
+
+def named_singleton(default_name: str):
+    """
+    Decorator to keep a single instance of a class per name. The name is the first
+    argument of the constructor, `default_name` when omitted.
+
+    Example:
+        @named_singleton("default")
+        class Registry:
+            def __init__(self, name):
+                ...
+
+        Registry() is Registry("default")    # True
+        Registry("a") is not Registry("b")   # True
+    """
+
+    def wrap(cls):
+        instances = {}
+
+        def get_instance(name: str = default_name, *args, **kwargs):
+            if name not in instances:
+                instances[name] = cls(name, *args, **kwargs)
+            return instances[name]
+
+        def names():
+            """
+            Names of the instances created so far
+            """
+            return list(instances)
+
+        def discard(name: str) -> None:
+            """
+            Forget the instance with the given name, if any
+            """
+            instances.pop(name, None)
+
+        get_instance.names = names
+        get_instance.discard = discard
+        get_instance.__doc__ = cls.__doc__
+        return get_instance
+
+    return wrap
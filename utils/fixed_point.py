@@ -0,0 +1,86 @@
+"""
+Holds the fixed-point arithmetic of the tick price mode, where prices are held as
+int64 multiples of a tick size. Sums of notionals are exact integers, and ratios
+like the volume weighted stock price are rounded deterministically from them.
+"""
+
+from decimal import Decimal
+from fractions import Fraction
+from typing import Union
+import numpy as np
+
+
+# Decimals the volume weighted stock price is rounded to
+PRICE_DECIMALS = 2
+
+TickSize = Union[str, int, float, Decimal, Fraction]
+
+
+def parse_tick_size(tick_size: TickSize) -> Fraction:
+    """
+    Parse a tick size, e.g. "0.01", to an exact fraction. Floats are read through
+    their shortest representation, so 0.01 is exactly one hundredth.
+
+    Raises:
+    ValueError: If the tick size is not a positive number.
+    """
+    try:
+        fraction = Fraction(repr(tick_size)) if isinstance(tick_size, float) else Fraction(tick_size)
+    except (TypeError, ValueError):
+        raise ValueError(f"Tick size {tick_size!r} is not a number")
+    if fraction <= 0:
+        raise ValueError(f"Tick size {tick_size!r} should be more than 0")
+    return fraction
+
+
+def to_ticks(prices: np.ndarray, tick_size: Fraction) -> np.ndarray:
+    """
+    Convert prices to int64 numbers of ticks.
+
+    Raises:
+    ValueError: If a price is not a multiple of the tick size.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    scaled = prices * tick_size.denominator / tick_size.numerator
+    ticks = np.rint(scaled)
+    off_grid = np.abs(scaled - ticks) > 1e-6
+    if off_grid.any():
+        raise ValueError(
+            f"Prices {prices[off_grid][:5].tolist()} are not multiples of the tick size {tick_size}"
+        )
+    return ticks.astype(np.int64)
+
+
+def from_ticks(ticks: np.ndarray, tick_size: Fraction) -> np.ndarray:
+    """
+    Convert numbers of ticks to float prices. The result is the float nearest to the
+    exact price, so the prices given to to_ticks are recovered as they were.
+    """
+    return (np.asarray(ticks, dtype=np.int64) * tick_size.numerator).astype(np.float64) / tick_size.denominator
+
+
+def round_ratio(numerator: int, denominator: int, decimals: int = PRICE_DECIMALS) -> float:
+    """
+    Round the exact ratio of two integers to `decimals` decimals, half to even.
+    """
+    scale = 10 ** decimals
+    quotient, remainder = divmod(int(numerator) * scale, int(denominator))
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient / scale
+
+
+def price_ratio(
+    notional_ticks: np.ndarray, quantities: np.ndarray, tick_size: Fraction, decimals: int = PRICE_DECIMALS
+) -> np.ndarray:
+    """
+    Compute prices, like the volume weighted stock price, from exact notional sums in
+    ticks and quantity sums, rounded to `decimals` decimals half to even.
+    """
+    return np.array(
+        [
+            round_ratio(notional * tick_size.numerator, quantity * tick_size.denominator, decimals)
+            for notional, quantity in zip(np.asarray(notional_ticks).tolist(), np.asarray(quantities).tolist())
+        ],
+        dtype=np.float64,
+    )
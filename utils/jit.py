@@ -0,0 +1,109 @@
+"""
+Holds the backend selection for the compute kernels. Kernels are written as plain
+loops that Numba can JIT compile, paired with an equivalent NumPy implementation
+used when Numba is not installed.
+"""
+
+import importlib.util
+import os
+from typing import Callable, Optional
+
+
+NUMBA = "numba"
+NUMPY = "numpy"
+BACKENDS = (NUMBA, NUMPY)
+
+# Environment variable forcing the kernel backend, e.g. BSM_KERNEL_BACKEND=numpy
+BACKEND_ENV_VAR = "BSM_KERNEL_BACKEND"
+
+_backend: Optional[str] = None
+
+
+def numba_available() -> bool:
+    """
+    Check if Numba is installed, without importing it.
+    """
+    return importlib.util.find_spec("numba") is not None
+
+
+def _validate_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Kernel backend '{backend}' is invalid, expected one of {BACKENDS}")
+    if backend == NUMBA and not numba_available():
+        raise ValueError("Kernel backend 'numba' requested, but Numba is not installed")
+    return backend
+
+
+def get_backend() -> str:
+    """
+    Get the kernel backend in use - the one set with set_backend, else the one in the
+    BSM_KERNEL_BACKEND environment variable, else Numba if it is installed, else NumPy.
+    """
+    global _backend
+    if _backend is None:
+        backend = os.environ.get(BACKEND_ENV_VAR)
+        _backend = _validate_backend(backend) if backend else (NUMBA if numba_available() else NUMPY)
+    return _backend
+
+
+def set_backend(backend: Optional[str]) -> None:
+    """
+    Set the kernel backend, or reset it to the default with None.
+    """
+    global _backend
+    _backend = None if backend is None else _validate_backend(backend)
+
+
+class Kernel:
+    """
+    A compute kernel with a loop implementation, JIT compiled by Numba on first use,
+    and an equivalent NumPy implementation. Calls dispatch on the backend in use.
+
+    Attributes:
+        loop_impl: The loop implementation, also callable as plain (slow) Python.
+        numpy_impl: The NumPy implementation.
+    """
+
+    def __init__(self, loop_impl: Callable, numpy_impl: Callable) -> None:
+        self.loop_impl = loop_impl
+        self.numpy_impl = numpy_impl
+        self.__name__ = loop_impl.__name__
+        self.__doc__ = loop_impl.__doc__
+        self._compiled = None
+
+    def compiled(self) -> Callable:
+        """
+        Get the Numba compiled loop implementation, compiling it on first use.
+        """
+        if self._compiled is None:
+            import numba  # Imported lazily, compiling is only worth it for the numba backend
+
+            self._compiled = numba.njit(cache=True, nogil=True)(self.loop_impl)
+        return self._compiled
+
+    def __call__(self, *args):
+        if get_backend() == NUMBA:
+            return self.compiled()(*args)
+        return self.numpy_impl(*args)
+
+
+def kernel(numpy_impl: Callable) -> Callable[[Callable], Kernel]:
+    """
+    Decorator turning a loop implementation into a Kernel, with the given NumPy implementation.
+
+    Example:
+        def _total_numpy(values):
+            return values.sum()
+
+        @kernel(numpy_impl=_total_numpy)
+        def total(values):
+            result = 0.0
+            for value in values:
+                result += value
+            return result
+    """
+
+    def wrap(loop_impl: Callable) -> Kernel:
+        return Kernel(loop_impl, numpy_impl)
+
+    return wrap
@@ -0,0 +1,209 @@
+"""
+Holds the profiling mode of the entry points. Each phase of a run - loading stocks,
+ingesting trades, every calculator - is profiled with cProfile, sampled for
+flamegraphs and tracked for allocations with tracemalloc, and gets its own reports.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Optional
+
+
+# Seconds between two stack samples of the profiled thread
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Number of functions and allocation sites listed in the phase reports
+REPORT_LIMIT = 25
+
+# Frames kept by tracemalloc for each allocation
+TRACEMALLOC_FRAMES = 10
+
+
+class StackSampler:
+    """
+    Samples the stack of a thread at a fixed interval from a background thread,
+    counting the collapsed stacks ("outer;...;inner") taken by flamegraph tools,
+    e.g. flamegraph.pl or speedscope.
+
+    Parameters:
+    thread_id: The id of the thread to sample. Defaults to the calling thread.
+    interval: The seconds between two samples.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """
+        Get the sampled stacks in the collapsed format, one "stack count" line each.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """
+    Profiles the phases of a run, writing for each one to the output directory:
+    - NN-phase.prof: the cProfile statistics, e.g. for snakeviz or pstats.
+    - NN-phase.txt: the functions taking the most time, and the allocation sites
+      growing the memory the most.
+    - NN-phase.collapsed: the sampled stacks, for flamegraphs.
+    and a summary.json of the wall and CPU time, samples and memory of every phase.
+
+    Without an output directory, phases are only timed, so entry points wrap their
+    phases unconditionally.
+
+    Phases run one at a time, in the thread creating the profiler.
+
+    Parameters:
+    output_dir: The directory to write the reports to, created if missing (optional).
+    sample_interval: The seconds between two stack samples.
+
+    Example:
+        profiler = Profiler("profiles")
+        with profiler.phase("ingest"):
+            load_trades("trades.csv")
+        with profiler.phase("vwsp"):
+            VolumeWeightedStockPriceCalculator().calculate()
+        profiler.write_summary()
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, sample_interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.phases: List[Dict] = []
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Profile the code run in the context as a phase of the given name.
+        """
+        if not self.enabled:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.phases.append({"phase": name, "wall_seconds": time.perf_counter() - start})
+            return
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.take_snapshot()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        sampler = StackSampler(interval=self.sample_interval)
+        profile = cProfile.Profile()
+
+        sampler.start()
+        cpu_start, start = time.process_time(), time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall_seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+            sampler.stop()
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+            memory_after = tracemalloc.take_snapshot()
+            if not tracing:
+                tracemalloc.stop()
+            self._write_phase(
+                name,
+                profile,
+                sampler,
+                memory_after.compare_to(memory_before, "lineno"),
+                {
+                    "phase": name,
+                    "wall_seconds": wall_seconds,
+                    "cpu_seconds": cpu_seconds,
+                    "samples": sum(sampler.stacks.values()),
+                    "allocated_bytes": traced_after - traced_before,
+                    "peak_bytes": traced_peak - traced_before,
+                },
+            )
+
+    def _write_phase(self, name: str, profile: cProfile.Profile, sampler: StackSampler, memory_diff, summary: Dict) -> None:
+        prefix = os.path.join(self.output_dir, f"{len(self.phases):02d}-{name}")
+        profile.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.collapsed", "w") as collapsed_file:
+            collapsed_file.write(sampler.collapsed())
+
+        report = io.StringIO()
+        report.write(
+            f"Phase {name}: {summary['wall_seconds']:.3f}s wall, {summary['cpu_seconds']:.3f}s CPU, "
+            f"{summary['allocated_bytes'] / 2**20:+.2f} MiB allocated, {summary['peak_bytes'] / 2**20:.2f} MiB peak\n\n"
+        )
+        pstats.Stats(profile, stream=report).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LIMIT)
+        report.write("Allocation sites by memory growth:\n")
+        for difference in memory_diff[:REPORT_LIMIT]:
+            report.write(f"{difference}\n")
+        with open(f"{prefix}.txt", "w") as report_file:
+            report_file.write(report.getvalue())
+
+        summary["reports"] = {kind: f"{prefix}.{kind}" for kind in ("prof", "txt", "collapsed")}
+        self.phases.append(summary)
+
+    def summary(self) -> str:
+        """
+        Get a table of the time (and memory, when profiling) of every phase.
+        """
+        lines = []
+        for phase in self.phases:
+            line = f"{phase['phase']:<24} {phase['wall_seconds']:10.3f}s"
+            if "cpu_seconds" in phase:
+                line += f" {phase['cpu_seconds']:10.3f}s CPU {phase['peak_bytes'] / 2**20:10.2f} MiB peak"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write_summary(self) -> Optional[str]:
+        """
+        Write the summary.json of the phases to the output directory.
+
+        Returns:
+        str: The path of the summary, None without an output directory.
+        """
+        if not self.enabled:
+            return None
+        path = os.path.join(self.output_dir, "summary.json")
+        with open(path, "w") as summary_file:
+            json.dump({"phases": self.phases}, summary_file, indent=2)
+        return path
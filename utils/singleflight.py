@@ -0,0 +1,58 @@
+"""
+Holds helpers to de-duplicate concurrent identical computations
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs concurrent calls sharing a key only once. Callers arriving while a call
+    with the same key is in flight wait for it and get its result (or exception).
+
+    Example:
+        flights = SingleFlight()
+        vwsp = flights.do(("vwsp", "XYZ"), lambda: VolumeWeightedStockPriceCalculator("XYZ").calculate())
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.computations = 0
+        self.requests = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Call `function`, unless a call with the same key is in flight, and return its result.
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.computations += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result